@@ -0,0 +1,130 @@
+"""partition orderbook_snapshots by day, add per-minute rollups
+
+Revision ID: orderbook_partitions_001
+Revises: backtest_001
+Create Date: 2026-10-17
+
+"""
+from datetime import date, datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'orderbook_partitions_001'
+down_revision: Union[str, None] = 'backtest_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created past today (the app keeps creating them, see OrderbookPartitionManager)
+PARTITIONS_AHEAD_DAYS = 3
+
+COLUMNS = 'exchange, symbol, bid, ask, bid_quantity, ask_quantity, "timestamp", timestamp_ns'
+
+
+def _create_partition(day: date):
+    op.execute(
+        f"CREATE TABLE orderbook_snapshots_p{day:%Y%m%d} PARTITION OF orderbook_snapshots "
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    op.rename_table('orderbook_snapshots', 'orderbook_snapshots_legacy')
+    for index in ('idx_exchange', 'idx_symbol', 'idx_timestamp', 'idx_symbol_timestamp', 'idx_exchange_symbol_timestamp'):
+        op.drop_index(index, table_name='orderbook_snapshots_legacy')
+    
+    # No primary key: on a partitioned table it would have to include timestamp
+    # and would cost one more index per insert; id stays unique via its sequence
+    op.execute("""
+        CREATE TABLE orderbook_snapshots (
+            id BIGSERIAL NOT NULL,
+            exchange VARCHAR(20) NOT NULL,
+            symbol VARCHAR(20) NOT NULL,
+            bid DOUBLE PRECISION NOT NULL,
+            ask DOUBLE PRECISION NOT NULL,
+            bid_quantity DOUBLE PRECISION,
+            ask_quantity DOUBLE PRECISION,
+            "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            timestamp_ns BIGINT NOT NULL
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    # The only index (created on every partition): symbol/exchange + time range
+    op.create_index(
+        'idx_orderbook_symbol_exchange_timestamp', 'orderbook_snapshots', ['symbol', 'exchange', 'timestamp']
+    )
+    
+    op.create_table(
+        'orderbook_rollups_1m',
+        sa.Column('minute', sa.DateTime(), nullable=False),
+        sa.Column('exchange', sa.String(length=20), nullable=False),
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('bid_open', sa.Float(), nullable=False),
+        sa.Column('bid_high', sa.Float(), nullable=False),
+        sa.Column('bid_low', sa.Float(), nullable=False),
+        sa.Column('bid_close', sa.Float(), nullable=False),
+        sa.Column('ask_open', sa.Float(), nullable=False),
+        sa.Column('ask_high', sa.Float(), nullable=False),
+        sa.Column('ask_low', sa.Float(), nullable=False),
+        sa.Column('ask_close', sa.Float(), nullable=False),
+        sa.Column('spread_bps_avg', sa.Float(), nullable=False),
+        sa.Column('spread_bps_min', sa.Float(), nullable=False),
+        sa.Column('spread_bps_max', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('minute', 'exchange', 'symbol')
+    )
+    op.create_index('idx_orderbook_rollup_symbol_minute', 'orderbook_rollups_1m', ['symbol', 'minute'])
+    
+    # Partitions for the recorded days and the next few, then move the rows over
+    first, last = op.get_bind().execute(sa.text(
+        'SELECT min("timestamp")::date, max("timestamp")::date FROM orderbook_snapshots_legacy'
+    )).one()
+    today = datetime.utcnow().date()
+    day = min(first or today, today)
+    while day <= max(last or today, today) + timedelta(days=PARTITIONS_AHEAD_DAYS):
+        _create_partition(day)
+        day += timedelta(days=1)
+    
+    op.execute(
+        f"INSERT INTO orderbook_snapshots (id, {COLUMNS}) SELECT id, {COLUMNS} FROM orderbook_snapshots_legacy"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('orderbook_snapshots', 'id'), "
+        "(SELECT COALESCE(max(id), 0) + 1 FROM orderbook_snapshots_legacy), false)"
+    )
+    op.drop_table('orderbook_snapshots_legacy')
+
+
+def downgrade() -> None:
+    op.rename_table('orderbook_snapshots', 'orderbook_snapshots_partitioned')
+    op.create_table(
+        'orderbook_snapshots',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('exchange', sa.String(length=20), nullable=False),
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('bid', sa.Float(), nullable=False),
+        sa.Column('ask', sa.Float(), nullable=False),
+        sa.Column('bid_quantity', sa.Float(), nullable=True),
+        sa.Column('ask_quantity', sa.Float(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('timestamp_ns', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        f"INSERT INTO orderbook_snapshots (id, {COLUMNS}) SELECT id, {COLUMNS} FROM orderbook_snapshots_partitioned"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('orderbook_snapshots', 'id'), "
+        "(SELECT COALESCE(max(id), 0) + 1 FROM orderbook_snapshots), false)"
+    )
+    op.drop_table('orderbook_snapshots_partitioned')  # drops its partitions too
+    
+    op.create_index('idx_exchange', 'orderbook_snapshots', ['exchange'])
+    op.create_index('idx_symbol', 'orderbook_snapshots', ['symbol'])
+    op.create_index('idx_timestamp', 'orderbook_snapshots', ['timestamp'])
+    op.create_index('idx_symbol_timestamp', 'orderbook_snapshots', ['symbol', 'timestamp'])
+    op.create_index('idx_exchange_symbol_timestamp', 'orderbook_snapshots', ['exchange', 'symbol', 'timestamp'])
+    
+    op.drop_index('idx_orderbook_rollup_symbol_minute', table_name='orderbook_rollups_1m')
+    op.drop_table('orderbook_rollups_1m')
@@ -1,14 +1,16 @@
 """API dependencies"""
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, Response, WebSocketException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import uuid
 
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal, get_db
 from app.core.security import decode_token
 from app.models.user import User
 from app.services.auth_service import AuthService
+from app.services.engine_hub import EngineSnapshot, get_engine_hub
+from app.services.user_cache import UserPrincipal, get_user_cache
 
 
 # Security схема
@@ -22,10 +24,40 @@ async def get_current_user(
     """
     Получить текущего аутентифицированного пользователя
     
-    Проверяет JWT token и возвращает User
+    Проверяет JWT token и возвращает User (ORM, из БД: для эндпоинтов,
+    которые меняют пользователя или его данные). Read-only эндпоинтам
+    достаточно get_current_principal.
     """
-    token = credentials.credentials
+    return await _get_user_from_token(credentials.credentials, db)
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> UserPrincipal:
+    """
+    Текущий пользователь без сессии БД (read-only эндпоинты)
+    
+    Берётся из кэша пользователей; БД открывается только при промахе.
+    """
+    return await _get_principal_from_token(credentials.credentials)
+
+
+async def get_websocket_user(token: Optional[str] = Query(None)) -> UserPrincipal:
+    """
+    Пользователь для WebSocket (браузер не может передать заголовок)
     
+    Токен передаётся как ?token=..., ошибка закрывает соединение с кодом 1008.
+    """
+    if not token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Missing token")
+    try:
+        return await _get_principal_from_token(token)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+
+
+def _decode_access_token(token: str) -> uuid.UUID:
+    """Проверить access token и вернуть user_id"""
     # Декодировать токен
     payload = decode_token(token)
     if not payload:
@@ -61,23 +93,56 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Получить пользователя из БД
-    auth_service = AuthService(db)
-    user = await auth_service.get_user_by_id(user_id)
-    
-    if not user:
+    return user_id
+
+
+def _check_principal(principal: Optional[UserPrincipal]):
+    """Пользователь существует и активен"""
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
         )
+
+
+async def _get_principal_from_token(token: str) -> UserPrincipal:
+    """Проверить access token через кэш пользователей"""
+    user_id = _decode_access_token(token)
+    
+    cache = get_user_cache()
+    principal = await cache.get(user_id)
+    if principal is None:
+        # Промах кэша: короткая сессия только на загрузку пользователя
+        async with AsyncSessionLocal() as db:
+            user = await AuthService(db).get_user_by_id(user_id)
+        principal = UserPrincipal.from_user(user) if user else None
+        if principal:
+            await cache.put(principal)
     
+    _check_principal(principal)
+    return principal
+
+
+async def _get_user_from_token(token: str, db: AsyncSession) -> User:
+    """Проверить access token и вернуть активного пользователя (ORM, из БД)"""
+    user_id = _decode_access_token(token)
+    
+    # Получить пользователя из БД
+    auth_service = AuthService(db)
+    user = await auth_service.get_user_by_id(user_id)
+    
+    principal = UserPrincipal.from_user(user) if user else None
+    if principal:
+        await get_user_cache().put(principal)
+    
+    _check_principal(principal)
     return user
 
 
@@ -93,13 +158,40 @@ async def get_current_active_user(
     return current_user
 
 
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match содержит etag (или *)"""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
 
 
-
-
-
-
-
-
-
-
+async def get_engine_snapshot(
+    request: Request,
+    response: Response,
+    wait_ms: int = Query(0, ge=0, le=30000)
+) -> EngineSnapshot:
+    """
+    Снимок движка для условных GET (ETag / 304 / long-poll)
+    
+    ETag меняется только когда движок записал новые stats или операции.
+    Если If-None-Match совпадает, ответ 304 отдаётся до того, как эндпоинт
+    что-либо сериализует. С ?wait_ms= запрос ждёт до wait_ms, пока ETag
+    не изменится, и только потом отвечает 304.
+    """
+    hub = get_engine_hub()
+    snapshot = hub.snapshot()
+    if_none_match = request.headers.get('if-none-match')
+    
+    if wait_ms and _etag_matches(if_none_match, snapshot.etag):
+        snapshot = await hub.wait_for_change(snapshot.etag, wait_ms / 1000.0)
+    
+    if _etag_matches(if_none_match, snapshot.etag):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={'ETag': snapshot.etag, 'Cache-Control': 'no-cache'}
+        )
+    
+    response.headers['ETag'] = snapshot.etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return snapshot
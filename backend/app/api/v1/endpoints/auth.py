@@ -7,6 +7,7 @@ from app.schemas.user import UserCreate, UserLogin, UserResponse, MFASetup, MFAV
 from app.schemas.token import Token
 from app.services.auth_service import AuthService
 from app.services.portfolio_service import PortfolioService
+from app.services.user_cache import get_user_cache
 from app.api.deps import get_current_user
 from app.models.user import User
 
@@ -123,9 +124,10 @@ async def logout(current_user: User = Depends(get_current_user)):
     """
     Выход из системы
     
-    В MVP просто endpoint для симметрии
-    В production - invalidate токены в Redis
+    Сбрасывает пользователя в кэше (во всех воркерах при AUTH_CACHE_REDIS).
+    JWT остаётся stateless: токен действует до истечения срока.
     """
+    await get_user_cache().invalidate(current_user.id)
     return {"message": "Successfully logged out"}
 
 
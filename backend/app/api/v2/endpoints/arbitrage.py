@@ -3,41 +3,57 @@ DRAIZER V2 API - Arbitrage Statistics
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, List, Optional
+import asyncio
 import time
 
-from app.api.deps import get_current_user
-from app.services.c_engine_bridge import CEngineBridge
-from app.models.user import User
+from app.api.deps import get_current_principal, get_engine_snapshot
+from app.services.c_engine_bridge import filter_operations, operations_to_dicts
+from app.services.engine_hub import EngineSnapshot, get_engine_hub
+from app.services.operations_export import EXPORT_FORMATS, export_operations
+from app.services.operations_journal import get_operations_journal
+from app.services.operations_stats import get_operations_aggregator
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter()
 
-# Global bridge instance
-_bridge = None
 
-def get_bridge() -> CEngineBridge:
-    """Get or create C engine bridge"""
-    global _bridge
-    if _bridge is None:
-        _bridge = CEngineBridge()
-        _bridge.connect()
-    return _bridge
+async def _query_operations(limit: int, before: Optional[int] = None, **filters):
+    """
+    Page of operations from the journal, or from the ring if it is empty
+    
+    The journal is read in a worker thread: a page may scan up to
+    QUERY_SCAN_RECORDS records.
+    
+    Returns:
+        (operations oldest first, cursor for the next older page or None)
+    """
+    journal = get_operations_journal()
+    if journal and journal.count:
+        return await asyncio.to_thread(journal.query, limit=limit, before=before, **filters)
+    
+    ops = filter_operations(get_engine_hub().snapshot().operations, **filters)
+    if before is not None:
+        return ops[:0], None
+    return ops[-limit:], None
 
 
 @router.get("/stats")
 async def get_arbitrage_stats(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal),
+    snapshot: EngineSnapshot = Depends(get_engine_snapshot)
 ) -> Dict:
     """
     Get arbitrage statistics for dashboard
     
+    Conditional: ETag / If-None-Match (304) and ?wait_ms= long-poll.
+    
     Returns:
         Stats matching frontend DashboardStats interface
     """
-    bridge = get_bridge()
-    
-    stats = bridge.get_stats()
+    stats = snapshot.stats
     if not stats:
         # Return default stats if engine not running
         return {
@@ -57,6 +73,9 @@ async def get_arbitrage_stats(
             'worst_pair': None
         }
     
+    aggregator = get_operations_aggregator()
+    best_pair, worst_pair = aggregator.best_worst('pair')
+    
     # Map C-engine stats to frontend format
     return {
         'engine_status': 'RUNNING' if stats['engine_running'] else 'STOPPED',
@@ -66,118 +85,167 @@ async def get_arbitrage_stats(
         'balance_usd': stats['balance_usd'],
         'total_operations': stats['opportunities_executed'],
         'total_profit': stats['total_profit_usd'],
-        'avg_spread_bps': 0.0,  # TODO: calculate from operations
+        'avg_spread_bps': aggregator.totals().spread_mean,
         'avg_execution_time_us': stats['avg_latency_us'],
         'opportunities_found': stats['opportunities_detected'],
         'opportunities_executed': stats['opportunities_executed'],
         'win_rate_percent': stats['win_rate'] * 100,
-        'best_pair': None,  # TODO: calculate from operations
-        'worst_pair': None   # TODO: calculate from operations
+        'best_pair': best_pair,
+        'worst_pair': worst_pair
     }
 
 
 @router.get("/profit-history")
 async def get_profit_history(
-    current_user: User = Depends(get_current_user),
-    limit: int = Query(100, ge=1, le=1000)
+    current_user: UserPrincipal = Depends(get_current_principal),
+    points: int = Query(500, ge=2, le=5000),
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    method: str = Query("lttb", pattern="^(lttb|minmax)$")
 ) -> List[Dict]:
     """
     Get profit history for chart
     
+    Cumulative P&L downsampled server-side from per-second, per-minute
+    and per-hour rollups, so the payload size depends on points only.
+    
+    Args:
+        points: Maximum number of points
+        since_ms, until_ms: Time range (default: everything)
+        method: lttb (shape preserving) or minmax (keeps extremes)
+    
     Returns:
         List of profit points with timestamp and cumulative
     """
-    bridge = get_bridge()
-    
-    # Get operations from C-engine shared memory
-    operations = bridge.get_operations(limit=limit)
+    return get_operations_aggregator().profit.query(
+        points=points,
+        since_ms=since_ms,
+        until_ms=until_ms,
+        method=method
+    )
+
+
+@router.get("/prices")
+async def get_live_prices(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    limit: int = Query(100, ge=1, le=1000),
+    symbol: Optional[str] = None,
+    exchange: Optional[str] = None
+) -> List[Dict]:
+    """
+    Get live top-of-book from the engine price cache
     
-    if not operations:
+    Returns:
+        Quotes, most recently updated first
+    """
+    book = get_engine_hub().snapshot().prices
+    if book is None:
         return []
     
-    # Calculate cumulative profit
-    cumulative = 0.0
-    profit_history = []
+    if symbol and exchange:
+        quote = book.get(symbol, exchange)
+        return [quote] if quote else []
     
-    for op in operations:
-        cumulative += op.get('pnl', 0.0)
-        profit_history.append({
-            'timestamp': op['timestamp'],
-            'profit': op.get('pnl', 0.0),
-            'cumulative': cumulative
-        })
+    return book.latest(limit=limit, symbol=symbol, exchange=exchange)
+
+
+@router.get("/opportunities")
+async def get_live_opportunities(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    limit: int = Query(10, ge=1, le=100),
+    min_spread_bps: float = 0.0
+) -> List[Dict]:
+    """
+    Get current cross-exchange spreads from the engine price cache
+    
+    Returns:
+        Opportunities, widest spread first
+    """
+    book = get_engine_hub().snapshot().prices
+    if book is None:
+        return []
     
-    return profit_history
+    return book.opportunities(limit=limit, min_spread_bps=min_spread_bps)
 
 
 @router.get("/history")
 async def get_arbitrage_history(
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_principal),
     limit: int = Query(50, ge=1, le=500),
     symbol: Optional[str] = None,
-    exchange: Optional[str] = None
+    exchange: Optional[str] = None,
+    strategy: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    before: Optional[int] = Query(None, ge=0)
 ) -> Dict:
     """
     Get arbitrage operation history
     
+    Pages walk back from the newest operation: pass `next_before` of a
+    response as `before` to get the next (older) page.
+    
     Returns:
         Paginated list of operations
     """
-    bridge = get_bridge()
-    
-    operations = bridge.get_operations(limit=limit)
-    
-    # Filter by symbol/exchange if specified
-    if symbol:
-        operations = [op for op in operations if op.get('symbol') == symbol]
+    # Filter by symbol/exchange/strategy/time if specified
+    ops, next_before = await _query_operations(
+        limit,
+        before=before,
+        symbol=symbol,
+        exchange=exchange,
+        strategy=strategy,
+        since_ms=since_ms,
+        until_ms=until_ms
+    )
+    operations = operations_to_dicts(ops)
     
-    if exchange:
-        operations = [op for op in operations 
-                     if op.get('exchange_buy') == exchange or op.get('exchange_sell') == exchange]
+    journal = get_operations_journal()
     
     return {
         'operations': operations,
         'total': len(operations),
-        'page': 1,
-        'per_page': limit
+        'journal_total': journal.count if journal else 0,
+        'per_page': limit,
+        'next_before': next_before
     }
 
 
 @router.get("/history/export")
 async def export_arbitrage_history(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal),
+    format: str = Query("csv", pattern="^(csv|ndjson|npz)$"),
+    symbol: Optional[str] = None,
+    exchange: Optional[str] = None,
+    strategy: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None
 ):
     """
-    Export arbitrage history as CSV
-    
-    Returns:
-        CSV file download
-    """
-    from fastapi.responses import StreamingResponse
-    import io
-    import csv
-    
-    bridge = get_bridge()
-    operations = bridge.get_operations(limit=1000)
+    Export arbitrage history
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=[
-        'timestamp', 'type', 'strategy', 'symbol', 
-        'exchange_buy', 'exchange_sell', 'quantity',
-        'entry_price', 'exit_price', 'pnl', 'pnl_percent',
-        'spread_bps', 'fees_paid', 'is_open'
-    ])
+    Streams every matching operation (oldest first) in constant memory:
+    rows are encoded and sent chunk by chunk as the journal is read.
     
-    writer.writeheader()
-    writer.writerows(operations)
+    Args:
+        format: csv, ndjson, or npz (NumPy structured array "operations")
     
-    output.seek(0)
+    Returns:
+        File download
+    """
+    media_type, extension = EXPORT_FORMATS[format]
     
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        export_operations(
+            format,
+            symbol=symbol,
+            exchange=exchange,
+            strategy=strategy,
+            since_ms=since_ms,
+            until_ms=until_ms
+        ),
+        media_type=media_type,
         headers={
-            "Content-Disposition": f"attachment; filename=arbitrage_history_{int(time.time())}.csv"
+            "Content-Disposition": f"attachment; filename=arbitrage_history_{int(time.time())}.{extension}"
         }
     )
@@ -3,44 +3,55 @@ DRAIZER V2 API - C Engine Management
 Monitor and control C trading engine
 """
 
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Optional
+from typing import Awaitable, Dict, Optional
 import asyncio
 import json
+import re
 import time
 
-from app.api.deps import get_current_user, get_db
-from app.services.c_engine_bridge import CEngineBridge
-from app.models.user import User
+from app.api.deps import get_current_principal, get_db, get_engine_snapshot, get_websocket_user
+from app.services.engine_commands import CommandAck, EngineCommandError
+from app.services.engine_hub import EngineSnapshot, get_engine_hub
+from app.services.engine_lifecycle import get_engine_lifecycle
+from app.services.engine_logs import get_engine_log_tailer
+from app.services.engine_stream import get_engine_stream
+from app.services.orderbook_bars import RESOLUTIONS, bars_to_dicts, get_orderbook_bars
+from app.services.orderbook_recorder import get_orderbook_recorder
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter()
 
-# Global bridge instance (singleton)
-_bridge = None
+STRATEGIES = ["cross_exchange", "funding_rate", "triangular"]
 
-def get_bridge() -> CEngineBridge:
-    """Get or create C engine bridge"""
-    global _bridge
-    if _bridge is None:
-        _bridge = CEngineBridge()
-        _bridge.connect()
-    return _bridge
+
+async def _send(command: Awaitable[CommandAck], error: str) -> CommandAck:
+    """Await an engine command: 503 if undelivered, 400 if the engine rejected it"""
+    try:
+        ack = await command
+    except EngineCommandError as e:
+        raise HTTPException(status_code=503, detail=f"{error}: {e}")
+    if not ack.ok:
+        raise HTTPException(status_code=400, detail=f"{error}: {ack.message}")
+    return ack
 
 
 @router.get("/status")
 async def get_engine_status(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal),
+    snapshot: EngineSnapshot = Depends(get_engine_snapshot)
 ) -> Dict:
     """
     Get C engine status
     
+    Conditional: ETag / If-None-Match (304) and ?wait_ms= long-poll.
+    
     Returns:
         Engine running status, stats, health
     """
-    bridge = get_bridge()
     
-    if not bridge.connected:
+    if not snapshot.connected:
         return {
             'running': False,
             'uptime_seconds': 0,
@@ -50,7 +61,7 @@ async def get_engine_status(
             'message': 'C engine not running'
         }
     
-    stats = bridge.get_stats()
+    stats = snapshot.stats
     
     if not stats:
         return {
@@ -81,17 +92,18 @@ async def get_engine_status(
 
 @router.get("/stats")
 async def get_engine_stats(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal),
+    snapshot: EngineSnapshot = Depends(get_engine_snapshot)
 ) -> Dict:
     """
     Get detailed engine statistics
     
+    Conditional: ETag / If-None-Match (304) and ?wait_ms= long-poll.
+    
     Returns:
         Opportunities, orders, profit, latency
     """
-    bridge = get_bridge()
-    
-    stats = bridge.get_stats()
+    stats = snapshot.stats
     if not stats:
         raise HTTPException(status_code=503, detail="C engine not available")
     
@@ -100,27 +112,35 @@ async def get_engine_stats(
 
 @router.get("/performance")
 async def get_performance_metrics(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Get performance metrics
     
     Returns:
-        Derived metrics: throughput, success rate, profit per trade
+        Derived metrics: latency percentiles over the metrics window and
+        since engine start, per-second rates, success rate, profit per trade
     """
-    bridge = get_bridge()
+    hub = get_engine_hub()
+    stats = hub.snapshot().stats
     
-    metrics = bridge.get_performance_metrics()
+    window_latency = hub.metrics.window_latency()
+    rates = hub.metrics.rates()
+    
+    metrics = hub.bridge.get_performance_metrics(stats, latency=window_latency, rates=rates) if stats else {}
     if not metrics:
         raise HTTPException(status_code=503, detail="C engine not available")
     
+    metrics['window_seconds'] = hub.metrics.window_seconds
+    metrics['lifetime_latency_us'] = hub.metrics.lifetime_latency()
+    metrics['rates'] = rates
     return metrics
 
 
 @router.post("/strategy/{strategy_name}/start")
 async def start_strategy(
     strategy_name: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Start a specific strategy
@@ -131,47 +151,78 @@ async def start_strategy(
     Returns:
         Success status
     """
-    bridge = get_bridge()
+    bridge = get_engine_hub().bridge
     
-    if strategy_name not in ["cross_exchange", "funding_rate", "triangular"]:
+    if strategy_name not in STRATEGIES:
         raise HTTPException(status_code=400, detail="Invalid strategy name")
     
-    success = bridge.start_strategy(strategy_name)
-    
-    if not success:
-        raise HTTPException(status_code=503, detail="Failed to start strategy")
+    ack = await _send(bridge.start_strategy(strategy_name), "Failed to start strategy")
     
     return {
         'success': True,
         'strategy': strategy_name,
-        'status': 'started'
+        'status': 'started',
+        'message': ack.message
     }
 
 
 @router.post("/strategy/{strategy_name}/stop")
 async def stop_strategy(
     strategy_name: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """Stop a specific strategy"""
-    bridge = get_bridge()
+    bridge = get_engine_hub().bridge
     
-    success = bridge.stop_strategy(strategy_name)
+    if strategy_name not in STRATEGIES:
+        raise HTTPException(status_code=400, detail="Invalid strategy name")
     
-    if not success:
-        raise HTTPException(status_code=503, detail="Failed to stop strategy")
+    ack = await _send(bridge.stop_strategy(strategy_name), "Failed to stop strategy")
     
     return {
         'success': True,
         'strategy': strategy_name,
-        'status': 'stopped'
+        'status': 'stopped',
+        'message': ack.message
+    }
+
+
+@router.post("/strategies")
+async def set_strategies(
+    enabled: Dict[str, bool],
+    current_user: UserPrincipal = Depends(get_current_principal)
+) -> Dict:
+    """
+    Start/stop several strategies in one engine round-trip
+    
+    Args:
+        enabled: {"cross_exchange": true, "triangular": false, ...}
+    
+    Returns:
+        Per-strategy engine acknowledgements
+    """
+    unknown = set(enabled) - set(STRATEGIES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid strategy name: {', '.join(sorted(unknown))}")
+    
+    try:
+        acks = await get_engine_hub().bridge.set_strategies(enabled)
+    except EngineCommandError as e:
+        raise HTTPException(status_code=503, detail=f"Failed to update strategies: {e}")
+    
+    return {
+        'success': all(ack.ok for ack in acks),
+        'strategies': {
+            name: {'enabled': on, 'applied': ack.ok, 'message': ack.message}
+            for (name, on), ack in zip(enabled.items(), acks)
+        }
     }
 
 
 @router.post("/config/update")
 async def update_config(
     config: Dict,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Hot-reload configuration
@@ -182,174 +233,115 @@ async def update_config(
     Returns:
         Success status
     """
-    bridge = get_bridge()
+    bridge = get_engine_hub().bridge
     
-    success = bridge.update_config(config)
-    
-    if not success:
-        raise HTTPException(status_code=503, detail="Failed to update config")
+    ack = await _send(bridge.update_config(config), "Failed to update config")
     
     return {
         'success': True,
-        'message': 'Configuration updated'
+        'message': ack.message
     }
 
 
+async def _run_job(action: str, wait_ms: int, response: Response) -> Dict:
+    """Queue a lifecycle job, optionally wait for it, 202 while unfinished"""
+    lifecycle = get_engine_lifecycle()
+    job = await lifecycle.wait(lifecycle.submit(action), wait_ms / 1000.0)
+    if not job.finished:
+        response.status_code = 202
+    return {'success': job.status == 'succeeded', **job.to_dict()}
+
+
 @router.post("/start")
 async def start_engine(
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    wait_ms: int = Query(0, ge=0, le=30000),
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Start C engine container via Docker API
     
-    Returns:
-        Success status
-    """
-    import docker
-    import os
-    import time
-    
-    # Check if already running
-    shm_path = "/dev/shm/draizer_v2"
+    Runs as a background job; poll /engine/jobs/{job_id} for the outcome.
     
-    if os.path.exists(shm_path):
-        return {
-            'success': True,
-            'message': '✅ C engine is already running'
-        }
+    Args:
+        wait_ms: Wait up to this long for the job to finish before replying
     
-    # Start container via Docker API
-    try:
-        # Connect to Docker
-        client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-        
-        # Get container
-        container = client.containers.get('draizer_c_engine')
-        
-        # Check if already running
-        container.reload()
-        if container.status == 'running':
-            return {
-                'success': True,
-                'message': '✅ C engine is already running'
-            }
-        
-        # Start container
-        container.start()
-        
-        # Wait up to 10 seconds for engine to initialize
-        for i in range(10):
-            time.sleep(1)
-            if os.path.exists(shm_path):
-                break
-        
-        # Verify it started
-        if os.path.exists(shm_path):
-            # Force bridge to reconnect to new shared memory
-            bridge = get_bridge()
-            bridge.disconnect()
-            bridge.connect()
-            
-            return {
-                'success': True,
-                'message': '✅ C engine started successfully'
-            }
-        else:
-            raise HTTPException(
-                status_code=503,
-                detail="Container started but shared memory not initialized"
-            )
-            
-    except docker.errors.NotFound:
-        raise HTTPException(
-            status_code=503,
-            detail="C engine container not found. Run: docker-compose up -d c_engine"
-        )
-    except docker.errors.APIError as e:
-        raise HTTPException(status_code=503, detail=f"Docker API error: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Failed to start engine: {e}")
+    Returns:
+        Job id and status (202 while the job is still running)
+    """
+    return await _run_job('start', wait_ms, response)
 
 
 @router.post("/stop")
 async def stop_engine(
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    wait_ms: int = Query(0, ge=0, le=30000),
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
-    Stop C engine process gracefully via Docker API
+    Stop C engine container gracefully via Docker API
     
     Returns:
-        Success status
+        Job id and status (202 while the job is still running)
     """
-    import docker
-    import os
-    
-    # Check if engine is running
-    shm_path = "/dev/shm/draizer_v2"
-    
-    if not os.path.exists(shm_path):
-        return {
-            'success': True,
-            'message': '⚠️ Engine was not running'
-        }
-    
-    # Stop container via Docker API
-    try:
-        # Connect to Docker via Unix socket
-        client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-        
-        # Get container
-        container = client.containers.get('draizer_c_engine')
-        
-        # Stop container (timeout=10s for graceful shutdown)
-        container.stop(timeout=10)
-        
-        # Disconnect bridge from old shared memory
-        bridge = get_bridge()
-        bridge.disconnect()
-        
-        return {
-            'success': True,
-            'message': '✅ C engine stopped successfully'
-        }
-            
-    except docker.errors.NotFound:
-        return {
-            'success': True,
-            'message': '⚠️ Engine container not found'
-        }
-    except docker.errors.APIError as e:
-        raise HTTPException(status_code=503, detail=f"Docker API error: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Failed to stop engine: {e}")
+    return await _run_job('stop', wait_ms, response)
 
 
 @router.post("/restart")
 async def restart_engine(
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    wait_ms: int = Query(0, ge=0, le=30000),
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
-    Restart C engine
+    Restart C engine container
     
     Returns:
-        Success status
+        Job id and status (202 while the job is still running)
+    """
+    return await _run_job('restart', wait_ms, response)
+
+
+@router.get("/jobs")
+async def list_engine_jobs(
+    current_user: UserPrincipal = Depends(get_current_principal)
+) -> Dict:
+    """
+    Recent start/stop/restart jobs
+    
+    Returns:
+        Jobs, newest first
+    """
+    return {'jobs': [job.to_dict() for job in get_engine_lifecycle().jobs()]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_engine_job(
+    job_id: str,
+    wait_ms: int = Query(0, ge=0, le=30000),
+    current_user: UserPrincipal = Depends(get_current_principal)
+) -> Dict:
     """
-    bridge = get_bridge()
+    Status of one lifecycle job
     
-    success = bridge.restart_engine()
+    Args:
+        wait_ms: Long-poll: wait up to this long for the job to finish
     
-    if not success:
-        raise HTTPException(status_code=503, detail="Failed to restart engine")
+    Returns:
+        Job id, action, status (queued/running/succeeded/failed) and message
+    """
+    lifecycle = get_engine_lifecycle()
+    job = lifecycle.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    return {
-        'success': True,
-        'message': 'Engine restarted successfully'
-    }
+    job = await lifecycle.wait(job, wait_ms / 1000.0)
+    return {'success': job.status == 'succeeded', **job.to_dict()}
 
 
 @router.get("/config")
 async def get_engine_config(
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Get current engine configuration
@@ -377,7 +369,7 @@ async def get_engine_config(
 @router.post("/config")
 async def save_engine_config(
     config: Dict,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Save engine configuration
@@ -408,24 +400,24 @@ async def save_engine_config(
 
 @router.post("/shutdown")
 async def shutdown_engine(
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    wait_ms: int = Query(0, ge=0, le=30000),
+    current_user: UserPrincipal = Depends(get_current_principal)
 ) -> Dict:
     """
     Gracefully shutdown C engine
     
     ⚠️  Use with caution!
-    """
-    bridge = get_bridge()
-    
-    success = bridge.stop_engine()
     
-    if not success:
-        raise HTTPException(status_code=503, detail="Failed to shutdown engine")
+    Same stop job as /engine/stop, serialized with start/restart.
     
-    return {
-        'success': True,
-        'message': 'Engine shutdown initiated'
-    }
+    Returns:
+        Job id and status (202 while the job is still running)
+    """
+    result = await _run_job('stop', wait_ms, response)
+    if result['status'] == 'failed':
+        raise HTTPException(status_code=503, detail=f"Failed to shutdown engine: {result['message']}")
+    return result
 
 
 @router.get("/health")
@@ -436,153 +428,166 @@ async def health_check() -> Dict:
     Returns:
         Engine health status
     """
-    bridge = get_bridge()
+    hub = get_engine_hub()
     
-    return bridge.health_check()
+    return hub.bridge.health_check(hub.snapshot().stats or {})
 
 
-@router.websocket("/logs/stream")
-async def stream_logs(websocket: WebSocket):
+@router.get("/recorder")
+async def get_recorder_status(
+    current_user: UserPrincipal = Depends(get_current_principal)
+) -> Dict:
     """
-    WebSocket endpoint for streaming C engine logs in real-time
+    Orderbook recorder status
     
-    Streams logs from Docker container to frontend
+    Returns:
+        Recorded snapshots and writer metrics (pending, written, dropped, batches, flush errors)
+    """
+    return get_orderbook_recorder().stats()
+
+
+@router.get("/recorder/bars")
+async def get_recorder_bars(
+    symbol: str,
+    exchange: Optional[str] = None,
+    resolution: str = Query("1m", pattern=f"^({'|'.join(RESOLUTIONS)})$"),
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_principal)
+) -> Dict:
+    """
+    Mid-price and spread bars of recorded ticks
+    
+    Args:
+        symbol: Symbol
+        exchange: Exchange (default: cross-exchange best bid / best ask spread bars)
+        resolution: 1s, 1m or 1h
+        since_ms, until_ms: Time range (default: everything)
+    
+    Returns:
+        Bars oldest first; start is the bar start in epoch seconds
+    """
+    bars = get_orderbook_bars()
+    if bars is None:
+        raise HTTPException(status_code=503, detail="Orderbook bars are disabled")
+    
+    since = since_ms // 1000 if since_ms is not None else None
+    until = until_ms // 1000 if until_ms is not None else None
+    try:
+        if exchange:
+            rows = bars.bars(exchange, symbol, resolution, since, until)
+        else:
+            rows = bars.cross_bars(symbol, resolution, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'symbol': symbol, 'exchange': exchange, 'resolution': resolution, 'bars': bars_to_dicts(rows)}
+
+
+@router.websocket("/stream")
+async def stream_engine(
+    websocket: WebSocket,
+    max_hz: Optional[float] = Query(None, gt=0),
+    current_user: UserPrincipal = Depends(get_websocket_user)
+):
+    """
+    WebSocket push of engine stats and operations
+    
+    First message is the full state ({"type": "snapshot"}), then
+    {"type": "update"} messages carry only changed stats fields, new
+    operations and a connected flag when it flips. Updates are coalesced
+    to at most max_hz per second (capped by ENGINE_STREAM_MAX_RATE_HZ).
     """
     await websocket.accept()
     
+    stream = get_engine_stream()
+    client = stream.subscribe(max_hz)
+    
+    async def drain_incoming():
+        # Nothing is expected from the client, reading detects disconnects
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return  # another receive() would raise RuntimeError
+    
+    receiver = asyncio.create_task(drain_incoming())
     try:
-        import docker
-        import subprocess
-        
-        # Check if container exists
-        try:
-            client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-            container = client.containers.get('draizer_c_engine')
-            container_name = container.name
-        except docker.errors.NotFound:
-            await websocket.send_json({
-                'timestamp': int(time.time() * 1000),
-                'level': 'ERROR',
-                'message': 'C engine container not found'
-            })
-            await websocket.close()
-            return
-        except Exception as e:
-            await websocket.send_json({
-                'timestamp': int(time.time() * 1000),
-                'level': 'ERROR',
-                'message': f'Docker connection error: {str(e)}'
-            })
-            await websocket.close()
-            return
-        
-        # Send initial logs (last 20 lines)
-        try:
-            result = subprocess.run(
-                ['docker', 'logs', '--tail', '20', container_name],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            
-            for line in result.stdout.split('\n') + result.stderr.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Determine log level
-                level = 'INFO'
-                if 'ERROR' in line or '❌' in line:
-                    level = 'ERROR'
-                elif 'WARN' in line or '⚠️' in line:
-                    level = 'WARNING'
-                elif 'DEBUG' in line:
-                    level = 'DEBUG'
-                elif '✅' in line:
-                    level = 'SUCCESS'
-                
-                    await websocket.send_json({
-                        'id': f"{int(time.time() * 1000)}_{hash(line) % 10000}",
-                        'timestamp': int(time.time() * 1000),
-                        'level': level,
-                        'message': line
-                    })
-                await asyncio.sleep(0.01)  # Small delay to prevent flooding
-        except Exception as e:
-            print(f"Error sending initial logs: {e}")
-        
-        # Start streaming new logs in background
-        process = await asyncio.create_subprocess_exec(
-            'docker', 'logs', '-f', '--tail', '0', container_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        async def read_stream(stream, ws):
-            """Read from stream and send to WebSocket"""
-            try:
-                while True:
-                    line = await stream.readline()
-                    if not line:
-                        break
-                    
-                    line_text = line.decode('utf-8', errors='ignore').strip()
-                    if not line_text:
-                        continue
-                    
-                    # Determine log level
-                    level = 'INFO'
-                    if 'ERROR' in line_text or '❌' in line_text:
-                        level = 'ERROR'
-                    elif 'WARN' in line_text or '⚠️' in line_text:
-                        level = 'WARNING'
-                    elif 'DEBUG' in line_text:
-                        level = 'DEBUG'
-                    elif '✅' in line_text:
-                        level = 'SUCCESS'
-                    
-                    await ws.send_json({
-                        'id': f"{int(time.time() * 1000)}_{hash(line_text) % 10000}",
-                        'timestamp': int(time.time() * 1000),
-                        'level': level,
-                        'message': line_text
-                    })
-            except Exception as e:
-                print(f"Stream read error: {e}")
-        
-        # Create tasks for both stdout and stderr
-        tasks = [
-            asyncio.create_task(read_stream(process.stdout, websocket)),
-            asyncio.create_task(read_stream(process.stderr, websocket))
-        ]
+        await websocket.send_json(stream.initial_message())
         
-        # Wait for disconnect or error
-        try:
-            while True:
-                # Check if client is still connected
-                try:
-                    await asyncio.wait_for(websocket.receive_text(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    continue
-                except:
-                    break
-        finally:
-            # Cleanup
-            for task in tasks:
-                task.cancel()
-            process.kill()
-            await process.wait()
+        while not receiver.done():
+            changed = asyncio.create_task(client.changed.wait())
+            await asyncio.wait({changed, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+            if receiver.done():
+                break
             
-    except WebSocketDisconnect:
-        print("WebSocket disconnected")
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-        try:
-            await websocket.send_json({
-                'timestamp': int(time.time() * 1000),
-                'level': 'ERROR',
-                'message': f'Streaming error: {str(e)}'
-            })
-        except:
-            pass
+            message = client.take()
+            if message:
+                await websocket.send_json(message)
+            await asyncio.sleep(client.min_interval)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        stream.unsubscribe(client)
+
 
+@router.websocket("/logs/stream")
+async def stream_logs(
+    websocket: WebSocket,
+    level: Optional[str] = Query(None),
+    q: Optional[str] = Query(None),
+    backfill: int = Query(20, ge=0)
+):
+    """
+    WebSocket endpoint for streaming C engine logs in real-time
+    
+    All viewers share one `docker logs -f` and its in-memory ring of
+    recent lines; each viewer gets `backfill` recent lines first.
+    
+    Args:
+        level: Comma-separated levels to keep (ERROR,WARNING,INFO,DEBUG,SUCCESS)
+        q: Regex the message must match
+        backfill: Recent lines to send on connect
+    """
+    await websocket.accept()
+    
+    tailer = get_engine_log_tailer()
+    levels = [name.strip() for name in level.split(',') if name.strip()] if level else None
+    
+    try:
+        subscriber = tailer.subscribe(levels=levels, pattern=q, backfill=backfill)
+    except re.error as e:
+        await websocket.send_json({
+            'timestamp': int(time.time() * 1000),
+            'level': 'ERROR',
+            'message': f'Invalid filter pattern: {e}'
+        })
+        await websocket.close()
+        return
+    
+    async def drain_incoming():
+        # Nothing is expected from the client, reading detects disconnects
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return  # another receive() would raise RuntimeError
+    
+    receiver = asyncio.create_task(drain_incoming())
+    try:
+        while not receiver.done():
+            line = asyncio.create_task(subscriber.queue.get())
+            await asyncio.wait({line, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                line.cancel()
+                break
+            
+            message = line.result().to_dict()
+            if subscriber.dropped:
+                message['dropped'] = subscriber.dropped
+                subscriber.dropped = 0
+            await websocket.send_json(message)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        tailer.unsubscribe(subscriber)
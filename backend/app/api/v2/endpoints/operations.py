@@ -6,101 +6,109 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, List
 
-from app.api.deps import get_current_user
-from app.services.c_engine_bridge import CEngineBridge
-from app.models.user import User
+from app.api.deps import get_current_principal, get_engine_snapshot
+from app.services.c_engine_bridge import operations_to_dicts
+from app.services.engine_hub import EngineSnapshot, get_engine_hub
+from app.services.operations_stats import WINDOWS, get_operations_aggregator
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter()
 
-# Global bridge instance
-_bridge = None
-
-def get_bridge() -> CEngineBridge:
-    """Get or create C engine bridge"""
-    global _bridge
-    if _bridge is None:
-        _bridge = CEngineBridge()
-        _bridge.connect()
-    return _bridge
-
 
 @router.get("/latest")
 async def get_latest_operations(
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_principal),
+    snapshot: EngineSnapshot = Depends(get_engine_snapshot),
     limit: int = Query(50, ge=1, le=500)
 ) -> List[Dict]:
     """
     Get latest operations from C-engine
     
+    Conditional: ETag / If-None-Match (304) and ?wait_ms= long-poll.
+    
     Args:
         limit: Max number of operations to return
     
     Returns:
         List of recent operations
     """
-    bridge = get_bridge()
+    ops = snapshot.operations[-limit:]
     
-    operations = bridge.get_operations(limit=limit)
-    
-    return operations
+    return operations_to_dicts(ops)
 
 
-@router.get("/stats")
-async def get_operations_stats(
-    current_user: User = Depends(get_current_user)
+@router.get("/feed")
+async def get_operations_feed(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    consumer: str = Query("default", min_length=1, max_length=64),
+    limit: int = Query(100, ge=1, le=500)
 ) -> Dict:
     """
-    Get aggregated operations statistics
+    Get operations this consumer has not seen yet
+    
+    Every (user, consumer) pair has its own cursor, so several dashboards,
+    the exporter and the recorder all see the full stream. Cursors are
+    kept per worker process (behind several uvicorn workers, consecutive
+    calls may land on different cursors) and are dropped after
+    CURSOR_IDLE_SECONDS unused or beyond MAX_CURSORS (LRU); a dropped
+    cursor restarts from the oldest operation still in the ring.
+    
+    Args:
+        consumer: Consumer name, e.g. one per browser tab
+        limit: Max number of operations to return
     
     Returns:
-        Stats summary
+        New operations plus dropped count (ring lapped this consumer)
     """
-    bridge = get_bridge()
-    
-    stats = bridge.get_stats()
-    if not stats:
-        return {
-            'total_operations': 0,
-            'total_profit': 0.0,
-            'avg_profit_per_operation': 0.0,
-            'win_rate': 0.0,
-            'best_symbol': None,
-            'worst_symbol': None
-        }
+    bridge = get_engine_hub().bridge
     
-    # Get recent operations for detailed stats
-    operations = bridge.get_operations(limit=100)
+    cursor = bridge.get_cursor(f"{current_user.id}:{consumer}", evictable=True)
+    dropped_before = cursor.dropped
     
-    if not operations:
-        return {
-            'total_operations': 0,
-            'total_profit': 0.0,
-            'avg_profit_per_operation': 0.0,
-            'win_rate': 0.0,
-            'best_symbol': None,
-            'worst_symbol': None
-        }
+    operations = operations_to_dicts(bridge.read_new_operations(cursor, limit=limit))
     
-    # Calculate stats
-    total_profit = sum(op['pnl'] for op in operations)
-    wins = sum(1 for op in operations if op['pnl'] > 0)
+    return {
+        'operations': operations,
+        'position': cursor.position,
+        'dropped': cursor.dropped - dropped_before,
+        'dropped_total': cursor.dropped
+    }
+
+
+@router.get("/stats")
+async def get_operations_stats(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    window: str = Query("lifetime", pattern="^(1m|1h|24h|lifetime)$")
+) -> Dict:
+    """
+    Get aggregated operations statistics
     
-    # Find best/worst symbols
-    symbol_profits = {}
-    for op in operations:
-        symbol = op['symbol']
-        if symbol not in symbol_profits:
-            symbol_profits[symbol] = 0.0
-        symbol_profits[symbol] += op['pnl']
+    Args:
+        window: 1m, 1h, 24h or lifetime
     
-    best_symbol = max(symbol_profits.items(), key=lambda x: x[1])[0] if symbol_profits else None
-    worst_symbol = min(symbol_profits.items(), key=lambda x: x[1])[0] if symbol_profits else None
+    Returns:
+        Stats summary of the window, totals of every window and
+        per symbol / strategy / exchange pair breakdowns
+    """
+    aggregator = get_operations_aggregator()
+    totals = aggregator.totals(window)
+    best_symbol, worst_symbol = aggregator.best_worst('symbol', window)
+    best_pair, worst_pair = aggregator.best_worst('pair', window)
     
     return {
-        'total_operations': len(operations),
-        'total_profit': total_profit,
-        'avg_profit_per_operation': total_profit / len(operations) if operations else 0.0,
-        'win_rate': (wins / len(operations) * 100) if operations else 0.0,
+        'window': window,
+        'total_operations': totals.count,
+        'total_profit': totals.pnl,
+        'avg_profit_per_operation': totals.pnl / totals.count if totals.count else 0.0,
+        'win_rate': totals.wins / totals.count * 100 if totals.count else 0.0,
+        'total_fees': totals.fees,
+        'avg_spread_bps': totals.spread_mean,
         'best_symbol': best_symbol,
-        'worst_symbol': worst_symbol
+        'worst_symbol': worst_symbol,
+        'best_pair': best_pair,
+        'worst_pair': worst_pair,
+        'windows': {name: aggregator.totals(name).to_dict() for name in WINDOWS},
+        'by_symbol': {key: agg.to_dict() for key, agg in aggregator.breakdown('symbol', window).items()},
+        'by_strategy': {key: agg.to_dict() for key, agg in aggregator.breakdown('strategy', window).items()},
+        'by_pair': {key: agg.to_dict() for key, agg in aggregator.breakdown('pair', window).items()},
     }
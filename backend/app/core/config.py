@@ -1,7 +1,7 @@
 """Application configuration"""
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
-from typing import Optional, List, Union
+from typing import Dict, Optional, List, Union
 import secrets
 
 
@@ -107,6 +107,63 @@ class Settings(BaseSettings):
     MAX_LOGIN_ATTEMPTS: int = 5
     LOCKOUT_DURATION_MINUTES: int = 30
     
+    # Authenticated user cache (Redis tier shared across workers, optional)
+    AUTH_CACHE_TTL_SECONDS: float = 30.0
+    AUTH_CACHE_MAX_USERS: int = 10000
+    AUTH_CACHE_REDIS: bool = False
+    AUTH_CACHE_REDIS_TTL_SECONDS: int = 300
+    
+    # C Engine bridge hub (one sampler per worker process)
+    ENGINE_SAMPLE_INTERVAL_MS: int = 100
+    ENGINE_RECONNECT_INTERVAL_SECONDS: float = 2.0
+    ENGINE_FEED_QUEUE_SIZE: int = 256
+    ENGINE_METRICS_WINDOW_SECONDS: float = 10.0
+    METRICS_TOKEN: Optional[str] = None  # bearer token for /metrics (unset = endpoint disabled)
+    ENGINE_COMMAND_TIMEOUT_SECONDS: float = 2.0
+    ENGINE_STREAM_MAX_RATE_HZ: float = 4.0
+    ENGINE_STREAM_MAX_PENDING_OPERATIONS: int = 500
+    
+    # Engine container and log streaming (one shared tail per worker)
+    ENGINE_CONTAINER_NAME: str = "draizer_c_engine"
+    ENGINE_LOG_RING_SIZE: int = 2000
+    ENGINE_LOG_QUEUE_SIZE: int = 500
+    
+    # Engine start/stop/restart jobs
+    ENGINE_START_TIMEOUT_SECONDS: float = 10.0
+    ENGINE_STOP_TIMEOUT_SECONDS: int = 10
+    ENGINE_JOB_HISTORY: int = 50
+    
+    # Operations journal (history beyond the 100-slot ring); empty = disabled
+    OPERATIONS_JOURNAL_DIR: str = "data/operations_journal"
+    OPERATIONS_JOURNAL_DRAIN_INTERVAL_MS: int = 50
+    
+    # Orderbook snapshot recording for backtests (enable in one worker only)
+    ORDERBOOK_RECORDING_ENABLED: bool = False
+    ORDERBOOK_RECORD_MODE: str = "change"  # change (thresholds + heartbeat) | interval (every update)
+    ORDERBOOK_RECORD_INTERVAL_MS: int = 250
+    ORDERBOOK_CONFLATION_WINDOW_MS: int = 100  # change mode: latest quote per (exchange, symbol) per window
+    ORDERBOOK_CHANGE_THRESHOLD_BPS: float = 0.5  # 0 = any move
+    ORDERBOOK_CHANGE_THRESHOLD_TICKS: float = 0.0  # 0 = off; needs ORDERBOOK_TICK_SIZES
+    ORDERBOOK_TICK_SIZES: Dict[str, float] = {}  # symbol -> tick size
+    ORDERBOOK_HEARTBEAT_SECONDS: float = 5.0
+    ORDERBOOK_WRITER_BATCH_ROWS: int = 5000
+    ORDERBOOK_WRITER_FLUSH_INTERVAL_SECONDS: float = 1.0
+    ORDERBOOK_WRITER_MAX_PENDING_ROWS: int = 200_000
+    ORDERBOOK_WRITER_PUT_TIMEOUT_SECONDS: float = 0.1
+    ORDERBOOK_PARTITIONS_AHEAD_DAYS: int = 3  # daily partitions created in advance
+    ORDERBOOK_RETENTION_DAYS: int = 14  # older days rolled up per minute and dropped; 0 = keep
+    ORDERBOOK_PARTITION_MAINTENANCE_SECONDS: float = 3600.0
+    ORDERBOOK_ARCHIVE_DIR: str = "data/tick_archive"  # columnar tick files for backtests; empty = disabled
+    ORDERBOOK_ARCHIVE_FLUSH_SECONDS: float = 1.0
+    ORDERBOOK_ARCHIVE_COMPRESS: bool = True  # compress past days into Gorilla-style blocks
+    ORDERBOOK_STREAM_CHUNK_ROWS: int = 50_000  # server-side cursor batch for snapshot reads
+    ORDERBOOK_BARS_DIR: str = "data/orderbook_bars"  # 1s/1m/1h bars of recorded ticks; empty = disabled
+    ORDERBOOK_DEPTH_DIR: str = "data/depth_archive"  # top-N levels (keyframes + deltas); empty = disabled
+    ORDERBOOK_DEPTH_SYMBOLS: List[str] = []  # captured symbols (exchanges with a depth source); empty = off
+    ORDERBOOK_DEPTH_LEVELS: int = 20  # levels per side
+    ORDERBOOK_DEPTH_INTERVAL_MS: int = 1000
+    ORDERBOOK_DEPTH_KEYFRAME_SECONDS: float = 60.0  # full book at least this often, deltas in between
+    
     # Trading Settings (SIMULATION)
     INITIAL_BALANCE_USD: float = 1000.00
     DEFAULT_TRADING_SYMBOL: str = "BTCUSDT"
@@ -1,11 +1,21 @@
 """FastAPI application entry point"""
-from fastapi import FastAPI
+import secrets
+
+from fastapi import FastAPI, Header, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.api.v2.api import api_router_v2
+from app.services.engine_hub import get_engine_hub
+from app.services.engine_metrics import EngineCollector
+from app.services.operations_journal import get_operations_journal
+from app.services.operations_stats import get_operations_aggregator
+from app.services.orderbook_partitions import get_orderbook_partitions
+from app.services.orderbook_recorder import get_orderbook_recorder
+from app.services.user_cache import get_user_cache
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 
 # Create FastAPI app
@@ -48,6 +58,46 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(api_router_v2, prefix="/api/v2")
 
 
+@app.on_event("startup")
+async def start_engine_hub():
+    """Start the shared C engine sampler (journal drainer, operations stats, orderbook recorder, user cache listener) for this worker"""
+    hub = get_engine_hub()
+    await hub.start()
+    await get_user_cache().start()
+    
+    try:
+        REGISTRY.register(EngineCollector(hub))
+    except ValueError:
+        pass  # already registered (app started again in the same process)
+    
+    journal = get_operations_journal()
+    if journal:
+        await journal.start(hub)
+    
+    await get_operations_aggregator().start(journal)
+    
+    if settings.ORDERBOOK_RECORDING_ENABLED:
+        await get_orderbook_partitions().start()
+        await get_orderbook_recorder().start()
+
+
+@app.on_event("shutdown")
+async def stop_engine_hub():
+    """Stop the C engine sampler and unmap shared memory"""
+    if settings.ORDERBOOK_RECORDING_ENABLED:
+        await get_orderbook_recorder().stop()  # flushes buffered snapshots
+        await get_orderbook_partitions().stop()
+    
+    await get_operations_aggregator().stop()
+    
+    journal = get_operations_journal()
+    if journal:
+        await journal.stop()
+    
+    await get_engine_hub().stop()
+    await get_user_cache().stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -69,4 +119,23 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str = Header("")):
+    """
+    Prometheus scrape endpoint (C engine latency histogram, counters, rates, balance)
+    
+    The backend port is public, so scrapes must send
+    "Authorization: Bearer <METRICS_TOKEN>"; without METRICS_TOKEN the
+    endpoint does not exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if not secrets.compare_digest(authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
 
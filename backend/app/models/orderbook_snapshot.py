@@ -3,23 +3,34 @@ Orderbook Snapshot Model - для backtracking и анализа
 Сохраняет bid/ask цены с обеих бирж для последующего replay
 """
 
-from sqlalchemy import Column, String, Float, BigInteger, DateTime, Index
+from sqlalchemy import Column, String, Float, BigInteger, Integer, DateTime, Index, Sequence
 from app.db.base_class import Base
 from datetime import datetime
 
+# Та же sequence, что создаёт BIGSERIAL в миграции
+SNAPSHOT_ID_SEQUENCE = Sequence('orderbook_snapshots_id_seq')
+
 
 class OrderbookSnapshot(Base):
     """
     Snapshot orderbook (best bid/ask) для backtracking
     Записывается каждые N секунд или при значительном изменении цены
+    
+    Таблица партиционирована по дням (RANGE по timestamp, партиции
+    orderbook_snapshots_pYYYYMMDD, см. OrderbookPartitionManager): запросы
+    по диапазону времени читают только свои партиции, старые дни
+    удаляются целиком. Первичного ключа в таблице нет ни в миграции, ни в
+    create_all (он стоил бы ещё один индекс на каждую вставку): id уникален
+    по sequence (как BIGSERIAL в миграции), а (id, timestamp) - ключ только
+    для ORM (__mapper_args__).
     """
     __tablename__ = "orderbook_snapshots"
     
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigInteger, SNAPSHOT_ID_SEQUENCE, server_default=SNAPSHOT_ID_SEQUENCE.next_value(), nullable=False)
     
     # Exchange & Symbol
-    exchange = Column(String(20), nullable=False, index=True)  # binance, bybit
-    symbol = Column(String(20), nullable=False, index=True)    # BTCUSDT, ETHUSDT
+    exchange = Column(String(20), nullable=False)  # binance, bybit
+    symbol = Column(String(20), nullable=False)    # BTCUSDT, ETHUSDT
     
     # Best bid/ask
     bid = Column(Float, nullable=False)
@@ -27,17 +38,44 @@ class OrderbookSnapshot(Base):
     bid_quantity = Column(Float, nullable=True)
     ask_quantity = Column(Float, nullable=True)
     
-    # Timestamp (microsecond precision)
-    timestamp = Column(DateTime, nullable=False, index=True, default=datetime.utcnow)
+    # Timestamp (microsecond precision) - partition key
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
     timestamp_ns = Column(BigInteger, nullable=False)  # Nanoseconds since epoch
     
-    # Indexes for fast backtest queries
+    # Один индекс на партицию для backtest запросов (symbol/exchange + диапазон времени)
     __table_args__ = (
-        Index('idx_symbol_timestamp', 'symbol', 'timestamp'),
-        Index('idx_exchange_symbol_timestamp', 'exchange', 'symbol', 'timestamp'),
+        Index('idx_orderbook_symbol_exchange_timestamp', 'symbol', 'exchange', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE ("timestamp")'},
     )
+    __mapper_args__ = {'primary_key': [id, timestamp]}
 
 
-
-
-
+class OrderbookRollup(Base):
+    """
+    Поминутная сводка bid/ask/spread по (exchange, symbol)
+    Считается из дневной партиции перед её удалением (retention)
+    """
+    __tablename__ = "orderbook_rollups_1m"
+    
+    minute = Column(DateTime, primary_key=True)
+    exchange = Column(String(20), primary_key=True)
+    symbol = Column(String(20), primary_key=True)
+    
+    samples = Column(Integer, nullable=False)
+    
+    bid_open = Column(Float, nullable=False)
+    bid_high = Column(Float, nullable=False)
+    bid_low = Column(Float, nullable=False)
+    bid_close = Column(Float, nullable=False)
+    ask_open = Column(Float, nullable=False)
+    ask_high = Column(Float, nullable=False)
+    ask_low = Column(Float, nullable=False)
+    ask_close = Column(Float, nullable=False)
+    
+    spread_bps_avg = Column(Float, nullable=False)
+    spread_bps_min = Column(Float, nullable=False)
+    spread_bps_max = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_orderbook_rollup_symbol_minute', 'symbol', 'minute'),
+    )
@@ -4,19 +4,30 @@ Backtest Service - replay исторических orderbook данных
 """
 
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from collections import defaultdict
 import statistics
+import numpy as np
 
 from app.models.orderbook_snapshot import OrderbookSnapshot
 from app.models.backtest_result import BacktestResult
+from app.services.depth_archive import DepthArchive, DepthCursor, get_depth_archive
 from app.services.orderbook_recorder import OrderbookRecorder
+from app.services.tick_archive import NS_PER_DAY, TickArchive, TickColumns, get_tick_archive
 import logging
 
 logger = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1)  # snapshot timestamps are naive UTC
+BUCKET_NS = 100_000_000  # opportunity detection bucket (100ms)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Aware datetimes (e.g. ...Z from the API) as naive UTC, like snapshot timestamps"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
 
 class BacktestEngine:
     """
@@ -30,7 +41,13 @@ class BacktestEngine:
         # Strategy parameters (from HFT Risk Manager)
         self.min_spread_bps = 3.0  # Minimum profitable spread
         self.fee_bps = 10.0        # 0.1% per side
-        self.slippage_bps = 2.0    # 0.02% estimated slippage
+        self.slippage_bps = 2.0    # 0.02% estimated slippage (when no recorded depth)
+        self.position_usd = 100.0  # Notional per trade (profit and depth slippage)
+        
+        # Recorded depth: slippage of position_usd walked through both books
+        self.depth: Optional[DepthArchive] = get_depth_archive()
+        self.depth_max_age_ns = 10 * 1_000_000_000  # older books are not used
+        self._depth_cursors: Dict[Tuple[str, str], DepthCursor] = {}
     
     def run_backtest(
         self,
@@ -61,25 +78,25 @@ class BacktestEngine:
         self.db.commit()
         
         try:
-            # Get all snapshots for the time period
-            snapshots = self.recorder.get_snapshots(
-                start_time=start_time,
-                end_time=end_time,
-                symbols=symbols,
-                exchanges=exchanges
-            )
+            self._depth_cursors = {}
+            
+            # Stream ticks for the time period (tick archive, DB as fallback)
+            # chunk by chunk: memory stays flat whatever the window length
+            total = 0
+            opportunities = []
+            for ticks in self._iter_ticks(start_time, end_time, symbols, exchanges):
+                total += sum(len(columns) for by_exchange in ticks.values() for columns in by_exchange.values())
+                opportunities.extend(self._detect_opportunities(ticks))
+            opportunities.sort(key=lambda opp: opp['timestamp'])
             
-            logger.info(f"📊 Loaded {len(snapshots)} snapshots")
+            logger.info(f"📊 Loaded {total} snapshots")
             
-            if len(snapshots) == 0:
+            if total == 0:
                 result.error_message = "No historical data found for this period"
                 result.completed = True
                 self.db.commit()
                 return result
             
-            # Group snapshots by timestamp for cross-exchange comparison
-            opportunities = self._detect_opportunities(snapshots, symbols, exchanges)
-            
             # Calculate statistics
             self._calculate_statistics(result, opportunities)
             
@@ -89,7 +106,7 @@ class BacktestEngine:
             
             logger.info(f"✅ Backtest completed: {result.total_opportunities} opportunities found")
             return result
-            
+        
         except Exception as e:
             logger.error(f"❌ Backtest failed: {e}")
             result.error_message = str(e)
@@ -97,74 +114,224 @@ class BacktestEngine:
             self.db.commit()
             raise
     
-    def _detect_opportunities(
+    def _iter_ticks(
         self,
-        snapshots: List[OrderbookSnapshot],
+        start_time: datetime,
+        end_time: datetime,
         symbols: List[str],
         exchanges: List[str]
-    ) -> List[Dict]:
+    ) -> Iterator[Dict[str, Dict[str, TickColumns]]]:
         """
-        Detect arbitrage opportunities from snapshots
+        Stream ticks as columns: symbol -> exchange -> TickColumns chunks
+        
+        Chunks are in time order and never split a detection bucket, so
+        _detect_opportunities() can run on each one. Days the tick archive
+        holds are read from it a day at a time; the rest of the range
+        (before the first archived tick, or days missing from the archive)
+        is streamed from the orderbook_snapshots table.
         """
-        opportunities = []
+        start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+        since_ns = (start_time - EPOCH) // timedelta(microseconds=1) * 1000
+        until_ns = (end_time - EPOCH) // timedelta(microseconds=1) * 1000
         
-        # Group snapshots by timestamp and symbol
-        time_buckets = defaultdict(lambda: defaultdict(dict))
-        
-        for snap in snapshots:
-            # Round timestamp to nearest 100ms for grouping
-            time_key = snap.timestamp.replace(microsecond=(snap.timestamp.microsecond // 100000) * 100000)
-            time_buckets[time_key][snap.symbol][snap.exchange] = {
-                'bid': snap.bid,
-                'ask': snap.ask,
-                'bid_qty': snap.bid_quantity or 0,
-                'ask_qty': snap.ask_quantity or 0
-            }
+        archive = get_tick_archive()
+        for source, lo, hi in self._tick_sources(archive, since_ns, until_ns, symbols, exchanges):
+            if source == 'archive':
+                ticks: Dict[str, Dict[str, TickColumns]] = defaultdict(dict)
+                for symbol in symbols:
+                    for exchange in exchanges:
+                        columns = archive.read(exchange, symbol, lo, hi)
+                        if len(columns):
+                            ticks[symbol][exchange] = columns
+                if ticks:
+                    yield ticks
+            else:
+                yield from self._stream_db(
+                    EPOCH + timedelta(microseconds=-(-lo // 1000)),
+                    EPOCH + timedelta(microseconds=hi // 1000),
+                    symbols,
+                    exchanges
+                )
+    
+    @staticmethod
+    def _tick_sources(
+        archive: Optional[TickArchive],
+        since_ns: int,
+        until_ns: int,
+        symbols: List[str],
+        exchanges: List[str]
+    ) -> List[Tuple[str, int, int]]:
+        """
+        ('archive' | 'db', since_ns, until_ns) ranges covering the window in order
+        
+        A day is read from the archive if it holds any requested pair that
+        day; on the first archived day, ticks before the first archived one
+        (archive enabled mid-day) come from the DB. Consecutive DB ranges
+        are merged into one query.
+        """
+        if archive is None:
+            return [('db', since_ns, until_ns)]
+        
+        days = set()
+        first_ns = None
+        for symbol in symbols:
+            for exchange in exchanges:
+                pair_days = archive.days(exchange, symbol)
+                days.update(pair_days)
+                if pair_days:
+                    first = archive.open_day(exchange, symbol, pair_days[0]).timestamp_ns
+                    if len(first) and (first_ns is None or first[0] < first_ns):
+                        first_ns = int(first[0])
+        
+        sources: List[Tuple[str, int, int]] = []
+        
+        def add(source: str, lo: int, hi: int):
+            if sources and sources[-1][0] == source == 'db' and sources[-1][2] + 1 == lo:
+                sources[-1] = ('db', sources[-1][1], hi)
+            else:
+                sources.append((source, lo, hi))
         
-        # Check each time bucket for arbitrage opportunities
-        for time_key, symbols_data in time_buckets.items():
-            for symbol, exchange_data in symbols_data.items():
-                # Need at least 2 exchanges to arbitrage
-                if len(exchange_data) < 2:
-                    continue
-                
-                # Find best bid and best ask across exchanges
-                best_bid = None
-                best_bid_exchange = None
-                best_ask = None
-                best_ask_exchange = None
-                
-                for exchange, prices in exchange_data.items():
-                    if best_bid is None or prices['bid'] > best_bid:
-                        best_bid = prices['bid']
-                        best_bid_exchange = exchange
-                    
-                    if best_ask is None or prices['ask'] < best_ask:
-                        best_ask = prices['ask']
-                        best_ask_exchange = exchange
-                
-                # Check if arbitrage exists (bid > ask across exchanges)
-                if best_bid > best_ask and best_bid_exchange != best_ask_exchange:
-                    # Calculate spread
-                    gross_spread_bps = ((best_bid - best_ask) / best_ask) * 10000.0
-                    net_spread_bps = gross_spread_bps - (self.fee_bps * 2) - self.slippage_bps
-                    
-                    # Check if profitable
-                    if net_spread_bps >= self.min_spread_bps:
-                        opportunities.append({
-                            'timestamp': time_key,
-                            'symbol': symbol,
-                            'buy_exchange': best_ask_exchange,
-                            'sell_exchange': best_bid_exchange,
-                            'buy_price': best_ask,
-                            'sell_price': best_bid,
-                            'gross_spread_bps': gross_spread_bps,
-                            'net_spread_bps': net_spread_bps,
-                            'potential_profit_usd': (net_spread_bps / 10000.0) * 100.0  # Assuming $100 position
-                        })
+        for day_start in range(since_ns // NS_PER_DAY * NS_PER_DAY, until_ns + 1, NS_PER_DAY):
+            lo, hi = max(since_ns, day_start), min(until_ns, day_start + NS_PER_DAY - 1)
+            if (EPOCH + timedelta(microseconds=day_start // 1000)).date() not in days:
+                add('db', lo, hi)
+                continue
+            if first_ns is not None and first_ns > lo:
+                add('db', lo, min(hi, first_ns - 1))
+                lo = first_ns
+            if lo <= hi:
+                add('archive', lo, hi)
+        return sources
+    
+    def _stream_db(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        symbols: List[str],
+        exchanges: List[str]
+    ) -> Iterator[Dict[str, Dict[str, TickColumns]]]:
+        """orderbook_snapshots rows of a range, in bucket-aligned chunks"""
+        # A bucket may straddle two batches: hold it back until the next one
+        pending = None
+        for batch in self.recorder.stream_snapshots(start_time, end_time, symbols, exchanges):
+            if pending is not None:
+                batch = np.concatenate([pending, batch])
+            if len(batch) == 0:
+                continue
+            bucket = batch['timestamp_ns'] // BUCKET_NS
+            cut = int(np.searchsorted(bucket, bucket[-1]))
+            pending = batch[cut:]
+            if cut:
+                yield self._group_batch(batch[:cut])
+        if pending is not None and len(pending):
+            yield self._group_batch(pending)
+    
+    @staticmethod
+    def _group_batch(batch: np.ndarray) -> Dict[str, Dict[str, TickColumns]]:
+        """Split a SNAPSHOT_BATCH_DTYPE batch into per-(symbol, exchange) columns"""
+        order = np.lexsort((batch['timestamp_ns'], batch['exchange'], batch['symbol']))
+        batch = batch[order]
+        ticks: Dict[str, Dict[str, TickColumns]] = defaultdict(dict)
+        keys = np.r_[True, (batch['symbol'][1:] != batch['symbol'][:-1]) | (batch['exchange'][1:] != batch['exchange'][:-1])]
+        starts = np.flatnonzero(keys)
+        for start, stop in zip(starts.tolist(), np.r_[starts[1:], len(batch)].tolist()):
+            rows = batch[start:stop]
+            ticks[str(rows['symbol'][0])][str(rows['exchange'][0])] = TickColumns(
+                rows['timestamp_ns'], rows['bid'], rows['ask'], rows['bid_qty'], rows['ask_qty']
+            )
+        return ticks
+    
+    def _detect_opportunities(self, ticks: Dict[str, Dict[str, TickColumns]]) -> List[Dict]:
+        """
+        Detect arbitrage opportunities from ticks
         
+        Per symbol and 100ms bucket, takes the last quote of every exchange
+        and compares the best bid with the best ask (vectorized over columns).
+        """
+        opportunities = []
+        
+        for symbol, by_exchange in ticks.items():
+            # Need at least 2 exchanges to arbitrage
+            if len(by_exchange) < 2:
+                continue
+            
+            names = list(by_exchange)
+            timestamp_ns = np.concatenate([np.asarray(by_exchange[name].timestamp_ns) for name in names])
+            bid = np.concatenate([np.asarray(by_exchange[name].bid) for name in names])
+            ask = np.concatenate([np.asarray(by_exchange[name].ask) for name in names])
+            exchange = np.repeat(np.arange(len(names)), [len(by_exchange[name]) for name in names])
+            
+            # Round timestamp down to 100ms for grouping; last quote per (bucket, exchange)
+            bucket = timestamp_ns // BUCKET_NS
+            order = np.lexsort((timestamp_ns, exchange, bucket))
+            bucket, exchange, bid, ask = bucket[order], exchange[order], bid[order], ask[order]
+            last = np.r_[(bucket[1:] != bucket[:-1]) | (exchange[1:] != exchange[:-1]), True]
+            bucket, exchange, bid, ask = bucket[last], exchange[last], bid[last], ask[last]
+            
+            # Best bid and best ask across exchanges per bucket
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            counts = np.diff(np.r_[starts, len(bucket)])
+            group = np.repeat(np.arange(len(starts)), counts)
+            sell = np.lexsort((-bid, group))[starts]
+            buy = np.lexsort((ask, group))[starts]
+            best_bid, best_ask = bid[sell], ask[buy]
+            
+            # Check if arbitrage exists (bid > ask across exchanges) and is profitable
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gross_spread_bps = (best_bid - best_ask) / best_ask * 10000.0
+            slippage_bps = np.full(len(starts), self.slippage_bps)
+            found = (counts >= 2) & (best_bid > best_ask) & (exchange[sell] != exchange[buy])
+            if self.depth:
+                # Candidates before slippage, then slippage from the recorded books
+                found &= gross_spread_bps - (self.fee_bps * 2) >= self.min_spread_bps
+                for i in np.flatnonzero(found).tolist():
+                    slippage_bps[i] = self._depth_slippage_bps(
+                        symbol, names[exchange[buy[i]]], names[exchange[sell[i]]], int(bucket[starts[i]]) * BUCKET_NS
+                    )
+            net_spread_bps = gross_spread_bps - (self.fee_bps * 2) - slippage_bps
+            found &= net_spread_bps >= self.min_spread_bps
+            
+            for i in np.flatnonzero(found).tolist():
+                opportunities.append({
+                    'timestamp': EPOCH + timedelta(microseconds=int(bucket[starts[i]]) * BUCKET_NS // 1000),
+                    'symbol': symbol,
+                    'buy_exchange': names[exchange[buy[i]]],
+                    'sell_exchange': names[exchange[sell[i]]],
+                    'buy_price': float(best_ask[i]),
+                    'sell_price': float(best_bid[i]),
+                    'gross_spread_bps': float(gross_spread_bps[i]),
+                    'slippage_bps': float(slippage_bps[i]),
+                    'net_spread_bps': float(net_spread_bps[i]),
+                    'potential_profit_usd': (float(net_spread_bps[i]) / 10000.0) * self.position_usd
+                })
+        
+        opportunities.sort(key=lambda opp: opp['timestamp'])
         return opportunities
     
+    def _depth_slippage_bps(self, symbol: str, buy_exchange: str, sell_exchange: str, timestamp_ns: int) -> float:
+        """
+        Slippage of buying and selling position_usd through the recorded books
+        
+        Falls back to slippage_bps if either book is missing, older than
+        depth_max_age_ns or too thin. Calls per (exchange, symbol) must come
+        in time order (the depth log is replayed forward once).
+        """
+        impacts = []
+        for exchange, side in ((buy_exchange, 'buy'), (sell_exchange, 'sell')):
+            cursor = self._depth_cursors.get((exchange, symbol))
+            if cursor is None:
+                cursor = self._depth_cursors[(exchange, symbol)] = self.depth.cursor(
+                    exchange, symbol, timestamp_ns - self.depth_max_age_ns
+                )
+            book = cursor.at(timestamp_ns)
+            if book is None or timestamp_ns - book.timestamp_ns > self.depth_max_age_ns:
+                return self.slippage_bps
+            impact = book.impact_bps(side, self.position_usd)
+            if impact is None:
+                return self.slippage_bps
+            impacts.append(impact)
+        return sum(impacts)
+    
     def _calculate_statistics(self, result: BacktestResult, opportunities: List[Dict]):
         """
         Calculate statistics from opportunities
@@ -5,15 +5,116 @@ Python ↔ C IPC communication for monitoring & control
 
 import mmap
 import struct
+import numpy as np
 import socket
 import os
-import json
 import subprocess
 import signal
-from typing import Dict, List, Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
+from app.services.engine_layout import (
+    OPERATION_DTYPE,
+    SHARED_MEMORY,
+    SHM_OPERATION_RING_SIZE,
+    SHM_STATS,
+    LATENCY_HIST_BUCKETS,
+    EngineLayoutError,
+    check_segment,
+)
+from app.services.engine_commands import CommandAck, CommandData, EngineCommandClient
+from app.services.engine_metrics import histogram_quantiles
+from app.services.engine_prices import PriceBook, PriceCacheReader
+
+
+OPERATION_STRING_FIELDS = ('type', 'strategy', 'symbol', 'exchange_buy', 'exchange_sell')
+OPERATION_NUMBER_FIELDS = (
+    'quantity', 'entry_price', 'exit_price', 'pnl',
+    'pnl_percent', 'spread_bps', 'fees_paid', 'is_open'
+)
+
+
+def operations_to_dicts(ops: np.ndarray) -> List[Dict]:
+    """
+    Convert a structured OPERATION_DTYPE array to API dicts
+    
+    Decodes column by column, so it is meant to be called once at the
+    API edge after all filtering has been done on the array.
+    """
+    if len(ops) == 0:
+        return []
+    
+    columns = {
+        'id': ops['id'].tolist(),
+        'timestamp': (ops['timestamp_ns'] // 1_000_000).tolist(),  # Convert to milliseconds
+    }
+    for name in OPERATION_STRING_FIELDS:
+        columns[name] = np.char.decode(ops[name], 'utf-8', 'ignore').tolist()
+    for name in OPERATION_NUMBER_FIELDS:
+        columns[name] = ops[name].tolist()
+    
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+def operations_mask(
+    ops: np.ndarray,
+    symbol: Optional[str] = None,
+    strategy: Optional[str] = None,
+    exchange: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None
+) -> np.ndarray:
+    """
+    Boolean mask selecting operations that match all given filters
+    
+    Args:
+        symbol: Only this symbol
+        strategy: Only this strategy
+        exchange: Only operations buying or selling on this exchange
+        since_ms: Only operations at or after this time (epoch ms)
+        until_ms: Only operations at or before this time (epoch ms)
+    """
+    mask = np.ones(len(ops), dtype=bool)
+    if symbol:
+        mask &= ops['symbol'] == symbol.encode()
+    if strategy:
+        mask &= ops['strategy'] == strategy.encode()
+    if exchange:
+        exchange_bytes = exchange.encode()
+        mask &= (ops['exchange_buy'] == exchange_bytes) | (ops['exchange_sell'] == exchange_bytes)
+    if since_ms is not None:
+        mask &= ops['timestamp_ns'] >= since_ms * 1_000_000
+    if until_ms is not None:
+        mask &= ops['timestamp_ns'] <= until_ms * 1_000_000
+    return mask
+
+
+def filter_operations(ops: np.ndarray, *args, **kwargs) -> np.ndarray:
+    """Filter a structured OPERATION_DTYPE array (see operations_mask())"""
+    return ops[operations_mask(ops, *args, **kwargs)]
+
+
+@dataclass
+class OperationsCursor:
+    """
+    Python-side read position of one consumer of the operations ring
+    
+    position is a sequence number (0-based, keyed off total_operations),
+    so consumers never touch operations_tail and never steal events from
+    each other.
+    """
+    consumer: str
+    position: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    evictable: bool = False  # client cursor: subject to the idle TTL / LRU cap
+    last_used: float = 0.0  # time.monotonic() of the last get_cursor()
+
 
 class CEngineBridge:
     """
@@ -24,33 +125,48 @@ class CEngineBridge:
     - Unix Socket: Send commands to engine (start/stop/config)
     """
     
-    # Shared memory layout (must match C struct!)
-    SHM_SIZE = 20 * 1024  # 20KB (sizeof(SharedMemory) ~17KB + margin)
+    # Shared memory layout: see engine_layout.py (single source of truth)
+    SHM_SIZE = SHARED_MEMORY.size
     SHM_NAME = "/draizer_v2"
     SOCKET_PATH = "/tmp/draizer_v2.sock"
     
-    # Struct offsets (must match C SharedMemory struct EXACTLY!)
-    OFFSET_ENGINE_RUNNING = 0      # bool (1 byte)
-    OFFSET_STRATEGY_ENABLED = 1    # bool[3] (3 bytes)
-    # padding1[4] at offset 4
-    OFFSET_OPPS_DETECTED = 8       # uint64_t (8 bytes)
-    OFFSET_OPPS_EXECUTED = 16      # uint64_t (8 bytes)
-    OFFSET_ORDERS_PLACED = 24      # uint64_t (8 bytes)
-    OFFSET_ORDERS_FILLED = 32      # uint64_t (8 bytes)
-    OFFSET_TOTAL_PROFIT = 40       # double (8 bytes) ← FIXED!
-    OFFSET_BALANCE = 48            # double (8 bytes)
-    OFFSET_WINS = 56               # uint32_t (4 bytes)
-    OFFSET_LOSSES = 60             # uint32_t (4 bytes)
-    OFFSET_WIN_RATE = 64           # double (8 bytes)
-    OFFSET_OPEN_POSITIONS = 72     # uint32_t (4 bytes)
-    # padding2[4] at offset 76
-    OFFSET_AVG_LATENCY = 80        # uint32_t (4 bytes) ← FIXED!
-    OFFSET_P99_LATENCY = 84        # uint32_t (4 bytes)
-    OFFSET_LAST_UPDATE = 88        # uint64_t (8 bytes)
+    # Stats header decoded in one call (copy of the first SHM_STATS.size bytes)
+    STATS_HEADER_SIZE = SHM_STATS.size
+    STATS_STRUCT = SHM_STATS.struct
+    OFFSET_STATS_SEQ = SHARED_MEMORY.offset('stats_seq')
+    STATS_SNAPSHOT_RETRIES = 8
+    
+    # Single live counters, read in place (the mapping is read-only)
+    U64_STRUCT = struct.Struct('<Q')
+    
+    # Operations ring buffer
+    OPERATION_RING_SIZE = SHM_OPERATION_RING_SIZE
+    OFFSET_OPERATIONS = SHARED_MEMORY.offset('operations')
+    OFFSET_TOTAL_OPERATIONS = SHARED_MEMORY.offset('total_operations')
+    
+    # Client cursors (get_cursor(evictable=True)): idle TTL and LRU cap
+    CURSOR_IDLE_SECONDS = 600.0
+    MAX_CURSORS = 1024
+    
+    # Latency histogram
+    OFFSET_LATENCY_HIST = SHARED_MEMORY.offset('latency_hist')
+    OFFSET_LATENCY_COUNT = SHARED_MEMORY.offset('latency_count')
+    OFFSET_LATENCY_SUM = SHARED_MEMORY.offset('latency_sum_us')
     
     def __init__(self):
         self.shm: Optional[mmap.mmap] = None
+        self.layout_error: Optional[str] = None
+        self.rejected_inode: Optional[int] = None  # segment that failed the layout check
+        self._perf_sample: Optional[Tuple[float, int]] = None  # (monotonic, opps_detected)
+        self._stats_snapshot: Optional[tuple] = None  # last verified stats copy of this segment
+        self.stats_torn_reads = 0  # snapshots that fell back after STATS_SNAPSHOT_RETRIES
+        self._operations_view: Optional[np.ndarray] = None
+        self._prices: Optional[PriceCacheReader] = None
+        self._cursors: "OrderedDict[str, OperationsCursor]" = OrderedDict()  # least recently used first
+        self.shm_inode: Optional[int] = None
+        self._cursors_inode: Optional[int] = None  # segment the cursor positions refer to
         self.socket: Optional[socket.socket] = None
+        self.commands = EngineCommandClient(self.SOCKET_PATH)
         self.connected = False
         self.engine_process: Optional[subprocess.Popen] = None
         self.engine_path = Path(__file__).parent.parent.parent / "c_engine" / "build" / "draizer_engine"
@@ -70,24 +186,58 @@ class CEngineBridge:
                 print(f"⚠️  C engine not running (shared memory not found)")
                 return False
             
+            if self.shm:
+                self.disconnect()
+            
             # Get real file size
             fd = os.open(shm_path, os.O_RDONLY)
-            file_size = os.fstat(fd).st_size
+            shm_stat = os.fstat(fd)
+            file_size = shm_stat.st_size
             
             # Use actual file size, not hardcoded constant
-            self.shm = mmap.mmap(fd, file_size, access=mmap.ACCESS_READ)
+            # (read-only: the bridge is a consumer and never writes engine memory)
+            shm = mmap.mmap(fd, file_size, access=mmap.ACCESS_READ)
             os.close(fd)
             
+            # Size + version handshake: never decode a segment with another layout
+            try:
+                check_segment(shm, file_size)
+            except EngineLayoutError as e:
+                shm.close()
+                self.layout_error = str(e)
+                self.rejected_inode = shm_stat.st_ino
+                print(f"❌ C engine shared memory layout mismatch: {e}")
+                return False
+            
+            self.shm = shm
+            self.shm_inode = shm_stat.st_ino
+            self._stats_snapshot = None
+            self._prices = PriceCacheReader(shm)
+            self.layout_error = None
+            self.rejected_inode = None
+            
+            # New segment = new engine run: operation sequence starts over
+            if self._cursors_inode != self.shm_inode:
+                for cursor in self._cursors.values():
+                    cursor.position = 0
+                self._cursors_inode = self.shm_inode
+            
             self.connected = True
             print(f"✅ Connected to C engine")
             return True
-            
+        
         except Exception as e:
             print(f"❌ Failed to connect to C engine: {e}")
             return False
     
     def disconnect(self):
         """Close connections"""
+        # Drop exported views first, the mmap cannot be closed while they exist
+        self._operations_view = None
+        if self._prices:
+            self._prices.close()
+            self._prices = None
+        
         if self.shm:
             self.shm.close()
             self.shm = None
@@ -97,6 +247,21 @@ class CEngineBridge:
             self.socket = None
         
         self.connected = False
+        self.shm_inode = None
+    
+    def is_stale(self) -> bool:
+        """
+        Check whether the mapped segment has been replaced or removed
+        
+        An engine restart unlinks /dev/shm/draizer_v2 and creates a new one;
+        the old mapping stays readable but is frozen.
+        """
+        if not self.connected:
+            return False
+        try:
+            return os.stat(f"/dev/shm{self.SHM_NAME}").st_ino != self.shm_inode
+        except FileNotFoundError:
+            return True
     
     def get_stats(self) -> Optional[Dict]:
         """
@@ -109,21 +274,14 @@ class CEngineBridge:
             return None
         
         try:
-            # Read all fields from shared memory (packed struct - FIXED OFFSETS!)
-            engine_running = struct.unpack_from('?', self.shm, self.OFFSET_ENGINE_RUNNING)[0]
-            opps_detected = struct.unpack_from('Q', self.shm, self.OFFSET_OPPS_DETECTED)[0]
-            opps_executed = struct.unpack_from('Q', self.shm, self.OFFSET_OPPS_EXECUTED)[0]
-            orders_placed = struct.unpack_from('Q', self.shm, self.OFFSET_ORDERS_PLACED)[0]
-            orders_filled = struct.unpack_from('Q', self.shm, self.OFFSET_ORDERS_FILLED)[0]
-            total_profit = struct.unpack_from('d', self.shm, self.OFFSET_TOTAL_PROFIT)[0]
-            balance = struct.unpack_from('d', self.shm, self.OFFSET_BALANCE)[0]
-            wins = struct.unpack_from('I', self.shm, self.OFFSET_WINS)[0]
-            losses = struct.unpack_from('I', self.shm, self.OFFSET_LOSSES)[0]
-            win_rate = struct.unpack_from('d', self.shm, self.OFFSET_WIN_RATE)[0]
-            open_positions = struct.unpack_from('I', self.shm, self.OFFSET_OPEN_POSITIONS)[0]
-            avg_latency_us = struct.unpack_from('I', self.shm, self.OFFSET_AVG_LATENCY)[0]
-            p99_latency_us = struct.unpack_from('I', self.shm, self.OFFSET_P99_LATENCY)[0]
-            last_update_ns = struct.unpack_from('Q', self.shm, self.OFFSET_LAST_UPDATE)[0]
+            snapshot = self.read_stats_snapshot()
+            if snapshot is None:
+                return None
+            
+            (engine_running, _strategy_enabled,
+             opps_detected, opps_executed, orders_placed, orders_filled,
+             total_profit, balance, wins, losses, win_rate, open_positions,
+             avg_latency_us, p99_latency_us, last_update_ns) = snapshot
             
             return {
                 'engine_running': engine_running,
@@ -149,181 +307,312 @@ class CEngineBridge:
             print(f"❌ Error reading stats: {e}")
             return None
     
-    def get_operations(self, limit: int = 100) -> List[Dict]:
+    def _read_u64(self, offset: int) -> int:
+        """One live uint64 field of the mapped segment"""
+        return self.U64_STRUCT.unpack_from(self.shm, offset)[0]
+    
+    def read_stats_snapshot(self) -> Optional[tuple]:
         """
-        Read operations from shared memory ring buffer
+        Copy the stats header once and decode it with STATS_STRUCT
         
-        Args:
-            limit: Max number of operations to return
+        The engine brackets every stats write with the stats_seq seqlock
+        (odd while writing). The copy is accepted only if the sequence was
+        even before it and unchanged after it; otherwise it is retried.
+        When every retry is torn, the previous verified snapshot of this
+        segment is returned (None if there is none yet).
         
         Returns:
-            List of operation dicts
+            Raw tuple in STATS_STRUCT field order or None if not connected
         """
         if not self.connected or not self.shm:
-            return []
+            return None
         
-        operations = []
+        size = self.STATS_HEADER_SIZE
+        seq_offset = self.OFFSET_STATS_SEQ
         
-        try:
-            # Calculate offsets for operations ring buffer
-            # SharedMemory struct layout (see shared_memory.h):
-            # - 96 bytes for stats
-            # - 100 operations @ 176 bytes each = 17,600 bytes
-            # - operations_head at offset 17,696
-            # - operations_tail at offset 17,700
-            # - total_operations at offset 17,704
-            
-            operations_start_offset = 96
-            operation_size = 176  # sizeof(ShmOperation)
-            operations_head_offset = 17696
-            operations_tail_offset = 17700
-            
-            # Read head and tail pointers
-            head = struct.unpack_from('I', self.shm, operations_head_offset)[0]
-            tail = struct.unpack_from('I', self.shm, operations_tail_offset)[0]
-            
-            # Read operations from tail to head (circular buffer)
-            count = 0
-            idx = tail
-            while idx != head and count < limit:
-                # Read operation from shared memory
-                offset = operations_start_offset + (idx * operation_size)
-                
-                op_id = struct.unpack_from('Q', self.shm, offset)[0]
-                timestamp_ns = struct.unpack_from('Q', self.shm, offset + 8)[0]
-                op_type = struct.unpack_from('20s', self.shm, offset + 16)[0].decode('utf-8').rstrip('\x00')
-                strategy = struct.unpack_from('20s', self.shm, offset + 36)[0].decode('utf-8').rstrip('\x00')
-                symbol = struct.unpack_from('12s', self.shm, offset + 56)[0].decode('utf-8').rstrip('\x00')
-                exchange_buy = struct.unpack_from('20s', self.shm, offset + 68)[0].decode('utf-8').rstrip('\x00')
-                exchange_sell = struct.unpack_from('20s', self.shm, offset + 88)[0].decode('utf-8').rstrip('\x00')
-                quantity = struct.unpack_from('d', self.shm, offset + 108)[0]
-                entry_price = struct.unpack_from('d', self.shm, offset + 116)[0]
-                exit_price = struct.unpack_from('d', self.shm, offset + 124)[0]
-                pnl = struct.unpack_from('d', self.shm, offset + 132)[0]
-                pnl_percent = struct.unpack_from('d', self.shm, offset + 140)[0]
-                spread_bps = struct.unpack_from('d', self.shm, offset + 148)[0]
-                fees_paid = struct.unpack_from('d', self.shm, offset + 156)[0]
-                is_open = struct.unpack_from('?', self.shm, offset + 164)[0]
-                
-                operations.append({
-                    'id': op_id,
-                    'timestamp': timestamp_ns // 1_000_000,  # Convert to milliseconds
-                    'type': op_type,
-                    'strategy': strategy,
-                    'symbol': symbol,
-                    'exchange_buy': exchange_buy,
-                    'exchange_sell': exchange_sell,
-                    'quantity': quantity,
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'pnl': pnl,
-                    'pnl_percent': pnl_percent,
-                    'spread_bps': spread_bps,
-                    'fees_paid': fees_paid,
-                    'is_open': is_open
-                })
-                
-                idx = (idx + 1) % 100  # Ring buffer size
-                count += 1
-            
-            # Update tail pointer in shared memory (mark as read)
-            struct.pack_into('I', self.shm, operations_tail_offset, head)
+        for _ in range(self.STATS_SNAPSHOT_RETRIES):
+            before = self._read_u64(seq_offset)
+            if before & 1:
+                continue
+            header = self.shm[:size]
+            if self._read_u64(seq_offset) == before:
+                self._stats_snapshot = self.STATS_STRUCT.unpack(header)
+                return self._stats_snapshot
         
-        except Exception as e:
-            print(f"❌ Error reading operations: {e}")
+        self.stats_torn_reads += 1
+        return self._stats_snapshot
+    
+    def read_latency_histogram(self) -> Optional[Tuple[np.ndarray, int, int]]:
+        """
+        Copy the engine's latency histogram
+        
+        Counters only grow, so a copy taken while the engine writes is at
+        worst a few ticks behind - never inconsistent in a way that matters
+        for percentiles.
         
-        return operations
+        Returns:
+            (bucket counts, total count, sum of latencies µs) or None if not connected
+        """
+        if not self.connected or not self.shm:
+            return None
+        
+        counts = np.frombuffer(
+            self.shm,
+            dtype='<u8',
+            count=LATENCY_HIST_BUCKETS,
+            offset=self.OFFSET_LATENCY_HIST
+        ).copy()
+        return counts, self._read_u64(self.OFFSET_LATENCY_COUNT), self._read_u64(self.OFFSET_LATENCY_SUM)
     
-    def get_latest_opportunities(self, limit: int = 10) -> List[Dict]:
+    def operations_view(self) -> Optional[np.ndarray]:
         """
-        Read latest detected opportunities from shared memory
+        Zero-copy structured view of the whole operations[100] array
         
-        Args:
-            limit: Max number of opportunities to return
+        The view is mapped directly onto shared memory and cached until
+        disconnect() (the mmap cannot be closed while it is exported).
         
         Returns:
-            List of opportunity dicts
+            Read-only array of OPERATION_DTYPE or None if not connected
         """
         if not self.connected or not self.shm:
-            return []
+            return None
         
-        opportunities = []
+        if self._operations_view is None:
+            view = np.frombuffer(
+                self.shm,
+                dtype=OPERATION_DTYPE,
+                count=self.OPERATION_RING_SIZE,
+                offset=self.OFFSET_OPERATIONS
+            )
+            view.flags.writeable = False
+            self._operations_view = view
+        return self._operations_view
+    
+    def read_total_operations(self) -> int:
+        """Number of operations the engine has pushed since it started"""
+        if not self.connected or not self.shm:
+            return 0
+        return self._read_u64(self.OFFSET_TOTAL_OPERATIONS)
+    
+    def copy_operations(self, start_seq: int = 0) -> Tuple[np.ndarray, int, int]:
+        """
+        Copy every operation with sequence number >= start_seq still in the ring
         
-        try:
-            # TODO: Read from opportunity ring buffer in shared memory
-            # For now, return empty list (to be implemented)
-            pass
+        Operation n (0-based, n == id - 1) lives in slot n % 100 and is
+        complete once total_operations > n. total_operations is re-read
+        after the copy, and slots the engine may have overwritten meanwhile
+        are cut off instead of being returned torn.
         
-        except Exception as e:
-            print(f"❌ Error reading opportunities: {e}")
+        Args:
+            start_seq: First sequence number wanted
+        
+        Returns:
+            (operations oldest first, sequence of the first one, end sequence)
+        """
+        view = self.operations_view()
+        if view is None:
+            return np.empty(0, dtype=OPERATION_DTYPE), start_seq, start_seq
+        
+        size = self.OPERATION_RING_SIZE
+        # The engine keeps one slot free (head never catches tail)
+        capacity = size - 1
         
-        return opportunities
+        end_seq = self.read_total_operations()
+        first_seq = max(start_seq, end_seq - capacity)
+        if first_seq >= end_seq:
+            return np.empty(0, dtype=OPERATION_DTYPE), end_seq, end_seq
+        
+        ops = view[np.arange(first_seq, end_seq) % size]
+        
+        # Writer of sequence T overwrites slot of T - 100: drop anything it may have hit
+        safe_seq = self.read_total_operations() - capacity
+        if safe_seq > first_seq:
+            ops = ops[safe_seq - first_seq:]
+            first_seq = min(safe_seq, end_seq)
+        
+        return ops, first_seq, end_seq
     
-    def get_latest_prices(self, limit: int = 10) -> List[Dict]:
+    def read_operations_batch(
+        self,
+        limit: int = 100,
+        symbol: Optional[str] = None,
+        strategy: Optional[str] = None,
+        exchange: Optional[str] = None,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None
+    ) -> np.ndarray:
         """
-        Read latest prices from shared memory
+        Read the operations currently in the ring as one structured array
+        
+        Non-destructive: nothing is written back to shared memory, so any
+        number of endpoints can call it. The result is a copy and stays
+        valid after the engine overwrites the ring.
         
         Args:
-            limit: Max number of prices to return
+            limit: Max number of operations to return (newest kept)
+            symbol, strategy, exchange, since_ms, until_ms: see filter_operations()
+        
+        Returns:
+            Structured array of OPERATION_DTYPE, oldest first (empty if not connected)
+        """
+        ops, _, _ = self.copy_operations()
+        ops = filter_operations(ops, symbol, strategy, exchange, since_ms, until_ms)
+        return ops[-limit:] if limit else ops[:0]
+    
+    def get_cursor(
+        self,
+        consumer: str,
+        from_latest: bool = False,
+        position: Optional[int] = None,
+        evictable: bool = False
+    ) -> 'OperationsCursor':
+        """
+        Get (or create) the named read cursor of a consumer
+        
+        Cursors live in this bridge, i.e. in one worker process: with
+        several uvicorn workers each has its own cursor per name.
+        
+        Args:
+            consumer: Consumer name (dashboard tab, exporter, recorder, ...)
+            from_latest: New cursor skips what is already in the ring
+            position: Explicit start sequence for a new cursor (resume)
+            evictable: Client-named cursor: dropped after CURSOR_IDLE_SECONDS
+                unused or when more than MAX_CURSORS exist (least recently
+                used first); an evicted consumer starts over from 0
+        """
+        now = time.monotonic()
+        cursor = self._cursors.get(consumer)
+        if cursor is None:
+            if position is None:
+                position = self.read_total_operations() if from_latest else 0
+            cursor = OperationsCursor(consumer, position, evictable=evictable, last_used=now)
+            self._cursors[consumer] = cursor
+            self._evict_cursors(now)
+        self._cursors.move_to_end(consumer)
+        cursor.last_used = now
+        return cursor
+    
+    def _evict_cursors(self, now: float):
+        evictable = [cursor for cursor in self._cursors.values() if cursor.evictable]
+        excess = len(evictable) - self.MAX_CURSORS
+        for cursor in evictable:  # least recently used first
+            if excess > 0 or now - cursor.last_used > self.CURSOR_IDLE_SECONDS:
+                del self._cursors[cursor.consumer]
+                excess -= 1
+    
+    def release_cursor(self, consumer: str):
+        """Forget a consumer's cursor"""
+        self._cursors.pop(consumer, None)
+    
+    def read_new_operations(self, cursor: 'OperationsCursor', limit: int = 100) -> np.ndarray:
+        """
+        Read operations the cursor has not seen yet and advance it
+        
+        If the ring has lapped the cursor, the skipped operations are added
+        to cursor.dropped. An engine restart (total_operations going back)
+        rewinds the cursor to the start of the new run.
+        
+        Args:
+            cursor: Consumer cursor from get_cursor()
+            limit: Max number of operations to return (oldest first)
         
         Returns:
-            List of price dicts
+            Structured array of OPERATION_DTYPE
+        """
+        if cursor.position > self.read_total_operations():
+            cursor.position = 0
+        
+        ops, first_seq, end_seq = self.copy_operations(cursor.position)
+        
+        if first_seq > cursor.position:
+            cursor.dropped += first_seq - cursor.position
+            cursor.position = first_seq
+        
+        ops = ops[:limit]
+        cursor.position += len(ops)
+        cursor.delivered += len(ops)
+        return ops
+    
+    def get_operations(self, limit: int = 100) -> List[Dict]:
+        """
+        Read operations from shared memory ring buffer
+        
+        Args:
+            limit: Max number of operations to return
+        
+        Returns:
+            List of operation dicts
         """
         if not self.connected or not self.shm:
             return []
         
-        prices = []
-        
         try:
-            # TODO: Read from price ring buffer in shared memory
-            # For now, return empty list (to be implemented)
-            pass
+            return operations_to_dicts(self.read_operations_batch(limit=limit))
         
         except Exception as e:
-            print(f"❌ Error reading prices: {e}")
+            print(f"❌ Error reading operations: {e}")
+            return []
+    
+    def read_prices(self) -> Optional[PriceBook]:
+        """
+        Consistent copy of the engine's live top-of-book (seqlock PriceCache)
         
-        return prices
+        Returns:
+            PriceBook or None if not connected
+        """
+        if not self.connected or self._prices is None:
+            return None
+        return self._prices.read()
     
-    def send_command(self, command: str, data: str = "") -> bool:
+    def get_latest_opportunities(self, limit: int = 10, book: Optional[PriceBook] = None) -> List[Dict]:
         """
-        Send command to C engine via Unix socket
+        Current cross-exchange opportunities from the price cache
         
         Args:
-            command: Command type ("start", "stop", "update_config", "shutdown")
-            data: Optional command data (JSON string)
+            limit: Max number of opportunities to return
+            book: Already-read prices (e.g. from a hub snapshot), read now if None
         
         Returns:
-            True if successful
+            List of opportunity dicts, widest spread first
         """
-        try:
-            # Connect to Unix socket
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.connect(self.SOCKET_PATH)
-            
-            # Command mapping
-            commands = {
-                'start': 0,
-                'stop': 1,
-                'update_config': 2,
-                'shutdown': 3
-            }
-            
-            cmd_type = commands.get(command, 0)
-            
-            # Pack command (4 bytes type + 256 bytes data)
-            cmd_bytes = struct.pack('I256s', cmd_type, data.encode()[:256])
-            sock.send(cmd_bytes)
-            
-            sock.close()
-            
-            print(f"✅ Sent command: {command}")
-            return True
+        book = book or self.read_prices()
+        return book.opportunities(limit=limit) if book else []
+    
+    def get_latest_prices(self, limit: int = 10, book: Optional[PriceBook] = None) -> List[Dict]:
+        """
+        Latest top-of-book quotes from the price cache
         
-        except Exception as e:
-            print(f"❌ Failed to send command: {e}")
-            return False
+        Args:
+            limit: Max number of prices to return
+            book: Already-read prices (e.g. from a hub snapshot), read now if None
+        
+        Returns:
+            List of price dicts, most recently updated first
+        """
+        book = book or self.read_prices()
+        return book.latest(limit=limit) if book else []
+    
+    async def send_command(self, command: str, data: CommandData = None) -> CommandAck:
+        """
+        Send command to C engine over the persistent command channel
+        
+        Args:
+            command: Command type ("start", "stop", "update_config", "shutdown", "ping")
+            data: Optional command data (JSON string or dict, any length)
+        
+        Returns:
+            Engine acknowledgement (ack.ok if applied)
+        
+        Raises:
+            EngineCommandError: engine unreachable or no ack in time
+        """
+        return await self.commands.send(command, data)
     
-    def start_strategy(self, strategy_name: str) -> bool:
+    async def send_commands(self, commands: List[Tuple[str, CommandData]]) -> List[CommandAck]:
+        """Send several commands in one write / one round-trip"""
+        return await self.commands.send_many(commands)
+    
+    async def start_strategy(self, strategy_name: str) -> CommandAck:
         """
         Start a specific strategy in C engine
         
@@ -331,32 +620,35 @@ class CEngineBridge:
             strategy_name: "cross_exchange", "funding_rate", "triangular"
         
         Returns:
-            True if successful
+            Engine acknowledgement
         """
-        data = json.dumps({'strategy': strategy_name})
-        return self.send_command('start', data)
+        return await self.send_command('start', {'strategy': strategy_name})
     
-    def stop_strategy(self, strategy_name: str) -> bool:
+    async def stop_strategy(self, strategy_name: str) -> CommandAck:
         """Stop a specific strategy"""
-        data = json.dumps({'strategy': strategy_name})
-        return self.send_command('stop', data)
+        return await self.send_command('stop', {'strategy': strategy_name})
+    
+    async def set_strategies(self, enabled: Dict[str, bool]) -> List[CommandAck]:
+        """Start/stop several strategies, pipelined into one round-trip"""
+        return await self.send_commands([
+            ('start' if on else 'stop', {'strategy': name}) for name, on in enabled.items()
+        ])
     
-    def update_config(self, config: Dict) -> bool:
+    async def update_config(self, config: Dict) -> CommandAck:
         """
         Hot-reload configuration in C engine
         
         Args:
-            config: New configuration dict
+            config: New configuration dict (chunked, no size limit below 64 KB)
         
         Returns:
-            True if successful
+            Engine acknowledgement
         """
-        data = json.dumps(config)
-        return self.send_command('update_config', data)
+        return await self.send_command('update_config', config)
     
-    def shutdown(self) -> bool:
+    async def shutdown(self) -> CommandAck:
         """Gracefully shutdown C engine"""
-        return self.send_command('shutdown')
+        return await self.send_command('shutdown')
     
     def is_running(self) -> bool:
         """Check if C engine is running"""
@@ -366,43 +658,83 @@ class CEngineBridge:
         stats = self.get_stats()
         return stats['engine_running'] if stats else False
     
-    def get_performance_metrics(self) -> Dict:
+    def get_performance_metrics(
+        self,
+        stats: Optional[Dict] = None,
+        latency: Optional[Dict] = None,
+        rates: Optional[Dict] = None
+    ) -> Dict:
         """
         Calculate performance metrics from stats
         
+        Args:
+            stats: Already-read stats (e.g. from a hub snapshot), read now if None
+            latency: Quantiles from EngineMetrics, engine lifetime histogram if None
+            rates: Per-second rates from EngineMetrics, delta since the previous call if None
+        
         Returns:
             Dict with derived metrics
         """
-        stats = self.get_stats()
+        if stats is None:
+            stats = self.get_stats()
         
         if not stats:
             return {}
         
+        if latency is None:
+            histogram = self.read_latency_histogram()
+            latency = histogram_quantiles(histogram[0]) if histogram else histogram_quantiles(np.zeros(1))
+        
+        if rates is None:
+            now = time.monotonic()
+            detected = stats['opportunities_detected']
+            previous = self._perf_sample
+            self._perf_sample = (now, detected)
+            throughput = 0.0
+            if previous and now > previous[0] and detected >= previous[1]:
+                throughput = (detected - previous[1]) / (now - previous[0])
+        else:
+            throughput = rates['opportunities_detected_per_sec']
+        
         return {
-            'latency_p50_us': stats['avg_latency_us'],
-            'latency_p99_us': stats['p99_latency_us'],
-            'throughput_ops_per_sec': stats['opportunities_detected'] / 3600,  # Assuming 1 hour
+            'latency_avg_us': stats['avg_latency_us'],
+            'latency_p50_us': latency['p50'],
+            'latency_p90_us': latency['p90'],
+            'latency_p99_us': latency['p99'],
+            'latency_p999_us': latency['p99_9'],
+            'latency_max_us': stats['p99_latency_us'],  # engine keeps a running max in this field
+            'throughput_ops_per_sec': throughput,
             'success_rate_pct': stats['success_rate'],
             'fill_rate_pct': stats['fill_rate'],
             'total_profit_usd': stats['total_profit_usd'],
             'profit_per_trade': stats['total_profit_usd'] / stats['opportunities_executed'] if stats['opportunities_executed'] > 0 else 0
         }
     
-    def health_check(self) -> Dict:
+    def health_check(self, stats: Optional[Dict] = None) -> Dict:
         """
         Comprehensive health check
         
+        Args:
+            stats: Already-read stats (e.g. from a hub snapshot), read now if None
+        
         Returns:
             Health status dict
         """
         if not self.connected:
+            if self.layout_error:
+                return {
+                    'status': 'layout_mismatch',
+                    'healthy': False,
+                    'message': f"Shared memory layout mismatch: {self.layout_error}"
+                }
             return {
                 'status': 'disconnected',
                 'healthy': False,
                 'message': 'Not connected to C engine'
             }
         
-        stats = self.get_stats()
+        if stats is None:
+            stats = self.get_stats()
         
         if not stats or not stats['engine_running']:
             return {
@@ -472,7 +804,7 @@ class CEngineBridge:
             self.connect()
             
             return True
-            
+        
         except Exception as e:
             print(f"❌ Failed to start engine: {e}")
             return False
@@ -507,7 +839,7 @@ class CEngineBridge:
             
             self.disconnect()
             return True
-            
+        
         except Exception as e:
             print(f"❌ Failed to stop engine: {e}")
             return False
@@ -553,8 +885,8 @@ if bridge.connect():
     print(f"Total profit: ${stats['total_profit_usd']:.2f}")
     print(f"P99 latency: {stats['p99_latency_us']}μs")
     
-    # Start strategy
-    bridge.start_strategy("cross_exchange")
+    # Start strategy (async, acknowledged by the engine)
+    ack = await bridge.start_strategy("cross_exchange")
     
     # Health check
     health = bridge.health_check()
@@ -0,0 +1,418 @@
+"""
+DRAIZER V2.0 - Depth Archive
+Top-N orderbook levels per (exchange, symbol): periodic full books plus
+level deltas in a compact binary log, rebuilt at any timestamp
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import tick_codec
+
+logger = logging.getLogger(__name__)
+
+NS_PER_DAY = 86400 * 1_000_000_000
+
+KEYFRAME = 0  # full top-N book
+DELTA = 1     # changed levels since the previous record (quantity 0 = level removed)
+
+# Header of every record; the payload is one varint stream: bid prices
+# (zigzag deltas), bid quantities, ask prices (zigzag deltas), ask
+# quantities, scaled by 10^price_decimals / 10^qty_decimals
+RECORD_HEADER = np.dtype([
+    ('timestamp_ns', '<i8'),
+    ('size', '<u4'),
+    ('kind', 'u1'),
+    ('price_decimals', 'u1'),
+    ('qty_decimals', 'u1'),
+    ('padding', 'V1'),
+    ('bid_count', '<u2'),
+    ('ask_count', '<u2'),
+])
+
+# Sidecar index: one entry per keyframe
+KEYFRAME_INDEX = np.dtype([('timestamp_ns', '<i8'), ('offset', '<i8')])
+
+Levels = List[Tuple[float, float]]  # (price, quantity)
+
+
+def _day_of(timestamp_ns: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(timestamp_ns // NS_PER_DAY))
+
+
+@dataclass(frozen=True)
+class DepthBook:
+    """
+    Top-N book at a point in time
+    
+    timestamp_ns: capture time of the last record applied to it
+    bids: (n, 2) [price, quantity], best (highest) first
+    asks: (n, 2) [price, quantity], best (lowest) first
+    """
+    timestamp_ns: int
+    bids: np.ndarray
+    asks: np.ndarray
+    
+    def impact_bps(self, side: str, notional: float) -> Optional[float]:
+        """
+        Slippage of a market order of notional (quote currency) against
+        the best price, in bps: 'buy' walks the asks, 'sell' the bids.
+        None if the captured levels are too thin to fill it.
+        """
+        levels = self.asks if side == 'buy' else self.bids
+        if len(levels) == 0 or notional <= 0:
+            return None
+        price, qty = levels[:, 0], levels[:, 1]
+        filled = np.cumsum(price * qty)
+        if filled[-1] < notional:
+            return None
+        last = int(np.searchsorted(filled, notional))
+        # Whole levels before the last one, the rest of the notional at the last price
+        spent_before = filled[last - 1] if last else 0.0
+        base = qty[:last].sum() + (notional - spent_before) / price[last]
+        vwap = notional / base
+        best = price[0]
+        return float((vwap - best) / best * 10000 if side == 'buy' else (best - vwap) / best * 10000)
+
+
+# ==================== CODEC ====================
+
+def _scale(values: np.ndarray) -> int:
+    decimals = tick_codec.decimal_places(values)
+    return tick_codec.MAX_DECIMALS if decimals is None else decimals
+
+
+def encode_record(timestamp_ns: int, kind: int, bids: Levels, asks: Levels) -> bytes:
+    """Header + payload of one record (levels sorted best first)"""
+    bids = np.asarray(bids, dtype=np.float64).reshape(-1, 2)
+    asks = np.asarray(asks, dtype=np.float64).reshape(-1, 2)
+    prices = np.r_[bids[:, 0], asks[:, 0]]
+    quantities = np.r_[bids[:, 1], asks[:, 1]]
+    price_decimals = _scale(prices) if len(prices) else 0
+    qty_decimals = _scale(quantities) if len(quantities) else 0
+    
+    streams = []
+    for side in (bids, asks):
+        units = np.round(side[:, 0] * 10.0 ** price_decimals).astype(np.int64)
+        streams.append(tick_codec.zigzag_encode(np.diff(units, prepend=0)))
+        streams.append(np.round(side[:, 1] * 10.0 ** qty_decimals).astype(np.uint64))
+    payload = tick_codec.varint_encode(np.concatenate(streams))
+    
+    header = np.zeros(1, dtype=RECORD_HEADER)
+    header['timestamp_ns'] = timestamp_ns
+    header['size'] = len(payload)
+    header['kind'] = kind
+    header['price_decimals'] = price_decimals
+    header['qty_decimals'] = qty_decimals
+    header['bid_count'] = len(bids)
+    header['ask_count'] = len(asks)
+    return header.tobytes() + payload
+
+
+def decode_record(data: np.ndarray, offset: int) -> Tuple[np.void, np.ndarray, np.ndarray, int]:
+    """(header, bids, asks, next offset) of the record at offset"""
+    header = np.frombuffer(data, dtype=RECORD_HEADER, count=1, offset=offset)[0]
+    start = offset + RECORD_HEADER.itemsize
+    stop = start + int(header['size'])
+    bid_count, ask_count = int(header['bid_count']), int(header['ask_count'])
+    values = tick_codec.varint_decode(data[start:stop], 2 * (bid_count + ask_count))
+    
+    price_scale = 10.0 ** int(header['price_decimals'])
+    qty_scale = 10.0 ** int(header['qty_decimals'])
+    sides = []
+    position = 0
+    for count in (bid_count, ask_count):
+        prices = np.cumsum(tick_codec.zigzag_decode(values[position:position + count])) / price_scale
+        quantities = values[position + count:position + 2 * count].astype(np.float64) / qty_scale
+        sides.append(np.column_stack([prices, quantities]))
+        position += 2 * count
+    return header, sides[0], sides[1], stop
+
+
+# ==================== BOOK STATE ====================
+
+class _Book:
+    """Mutable top-N book: price -> quantity per side, as of timestamp_ns"""
+    
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.timestamp_ns = 0
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+    
+    def reset(self, timestamp_ns: int, bids: np.ndarray, asks: np.ndarray):
+        self.timestamp_ns = timestamp_ns
+        self.bids = dict(bids.tolist())
+        self.asks = dict(asks.tolist())
+    
+    def apply(self, timestamp_ns: int, bids: np.ndarray, asks: np.ndarray):
+        self.timestamp_ns = timestamp_ns
+        for levels, side in ((bids, self.bids), (asks, self.asks)):
+            for price, qty in levels.tolist():
+                if qty:
+                    side[price] = qty
+                else:
+                    side.pop(price, None)
+    
+    def snapshot(self) -> DepthBook:
+        bids = sorted(self.bids.items(), reverse=True)[:self.depth]
+        asks = sorted(self.asks.items())[:self.depth]
+        return DepthBook(
+            self.timestamp_ns,
+            np.array(bids, dtype=np.float64).reshape(-1, 2),
+            np.array(asks, dtype=np.float64).reshape(-1, 2),
+        )
+
+
+def _top(levels: Levels, depth: int, reverse: bool) -> Dict[float, float]:
+    return dict(sorted(((float(p), float(q)) for p, q in levels if float(q) > 0), reverse=reverse)[:depth])
+
+
+def _diff(old: Dict[float, float], new: Dict[float, float], reverse: bool) -> Levels:
+    changed = [(price, qty) for price, qty in new.items() if old.get(price) != qty]
+    changed += [(price, 0.0) for price in old if price not in new]
+    return sorted(changed, reverse=reverse)
+
+
+# ==================== ARCHIVE ====================
+
+class DepthArchive:
+    """
+    Append-only depth log
+    
+    Layout on disk:
+    - {exchange}/{symbol}/{YYYYMMDD}.depth  records (RECORD_HEADER + payload)
+    - {exchange}/{symbol}/{YYYYMMDD}.keys   KEYFRAME_INDEX, one per keyframe
+    
+    record() keeps the top depth levels per side and writes a keyframe
+    (full book) every keyframe_seconds, on the first book of a process or
+    a day, and otherwise only the levels that changed. A book at any
+    timestamp is rebuilt from the last keyframe before it (binary search
+    over the .keys index) plus at most keyframe_seconds of deltas. A torn
+    trailing record is ignored by readers and cut off before the first
+    append of the next process.
+    """
+    
+    def __init__(
+        self,
+        directory: str = settings.ORDERBOOK_DEPTH_DIR,
+        depth: int = settings.ORDERBOOK_DEPTH_LEVELS,
+        keyframe_seconds: float = settings.ORDERBOOK_DEPTH_KEYFRAME_SECONDS
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.depth = depth
+        self.keyframe_ns = int(keyframe_seconds * 1_000_000_000)
+        
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_written = 0
+        # (exchange, symbol) -> (bids, asks, last timestamp, last keyframe timestamp)
+        self._last: Dict[Tuple[str, str], Tuple[Dict[float, float], Dict[float, float], int, int]] = {}
+        self._repaired: Set[Path] = set()
+    
+    def _path(self, exchange: str, symbol: str, day: date, suffix: str) -> Path:
+        return self.directory / exchange / symbol / f"{day:%Y%m%d}.{suffix}"
+    
+    def days(self, exchange: str, symbol: str) -> List[date]:
+        """Days with depth of one pair, oldest first"""
+        root = self.directory / exchange / symbol
+        if not root.is_dir():
+            return []
+        return sorted(datetime.strptime(path.stem, "%Y%m%d").date() for path in root.glob("*.depth"))
+    
+    # ==================== WRITE ====================
+    
+    def record(self, exchange: str, symbol: str, timestamp_ns: int, bids: Levels, asks: Levels) -> bool:
+        """
+        Capture one book (any number of levels, any order)
+        
+        Returns:
+            False if it was older than the previous book of the pair (dropped)
+        """
+        key = (exchange, symbol)
+        bids_top = _top(bids, self.depth, reverse=True)
+        asks_top = _top(asks, self.depth, reverse=False)
+        
+        last = self._last.get(key)
+        if last and timestamp_ns < last[2]:
+            return False
+        keyframe = (
+            last is None
+            or timestamp_ns - last[3] >= self.keyframe_ns
+            or _day_of(timestamp_ns) != _day_of(last[2])
+        )
+        if keyframe:
+            record = encode_record(
+                timestamp_ns, KEYFRAME, sorted(bids_top.items(), reverse=True), sorted(asks_top.items())
+            )
+        else:
+            bid_changes = _diff(last[0], bids_top, reverse=True)
+            ask_changes = _diff(last[1], asks_top, reverse=False)
+            if not bid_changes and not ask_changes:
+                self._last[key] = (last[0], last[1], timestamp_ns, last[3])
+                return True
+            record = encode_record(timestamp_ns, DELTA, bid_changes, ask_changes)
+        
+        day = _day_of(timestamp_ns)
+        path = self._path(exchange, symbol, day, 'depth')
+        if path not in self._repaired:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._repair(path, self._path(exchange, symbol, day, 'keys'))
+            self._repaired.add(path)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(record)
+        if keyframe:
+            entry = np.array([(timestamp_ns, offset)], dtype=KEYFRAME_INDEX)
+            with open(self._path(exchange, symbol, day, 'keys'), 'ab') as f:
+                f.write(entry.tobytes())
+            self.keyframes += 1
+        else:
+            self.deltas += 1
+        self.bytes_written += len(record)
+        
+        self._last[key] = (bids_top, asks_top, timestamp_ns, timestamp_ns if keyframe else last[3])
+        return True
+    
+    def _repair(self, path: Path, keys: Path):
+        """Cut a torn trailing record (and index entries past the end) off a day"""
+        if not path.exists():
+            return
+        records = np.fromfile(path, dtype=np.uint8)
+        offset = 0
+        while self._complete(records, offset):
+            offset += RECORD_HEADER.itemsize + int(np.frombuffer(records, RECORD_HEADER, 1, offset)[0]['size'])
+        if offset != len(records):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        if keys.exists():
+            index = np.fromfile(keys, dtype=KEYFRAME_INDEX)
+            valid = index[index['offset'] < offset]
+            if len(valid) != len(index) or keys.stat().st_size % KEYFRAME_INDEX.itemsize:
+                keys.write_bytes(valid.tobytes())
+    
+    # ==================== READ ====================
+    
+    def _load(self, exchange: str, symbol: str, day: date) -> Tuple[np.ndarray, np.ndarray]:
+        """(records, keyframe index) of one day (empty if none)"""
+        path = self._path(exchange, symbol, day, 'depth')
+        keys = self._path(exchange, symbol, day, 'keys')
+        if not path.exists() or not keys.exists() or keys.stat().st_size < KEYFRAME_INDEX.itemsize:
+            return np.empty(0, dtype=np.uint8), np.empty(0, dtype=KEYFRAME_INDEX)
+        records = np.memmap(path, dtype=np.uint8, mode='r') if path.stat().st_size else np.empty(0, dtype=np.uint8)
+        index = np.memmap(keys, dtype=KEYFRAME_INDEX, mode='r', shape=(keys.stat().st_size // KEYFRAME_INDEX.itemsize,))
+        return records, index
+    
+    @staticmethod
+    def _complete(records: np.ndarray, offset: int) -> bool:
+        if offset + RECORD_HEADER.itemsize > len(records):
+            return False
+        header = np.frombuffer(records, dtype=RECORD_HEADER, count=1, offset=offset)[0]
+        return offset + RECORD_HEADER.itemsize + int(header['size']) <= len(records)
+    
+    def replay(self, exchange: str, symbol: str, since_ns: int, until_ns: Optional[int] = None) -> Iterator[DepthBook]:
+        """Book as of since_ns (if any), then after every later record up to until_ns"""
+        book = _Book(self.depth)
+        started = False  # the book as of since_ns has been yielded
+        for day in self.days(exchange, symbol):
+            if day < _day_of(since_ns):
+                continue
+            if until_ns is not None and day > _day_of(until_ns):
+                break
+            records, index = self._load(exchange, symbol, day)
+            if len(index) == 0:
+                continue
+            
+            # Rebuild from the last keyframe at or before since_ns
+            start = 0 if started else max(int(np.searchsorted(index['timestamp_ns'], since_ns, side='right')) - 1, 0)
+            while start > 0 and not self._complete(records, int(index['offset'][start])):
+                start -= 1  # keyframe of a torn trailing record
+            offset = int(index['offset'][start])
+            while self._complete(records, offset):
+                header, bids, asks, offset = decode_record(records, offset)
+                timestamp_ns = int(header['timestamp_ns'])
+                if until_ns is not None and timestamp_ns > until_ns:
+                    break
+                if not started and timestamp_ns > since_ns:
+                    started = True
+                    if book.bids or book.asks:
+                        yield book.snapshot()
+                if header['kind'] == KEYFRAME:
+                    book.reset(timestamp_ns, bids, asks)
+                else:
+                    book.apply(timestamp_ns, bids, asks)
+                if started:
+                    yield book.snapshot()
+        
+        if not started and (book.bids or book.asks):
+            yield book.snapshot()
+    
+    def book_at(self, exchange: str, symbol: str, timestamp_ns: int) -> Optional[DepthBook]:
+        """Book as of timestamp_ns (None if nothing captured that day before it)"""
+        for book in self.replay(exchange, symbol, timestamp_ns, timestamp_ns):
+            return book
+        return None
+    
+    def cursor(self, exchange: str, symbol: str, since_ns: int, until_ns: Optional[int] = None) -> "DepthCursor":
+        return DepthCursor(self.replay(exchange, symbol, since_ns, until_ns))
+
+
+class DepthCursor:
+    """Book as of non-decreasing timestamps, replaying the log forward once"""
+    
+    def __init__(self, books: Iterator[DepthBook]):
+        self._books = books
+        self._current: Optional[DepthBook] = None
+        self._next: Optional[DepthBook] = next(books, None)
+    
+    def at(self, timestamp_ns: int) -> Optional[DepthBook]:
+        while self._next is not None and self._next.timestamp_ns <= timestamp_ns:
+            self._current = self._next
+            self._next = next(self._books, None)
+        return self._current
+
+
+# ==================== SOURCES ====================
+
+BINANCE_DEPTH_LIMITS = (5, 10, 20, 50, 100, 500, 1000, 5000)
+
+
+def _binance_depth(symbol: str, levels: int) -> Optional[Tuple[Levels, Levels]]:
+    from app.services.binance_service import binance_service
+    
+    limit = next((limit for limit in BINANCE_DEPTH_LIMITS if limit >= levels), BINANCE_DEPTH_LIMITS[-1])
+    book, stale = binance_service.get_order_book(symbol, limit)
+    if not book or stale:
+        return None  # a cached book is not a capture of now
+    return (
+        [(float(price), float(qty)) for price, qty in book['bids']],
+        [(float(price), float(qty)) for price, qty in book['asks']],
+    )
+
+
+# Exchange -> blocking fetch(symbol, levels) -> (bids, asks) or None
+DEPTH_SOURCES: Dict[str, Callable[[str, int], Optional[Tuple[Levels, Levels]]]] = {
+    'binance': _binance_depth,
+}
+
+
+# Process-wide depth archive
+_depth: Optional[DepthArchive] = None
+
+
+def get_depth_archive() -> Optional[DepthArchive]:
+    """Get or open the depth archive (None if disabled or unavailable)"""
+    global _depth
+    if _depth is None and settings.ORDERBOOK_DEPTH_DIR:
+        try:
+            _depth = DepthArchive()
+        except OSError as e:
+            logger.error(f"❌ Depth archive unavailable: {e}")
+    return _depth
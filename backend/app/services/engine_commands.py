@@ -0,0 +1,197 @@
+"""
+DRAIZER V2.0 - Engine Command Channel
+Persistent pipelined client for the C engine's Unix socket command server
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.config import settings
+from app.services.engine_layout import COMMAND_ACK, COMMAND_FLAG_MORE, COMMAND_FRAME, COMMAND_FRAME_DATA
+
+logger = logging.getLogger(__name__)
+
+# Command name -> frame type (ipc/command_server.h)
+COMMAND_TYPES = {
+    'start': 0,
+    'stop': 1,
+    'update_config': 2,
+    'shutdown': 3,
+    'ping': 4,
+}
+
+CommandData = Union[str, Dict, None]
+
+
+class EngineCommandError(Exception):
+    """Command could not be delivered or was not acknowledged in time"""
+    pass
+
+
+@dataclass(frozen=True)
+class CommandAck:
+    """Engine reply to one command (status 0 = applied)"""
+    request_id: int
+    status: int
+    message: str
+    
+    @property
+    def ok(self) -> bool:
+        return self.status == 0
+
+
+def encode_command(request_id: int, command: str, data: CommandData = None) -> bytes:
+    """
+    Frame one command
+    
+    Payloads longer than one frame are split over consecutive frames of
+    the same request id, all but the last flagged COMMAND_FLAG_MORE.
+    """
+    if command not in COMMAND_TYPES:
+        raise ValueError(f"Unknown engine command: {command}")
+    
+    if isinstance(data, dict):
+        data = json.dumps(data, separators=(',', ':'))
+    payload = (data or '').encode()
+    
+    chunks = [payload[i:i + COMMAND_FRAME_DATA] for i in range(0, len(payload), COMMAND_FRAME_DATA)] or [b'']
+    pack = COMMAND_FRAME.struct.pack
+    return b''.join(
+        pack(request_id, COMMAND_TYPES[command], COMMAND_FLAG_MORE if i < len(chunks) - 1 else 0, len(chunk), chunk)
+        for i, chunk in enumerate(chunks)
+    )
+
+
+class EngineCommandClient:
+    """
+    One long-lived connection to the engine command socket
+    
+    Every command carries a request id and resolves when the engine acks
+    it. Several commands sent together go out in a single write and are
+    answered in one round-trip. The connection is opened on first use and
+    re-opened after the engine restarts.
+    """
+    
+    def __init__(self, path: str, timeout: float = settings.ENGINE_COMMAND_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+    
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        
+        async with self._connect_lock:
+            if self.connected:
+                return
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(self.path), self.timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                raise EngineCommandError(f"engine command socket unavailable: {e}") from e
+            self._read_task = asyncio.create_task(self._read_acks(self._reader))
+            logger.info(f"🔌 Engine command channel connected ({self.path})")
+    
+    async def _read_acks(self, reader: asyncio.StreamReader):
+        unpack = COMMAND_ACK.struct.unpack
+        try:
+            while True:
+                request_id, status, message = unpack(await reader.readexactly(COMMAND_ACK.size))
+                future = self._pending.pop(request_id, None)
+                if future and not future.done():
+                    future.set_result(CommandAck(request_id, status, message.split(b'\0', 1)[0].decode(errors='ignore')))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            # A newer connection may already have replaced this one
+            if self._reader is reader:
+                self._drop_connection(EngineCommandError("engine command channel closed"))
+    
+    def _drop_connection(self, error: Exception):
+        if self._writer:
+            self._writer.close()
+        self._reader = self._writer = None
+        
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+    
+    async def send_many(
+        self,
+        commands: Sequence[Tuple[str, CommandData]],
+        timeout: Optional[float] = None
+    ) -> List[CommandAck]:
+        """
+        Send commands in one write and wait for all acks
+        
+        Args:
+            commands: (command, data) pairs, data is a JSON string or dict
+            timeout: Seconds to wait for the acks (default: client timeout)
+        
+        Returns:
+            One CommandAck per command, in order
+        
+        Raises:
+            EngineCommandError: engine unreachable, connection lost or no ack in time
+        """
+        if not commands:
+            return []
+        
+        await self._connect()
+        
+        loop = asyncio.get_running_loop()
+        ids = [next(self._ids) & 0xFFFFFFFF for _ in commands]
+        frames = b''.join(encode_command(request_id, command, data) for request_id, (command, data) in zip(ids, commands))
+        futures = [self._pending.setdefault(request_id, loop.create_future()) for request_id in ids]
+        
+        try:
+            self._writer.write(frames)
+            await self._writer.drain()
+            results = await asyncio.wait_for(
+                asyncio.gather(*futures, return_exceptions=True), timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise EngineCommandError(f"engine did not acknowledge {len(commands)} command(s) in time")
+        except (ConnectionError, OSError) as e:
+            self._drop_connection(EngineCommandError(f"engine command channel failed: {e}"))
+            raise EngineCommandError(f"engine command channel failed: {e}") from e
+        finally:
+            for request_id in ids:
+                self._pending.pop(request_id, None)
+        
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+    
+    async def send(self, command: str, data: CommandData = None, timeout: Optional[float] = None) -> CommandAck:
+        """Send one command and wait for its ack (see send_many)"""
+        acks = await self.send_many([(command, data)], timeout=timeout)
+        return acks[0]
+    
+    async def close(self):
+        """Close the connection and fail commands still waiting for an ack"""
+        if self._read_task:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+        self._drop_connection(EngineCommandError("engine command channel closed"))
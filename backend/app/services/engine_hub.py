@@ -0,0 +1,278 @@
+"""
+DRAIZER V2.0 - Engine Bridge Hub
+One shared-memory mapping and one background sampler per worker process
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.c_engine_bridge import CEngineBridge, OPERATION_DTYPE
+from app.services.engine_metrics import EngineMetrics
+from app.services.engine_prices import PriceBook
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_operations() -> np.ndarray:
+    ops = np.empty(0, dtype=OPERATION_DTYPE)
+    ops.flags.writeable = False
+    return ops
+
+
+@dataclass(frozen=True)
+class EngineSnapshot:
+    """
+    Immutable result of one sampler pass
+    
+    stats is the CEngineBridge.get_stats() dict and must be treated as
+    read-only: the same object is handed to every request until the next
+    sample. operations is a read-only copy of the ring, oldest first.
+    latency_hist holds the engine's cumulative latency bucket counts and
+    prices the live top-of-book. etag changes exactly when the engine
+    published new stats or operations (last_update_ns, total_operations).
+    """
+    sequence: int = 0
+    connected: bool = False
+    stats: Optional[Dict] = None
+    operations: np.ndarray = field(default_factory=_empty_operations)
+    total_operations: int = 0
+    latency_hist: Optional[np.ndarray] = None
+    latency_count: int = 0
+    latency_sum_us: int = 0
+    prices: Optional[PriceBook] = None
+    sampled_at: float = 0.0
+    etag: str = '"0-0-0"'
+
+
+class EngineHub:
+    """
+    Process-wide owner of the C engine bridge
+    
+    The sampler reads shared memory every ENGINE_SAMPLE_INTERVAL_MS and
+    publishes an EngineSnapshot, so endpoints read the latest sample in
+    O(1) instead of decoding shared memory per request. New operations are
+    also fanned out to subscriber queues (operations feed). Reconnecting
+    after an engine restart happens here and nowhere else.
+    """
+    
+    HUB_CONSUMER = "engine_hub"
+    
+    def __init__(
+        self,
+        bridge: Optional[CEngineBridge] = None,
+        sample_interval_ms: int = settings.ENGINE_SAMPLE_INTERVAL_MS,
+        reconnect_interval_seconds: float = settings.ENGINE_RECONNECT_INTERVAL_SECONDS,
+        feed_queue_size: int = settings.ENGINE_FEED_QUEUE_SIZE
+    ):
+        self.bridge = bridge or CEngineBridge()
+        self.sample_interval = sample_interval_ms / 1000.0
+        self.reconnect_interval = reconnect_interval_seconds
+        self.feed_queue_size = feed_queue_size
+        
+        self._snapshot = EngineSnapshot()
+        self.metrics = EngineMetrics()
+        self._subscribers: List[asyncio.Queue] = []
+        self._advanced = asyncio.Event()  # set (and replaced) when the etag changes
+        self._task: Optional[asyncio.Task] = None
+        self._last_reconnect_check = 0.0
+        self.feed_dropped = 0
+    
+    # ==================== LIFECYCLE ====================
+    
+    async def start(self):
+        """Start the background sampler (idempotent)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📡 Engine hub sampler started ({self.sample_interval * 1000:.0f} ms)")
+    
+    async def stop(self):
+        """Stop the sampler and release the mapping"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.disconnect()
+        await self.bridge.commands.close()
+        logger.info("⏸️  Engine hub sampler stopped")
+    
+    def reconnect(self) -> bool:
+        """Drop the current mapping and map the engine segment again"""
+        self.bridge.disconnect()
+        self.bridge.release_cursor(self.HUB_CONSUMER)
+        connected = self.bridge.connect()
+        self._last_reconnect_check = time.monotonic()
+        self.sample()
+        return connected
+    
+    def disconnect(self):
+        """Release the mapping (engine stopped) and publish an empty snapshot"""
+        self.bridge.disconnect()
+        self.bridge.release_cursor(self.HUB_CONSUMER)
+        self.sample()
+    
+    # ==================== READERS ====================
+    
+    def snapshot(self) -> EngineSnapshot:
+        """Latest published snapshot (O(1), no shared-memory access)"""
+        return self._snapshot
+    
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Subscribe to the operations feed
+        
+        Each item is a read-only OPERATION_DTYPE array of new operations.
+        A subscriber that falls behind loses batches (counted in feed_dropped)
+        instead of slowing the sampler down. The feed starts at the newest
+        operation: the shared cursor only advances while someone listens, so
+        the first subscriber restarts it from latest instead of replaying
+        what accumulated unobserved.
+        """
+        if not self._subscribers:
+            self.bridge.release_cursor(self.HUB_CONSUMER)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.feed_queue_size)
+        self._subscribers.append(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Remove an operations feed subscriber"""
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+    
+    # ==================== SAMPLER ====================
+    
+    def sample(self) -> EngineSnapshot:
+        """Read shared memory once and publish a new snapshot"""
+        bridge = self.bridge
+        previous = self._snapshot
+        
+        if not bridge.connected:
+            snapshot = EngineSnapshot(sequence=previous.sequence + 1, sampled_at=time.time())
+            self._publish(snapshot)
+            return snapshot
+        
+        stats = bridge.get_stats()
+        total_operations = bridge.read_total_operations()
+        
+        operations = previous.operations
+        if total_operations != previous.total_operations or not previous.connected:
+            operations, _, _ = bridge.copy_operations()
+            operations.flags.writeable = False
+        
+        last_update_ns = stats.get('last_update_ns', 0) if stats else 0
+        
+        latency_hist, latency_count, latency_sum_us = bridge.read_latency_histogram()
+        latency_hist.flags.writeable = False
+        
+        snapshot = EngineSnapshot(
+            sequence=previous.sequence + 1,
+            connected=True,
+            stats=stats,
+            operations=operations,
+            total_operations=total_operations,
+            latency_hist=latency_hist,
+            latency_count=latency_count,
+            latency_sum_us=latency_sum_us,
+            prices=bridge.read_prices(),
+            sampled_at=time.time(),
+            etag=f'"{bridge.shm_inode or 0:x}-{last_update_ns:x}-{total_operations:x}"'
+        )
+        self._publish(snapshot)
+        
+        self._publish_new_operations()
+        return snapshot
+    
+    def _publish(self, snapshot: EngineSnapshot):
+        previous = self._snapshot
+        self._snapshot = snapshot
+        self.metrics.update(snapshot)
+        
+        if snapshot.etag != previous.etag:
+            advanced, self._advanced = self._advanced, asyncio.Event()
+            advanced.set()
+    
+    async def wait_for_change(self, etag: str, timeout: float) -> EngineSnapshot:
+        """
+        Wait until the snapshot etag differs from etag (long-poll)
+        
+        Returns:
+            The latest snapshot, changed or not after timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        while self._snapshot.etag == etag:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._advanced.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self._snapshot
+    
+    def _publish_new_operations(self):
+        if not self._subscribers:
+            return
+        
+        cursor = self.bridge.get_cursor(self.HUB_CONSUMER, from_latest=True)
+        new_ops = self.bridge.read_new_operations(cursor, limit=self.bridge.OPERATION_RING_SIZE)
+        if len(new_ops) == 0:
+            return
+        
+        new_ops.flags.writeable = False
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(new_ops)
+            except asyncio.QueueFull:
+                self.feed_dropped += len(new_ops)
+    
+    def _check_connection(self):
+        now = time.monotonic()
+        if now - self._last_reconnect_check < self.reconnect_interval:
+            return
+        self._last_reconnect_check = now
+        
+        bridge = self.bridge
+        if bridge.connected and bridge.is_stale():
+            logger.info("🔄 Engine segment replaced, reconnecting bridge")
+            bridge.disconnect()
+            bridge.release_cursor(self.HUB_CONSUMER)
+        
+        if not bridge.connected:
+            try:
+                inode = os.stat(f"/dev/shm{bridge.SHM_NAME}").st_ino
+            except FileNotFoundError:
+                return
+            # A segment that failed the layout check is not retried until it is replaced
+            if inode != bridge.rejected_inode:
+                bridge.connect()
+    
+    async def _run(self):
+        while True:
+            try:
+                self._check_connection()
+                self.sample()
+            except Exception as e:
+                logger.error(f"❌ Engine hub sample failed: {e}")
+            await asyncio.sleep(self.sample_interval)
+
+
+# Process-wide hub instance
+_hub: Optional[EngineHub] = None
+
+
+def get_engine_hub() -> EngineHub:
+    """Get or create the process-wide engine hub"""
+    global _hub
+    if _hub is None:
+        _hub = EngineHub()
+    return _hub
@@ -0,0 +1,239 @@
+"""
+DRAIZER V2.0 - Shared Memory Layout
+Single declarative description of the C engine's SharedMemory segment
+
+Every structure is declared once as a list of fields and turned into:
+- a packed ctypes.Structure (field offsets, from_buffer_copy of a copied range)
+- a NumPy dtype (vectorized access to arrays of records)
+- a struct.Struct (one-call decode of a copied byte range)
+
+Must match backend/c_engine/src/ipc/shared_memory.h. Any change to the C
+structs must bump SHM_LAYOUT_VERSION on both sides.
+"""
+
+import ctypes
+import struct
+from typing import List, Tuple, Union
+
+import numpy as np
+
+SHM_LAYOUT_VERSION = 5
+SHM_OPERATION_RING_SIZE = 100
+PRICE_CACHE_MAX_SYMBOLS = 1000  # MAX_SYMBOLS in price_cache.h
+
+# Latency histogram (HDR-style log-linear buckets, see latency_bucket_bounds())
+LATENCY_HIST_SUB_BITS = 3   # 8 linear sub-buckets per power of two (~12.5% precision)
+LATENCY_HIST_BUCKETS = 160  # up to ~2 s, last bucket is a catch-all
+
+# type token -> (ctypes type, numpy type, struct code)
+FIELD_TYPES = {
+    'bool': (ctypes.c_bool, '?', '?'),
+    'u8': (ctypes.c_uint8, 'u1', 'B'),
+    'u16': (ctypes.c_uint16, '<u2', 'H'),
+    'i32': (ctypes.c_int32, '<i4', 'i'),
+    'u32': (ctypes.c_uint32, '<u4', 'I'),
+    'u64': (ctypes.c_uint64, '<u8', 'Q'),
+    'f64': (ctypes.c_double, '<f8', 'd'),
+    'char': (ctypes.c_char, 'S', 's'),
+    'pad': (ctypes.c_uint8, 'V', 'x'),
+}
+
+
+class EngineLayoutError(Exception):
+    """Mapped segment does not match the layout this backend was built for"""
+    pass
+
+
+class Layout:
+    """
+    Packed C struct described by (name, type, count) fields
+    
+    type is a FIELD_TYPES token or another Layout (nested struct).
+    In struct.Struct form, char arrays decode to bytes, padding is skipped
+    and other arrays (bool[3], nested structs) decode to raw bytes.
+    """
+    
+    def __init__(self, name: str, fields: List[Tuple[str, Union[str, 'Layout'], int]]):
+        self.name = name
+        self.fields = fields
+        
+        ctype_fields = []
+        dtype_fields = []
+        struct_format = '<'
+        
+        for field_name, kind, count in fields:
+            if isinstance(kind, Layout):
+                ctype_fields.append((field_name, kind.ctype * count))
+                dtype_fields.append((field_name, kind.dtype, (count,)))
+                struct_format += f'{kind.size * count}s'
+                continue
+            
+            ctype, np_type, code = FIELD_TYPES[kind]
+            ctype_fields.append((field_name, ctype * count if count > 1 else ctype))
+            
+            if kind in ('char', 'pad'):
+                dtype_fields.append((field_name, f'{np_type}{count}'))
+                struct_format += f'{count}{code}'
+            elif count > 1:
+                dtype_fields.append((field_name, np_type, (count,)))
+                struct_format += f'{np.dtype(np_type).itemsize * count}s'
+            else:
+                dtype_fields.append((field_name, np_type))
+                struct_format += code
+        
+        self.ctype = type(name, (ctypes.Structure,), {'_pack_': 1, '_fields_': ctype_fields})
+        self.dtype = np.dtype(dtype_fields)
+        self.struct = struct.Struct(struct_format)
+        self.size = ctypes.sizeof(self.ctype)
+        
+        if not (self.size == self.dtype.itemsize == self.struct.size):
+            raise EngineLayoutError(
+                f"{name}: ctypes={self.size}, numpy={self.dtype.itemsize}, struct={self.struct.size}"
+            )
+    
+    def offset(self, field_name: str) -> int:
+        """Byte offset of a top-level field"""
+        return getattr(self.ctype, field_name).offset
+
+
+# ShmOperation
+SHM_OPERATION = Layout('ShmOperation', [
+    ('id', 'u64', 1),
+    ('timestamp_ns', 'u64', 1),
+    ('type', 'char', 20),            # "LONG", "SHORT", "CLOSE"
+    ('strategy', 'char', 20),        # "cross_exchange", etc.
+    ('symbol', 'char', 12),
+    ('exchange_buy', 'char', 20),
+    ('exchange_sell', 'char', 20),
+    ('quantity', 'f64', 1),
+    ('entry_price', 'f64', 1),
+    ('exit_price', 'f64', 1),
+    ('pnl', 'f64', 1),
+    ('pnl_percent', 'f64', 1),
+    ('spread_bps', 'f64', 1),
+    ('fees_paid', 'f64', 1),
+    ('is_open', 'bool', 1),
+    ('padding', 'pad', 7),
+])
+
+# Stats header at the start of SharedMemory
+STATS_FIELDS = [
+    ('engine_running', 'bool', 1),
+    ('strategy_enabled', 'bool', 3),  # cross_exchange, funding_rate, triangular
+    ('padding1', 'pad', 4),
+    ('opps_detected', 'u64', 1),
+    ('opps_executed', 'u64', 1),
+    ('orders_placed', 'u64', 1),
+    ('orders_filled', 'u64', 1),
+    ('total_profit_usd', 'f64', 1),
+    ('balance_usd', 'f64', 1),
+    ('wins', 'u32', 1),
+    ('losses', 'u32', 1),
+    ('win_rate', 'f64', 1),
+    ('open_positions', 'u32', 1),
+    ('padding2', 'pad', 4),
+    ('avg_latency_us', 'u32', 1),
+    ('p99_latency_us', 'u32', 1),
+    ('last_update_ns', 'u64', 1),
+]
+
+SHM_STATS = Layout('ShmStats', STATS_FIELDS)
+
+# CachedPrice (seqlock entry, one cache line) and PriceCache from price_cache.h
+CACHED_PRICE = Layout('CachedPrice', [
+    ('sequence', 'u32', 1),          # even = stable, odd = being written
+    ('symbol', 'char', 12),
+    ('exchange', 'char', 20),
+    ('padding', 'pad', 4),
+    ('bid', 'f64', 1),
+    ('ask', 'f64', 1),
+    ('timestamp_tsc', 'u64', 1),
+])
+
+PRICE_CACHE = Layout('PriceCache', [
+    ('entries', CACHED_PRICE, PRICE_CACHE_MAX_SYMBOLS),
+    ('num_entries', 'i32', 1),
+    ('padding', 'pad', 60),          # C tail padding to the 64-byte alignment
+])
+
+# SharedMemory
+SHARED_MEMORY = Layout('SharedMemory', STATS_FIELDS + [
+    ('operations', SHM_OPERATION, SHM_OPERATION_RING_SIZE),
+    ('operations_head', 'u32', 1),
+    ('operations_tail', 'u32', 1),
+    ('total_operations', 'u64', 1),
+    ('layout_version', 'u32', 1),
+    ('layout_size', 'u32', 1),
+    # Sections below are appended after the handshake so its offset never moves
+    ('latency_hist', 'u64', LATENCY_HIST_BUCKETS),
+    ('latency_count', 'u64', 1),
+    ('latency_sum_us', 'u64', 1),
+    ('tsc_to_ns', 'f64', 1),
+    ('clock_ref_tsc', 'u64', 1),
+    ('clock_ref_epoch_ns', 'u64', 1),
+    ('stats_seq', 'u64', 1),         # stats seqlock: odd while the header is being written
+    ('padding3', 'pad', 40),
+    ('prices', PRICE_CACHE, 1),
+])
+
+# Command channel frames (ipc/command_server.h), not part of SharedMemory
+COMMAND_FRAME_DATA = 256
+COMMAND_FLAG_MORE = 0x1
+
+COMMAND_FRAME = Layout('CommandFrame', [
+    ('request_id', 'u32', 1),
+    ('type', 'u16', 1),
+    ('flags', 'u16', 1),            # COMMAND_FLAG_MORE: payload continues in the next frame
+    ('length', 'u32', 1),           # bytes of data used in this frame
+    ('data', 'char', COMMAND_FRAME_DATA),
+])
+
+COMMAND_ACK = Layout('CommandAck', [
+    ('request_id', 'u32', 1),
+    ('status', 'i32', 1),           # 0 = applied, < 0 = rejected
+    ('message', 'char', 56),
+])
+
+OPERATION_DTYPE = SHM_OPERATION.dtype
+CACHED_PRICE_DTYPE = CACHED_PRICE.dtype
+
+
+def latency_bucket_bounds() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lower/upper bounds (µs, upper exclusive) of every latency bucket
+    
+    Mirrors shm_latency_bucket() in shared_memory.c: values below
+    2^SUB_BITS get one bucket each, then every power of two is split
+    into 2^SUB_BITS equal buckets.
+    """
+    sub = 1 << LATENCY_HIST_SUB_BITS
+    idx = np.arange(LATENCY_HIST_BUCKETS, dtype=np.uint64)
+    
+    shift = np.where(idx < sub, 0, idx // sub - 1).astype(np.uint64)
+    lower = np.where(idx < sub, idx, (sub + idx % sub) << shift)
+    upper = (lower + (np.uint64(1) << shift)).astype(np.float64)
+    upper[-1] = np.inf  # catch-all
+    return lower.astype(np.float64), upper
+
+
+def check_segment(buffer, file_size: int):
+    """
+    Fail fast if a mapped segment was written with a different layout
+    
+    Raises:
+        EngineLayoutError: size or layout_version mismatch
+    """
+    if file_size < SHARED_MEMORY.size:
+        raise EngineLayoutError(
+            f"shared memory is {file_size} bytes, expected {SHARED_MEMORY.size} "
+            f"(engine built with an older layout?)"
+        )
+    
+    version_offset = SHARED_MEMORY.offset('layout_version')
+    version, size = struct.unpack_from('<II', buffer, version_offset)
+    
+    if version != SHM_LAYOUT_VERSION or size != SHARED_MEMORY.size:
+        raise EngineLayoutError(
+            f"engine layout v{version} ({size} bytes), backend expects "
+            f"v{SHM_LAYOUT_VERSION} ({SHARED_MEMORY.size} bytes)"
+        )
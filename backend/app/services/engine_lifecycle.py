@@ -0,0 +1,248 @@
+"""
+DRAIZER V2.0 - Engine Lifecycle
+Start/stop/restart of the C engine container as background jobs
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.engine_hub import EngineHub, get_engine_hub
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('start', 'stop', 'restart')
+
+
+class EngineLifecycleError(Exception):
+    """Engine container operation failed"""
+    pass
+
+
+@dataclass
+class EngineJob:
+    """One start/stop/restart request and its outcome"""
+    action: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = 'queued'  # queued -> running -> succeeded | failed
+    message: str = ''
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('succeeded', 'failed')
+    
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'action': self.action,
+            'status': self.status,
+            'message': self.message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class EngineLifecycleManager:
+    """
+    Serialized engine container operations
+    
+    Every request becomes an EngineJob that runs in the background, one at
+    a time, so concurrent start/stop calls cannot interleave. Docker API
+    calls run in a worker thread and waiting for the shared-memory segment
+    is async polling, so nothing here blocks the event loop. A request for
+    the same action as the job still queued or running returns that job.
+    """
+    
+    SHM_POLL_INTERVAL_SECONDS = 0.1
+    
+    def __init__(
+        self,
+        hub: Optional[EngineHub] = None,
+        container: str = settings.ENGINE_CONTAINER_NAME,
+        start_timeout: float = settings.ENGINE_START_TIMEOUT_SECONDS,
+        stop_timeout: int = settings.ENGINE_STOP_TIMEOUT_SECONDS,
+        history: int = settings.ENGINE_JOB_HISTORY
+    ):
+        self.hub = hub or get_engine_hub()
+        self.container = container
+        self.start_timeout = start_timeout
+        self.stop_timeout = stop_timeout
+        self.history = history
+        
+        self._jobs: "OrderedDict[str, EngineJob]" = OrderedDict()
+        self._lock: Optional[asyncio.Lock] = None
+        self._tasks: Set[asyncio.Task] = set()  # strong refs: the loop only keeps weak ones
+        self._docker = None
+    
+    @property
+    def shm_path(self) -> str:
+        return f"/dev/shm{self.hub.bridge.SHM_NAME}"
+    
+    # ==================== JOBS ====================
+    
+    def submit(self, action: str) -> EngineJob:
+        """Queue an action (or return the pending job for the same action)"""
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown engine action: {action}")
+        
+        pending = [job for job in self._jobs.values() if not job.finished]
+        if pending and pending[-1].action == action:
+            return pending[-1]
+        
+        job = EngineJob(action)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+        
+        task = asyncio.create_task(self._execute(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+    
+    def get(self, job_id: str) -> Optional[EngineJob]:
+        return self._jobs.get(job_id)
+    
+    def jobs(self) -> List[EngineJob]:
+        """Known jobs, newest first"""
+        return list(reversed(self._jobs.values()))
+    
+    async def wait(self, job: EngineJob, timeout: float) -> EngineJob:
+        """Wait up to timeout seconds for a job to finish"""
+        if timeout > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+    
+    async def _execute(self, job: EngineJob):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+            logger.info(f"🔧 Engine {job.action} job {job.id} started")
+            try:
+                job.message = await getattr(self, f"_{job.action}")()
+                job.status = 'succeeded'
+            except EngineLifecycleError as e:
+                job.message = str(e)
+                job.status = 'failed'
+            except Exception as e:
+                job.message = f"Failed to {job.action} engine: {e}"
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+            logger.info(f"🔧 Engine {job.action} job {job.id} {job.status}: {job.message}")
+    
+    # ==================== DOCKER (worker thread) ====================
+    
+    def _get_container(self):
+        import docker
+        
+        if self._docker is None:
+            self._docker = docker.DockerClient(base_url='unix://var/run/docker.sock')
+        try:
+            return self._docker.containers.get(self.container)
+        except docker.errors.NotFound:
+            return None
+        except docker.errors.APIError as e:
+            raise EngineLifecycleError(f"Docker API error: {e}")
+    
+    def _docker_start(self) -> bool:
+        """Start the container; False if it was already running"""
+        container = self._get_container()
+        if container is None:
+            raise EngineLifecycleError("C engine container not found. Run: docker-compose up -d c_engine")
+        if container.status == 'running':
+            return False
+        container.start()
+        return True
+    
+    def _docker_stop(self) -> bool:
+        """Stop the container; False if it does not exist"""
+        container = self._get_container()
+        if container is None:
+            return False
+        container.stop(timeout=self.stop_timeout)
+        return True
+    
+    # ==================== ACTIONS ====================
+    
+    def _shm_inode(self) -> Optional[int]:
+        try:
+            return os.stat(self.shm_path).st_ino
+        except OSError:
+            return None
+    
+    async def _wait_for_shm(self, previous_inode: Optional[int] = None) -> bool:
+        """Wait for a segment other than previous_inode (async polling)"""
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            inode = self._shm_inode()
+            if inode is not None and inode != previous_inode:
+                return True
+            await asyncio.sleep(self.SHM_POLL_INTERVAL_SECONDS)
+        return False
+    
+    async def _start(self, previous_inode: Optional[int] = None) -> str:
+        if previous_inode is None and self._shm_inode() is not None:
+            return '✅ C engine is already running'
+        
+        started = await asyncio.to_thread(self._docker_start)
+        if not started and previous_inode is None:
+            return '✅ C engine is already running'
+        
+        if not await self._wait_for_shm(previous_inode):
+            raise EngineLifecycleError("Container started but shared memory not initialized")
+        
+        # Map the new segment
+        self.hub.reconnect()
+        return '✅ C engine started successfully'
+    
+    async def _stop(self) -> str:
+        if self._shm_inode() is None:
+            return '⚠️ Engine was not running'
+        
+        stopped = await asyncio.to_thread(self._docker_stop)
+        
+        # Release the old segment
+        self.hub.disconnect()
+        return '✅ C engine stopped successfully' if stopped else '⚠️ Engine container not found'
+    
+    async def _restart(self) -> str:
+        previous_inode = self._shm_inode()
+        await asyncio.to_thread(self._docker_stop)
+        self.hub.disconnect()
+        
+        # The engine may leave its segment behind: wait for a new one
+        await self._start(previous_inode=previous_inode or -1)
+        return '✅ C engine restarted successfully'
+
+
+# Process-wide lifecycle manager
+_manager: Optional[EngineLifecycleManager] = None
+
+
+def get_engine_lifecycle() -> EngineLifecycleManager:
+    """Get or create the process-wide engine lifecycle manager"""
+    global _manager
+    if _manager is None:
+        _manager = EngineLifecycleManager()
+    return _manager
@@ -0,0 +1,249 @@
+"""
+DRAIZER V2.0 - Engine Log Tailer
+One `docker logs -f` per worker process, fanned out to every log viewer
+"""
+
+import asyncio
+import itertools
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Iterable, Optional, Pattern, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Alternatives in priority order: the first group that matches anywhere wins
+_LEVEL_PATTERN = re.compile(r'(ERROR|❌)|(WARN|⚠️)|(DEBUG)|(✅)')
+_LEVELS = ('ERROR', 'WARNING', 'DEBUG', 'SUCCESS')
+_TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)')
+
+
+def classify_level(message: str) -> str:
+    """Log level of an engine line (the engine prints emoji, not levels)"""
+    best = len(_LEVELS)
+    for match in _LEVEL_PATTERN.finditer(message):
+        best = min(best, match.lastindex - 1)
+        if best == 0:
+            break
+    return _LEVELS[best] if best < len(_LEVELS) else 'INFO'
+
+
+def parse_docker_timestamp(value: str) -> Optional[int]:
+    """
+    Epoch ns of a `docker logs --timestamps` prefix (RFC3339Nano)
+    
+    Returns None when the value is not a timestamp.
+    """
+    match = _TIMESTAMP_PATTERN.fullmatch(value)
+    if match is None:
+        return None
+    seconds, fraction, zone = match.groups()
+    try:
+        moment = datetime.fromisoformat(seconds + ('+00:00' if zone == 'Z' else zone))
+    except ValueError:
+        return None
+    return int(moment.timestamp()) * 1_000_000_000 + int((fraction or '').ljust(9, '0')[:9])
+
+
+@dataclass(frozen=True)
+class LogLine:
+    """Parsed engine log line (id is monotonic per worker process)"""
+    id: int
+    timestamp: int  # ms, when docker received it (when the backend read it if unknown)
+    level: str
+    message: str
+    
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'timestamp': self.timestamp, 'level': self.level, 'message': self.message}
+
+
+class LogSubscriber:
+    """
+    One log viewer: filters plus a bounded queue
+    
+    When the viewer falls behind, the oldest queued lines are dropped and
+    counted, so the tailer never waits for a slow client.
+    """
+    
+    def __init__(self, queue_size: int, levels: Optional[Set[str]] = None, pattern: Optional[Pattern] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.levels = levels
+        self.pattern = pattern
+        self.dropped = 0
+    
+    def matches(self, line: LogLine) -> bool:
+        if self.levels and line.level not in self.levels:
+            return False
+        return self.pattern is None or self.pattern.search(line.message) is not None
+    
+    def offer(self, line: LogLine):
+        if not self.matches(line):
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(line)
+
+
+class EngineLogTailer:
+    """
+    Shared tail of the engine container's output
+    
+    Runs a single `docker logs -f` while at least one viewer is subscribed
+    and keeps the last `ring_size` parsed lines in memory, so a new viewer
+    gets recent history from the ring instead of a `docker logs --tail`.
+    
+    Lines are read with `--timestamps`; every (re)start of the tail resumes
+    with `--since` the last line seen, so output emitted while nobody was
+    watching or during RESTART_DELAY_SECONDS is not lost.
+    """
+    
+    RESTART_DELAY_SECONDS = 3.0
+    
+    def __init__(
+        self,
+        container: str = settings.ENGINE_CONTAINER_NAME,
+        ring_size: int = settings.ENGINE_LOG_RING_SIZE,
+        queue_size: int = settings.ENGINE_LOG_QUEUE_SIZE
+    ):
+        self.container = container
+        self.queue_size = queue_size
+        
+        self.ring: Deque[LogLine] = deque(maxlen=ring_size)
+        self._ids = itertools.count(1)
+        self._last_ns: Optional[int] = None  # docker timestamp of the newest line read
+        self._subscribers: Set[LogSubscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+    
+    # ==================== SUBSCRIBERS ====================
+    
+    def subscribe(
+        self,
+        levels: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        backfill: int = 20
+    ) -> LogSubscriber:
+        """
+        Register a viewer
+        
+        Args:
+            levels: Only these levels (all if empty)
+            pattern: Only lines matching this regex
+            backfill: Matching lines from the ring to queue first
+        
+        Raises:
+            re.error: invalid pattern
+        """
+        subscriber = LogSubscriber(
+            self.queue_size,
+            levels={level.upper() for level in levels} if levels else None,
+            pattern=re.compile(pattern) if pattern else None
+        )
+        
+        if backfill > 0:
+            history = [line for line in self.ring if subscriber.matches(line)]
+            for line in history[-min(backfill, self.queue_size):]:
+                subscriber.queue.put_nowait(line)
+        
+        self._subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+    
+    def unsubscribe(self, subscriber: LogSubscriber):
+        """Remove a viewer, stopping the tail after the last one"""
+        self._subscribers.discard(subscriber)
+        if not self._subscribers and self._task:
+            self._task.cancel()
+            self._task = None
+    
+    def publish(self, message: str, level: Optional[str] = None, timestamp: Optional[int] = None) -> LogLine:
+        """Add one line to the ring and every matching viewer (timestamp in ms)"""
+        line = LogLine(
+            id=next(self._ids),
+            timestamp=timestamp if timestamp is not None else int(time.time() * 1000),
+            level=level or classify_level(message),
+            message=message
+        )
+        self.ring.append(line)
+        for subscriber in self._subscribers:
+            subscriber.offer(line)
+        return line
+    
+    # ==================== TAIL ====================
+    
+    async def _read(self, stream: asyncio.StreamReader, resume_ns: Optional[int]):
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                return
+            prefix, _, message = raw.decode('utf-8', errors='ignore').partition(' ')
+            timestamp_ns = parse_docker_timestamp(prefix)
+            if timestamp_ns is None:
+                message = f'{prefix} {message}'
+            elif resume_ns is not None and timestamp_ns <= resume_ns:
+                continue  # --since is inclusive: already published before the restart
+            else:
+                self._last_ns = max(self._last_ns or 0, timestamp_ns)
+            message = message.strip()
+            if message:
+                self.publish(message, timestamp=timestamp_ns // 1_000_000 if timestamp_ns else None)
+    
+    async def _tail_once(self):
+        # Resume after the last line read (at most a ring's worth of catch-up);
+        # backfill the ring on the first run
+        resume_ns = self._last_ns
+        window = ['--tail', str(self.ring.maxlen)]
+        if resume_ns is not None:
+            window += ['--since', f'{resume_ns // 1_000_000_000}.{resume_ns % 1_000_000_000:09d}']
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'docker', 'logs', '-f', '--timestamps', *window, self.container,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            self.publish(f'Docker connection error: {e}', level='ERROR')
+            return
+        
+        try:
+            await asyncio.gather(self._read(process.stdout, resume_ns), self._read(process.stderr, resume_ns))
+            returncode = await process.wait()
+            if returncode:
+                self.publish(f'docker logs exited ({returncode}), is {self.container} running?', level='ERROR')
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+    
+    async def _run(self):
+        logger.info(f"📜 Engine log tailer started ({self.container})")
+        try:
+            while True:
+                try:
+                    await self._tail_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Engine log tailer failed: {e}")
+                # Container stopped or restarted: follow the next one
+                await asyncio.sleep(self.RESTART_DELAY_SECONDS)
+        finally:
+            logger.info("📜 Engine log tailer stopped")
+
+
+# Process-wide tailer instance
+_tailer: Optional[EngineLogTailer] = None
+
+
+def get_engine_log_tailer() -> EngineLogTailer:
+    """Get or create the process-wide engine log tailer"""
+    global _tailer
+    if _tailer is None:
+        _tailer = EngineLogTailer()
+    return _tailer
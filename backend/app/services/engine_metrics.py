@@ -0,0 +1,193 @@
+"""
+DRAIZER V2.0 - Engine Metrics
+Latency percentiles from the engine histogram, per-second rates from
+sample deltas, and their Prometheus export
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.engine_layout import LATENCY_HIST_SUB_BITS, latency_bucket_bounds
+
+LATENCY_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+_BUCKET_LOWER, _BUCKET_UPPER = latency_bucket_bounds()
+
+
+def quantile_key(q: float) -> str:
+    """0.999 -> 'p99_9'"""
+    return 'p' + f"{q * 100:g}".replace('.', '_')
+
+
+def histogram_quantiles(counts: np.ndarray, quantiles: Sequence[float] = LATENCY_QUANTILES) -> Dict[str, float]:
+    """
+    Latency quantiles (µs) from bucket counts
+    
+    Each quantile is reported as the upper bound of the bucket it falls in
+    (HDR "highest equivalent value"), so it is never under-reported.
+    
+    Returns:
+        {'p50': ..., 'p90': ..., 'p99': ..., 'p99_9': ...}, zeros if empty
+    """
+    total = counts.sum()
+    if total == 0:
+        return {quantile_key(q): 0.0 for q in quantiles}
+    
+    cumulative = np.cumsum(counts)
+    ranks = np.ceil(np.asarray(quantiles) * total)
+    idx = np.minimum(np.searchsorted(cumulative, ranks), len(counts) - 1)
+    values = np.where(np.isinf(_BUCKET_UPPER[idx]), _BUCKET_LOWER[idx], _BUCKET_UPPER[idx])
+    return {quantile_key(q): float(v) for q, v in zip(quantiles, values)}
+
+
+class EngineMetrics:
+    """
+    Rolling window over hub samples
+    
+    Keeps (time, counters, histogram) for the last `window_seconds`, so
+    rates are real deltas over elapsed time and window percentiles show
+    what latency looks like now rather than since engine start.
+    """
+    
+    # stats keys turned into per-second rates (plus operations and ticks)
+    RATE_COUNTERS = ('opportunities_detected', 'opportunities_executed', 'orders_placed', 'orders_filled')
+    
+    def __init__(self, window_seconds: float = settings.ENGINE_METRICS_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, np.ndarray, np.ndarray]] = deque()
+    
+    def update(self, snapshot):
+        """Add a hub EngineSnapshot (engine restarts reset the window)"""
+        if not snapshot.connected or snapshot.stats is None or snapshot.latency_hist is None:
+            self._samples.clear()
+            return
+        
+        stats = snapshot.stats
+        counters = np.array(
+            [stats[name] for name in self.RATE_COUNTERS] + [snapshot.total_operations, snapshot.latency_count],
+            dtype=np.float64
+        )
+        now = time.monotonic()
+        
+        # Counters went back: new engine run, old deltas are meaningless
+        if self._samples and (counters < self._samples[-1][1]).any():
+            self._samples.clear()
+        
+        self._samples.append((now, counters, snapshot.latency_hist))
+        
+        # Keep one sample at least window_seconds old as the delta base
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window_seconds:
+            self._samples.popleft()
+    
+    def _window(self) -> Optional[Tuple[float, np.ndarray, np.ndarray]]:
+        if len(self._samples) < 2:
+            return None
+        t0, counters0, hist0 = self._samples[0]
+        t1, counters1, hist1 = self._samples[-1]
+        if t1 <= t0:
+            return None
+        return t1 - t0, counters1 - counters0, hist1 - hist0
+    
+    def rates(self) -> Dict[str, float]:
+        """Per-second rates over the window (zeros until two samples exist)"""
+        names = [f"{name}_per_sec" for name in self.RATE_COUNTERS] + ['operations_per_sec', 'ticks_per_sec']
+        window = self._window()
+        if window is None:
+            return {name: 0.0 for name in names}
+        elapsed, deltas, _ = window
+        return {name: float(delta / elapsed) for name, delta in zip(names, deltas)}
+    
+    def window_latency(self) -> Dict[str, float]:
+        """Latency quantiles (µs) of ticks inside the window"""
+        window = self._window()
+        if window is None:
+            return histogram_quantiles(np.zeros(1))
+        return histogram_quantiles(window[2])
+    
+    def lifetime_latency(self) -> Dict[str, float]:
+        """Latency quantiles (µs) since engine start"""
+        if not self._samples:
+            return histogram_quantiles(np.zeros(1))
+        return histogram_quantiles(self._samples[-1][2])
+
+
+class EngineCollector:
+    """
+    Prometheus collector reading the hub's latest snapshot at scrape time
+    
+    Exports the engine histogram as a native Prometheus histogram, the
+    engine counters, and window rates/quantiles as gauges. Histogram
+    boundaries are le = 2^k - 1: latencies are whole µs and engine buckets
+    are [lower, upper), so the last bucket below 2^k holds exactly the
+    values <= 2^k - 1.
+    """
+    
+    PREFIX = 'draizer_engine'
+    
+    # Engine bucket index at every power of two >= 2^SUB_BITS
+    _EXPORT_BUCKETS = np.arange(
+        1 << LATENCY_HIST_SUB_BITS, len(_BUCKET_LOWER), 1 << LATENCY_HIST_SUB_BITS
+    )
+    
+    def __init__(self, hub):
+        self.hub = hub
+    
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+        
+        snapshot = self.hub.snapshot()
+        metrics = self.hub.metrics
+        
+        up = GaugeMetricFamily(f'{self.PREFIX}_up', 'C engine shared memory connected')
+        up.add_metric([], 1.0 if snapshot.connected else 0.0)
+        yield up
+        
+        if not snapshot.connected or snapshot.stats is None or snapshot.latency_hist is None:
+            return
+        
+        stats = snapshot.stats
+        cumulative = np.cumsum(snapshot.latency_hist)
+        buckets = [
+            (str(int(_BUCKET_UPPER[i - 1]) - 1), float(cumulative[i - 1]))
+            for i in self._EXPORT_BUCKETS
+        ]
+        buckets.append(('+Inf', float(cumulative[-1])))
+        yield HistogramMetricFamily(
+            f'{self.PREFIX}_tick_latency_microseconds',
+            'Engine tick-to-decision loop latency',
+            buckets=buckets,
+            sum_value=float(snapshot.latency_sum_us)
+        )
+        
+        for name in EngineMetrics.RATE_COUNTERS:
+            counter = CounterMetricFamily(f'{self.PREFIX}_{name}', f'Engine {name.replace("_", " ")}')
+            counter.add_metric([], float(stats[name]))
+            yield counter
+        
+        operations = CounterMetricFamily(f'{self.PREFIX}_operations', 'Operations pushed by the engine')
+        operations.add_metric([], float(snapshot.total_operations))
+        yield operations
+        
+        for name, value in metrics.rates().items():
+            gauge = GaugeMetricFamily(f'{self.PREFIX}_{name}', f'{name.replace("_", " ")} over the metrics window')
+            gauge.add_metric([], value)
+            yield gauge
+        
+        latency = GaugeMetricFamily(
+            f'{self.PREFIX}_window_latency_microseconds',
+            'Tick latency quantiles over the metrics window',
+            labels=['quantile']
+        )
+        window_latency = metrics.window_latency()
+        for q in LATENCY_QUANTILES:
+            latency.add_metric([str(q)], window_latency[quantile_key(q)])
+        yield latency
+        
+        for name in ('balance_usd', 'total_profit_usd'):
+            gauge = GaugeMetricFamily(f'{self.PREFIX}_{name}', f'Engine {name.replace("_", " ")}')
+            gauge.add_metric([], float(stats[name]))
+            yield gauge
@@ -0,0 +1,227 @@
+"""
+DRAIZER V2.0 - Engine Price Cache Reader
+Live top-of-book from the engine's seqlock PriceCache in shared memory
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.engine_layout import CACHED_PRICE_DTYPE, PRICE_CACHE, PRICE_CACHE_MAX_SYMBOLS, SHARED_MEMORY
+
+
+@dataclass(frozen=True)
+class PriceBook:
+    """
+    Consistent copy of every published PriceCache entry
+    
+    Position i is engine cache slot i. Arrays are read-only; timestamp_ns
+    is epoch nanoseconds (0 = slot registered but never priced). index
+    maps (symbol, exchange) to a slot and is shared between books of the
+    same engine run, so lookups check the slot against len(self).
+    """
+    symbols: np.ndarray
+    exchanges: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    timestamp_ns: np.ndarray
+    index: Dict[Tuple[str, str], int]
+    torn: int = 0  # entries still being written after all retries (bid/ask NaN)
+    
+    def __len__(self) -> int:
+        return len(self.bid)
+    
+    def slot(self, symbol: str, exchange: str) -> Optional[int]:
+        """Cache slot of a (symbol, exchange) pair, None if not in this book"""
+        slot = self.index.get((symbol, exchange))
+        return slot if slot is not None and slot < len(self) else None
+    
+    def get(self, symbol: str, exchange: str) -> Optional[Dict]:
+        """Top-of-book for one (symbol, exchange) pair"""
+        slot = self.slot(symbol, exchange)
+        return self.to_dicts(np.array([slot]))[0] if slot is not None else None
+    
+    def priced(self) -> np.ndarray:
+        """Mask of slots holding a usable quote"""
+        return (self.timestamp_ns > 0) & (self.bid > 0) & (self.ask > 0)
+    
+    def to_dicts(self, slots: Optional[np.ndarray] = None) -> List[Dict]:
+        """Convert slots (all if None) to API dicts"""
+        if slots is None:
+            slots = np.arange(len(self))
+        
+        bid = self.bid[slots]
+        ask = self.ask[slots]
+        mid = (bid + ask) / 2
+        columns = {
+            'symbol': self.symbols[slots].tolist(),
+            'exchange': self.exchanges[slots].tolist(),
+            'bid': bid.tolist(),
+            'ask': ask.tolist(),
+            'mid': mid.tolist(),
+            'spread_bps': np.divide((ask - bid) * 10_000, mid, out=np.zeros_like(mid), where=mid > 0).tolist(),
+            'timestamp': (self.timestamp_ns[slots] // 1_000_000).tolist(),  # milliseconds
+        }
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+    
+    def latest(self, limit: int = 10, symbol: Optional[str] = None, exchange: Optional[str] = None) -> List[Dict]:
+        """Most recently updated quotes first"""
+        mask = self.priced()
+        if symbol:
+            mask &= self.symbols == symbol
+        if exchange:
+            mask &= self.exchanges == exchange
+        
+        slots = np.flatnonzero(mask)
+        slots = slots[np.argsort(self.timestamp_ns[slots], kind='stable')[::-1][:limit]]
+        return self.to_dicts(slots)
+    
+    def opportunities(self, limit: int = 10, min_spread_bps: float = 0.0) -> List[Dict]:
+        """
+        Cross-exchange opportunities: per symbol, buy at the lowest ask and
+        sell at the highest bid on another exchange
+        
+        Returns:
+            Dicts sorted by spread_bps (descending)
+        """
+        slots = np.flatnonzero(self.priced())
+        if len(slots) < 2:
+            return []
+        
+        symbols, groups = np.unique(self.symbols[slots], return_inverse=True)
+        bid = self.bid[slots]
+        ask = self.ask[slots]
+        
+        # Per symbol group: first row after sorting = best quote
+        by_bid = np.lexsort((-bid, groups))
+        by_ask = np.lexsort((ask, groups))
+        firsts = np.searchsorted(groups[by_bid], np.arange(len(symbols)))
+        sell = slots[by_bid[firsts]]
+        buy = slots[by_ask[firsts]]
+        
+        spread_bps = (self.bid[sell] - self.ask[buy]) / self.ask[buy] * 10_000
+        keep = (self.exchanges[sell] != self.exchanges[buy]) & (spread_bps > min_spread_bps)
+        order = np.flatnonzero(keep)[np.argsort(-spread_bps[keep], kind='stable')][:limit]
+        
+        return [
+            {
+                'symbol': str(symbols[i]),
+                'exchange_buy': str(self.exchanges[buy[i]]),
+                'exchange_sell': str(self.exchanges[sell[i]]),
+                'buy_price': float(self.ask[buy[i]]),
+                'sell_price': float(self.bid[sell[i]]),
+                'spread_bps': float(spread_bps[i]),
+                'timestamp': int(min(self.timestamp_ns[buy[i]], self.timestamp_ns[sell[i]]) // 1_000_000),
+            }
+            for i in order
+        ]
+
+
+class PriceCacheReader:
+    """
+    Seqlock reader over the PriceCache section of a mapped segment
+    
+    Uses the engine's even/odd protocol in bulk: copy every sequence,
+    copy every entry, copy every sequence again, then re-read only the
+    slots whose sequence was odd or moved. Plain NumPy loads are ordered
+    on x86 (the engine is x86-only, it times with rdtsc), which is what
+    the C reader's acquire loads guarantee.
+    
+    Entries are append-only, so the (symbol, exchange) index is built once
+    per slot as num_entries grows and never rebuilt.
+    """
+    
+    READ_RETRIES = 8
+    
+    def __init__(self, buffer):
+        base = SHARED_MEMORY.offset('prices')
+        
+        self._entries = np.frombuffer(
+            buffer, dtype=CACHED_PRICE_DTYPE, count=PRICE_CACHE_MAX_SYMBOLS, offset=base
+        )
+        self._entries.flags.writeable = False
+        self._num_entries = np.frombuffer(
+            buffer, dtype='<i4', count=1, offset=base + PRICE_CACHE.offset('num_entries')
+        )
+        
+        # Clock reference written once by shm_create()
+        tsc_to_ns, ref_tsc, ref_epoch_ns = (
+            np.frombuffer(buffer, dtype='<f8', count=1, offset=SHARED_MEMORY.offset('tsc_to_ns'))[0],
+            np.frombuffer(buffer, dtype='<u8', count=1, offset=SHARED_MEMORY.offset('clock_ref_tsc'))[0],
+            np.frombuffer(buffer, dtype='<u8', count=1, offset=SHARED_MEMORY.offset('clock_ref_epoch_ns'))[0],
+        )
+        self.tsc_to_ns = float(tsc_to_ns)
+        self.clock_ref_tsc = int(ref_tsc)
+        self.clock_ref_epoch_ns = int(ref_epoch_ns)
+        
+        self.index: Dict[Tuple[str, str], int] = {}
+        self._symbols = np.empty(0, dtype='U12')
+        self._exchanges = np.empty(0, dtype='U20')
+    
+    def close(self):
+        """Drop the views on the mapping (it cannot be closed while they exist)"""
+        self._entries = None
+        self._num_entries = None
+    
+    def _extend_index(self, count: int):
+        known = len(self._symbols)
+        if count <= known:
+            return
+        
+        new = self._entries[known:count]
+        symbols = np.char.decode(new['symbol'], 'utf-8', 'ignore')
+        exchanges = np.char.decode(new['exchange'], 'utf-8', 'ignore')
+        
+        self._symbols = np.concatenate([self._symbols, symbols.astype('U12')])
+        self._exchanges = np.concatenate([self._exchanges, exchanges.astype('U20')])
+        self._symbols.flags.writeable = False
+        self._exchanges.flags.writeable = False
+        for slot, key in enumerate(zip(symbols.tolist(), exchanges.tolist()), start=known):
+            self.index.setdefault(key, slot)
+    
+    def tsc_to_epoch_ns(self, tsc: np.ndarray) -> np.ndarray:
+        """Convert engine TSC readings to epoch ns (0 stays 0)"""
+        elapsed = (tsc.astype(np.int64) - self.clock_ref_tsc) * self.tsc_to_ns
+        return np.where(tsc > 0, self.clock_ref_epoch_ns + elapsed.astype(np.int64), 0)
+    
+    def read(self) -> PriceBook:
+        """Copy every published entry consistently"""
+        count = min(max(int(self._num_entries[0]), 0), PRICE_CACHE_MAX_SYMBOLS)
+        self._extend_index(count)
+        
+        live = self._entries[:count]
+        before = live['sequence'].copy()
+        data = live.copy()
+        after = live['sequence']
+        torn = np.flatnonzero((before & 1) | (before != after))
+        
+        for _ in range(self.READ_RETRIES):
+            if len(torn) == 0:
+                break
+            before = live['sequence'][torn]
+            retry = live[torn]
+            after = live['sequence'][torn]
+            ok = ((before & 1) == 0) & (before == after)
+            data[torn[ok]] = retry[ok]
+            torn = torn[~ok]
+        
+        bid = data['bid']
+        ask = data['ask']
+        if len(torn):
+            bid[torn] = np.nan
+            ask[torn] = np.nan
+        
+        timestamp_ns = self.tsc_to_epoch_ns(data['timestamp_tsc'])
+        for array in (bid, ask, timestamp_ns):
+            array.flags.writeable = False
+        
+        return PriceBook(
+            symbols=self._symbols[:count],
+            exchanges=self._exchanges[:count],
+            bid=bid,
+            ask=ask,
+            timestamp_ns=timestamp_ns,
+            index=self.index,
+            torn=len(torn)
+        )
@@ -0,0 +1,191 @@
+"""
+DRAIZER V2.0 - Engine Stream
+One shared producer turning hub samples into per-client coalesced pushes
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.c_engine_bridge import operations_to_dicts
+from app.services.engine_hub import EngineHub, EngineSnapshot, get_engine_hub
+
+logger = logging.getLogger(__name__)
+
+# Stats keys that change on every read without carrying engine state
+VOLATILE_STATS = ('timestamp',)
+
+
+def stats_delta(previous: Optional[Dict], current: Optional[Dict]) -> Dict:
+    """Fields of current that differ from previous (all of them if previous is None)"""
+    if not current:
+        return {}
+    previous = previous or {}
+    return {
+        key: value for key, value in current.items()
+        if key not in VOLATILE_STATS and previous.get(key) != value
+    }
+
+
+class StreamClient:
+    """
+    Pending update of one subscriber
+    
+    The producer merges every change into the pending update; the client's
+    sender takes it at most max_rate_hz times per second, so a slow or
+    rate-limited client gets fewer, larger messages instead of a backlog.
+    """
+    
+    def __init__(self, max_rate_hz: float, max_pending_operations: int):
+        self.min_interval = 1.0 / max_rate_hz
+        self.max_pending_operations = max_pending_operations
+        self.changed = asyncio.Event()
+        self.dropped = 0  # operations dropped because the client fell behind
+        
+        self._connected: Optional[bool] = None
+        self._stats: Dict = {}
+        self._operations: List[Dict] = []
+        self._dropped_pending = 0
+    
+    def push(self, connected: Optional[bool], stats: Dict, operations: List[Dict]):
+        """Merge one producer update into the pending update"""
+        if connected is not None:
+            self._connected = connected
+        self._stats.update(stats)
+        
+        if operations:
+            self._operations.extend(operations)
+            overflow = len(self._operations) - self.max_pending_operations
+            if overflow > 0:
+                del self._operations[:overflow]
+                self._dropped_pending += overflow
+                self.dropped += overflow
+        
+        self.changed.set()
+    
+    def take(self) -> Optional[Dict]:
+        """Pending update as a message (None if nothing changed) and reset it"""
+        self.changed.clear()
+        if self._connected is None and not self._stats and not self._operations:
+            return None
+        
+        message: Dict = {'type': 'update', 'timestamp': int(time.time() * 1000)}
+        if self._connected is not None:
+            message['connected'] = self._connected
+        if self._stats:
+            message['stats'] = self._stats
+        if self._operations:
+            message['operations'] = self._operations
+        if self._dropped_pending:
+            message['dropped'] = self._dropped_pending
+        
+        self._connected = None
+        self._stats = {}
+        self._operations = []
+        self._dropped_pending = 0
+        return message
+
+
+class EngineStream:
+    """
+    Shared producer for /engine/stream
+    
+    Runs only while someone is subscribed. Each hub sample is diffed
+    against the previous one once, new operations are decoded once, and
+    the result is merged into every client's pending update.
+    """
+    
+    def __init__(
+        self,
+        hub: Optional[EngineHub] = None,
+        max_rate_hz: float = settings.ENGINE_STREAM_MAX_RATE_HZ,
+        max_pending_operations: int = settings.ENGINE_STREAM_MAX_PENDING_OPERATIONS
+    ):
+        self.hub = hub or get_engine_hub()
+        self.max_rate_hz = max_rate_hz
+        self.max_pending_operations = max_pending_operations
+        
+        self._clients: Set[StreamClient] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last: Optional[EngineSnapshot] = None
+    
+    def initial_message(self) -> Dict:
+        """Full state for a new subscriber"""
+        snapshot = self.hub.snapshot()
+        return {
+            'type': 'snapshot',
+            'timestamp': int(time.time() * 1000),
+            'connected': snapshot.connected,
+            'stats': stats_delta(None, snapshot.stats),
+            'total_operations': snapshot.total_operations,
+            'operations': operations_to_dicts(snapshot.operations[-50:]),
+        }
+    
+    def subscribe(self, max_rate_hz: Optional[float] = None) -> StreamClient:
+        """Register a client (rate capped at the server maximum)"""
+        rate = min(max_rate_hz or self.max_rate_hz, self.max_rate_hz)
+        client = StreamClient(rate, self.max_pending_operations)
+        self._clients.add(client)
+        
+        if self._task is None or self._task.done():
+            self._last = self.hub.snapshot()
+            self._task = asyncio.create_task(self._run())
+        return client
+    
+    def unsubscribe(self, client: StreamClient):
+        """Remove a client, stopping the producer after the last one"""
+        self._clients.discard(client)
+        if not self._clients and self._task:
+            self._task.cancel()
+            self._task = None
+    
+    def _publish(self, snapshot: EngineSnapshot, operations: List[Dict]):
+        last = self._last
+        connected = snapshot.connected if last is None or last.connected != snapshot.connected else None
+        stats = stats_delta(last.stats if last else None, snapshot.stats)
+        if snapshot.total_operations != (last.total_operations if last else 0):
+            stats['total_operations'] = snapshot.total_operations
+        self._last = snapshot
+        
+        if connected is None and not stats and not operations:
+            return
+        for client in self._clients:
+            client.push(connected, stats, operations)
+    
+    async def _run(self):
+        feed = self.hub.subscribe()
+        sequence = self._last.sequence if self._last else 0
+        try:
+            while True:
+                await asyncio.sleep(self.hub.sample_interval)
+                
+                snapshot = self.hub.snapshot()
+                if snapshot.sequence == sequence:
+                    continue
+                sequence = snapshot.sequence
+                
+                batches = []
+                while not feed.empty():
+                    batches.append(feed.get_nowait())
+                operations = [op for batch in batches for op in operations_to_dicts(batch)]
+                
+                try:
+                    self._publish(snapshot, operations)
+                except Exception as e:
+                    logger.error(f"❌ Engine stream publish failed: {e}")
+        finally:
+            self.hub.unsubscribe(feed)
+
+
+# Process-wide stream instance
+_stream: Optional[EngineStream] = None
+
+
+def get_engine_stream() -> EngineStream:
+    """Get or create the process-wide engine stream"""
+    global _stream
+    if _stream is None:
+        _stream = EngineStream()
+    return _stream
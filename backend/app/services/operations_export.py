@@ -0,0 +1,157 @@
+"""
+DRAIZER V2.0 - Operations Export
+Constant-memory CSV / NDJSON / NumPy .npz encoders for operation history
+"""
+
+import csv
+import io
+import json
+import zipfile
+from typing import Callable, Dict, Iterator
+
+import numpy as np
+
+from app.services.c_engine_bridge import OPERATION_DTYPE, filter_operations, operations_to_dicts
+from app.services.engine_hub import get_engine_hub
+from app.services.operations_journal import get_operations_journal
+
+# Journal records read (and encoded) per step
+EXPORT_CHUNK_RECORDS = 8192
+
+CSV_FIELDS = [
+    'timestamp', 'type', 'strategy', 'symbol',
+    'exchange_buy', 'exchange_sell', 'quantity',
+    'entry_price', 'exit_price', 'pnl', 'pnl_percent',
+    'spread_bps', 'fees_paid', 'is_open'
+]
+
+# OPERATION_DTYPE without the struct padding (what np.load returns from an .npz export)
+EXPORT_DTYPE = np.dtype([(name, OPERATION_DTYPE[name]) for name in OPERATION_DTYPE.names if name != 'padding'])
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'npz': ('application/zip', 'npz'),
+}
+
+OperationChunks = Callable[[], Iterator[np.ndarray]]
+
+
+def operation_chunks(**filters) -> OperationChunks:
+    """
+    Source of filtered operations, oldest first, one bounded array at a time
+    
+    Reads the journal (falls back to the engine ring if it is empty).
+    Calling the returned function starts a new pass.
+    
+    Args:
+        filters: symbol, strategy, exchange, since_ms, until_ms (see operations_mask())
+    """
+    def chunks() -> Iterator[np.ndarray]:
+        journal = get_operations_journal()
+        if journal and journal.count:
+            for ops in journal.scan(filters.get('since_ms'), filters.get('until_ms'), EXPORT_CHUNK_RECORDS):
+                ops = filter_operations(ops, **filters)
+                if len(ops):
+                    yield ops
+            return
+        
+        ops = filter_operations(get_engine_hub().snapshot().operations, **filters)
+        if len(ops):
+            yield ops
+    
+    return chunks
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target whose bytes are handed out as they are produced"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_csv(source: OperationChunks) -> Iterator[str]:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, extrasaction='ignore', fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    
+    for ops in source():
+        writer.writerows(operations_to_dicts(ops))
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+    
+    yield output.getvalue()
+
+
+def export_ndjson(source: OperationChunks) -> Iterator[str]:
+    for ops in source():
+        yield ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in operations_to_dicts(ops))
+
+
+def export_npz(source: OperationChunks) -> Iterator[bytes]:
+    """
+    Single 'operations' structured array (EXPORT_DTYPE) in a deflated .npz
+    
+    The .npy header needs the row count, so a first pass counts matches;
+    records are then written chunk by chunk through a streaming zip.
+    Operations journaled between the passes are left out. If the second
+    pass finds fewer (journal reset in between), the stream is aborted
+    rather than padded, so the download fails instead of holding fake rows.
+    Load with np.load(path)['operations'] (pandas.DataFrame(...) works on it).
+    
+    Raises:
+        RuntimeError: operations disappeared between the two passes
+    """
+    count = sum(len(ops) for ops in source())
+    
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('operations.npy', 'w', force_zip64=True) as member:
+            np.lib.format.write_array_header_1_0(member, {
+                'descr': np.lib.format.dtype_to_descr(EXPORT_DTYPE),
+                'fortran_order': False,
+                'shape': (count,),
+            })
+            
+            written = 0
+            for ops in source():
+                ops = ops[:count - written]
+                records = np.empty(len(ops), dtype=EXPORT_DTYPE)
+                for name in EXPORT_DTYPE.names:
+                    records[name] = ops[name]
+                member.write(records.tobytes())
+                written += len(records)
+                yield sink.take()
+                if written == count:
+                    break
+            
+            if written < count:
+                raise RuntimeError(f"Operations changed during export: {written} of {count} left")
+    
+    yield sink.take()
+
+
+EXPORTERS: Dict[str, Callable[[OperationChunks], Iterator]] = {
+    'csv': export_csv,
+    'ndjson': export_ndjson,
+    'npz': export_npz,
+}
+
+
+def export_operations(format: str, **filters) -> Iterator:
+    """Encoded export of operations matching filters, produced chunk by chunk"""
+    return EXPORTERS[format](operation_chunks(**filters))
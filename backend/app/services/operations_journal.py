@@ -0,0 +1,421 @@
+"""
+DRAIZER V2.0 - Operations Journal
+Append-only on-disk history of every ShmOperation drained from the engine ring
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.c_engine_bridge import OPERATION_DTYPE, OperationsCursor, operations_mask
+from app.services.engine_hub import EngineHub
+
+logger = logging.getLogger(__name__)
+
+
+class OperationsJournal:
+    """
+    Append-only journal of engine operations
+    
+    Layout on disk:
+    - {segment:08d}.ops  fixed-width OPERATION_DTYPE records (172 bytes),
+      SEGMENT_RECORDS per segment, memory-mapped for reads
+    - {segment:08d}.idx  time index of a sealed segment: min/max
+      timestamp_ns of every INDEX_BLOCK records
+    - drain.json         drainer position (engine segment inode + sequence)
+      and the journal record count it corresponds to, written before each
+      append together with the previous pair (see _recover())
+    - .lock              only the worker holding it drains, others read
+    
+    Records are addressed by journal sequence (0-based, never reused), so
+    pages are read by position in time proportional to the page size; the
+    block index lets time-filtered reads skip blocks without touching them.
+    Symbol/strategy/exchange filters are not indexed: query() reads blocks
+    until the page is full, at most QUERY_SCAN_RECORDS per call.
+    """
+    
+    SEGMENT_RECORDS = 1 << 16  # ~11 MB per segment
+    INDEX_BLOCK = 1024
+    QUERY_SCAN_RECORDS = 1 << 18  # ~45 MB read per filtered page at most
+    DRAIN_CONSUMER = "operations_journal"
+    
+    def __init__(self, directory: str = settings.OPERATIONS_JOURNAL_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        self.count = 0
+        self.dropped = 0
+        self._maps: List[np.ndarray] = []        # memmap per segment (active one re-mapped on growth)
+        self._block_min: List[np.ndarray] = []   # per segment block min timestamp_ns (extended on growth)
+        self._block_max: List[np.ndarray] = []
+        self._lock_fd: Optional[int] = None
+        self._cursor: Optional[OperationsCursor] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        self.refresh()
+    
+    # ==================== PATHS ====================
+    
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}.ops"
+    
+    def _index_path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}.idx"
+    
+    @property
+    def _state_path(self) -> Path:
+        return self.directory / "drain.json"
+    
+    # ==================== INDEX ====================
+    
+    def refresh(self):
+        """Pick up records appended since the last call (also by other workers)"""
+        segment = max(len(self._maps) - 1, 0)
+        while True:
+            path = self._segment_path(segment)
+            records = path.stat().st_size // OPERATION_DTYPE.itemsize if path.exists() else 0
+            mapped = len(self._maps[segment]) if segment < len(self._maps) else 0
+            if records > mapped:
+                self._map_segment(segment, records)
+            if records < self.SEGMENT_RECORDS:
+                break
+            segment += 1
+        
+        self.count = (len(self._maps) - 1) * self.SEGMENT_RECORDS + len(self._maps[-1]) if self._maps else 0
+    
+    def _map_segment(self, segment: int, records: int):
+        """Map a new segment or a grown active one (only new blocks are indexed)"""
+        ops = np.memmap(self._segment_path(segment), dtype=OPERATION_DTYPE, mode='r', shape=(records,))
+        index_path = self._index_path(segment)
+        
+        if segment < len(self._maps):
+            # Complete blocks keep their bounds, the last partial one is redone
+            kept = len(self._maps[segment]) // self.INDEX_BLOCK
+            block_min, block_max = self._build_index(ops[kept * self.INDEX_BLOCK:])
+            block_min = np.concatenate([self._block_min[segment][:kept], block_min])
+            block_max = np.concatenate([self._block_max[segment][:kept], block_max])
+            self._maps[segment], self._block_min[segment], self._block_max[segment] = ops, block_min, block_max
+        else:
+            if records == self.SEGMENT_RECORDS and index_path.exists():
+                block_min, block_max = np.load(index_path, allow_pickle=False)
+            else:
+                block_min, block_max = self._build_index(ops)
+            self._maps.append(ops)
+            self._block_min.append(block_min)
+            self._block_max.append(block_max)
+        
+        if records == self.SEGMENT_RECORDS and self._lock_fd is not None and not index_path.exists():
+            np.save(index_path.with_suffix('.idx.npy'), np.stack([block_min, block_max]))
+            os.replace(index_path.with_suffix('.idx.npy'), index_path)
+    
+    def _build_index(self, ops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        timestamps = np.asarray(ops['timestamp_ns'])
+        starts = np.arange(0, len(timestamps), self.INDEX_BLOCK)
+        return np.minimum.reduceat(timestamps, starts), np.maximum.reduceat(timestamps, starts)
+    
+    # ==================== WRITE ====================
+    
+    def append(self, ops: np.ndarray):
+        """Append operations (OPERATION_DTYPE) to the journal (writer only)"""
+        offset = 0
+        while offset < len(ops):
+            segment, position = divmod(self.count, self.SEGMENT_RECORDS)
+            chunk = ops[offset:offset + self.SEGMENT_RECORDS - position]
+            
+            with open(self._segment_path(segment), 'ab') as f:
+                f.write(np.ascontiguousarray(chunk, dtype=OPERATION_DTYPE).tobytes())
+            
+            offset += len(chunk)
+            self.count += len(chunk)
+        
+        self.refresh()
+    
+    def _truncate(self, count: int):
+        """Drop every record from journal sequence count on (crash recovery)"""
+        segment, position = divmod(count, self.SEGMENT_RECORDS)
+        path = self._segment_path(segment)
+        if path.exists():
+            os.truncate(path, position * OPERATION_DTYPE.itemsize)
+        while True:
+            segment += 1
+            path = self._segment_path(segment)
+            if not path.exists():
+                break
+            path.unlink()
+            self._index_path(segment).unlink(missing_ok=True)
+        
+        self._maps.clear()
+        self._block_min.clear()
+        self._block_max.clear()
+        self.refresh()
+    
+    # ==================== READ ====================
+    
+    def _records(self, start: int, end: int) -> np.ndarray:
+        """Records [start, end) of one segment (must not cross a segment)"""
+        segment, position = divmod(start, self.SEGMENT_RECORDS)
+        return self._maps[segment][position:position + (end - start)]
+    
+    def _block_overlaps(self, start: int, since_ns: Optional[int], until_ns: Optional[int]) -> bool:
+        segment, position = divmod(start, self.SEGMENT_RECORDS)
+        block = position // self.INDEX_BLOCK
+        if since_ns is not None and self._block_max[segment][block] < since_ns:
+            return False
+        if until_ns is not None and self._block_min[segment][block] > until_ns:
+            return False
+        return True
+    
+    def query(
+        self,
+        limit: int = 50,
+        before: Optional[int] = None,
+        symbol: Optional[str] = None,
+        strategy: Optional[str] = None,
+        exchange: Optional[str] = None,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None
+    ) -> Tuple[np.ndarray, Optional[int]]:
+        """
+        Read one page of matching operations, walking back from the newest
+        
+        Blocks outside since_ms/until_ms are skipped via the index; other
+        filters are checked record by record. After QUERY_SCAN_RECORDS
+        scanned records the page is returned short, with a cursor to go on.
+        
+        Args:
+            limit: Page size
+            before: Only records with journal sequence < before (page cursor)
+            symbol, strategy, exchange, since_ms, until_ms: see operations_mask()
+        
+        Returns:
+            (operations oldest first, cursor for the next older page or None)
+        """
+        self.refresh()
+        
+        since_ns = since_ms * 1_000_000 if since_ms is not None else None
+        until_ns = until_ms * 1_000_000 if until_ms is not None else None
+        
+        end = self.count if before is None else max(min(before, self.count), 0)
+        pages: List[np.ndarray] = []
+        need = limit
+        budget = self.QUERY_SCAN_RECORDS
+        
+        while end > 0 and need > 0 and budget > 0:
+            start = (end - 1) // self.INDEX_BLOCK * self.INDEX_BLOCK
+            if self._block_overlaps(start, since_ns, until_ns):
+                block = self._records(start, end)
+                budget -= len(block)
+                matches = np.flatnonzero(
+                    operations_mask(block, symbol, strategy, exchange, since_ms, until_ms)
+                )[-need:]
+                if len(matches):
+                    pages.append(np.array(block[matches]))
+                    need -= len(matches)
+                    if need == 0:
+                        end = start + int(matches[0])
+                        break
+            end = start
+        
+        ops = np.concatenate(pages[::-1]) if pages else np.empty(0, dtype=OPERATION_DTYPE)
+        return ops, (end if end > 0 else None)
+    
+    def scan(
+        self,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None,
+        chunk_records: int = SEGMENT_RECORDS,
+        end: Optional[int] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Journaled operations, oldest first, as memory-mapped chunks
+        
+        Chunks whose index blocks all fall outside [since_ms, until_ms] are
+        skipped; records inside yielded chunks are not filtered. With `end`,
+        only records before that journal sequence are read (see checkpoint()).
+        """
+        self.refresh()
+        end = self.count if end is None else min(end, self.count)
+        
+        since_ns = since_ms * 1_000_000 if since_ms is not None else None
+        until_ns = until_ms * 1_000_000 if until_ms is not None else None
+        chunk_records = max(chunk_records // self.INDEX_BLOCK, 1) * self.INDEX_BLOCK
+        
+        for segment, ops in enumerate(list(self._maps)):
+            overlap = np.ones(len(self._block_min[segment]), dtype=bool)
+            if since_ns is not None:
+                overlap &= self._block_max[segment] >= since_ns
+            if until_ns is not None:
+                overlap &= self._block_min[segment] <= until_ns
+            
+            blocks_per_chunk = chunk_records // self.INDEX_BLOCK
+            for first in range(0, len(overlap), blocks_per_chunk):
+                hits = np.flatnonzero(overlap[first:first + blocks_per_chunk])
+                if len(hits):
+                    start = (first + int(hits[0])) * self.INDEX_BLOCK
+                    stop = (first + int(hits[-1]) + 1) * self.INDEX_BLOCK
+                    stop = min(stop, end - segment * self.SEGMENT_RECORDS)
+                    if stop <= start:
+                        return
+                    yield ops[start:stop]
+    
+    def tail(self, limit: int) -> np.ndarray:
+        """Newest `limit` operations, oldest first"""
+        ops, _ = self.query(limit=limit)
+        return ops
+    
+    # ==================== DRAINER ====================
+    
+    def _acquire_writer_lock(self) -> bool:
+        fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+    
+    def _load_drain_state(self) -> Dict:
+        try:
+            return json.loads(self._state_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def _save_drain_state(self, state: Dict):
+        tmp_path = self._state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self._state_path)
+    
+    def _recover(self) -> Tuple[Optional[int], int]:
+        """
+        Reconcile the journal with drain.json after (re)acquiring the lock
+        
+        drain.json is replaced before every append and names both the
+        position/count after the batch and the pair before it. Records past
+        the committed count (a torn or unfinished append) are cut off, and
+        draining resumes from the matching position, so a crash neither
+        re-journals nor skips operations.
+        
+        Returns:
+            (engine segment inode, drain position) to resume from
+        """
+        state = self._load_drain_state()
+        records = sum(
+            path.stat().st_size for path in self.directory.glob('*.ops')
+        ) // OPERATION_DTYPE.itemsize
+        
+        count, position = state.get('count', records), state.get('position', 0)
+        if records < count:
+            # Crashed before the batch was fully written: drop it and drain it again
+            count, position = state.get('previous_count', 0), state.get('previous_position', 0)
+            self._save_drain_state({**state, 'count': count, 'position': position})
+        self._truncate(min(count, records))
+        
+        if self.count != count:
+            logger.warning(f"⚠️  Operations journal has {self.count} of {count} drained operations")
+        return state.get('segment_inode'), position
+    
+    def checkpoint(self) -> Tuple[int, Optional[int], int]:
+        """
+        Journal record count and the drain position it corresponds to
+        
+        Returns:
+            (count, engine segment inode, engine sequence after those records)
+        """
+        state = self._load_drain_state()
+        self.refresh()
+        if self.count >= state.get('count', 0):
+            return state.get('count', self.count), state.get('segment_inode'), state.get('position', 0)
+        # Batch being appended right now: it is not part of the checkpoint yet
+        return state.get('previous_count', 0), state.get('segment_inode'), state.get('previous_position', 0)
+    
+    def drain(self, hub: EngineHub) -> int:
+        """
+        Move every operation not yet journaled from the engine ring to disk
+        
+        Returns:
+            Number of operations appended
+        """
+        bridge = hub.bridge
+        if not bridge.connected:
+            return 0
+        
+        cursor = self._cursor
+        if cursor is None:
+            # Resume where the previous drainer stopped if the engine run is the same
+            saved_inode, saved_position = self._recover()
+            position = saved_position if saved_inode == bridge.shm_inode else 0
+            cursor = self._cursor = bridge.get_cursor(self.DRAIN_CONSUMER, position=position)
+        
+        dropped_before = cursor.dropped
+        ops = bridge.read_new_operations(cursor, limit=bridge.OPERATION_RING_SIZE)
+        
+        if cursor.dropped > dropped_before:
+            self.dropped += cursor.dropped - dropped_before
+            logger.warning(f"⚠️  Operations journal lost {cursor.dropped - dropped_before} operations (ring lapped)")
+        
+        if len(ops):
+            # Intent first: a crash mid-append is rolled back by _recover()
+            self._save_drain_state({
+                'segment_inode': bridge.shm_inode,
+                'position': cursor.position,
+                'count': self.count + len(ops),
+                'previous_position': cursor.position - len(ops),
+                'previous_count': self.count,
+            })
+            self.append(ops)
+        
+        return len(ops)
+    
+    async def start(self, hub: EngineHub, interval_ms: int = settings.OPERATIONS_JOURNAL_DRAIN_INTERVAL_MS):
+        """Start the background drainer (only in the worker holding the lock)"""
+        if self._task and not self._task.done():
+            return
+        if not self._acquire_writer_lock():
+            logger.info("📒 Operations journal drained by another worker, read-only here")
+            return
+        self._task = asyncio.create_task(self._run(hub, interval_ms / 1000.0))
+        logger.info(f"📒 Operations journal drainer started ({self.directory}, {self.count} operations)")
+    
+    async def stop(self):
+        """Stop the drainer and release the writer lock"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+    
+    async def _run(self, hub: EngineHub, interval: float):
+        while True:
+            try:
+                self.drain(hub)
+            except Exception as e:
+                logger.error(f"❌ Operations journal drain failed: {e}")
+            await asyncio.sleep(interval)
+
+
+# Process-wide journal instance
+_journal: Optional[OperationsJournal] = None
+
+
+def get_operations_journal() -> Optional[OperationsJournal]:
+    """Get or open the operations journal (None if disabled or unavailable)"""
+    global _journal
+    if _journal is None and settings.OPERATIONS_JOURNAL_DIR:
+        try:
+            _journal = OperationsJournal()
+        except OSError as e:
+            logger.error(f"❌ Operations journal unavailable: {e}")
+    return _journal
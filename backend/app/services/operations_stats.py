@@ -0,0 +1,347 @@
+"""
+DRAIZER V2.0 - Operations Statistics
+Incremental rolling aggregates of engine operations, fed by the hub's operations feed
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.c_engine_bridge import OperationsCursor
+from app.services.engine_hub import EngineHub, get_engine_hub
+from app.services.operations_journal import OperationsJournal
+from app.services.profit_history import ProfitRollups
+
+logger = logging.getLogger(__name__)
+
+# Window name -> (length seconds, bucket seconds); None = since start
+WINDOWS: Dict[str, Tuple[Optional[int], int]] = {
+    '1m': (60, 1),
+    '1h': (3600, 60),
+    '24h': (86400, 900),
+    'lifetime': (None, 0),
+}
+DIMENSIONS = ('symbol', 'strategy', 'pair')
+TOTAL_KEY = '*'
+
+
+class Aggregate:
+    """
+    Count, P&L, wins, fees and spread mean/variance of a set of operations
+    
+    Spread moments are kept as (mean, M2) and combined with the parallel
+    form of Welford's update, so whole groups can be merged in and, for
+    expiring window buckets, removed again without revisiting operations.
+    """
+    
+    __slots__ = ('count', 'pnl', 'wins', 'fees', 'spread_mean', 'spread_m2')
+    
+    def __init__(
+        self,
+        count: int = 0,
+        pnl: float = 0.0,
+        wins: int = 0,
+        fees: float = 0.0,
+        spread_mean: float = 0.0,
+        spread_m2: float = 0.0
+    ):
+        self.count = count
+        self.pnl = pnl
+        self.wins = wins
+        self.fees = fees
+        self.spread_mean = spread_mean
+        self.spread_m2 = spread_m2
+    
+    def merge(self, other: "Aggregate") -> "Aggregate":
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.spread_mean - self.spread_mean
+        self.spread_mean += delta * other.count / count
+        self.spread_m2 += other.spread_m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.pnl += other.pnl
+        self.wins += other.wins
+        self.fees += other.fees
+        return self
+    
+    def remove(self, other: "Aggregate") -> "Aggregate":
+        """Inverse of merge() for a group that was merged in earlier"""
+        count = self.count - other.count
+        if count <= 0:
+            self.__init__()
+            return self
+        mean = (self.spread_mean * self.count - other.spread_mean * other.count) / count
+        delta = other.spread_mean - mean
+        self.spread_m2 = max(self.spread_m2 - other.spread_m2 - delta * delta * count * other.count / self.count, 0.0)
+        self.spread_mean = mean
+        self.count = count
+        self.pnl -= other.pnl
+        self.wins -= other.wins
+        self.fees -= other.fees
+        return self
+    
+    def to_dict(self) -> Dict:
+        count = self.count
+        return {
+            'count': count,
+            'total_profit': self.pnl,
+            'avg_profit': self.pnl / count if count else 0.0,
+            'wins': self.wins,
+            'win_rate': self.wins / count * 100 if count else 0.0,
+            'fees': self.fees,
+            'avg_spread_bps': self.spread_mean,
+            'spread_std_bps': (self.spread_m2 / (count - 1)) ** 0.5 if count > 1 else 0.0,
+        }
+
+
+class RollingAggregate:
+    """
+    Aggregate over a sliding time window
+    
+    Operations are merged into fixed time buckets and into a running total;
+    buckets that slide out of the window are removed from the total, so
+    reading is O(1). The window edge is exact to one bucket.
+    """
+    
+    def __init__(self, window: Optional[int], bucket: int):
+        self.window = window
+        self.bucket = bucket
+        self.total = Aggregate()
+        self._buckets: Deque[Tuple[int, Aggregate]] = deque()
+    
+    def add(self, second: int, part: Aggregate):
+        if self.window is None:
+            self.total.merge(part)
+            return
+        
+        start = second - second % self.bucket
+        if self._buckets and self._buckets[-1][0] >= start:
+            # Late operations join the newest bucket
+            self._buckets[-1][1].merge(part)
+        else:
+            self._buckets.append((start, Aggregate().merge(part)))
+        self.total.merge(part)
+        self.expire(start)
+    
+    def expire(self, now: float):
+        if self.window is None:
+            return
+        horizon = now - self.window
+        while self._buckets and self._buckets[0][0] + self.bucket <= horizon:
+            _, bucket = self._buckets.popleft()
+            self.total.remove(bucket)
+
+
+def _group_aggregates(index: np.ndarray, groups: int, pnl: np.ndarray, spread: np.ndarray, fees: np.ndarray) -> List[Aggregate]:
+    """One Aggregate per group label in index (vectorized)"""
+    count = np.bincount(index, minlength=groups)
+    mean = np.bincount(index, weights=spread, minlength=groups) / count
+    columns = (
+        count,
+        np.bincount(index, weights=pnl, minlength=groups),
+        np.bincount(index, weights=pnl > 0, minlength=groups).astype(np.int64),
+        np.bincount(index, weights=fees, minlength=groups),
+        mean,
+        np.bincount(index, weights=(spread - mean[index]) ** 2, minlength=groups),
+    )
+    return [Aggregate(*row) for row in zip(*(column.tolist() for column in columns))]
+
+
+class OperationsAggregator:
+    """
+    Rolling 1m / 1h / 24h / lifetime statistics per symbol, strategy and
+    exchange pair (plus overall totals), and the multi-resolution
+    cumulative P&L curve (profit)
+    
+    Every batch from the operations feed is grouped by (key, second) with
+    NumPy and merged into the windows once, so endpoints read ready-made
+    aggregates instead of rescanning operations. Seeded from the operations
+    journal at start-up, so lifetime covers the whole journal; live
+    operations are then read through an own ring cursor that starts at the
+    drain position the seed ended at (the hub feed only wakes it up), so
+    nothing journaled in between is missed or counted twice.
+    """
+    
+    STATS_CONSUMER = "operations_stats"
+    
+    def __init__(self, hub: Optional[EngineHub] = None):
+        self.hub = hub or get_engine_hub()
+        self.ingested = 0
+        self.dropped = 0
+        self.profit = ProfitRollups()
+        
+        self._groups: Dict[str, Dict[str, Dict[str, RollingAggregate]]] = {
+            dimension: {} for dimension in ('total',) + DIMENSIONS
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._cursor: Optional[OperationsCursor] = None
+        self._cursor_inode: Optional[int] = None
+        self._resume: Optional[Tuple[Optional[int], int]] = None  # (engine segment inode, position) after the seed
+    
+    # ==================== WRITE ====================
+    
+    def _windows(self, dimension: str, key: str) -> Dict[str, RollingAggregate]:
+        group = self._groups[dimension]
+        windows = group.get(key)
+        if windows is None:
+            windows = group[key] = {name: RollingAggregate(*spec) for name, spec in WINDOWS.items()}
+        return windows
+    
+    def ingest(self, ops: np.ndarray, now: Optional[float] = None):
+        """Merge a batch of operations (OPERATION_DTYPE) into every window"""
+        if len(ops) == 0:
+            return
+        now = now or time.time()
+        
+        seconds, second_index = np.unique(ops['timestamp_ns'] // 1_000_000_000, return_inverse=True)
+        pnl = ops['pnl'].astype(np.float64)
+        spread = ops['spread_bps'].astype(np.float64)
+        fees = ops['fees_paid'].astype(np.float64)
+        
+        labels = {
+            'total': np.full(len(ops), TOTAL_KEY.encode()),
+            'symbol': ops['symbol'],
+            'strategy': ops['strategy'],
+            'pair': np.char.add(np.char.add(ops['exchange_buy'], '→'.encode()), ops['exchange_sell']),
+        }
+        
+        for dimension, values in labels.items():
+            names, key_index = np.unique(values, return_inverse=True)
+            groups, group_index = np.unique(key_index * len(seconds) + second_index, return_inverse=True)
+            parts = _group_aggregates(group_index, len(groups), pnl, spread, fees)
+            
+            keys = np.char.decode(names, 'utf-8', 'ignore').tolist()
+            for group, part in zip(groups.tolist(), parts):
+                key = keys[group // len(seconds)]
+                second = int(seconds[group % len(seconds)])
+                for rolling in self._windows(dimension, key).values():
+                    if rolling.window is None or second >= now - rolling.window:
+                        rolling.add(second, part)
+        
+        self.profit.ingest(ops)
+        self.ingested += len(ops)
+    
+    # ==================== READ ====================
+    
+    def totals(self, window: str = 'lifetime') -> Aggregate:
+        """Overall aggregate of one window"""
+        return self.breakdown('total', window).get(TOTAL_KEY, Aggregate())
+    
+    def breakdown(self, dimension: str, window: str = 'lifetime') -> Dict[str, Aggregate]:
+        """Aggregate per key of a dimension (keys without operations omitted)"""
+        now = time.time()
+        result = {}
+        for key, windows in self._groups[dimension].items():
+            rolling = windows[window]
+            rolling.expire(now)
+            if rolling.total.count:
+                result[key] = rolling.total
+        return result
+    
+    def best_worst(self, dimension: str, window: str = 'lifetime') -> Tuple[Optional[str], Optional[str]]:
+        """Keys with the highest and lowest P&L"""
+        aggregates = self.breakdown(dimension, window)
+        if not aggregates:
+            return None, None
+        return (
+            max(aggregates, key=lambda key: aggregates[key].pnl),
+            min(aggregates, key=lambda key: aggregates[key].pnl)
+        )
+    
+    # ==================== FEED ====================
+    
+    def seed(self, directory) -> Tuple[int, Optional[int], int]:
+        """
+        Ingest every journaled operation (start-up, runs in a worker thread)
+        
+        Reads through a private journal instance, so the drainer's maps are
+        never touched from this thread.
+        
+        Returns:
+            (operations seeded, engine segment inode, drain position after them)
+        """
+        journal = OperationsJournal(directory)
+        count, segment_inode, position = journal.checkpoint()
+        for ops in journal.scan(end=count):
+            self.ingest(np.asarray(ops))
+        return count, segment_inode, position
+    
+    async def start(self, journal: Optional[OperationsJournal] = None):
+        """Seed from the journal and follow the operations feed (idempotent)"""
+        if self._task and not self._task.done():
+            return
+        if journal:
+            try:
+                seeded, segment_inode, position = await asyncio.to_thread(self.seed, journal.directory)
+                self._resume = (segment_inode, position)
+                logger.info(f"📊 Operations stats seeded with {seeded} journaled operations")
+            except Exception as e:
+                logger.error(f"❌ Operations stats seeding failed: {e}")
+        self._task = asyncio.create_task(self._run(self.hub.subscribe()))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def catch_up(self) -> int:
+        """Ingest every ring operation the stats cursor has not seen yet"""
+        bridge = self.hub.bridge
+        if not bridge.connected:
+            return 0
+        
+        cursor = self._cursor
+        if cursor is not None and self._cursor_inode != bridge.shm_inode:
+            cursor.position = 0  # new engine run, its operations start over
+        elif cursor is None:
+            if self._resume is None:
+                cursor = bridge.get_cursor(self.STATS_CONSUMER, from_latest=True)
+            else:
+                # Continue after the seed if the journal is of this engine run
+                segment_inode, position = self._resume
+                cursor = bridge.get_cursor(
+                    self.STATS_CONSUMER, position=position if segment_inode == bridge.shm_inode else 0
+                )
+            self._cursor = cursor
+        self._cursor_inode = bridge.shm_inode
+        
+        dropped_before = cursor.dropped
+        ops = bridge.read_new_operations(cursor, limit=bridge.OPERATION_RING_SIZE)
+        if cursor.dropped > dropped_before:
+            self.dropped += cursor.dropped - dropped_before
+            logger.warning(f"⚠️  Operations stats missed {cursor.dropped - dropped_before} operations (ring lapped)")
+        
+        self.ingest(ops)
+        return len(ops)
+    
+    async def _run(self, feed: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    self.catch_up()
+                except Exception as e:
+                    logger.error(f"❌ Operations stats update failed: {e}")
+                await feed.get()  # the hub has new operations
+        finally:
+            self.hub.unsubscribe(feed)
+
+
+# Process-wide aggregator instance
+_aggregator: Optional[OperationsAggregator] = None
+
+
+def get_operations_aggregator() -> OperationsAggregator:
+    """Get or create the process-wide operations aggregator"""
+    global _aggregator
+    if _aggregator is None:
+        _aggregator = OperationsAggregator()
+    return _aggregator
@@ -0,0 +1,551 @@
+"""
+DRAIZER V2.0 - Orderbook Bars
+Materialized 1s / 1m / 1h mid-price and spread bars per (exchange, symbol)
+and cross-exchange best bid / best ask spread bars per symbol
+"""
+
+import asyncio
+import json
+import logging
+import re
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.tick_archive import NS_PER_DAY, TickArchive, TickColumns
+
+logger = logging.getLogger(__name__)
+
+# Resolution name -> (seconds, retention seconds); None = keep everything
+RESOLUTIONS: Dict[str, Tuple[int, Optional[int]]] = {
+    '1s': (1, 7 * 86400),
+    '1m': (60, 365 * 86400),
+    '1h': (3600, None),
+}
+
+CROSS_KEY = '_cross'  # directory of the cross-exchange bars (not an exchange name)
+NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,31}$')  # exchange / symbol (used in paths)
+
+# Field -> how it combines within a bar: first / last / max / min / mean
+# (weighted by the count field) / count; start and the count field are implied
+BAR_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ('mid_open', 'first'),
+    ('mid_high', 'max'),
+    ('mid_low', 'min'),
+    ('mid_close', 'last'),
+    ('spread_bps_min', 'min'),
+    ('spread_bps_max', 'max'),
+    ('spread_bps_mean', 'mean'),
+    ('bid_qty', 'last'),
+    ('ask_qty', 'last'),
+)
+
+# Cross spread = (best bid - best ask) / mid across exchanges; > 0 = crossed books
+CROSS_BAR_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ('spread_bps_open', 'first'),
+    ('spread_bps_high', 'max'),
+    ('spread_bps_low', 'min'),
+    ('spread_bps_close', 'last'),
+    ('spread_bps_mean', 'mean'),
+    ('best_bid', 'last'),
+    ('best_ask', 'last'),
+)
+
+
+def _bar_dtype(fields: Sequence[Tuple[str, str]]) -> np.dtype:
+    return np.dtype([('start', '<i8'), ('count', '<i8')] + [(name, '<f8') for name, _ in fields])
+
+
+BAR_DTYPE = _bar_dtype(BAR_FIELDS)
+CROSS_BAR_DTYPE = _bar_dtype(CROSS_BAR_FIELDS)
+
+
+def bars_to_dicts(bars: np.ndarray) -> List[Dict]:
+    """JSON-ready bars (NaN quantities -> None)"""
+    return [
+        {name: (None if value != value else value) for name, value in zip(bars.dtype.names, row)}
+        for row in bars.tolist()
+    ]
+
+
+class BarSeries:
+    """
+    Bars of one key at one resolution
+    
+    Closed bars are appended to a file of BAR_DTYPE-like records (start =
+    bucket start in epoch seconds, count = ticks) and range-read through a
+    memory map; the newest bar stays open in memory until a tick of a
+    later bucket arrives. Ticks older than the open bar join it, ticks
+    older than the last closed bar are dropped, so the file stays sorted.
+    Expired bars are cut off the front in bulk.
+    
+    A partial bucket is never finalized: close() saves the open bar and
+    the timestamp of the last tick it holds to a .open sidecar, which is
+    reloaded so ticks of the same bucket keep merging after a restart;
+    ticks up to that timestamp are already in it and are skipped (archive
+    backfill). A sidecar whose bar was closed since (crash after a
+    restart) is stale and ignored.
+    """
+    
+    OPEN_HEADER = np.dtype([('through_ns', '<i8')])
+    
+    def __init__(self, path: Path, resolution: int, retention: Optional[int], fields: Sequence[Tuple[str, str]]):
+        self.path = path
+        self.open_path = path.with_suffix('.open')
+        self.resolution = resolution
+        self.retention = retention
+        self.fields = tuple(fields)
+        self.dtype = _bar_dtype(fields)
+        self.dropped = 0
+        
+        self._open: Optional[np.ndarray] = None  # one record
+        self._through_ns: Optional[int] = None  # newest tick aggregated (ns)
+        self._restored_ns = -1  # ticks up to here are in the reloaded open bar
+        self._floor = -1  # end of the last closed bar (s)
+        closed = self._closed()
+        if len(closed):
+            self._floor = int(closed['start'][-1]) + resolution
+        self._load_open()
+    
+    def _closed(self) -> np.ndarray:
+        if not self.path.exists() or self.path.stat().st_size < self.dtype.itemsize:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', shape=(self.path.stat().st_size // self.dtype.itemsize,))
+    
+    def _load_open(self):
+        if not self.open_path.exists():
+            return
+        data = self.open_path.read_bytes()
+        if len(data) != self.OPEN_HEADER.itemsize + self.dtype.itemsize:
+            logger.warning(f"⚠️  Ignoring corrupt open bar {self.open_path}")
+            return
+        bar = np.frombuffer(data, dtype=self.dtype, count=1, offset=self.OPEN_HEADER.itemsize).copy()
+        if int(bar['start'][0]) >= self._floor:
+            self._open = bar
+            self._through_ns = int(np.frombuffer(data, dtype=self.OPEN_HEADER, count=1)['through_ns'][0])
+            self._restored_ns = self._through_ns
+    
+    @property
+    def floor(self) -> int:
+        """Ticks before this second are no longer accepted"""
+        return self._floor
+    
+    @property
+    def through_ns(self) -> Optional[int]:
+        """Newest tick aggregated (ns), None if none yet"""
+        return self._through_ns
+    
+    @property
+    def resume_ns(self) -> int:
+        """Ticks from this timestamp (ns) on have not been aggregated yet"""
+        floor_ns = max(self._floor, 0) * 1_000_000_000
+        return floor_ns if self._through_ns is None else max(floor_ns, self._through_ns + 1)
+    
+    def ingest(self, timestamp_ns: np.ndarray, values: Dict[str, np.ndarray]):
+        """
+        Add ticks in time order
+        
+        Args:
+            timestamp_ns: Tick timestamps (ns)
+            values: Source column per field (count is the number of ticks)
+        """
+        seconds = timestamp_ns // 1_000_000_000
+        keep = seconds >= self._floor
+        self.dropped += int(len(seconds) - keep.sum())
+        keep &= timestamp_ns > self._restored_ns
+        if not keep.all():
+            seconds = seconds[keep]
+            timestamp_ns = timestamp_ns[keep]
+            values = {name: column[keep] for name, column in values.items()}
+        if len(seconds) == 0:
+            return
+        newest = int(timestamp_ns.max())
+        self._through_ns = newest if self._through_ns is None else max(self._through_ns, newest)
+        
+        buckets = seconds - seconds % self.resolution
+        if self._open is not None:
+            buckets = np.maximum(buckets, self._open['start'][0])
+        buckets = np.maximum.accumulate(buckets)
+        
+        first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        last = np.r_[first[1:] - 1, len(buckets) - 1]
+        bars = np.zeros(len(first), dtype=self.dtype)
+        bars['start'] = buckets[first]
+        bars['count'] = np.diff(np.r_[first, len(buckets)])
+        for name, how in self.fields:
+            column = values[name]
+            if how == 'first':
+                bars[name] = column[first]
+            elif how == 'last':
+                bars[name] = column[last]
+            elif how == 'max':
+                bars[name] = np.maximum.reduceat(column, first)
+            elif how == 'min':
+                bars[name] = np.minimum.reduceat(column, first)
+            else:
+                bars[name] = np.add.reduceat(column, first) / bars['count']
+        
+        if self._open is not None:
+            if bars['start'][0] == self._open['start'][0]:
+                bars[:1] = self._merge(self._open, bars[:1])
+            else:
+                bars = np.concatenate([self._open, bars])
+        self._open = bars[-1:].copy()
+        if len(bars) > 1:
+            self._append(bars[:-1])
+    
+    def _merge(self, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        merged = new.copy()
+        count = old['count'] + new['count']
+        merged['count'] = count
+        for name, how in self.fields:
+            if how == 'first':
+                merged[name] = old[name]
+            elif how == 'max':
+                merged[name] = np.fmax(old[name], new[name])
+            elif how == 'min':
+                merged[name] = np.fmin(old[name], new[name])
+            elif how == 'mean':
+                merged[name] = (old[name] * old['count'] + new[name] * new['count']) / count
+        return merged
+    
+    def _append(self, bars: np.ndarray):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(bars.tobytes())
+        self._floor = int(bars['start'][-1]) + self.resolution
+        self._expire()
+    
+    def _expire(self):
+        if self.retention is None:
+            return
+        closed = self._closed()
+        cut = int(np.searchsorted(closed['start'], closed['start'][-1] - self.retention, side='left'))
+        if cut > len(closed) // 2:  # rewrite in bulk, not on every bar
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_bytes(np.asarray(closed[cut:]).tobytes())
+            tmp.replace(self.path)
+    
+    def close(self):
+        """Save the open bar to the sidecar (shutdown), it stays open"""
+        if self._open is None:
+            return
+        header = np.array([(self._through_ns,)], dtype=self.OPEN_HEADER)
+        self.open_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.open_path.with_suffix('.open.tmp')
+        tmp.write_bytes(header.tobytes() + self._open.tobytes())
+        tmp.replace(self.open_path)
+    
+    def range(self, since: Optional[int] = None, until: Optional[int] = None) -> np.ndarray:
+        """Bars overlapping [since, until] seconds, the open one included"""
+        closed = self._closed()
+        starts = closed['start']
+        lo = 0 if since is None else int(np.searchsorted(starts, since - self.resolution + 1, side='left'))
+        hi = len(closed) if until is None else int(np.searchsorted(starts, until, side='right'))
+        bars = np.array(closed[lo:hi])
+        if self._open is not None:
+            start = int(self._open['start'][0])
+            if (since is None or start + self.resolution > since) and (until is None or start <= until):
+                bars = np.concatenate([bars, self._open])
+        return bars
+
+
+def best_quotes(
+    exchange_index: np.ndarray,
+    bid: np.ndarray,
+    ask: np.ndarray,
+    last_bid: np.ndarray,
+    last_ask: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Best bid / best ask across exchanges after every tick (vectorized)
+    
+    Args:
+        exchange_index: Exchange of each tick (ticks in time order)
+        bid, ask: Quotes of each tick
+        last_bid, last_ask: Quote per exchange before the first tick (NaN = none yet)
+    
+    Returns:
+        (best_bid, best_ask, quoted exchanges) after each tick
+    """
+    n = len(exchange_index)
+    rows = np.arange(n + 1)
+    best = []
+    for side, last in ((bid, last_bid), (ask, last_ask)):
+        quotes = np.full((n + 1, len(last)), np.nan)
+        quotes[0] = last
+        quotes[rows[1:], exchange_index] = side
+        # Forward-fill every exchange's last quote down the ticks
+        filled = np.where(np.isnan(quotes), 0, rows[:, None])
+        quotes = quotes[np.maximum.accumulate(filled, axis=0), np.arange(len(last))]
+        best.append(quotes[1:])
+    bids, asks = best
+    return np.fmax.reduce(bids, axis=1), np.fmin.reduce(asks, axis=1), (~np.isnan(bids)).sum(axis=1)
+
+
+class OrderbookBars:
+    """
+    Bars of recorded ticks at every resolution in RESOLUTIONS
+    
+    Layout on disk:
+    - {resolution}/{exchange}/{symbol}.bars  BAR_DTYPE records, oldest first
+    - {resolution}/_cross/{symbol}.bars  CROSS_BAR_DTYPE records
+    
+    Fed incrementally by OrderbookRecorder with the rows it records
+    (ingest_rows), so charts and coarse backtests read ready-made bars
+    instead of rescanning ticks. At start-up, ticks archived after the
+    last written bars (downtime, or everything on the first run) are
+    aggregated from the tick archive first (backfill).
+    
+    A cross-exchange bar samples best bid / best ask across the exchanges
+    of a symbol after every tick, once at least two exchanges have quoted.
+    The last quote per exchange is saved next to the cross bars on close()
+    ({symbol}.quotes) and restored with them, so sampling resumes exactly.
+    """
+    
+    def __init__(self, directory: str = settings.ORDERBOOK_BARS_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ingested = 0
+        
+        self._series: Dict[Tuple[str, str], Dict[str, BarSeries]] = {}
+        self._exchanges: Dict[str, List[str]] = {}  # symbol -> exchanges seen (cross column order)
+        self._last_bid: Dict[str, np.ndarray] = {}
+        self._last_ask: Dict[str, np.ndarray] = {}
+    
+    # ==================== SERIES ====================
+    
+    def series(self, exchange: str, symbol: str, create: bool = True) -> Dict[str, BarSeries]:
+        """Resolution -> BarSeries of a pair (exchange CROSS_KEY = cross bars)"""
+        key = (exchange, symbol)
+        series = self._series.get(key)
+        if series is None:
+            if (exchange != CROSS_KEY and not NAME.match(exchange)) or not NAME.match(symbol):
+                raise ValueError(f"Invalid exchange/symbol: {exchange}/{symbol}")
+            fields = CROSS_BAR_FIELDS if exchange == CROSS_KEY else BAR_FIELDS
+            series = {
+                name: BarSeries(self.directory / name / exchange / f"{symbol}.bars", seconds, retention, fields)
+                for name, (seconds, retention) in RESOLUTIONS.items()
+            }
+            if create:
+                self._series[key] = series
+        return series
+    
+    def _quotes_path(self, symbol: str) -> Path:
+        return self.directory / CROSS_KEY / f"{symbol}.quotes"
+    
+    def _restore_quotes(self, symbol: str):
+        """Last quotes per exchange saved by close(), if the cross bars resume right after them"""
+        try:
+            state = json.loads(self._quotes_path(symbol).read_text())
+        except (OSError, ValueError):
+            return
+        resume_ns = min(series.resume_ns for series in self.series(CROSS_KEY, symbol).values())
+        if resume_ns != state['through_ns'] + 1:
+            return  # bars moved on since (crash after a restart): quotes are stale
+        self._exchanges[symbol] = list(state['exchanges'])
+        self._last_bid[symbol] = np.array(state['bid'], dtype=np.float64)
+        self._last_ask[symbol] = np.array(state['ask'], dtype=np.float64)
+    
+    def _save_quotes(self, symbol: str):
+        through = [series.through_ns for series in self.series(CROSS_KEY, symbol).values()]
+        if None in through:
+            return
+        state = {
+            'through_ns': max(through),
+            'exchanges': self._exchanges[symbol],
+            'bid': [None if value != value else value for value in self._last_bid[symbol].tolist()],
+            'ask': [None if value != value else value for value in self._last_ask[symbol].tolist()],
+        }
+        path = self._quotes_path(symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.quotes.tmp')
+        tmp.write_text(json.dumps(state))
+        tmp.replace(path)
+    
+    def _exchange_index(self, symbol: str, exchange: str) -> int:
+        if symbol not in self._exchanges:
+            self._restore_quotes(symbol)
+        exchanges = self._exchanges.setdefault(symbol, [])
+        if exchange not in exchanges:
+            exchanges.append(exchange)
+            self._last_bid[symbol] = np.r_[self._last_bid.get(symbol, np.empty(0)), np.nan]
+            self._last_ask[symbol] = np.r_[self._last_ask.get(symbol, np.empty(0)), np.nan]
+        return exchanges.index(exchange)
+    
+    # ==================== WRITE ====================
+    
+    def ingest_ticks(self, exchange: str, symbol: str, ticks: TickColumns):
+        """Add ticks of one pair in time order"""
+        if len(ticks) == 0:
+            return
+        bid = np.asarray(ticks.bid, dtype=np.float64)
+        ask = np.asarray(ticks.ask, dtype=np.float64)
+        mid = (bid + ask) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_bps = (ask - bid) / mid * 10000
+        values = {
+            'mid_open': mid, 'mid_high': mid, 'mid_low': mid, 'mid_close': mid,
+            'spread_bps_min': spread_bps, 'spread_bps_max': spread_bps, 'spread_bps_mean': spread_bps,
+            'bid_qty': np.asarray(ticks.bid_qty, dtype=np.float64),
+            'ask_qty': np.asarray(ticks.ask_qty, dtype=np.float64),
+        }
+        timestamp_ns = np.asarray(ticks.timestamp_ns, dtype=np.int64)
+        for series in self.series(exchange, symbol).values():
+            series.ingest(timestamp_ns, values)
+        self.ingested += len(ticks)
+    
+    def ingest_cross(self, symbol: str, exchanges: Sequence[str], ticks: Sequence[TickColumns]):
+        """Add ticks of several exchanges of one symbol to its cross-exchange bars"""
+        index = np.concatenate([
+            np.full(len(part), self._exchange_index(symbol, exchange)) for exchange, part in zip(exchanges, ticks)
+        ])
+        merged = TickColumns.concatenate(list(ticks))
+        if len(merged) == 0:
+            return
+        order = np.argsort(merged.timestamp_ns, kind='stable')
+        index = index[order]
+        bid = np.asarray(merged.bid, dtype=np.float64)[order]
+        ask = np.asarray(merged.ask, dtype=np.float64)[order]
+        
+        best_bid, best_ask, quoted = best_quotes(index, bid, ask, self._last_bid[symbol], self._last_ask[symbol])
+        present, from_end = np.unique(index[::-1], return_index=True)
+        self._last_bid[symbol][present] = bid[len(index) - 1 - from_end]
+        self._last_ask[symbol][present] = ask[len(index) - 1 - from_end]
+        
+        sampled = quoted >= 2
+        if not sampled.any():
+            return
+        best_bid, best_ask = best_bid[sampled], best_ask[sampled]
+        spread_bps = (best_bid - best_ask) / ((best_bid + best_ask) / 2) * 10000
+        values = {
+            'spread_bps_open': spread_bps, 'spread_bps_high': spread_bps, 'spread_bps_low': spread_bps,
+            'spread_bps_close': spread_bps, 'spread_bps_mean': spread_bps,
+            'best_bid': best_bid, 'best_ask': best_ask,
+        }
+        timestamp_ns = np.asarray(merged.timestamp_ns, dtype=np.int64)[order][sampled]
+        for series in self.series(CROSS_KEY, symbol).values():
+            series.ingest(timestamp_ns, values)
+    
+    def ingest_rows(self, rows: Sequence[Tuple]):
+        """Add recorded snapshot rows (SnapshotRow)"""
+        by_pair: Dict[Tuple[str, str], List[Tuple]] = {}
+        for row in rows:
+            by_pair.setdefault((row[0], row[1]), []).append(row)
+        
+        by_symbol: Dict[str, Tuple[List[str], List[TickColumns]]] = {}
+        for (exchange, symbol), pair_rows in by_pair.items():
+            exchange_, symbol_, bid, ask, bid_qty, ask_qty, _, timestamp_ns = zip(*pair_rows)
+            ticks = TickColumns(
+                np.array(timestamp_ns, dtype=np.int64),
+                np.array(bid, dtype=np.float64),
+                np.array(ask, dtype=np.float64),
+                np.array(bid_qty, dtype=np.float64),
+                np.array(ask_qty, dtype=np.float64),
+            )
+            order = np.argsort(ticks.timestamp_ns, kind='stable')
+            ticks = TickColumns(*(column[order] for column in (
+                ticks.timestamp_ns, ticks.bid, ticks.ask, ticks.bid_qty, ticks.ask_qty
+            )))
+            self.ingest_ticks(exchange, symbol, ticks)
+            exchanges, parts = by_symbol.setdefault(symbol, ([], []))
+            exchanges.append(exchange)
+            parts.append(ticks)
+        
+        for symbol, (exchanges, parts) in by_symbol.items():
+            self.ingest_cross(symbol, exchanges, parts)
+    
+    def backfill(self, archive: TickArchive) -> int:
+        """Aggregate archived ticks newer than the bars already written"""
+        ingested = self.ingested
+        by_symbol: Dict[str, List[str]] = {}
+        for exchange, symbol in archive.pairs():
+            by_symbol.setdefault(symbol, []).append(exchange)
+        
+        for symbol, exchanges in by_symbol.items():
+            since_ns = min(
+                series.resume_ns
+                for key in exchanges + [CROSS_KEY]
+                for series in self.series(key, symbol).values()
+            )
+            # A day at a time across exchanges, so cross bars see them interleaved
+            days = sorted({day for exchange in exchanges for day in archive.days(exchange, symbol)})
+            for day in days:
+                day_start = (day - date(1970, 1, 1)).days * NS_PER_DAY
+                if day_start + NS_PER_DAY <= since_ns:
+                    continue
+                parts = [
+                    archive.read(exchange, symbol, max(since_ns, day_start), day_start + NS_PER_DAY - 1)
+                    for exchange in exchanges
+                ]
+                for exchange, ticks in zip(exchanges, parts):
+                    self.ingest_ticks(exchange, symbol, ticks)
+                self.ingest_cross(symbol, exchanges, parts)
+        return self.ingested - ingested
+    
+    def close(self):
+        """Save every open bar and the cross-exchange quotes (shutdown)"""
+        for series in self._series.values():
+            for bars in series.values():
+                bars.close()
+        for symbol in self._exchanges:
+            self._save_quotes(symbol)
+    
+    # ==================== READ ====================
+    
+    def bars(
+        self,
+        exchange: str,
+        symbol: str,
+        resolution: str = '1m',
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> np.ndarray:
+        """BAR_DTYPE bars of a pair in [since, until] (epoch seconds)"""
+        return self.series(exchange, symbol, create=False)[resolution].range(since, until)
+    
+    def cross_bars(
+        self,
+        symbol: str,
+        resolution: str = '1m',
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> np.ndarray:
+        """CROSS_BAR_DTYPE bars of a symbol in [since, until] (epoch seconds)"""
+        return self.series(CROSS_KEY, symbol, create=False)[resolution].range(since, until)
+    
+    def stats(self) -> Dict:
+        return {
+            'ingested': self.ingested,
+            'series': len(self._series),
+            'dropped_late': sum(bars.dropped for series in self._series.values() for bars in series.values()),
+        }
+    
+    # ==================== BACKGROUND ====================
+    
+    async def start(self, archive: Optional[TickArchive] = None):
+        """Backfill from the archive (in a worker thread) before live rows arrive"""
+        if archive:
+            try:
+                backfilled = await asyncio.to_thread(self.backfill, archive)
+                logger.info(f"📊 Orderbook bars backfilled with {backfilled} archived ticks")
+            except Exception as e:
+                logger.error(f"❌ Orderbook bars backfill failed: {e}")
+
+
+# Process-wide bars
+_bars: Optional[OrderbookBars] = None
+
+
+def get_orderbook_bars() -> Optional[OrderbookBars]:
+    """Get or open the orderbook bars (None if disabled or unavailable)"""
+    global _bars
+    if _bars is None and settings.ORDERBOOK_BARS_DIR:
+        try:
+            _bars = OrderbookBars()
+        except OSError as e:
+            logger.error(f"❌ Orderbook bars unavailable: {e}")
+    return _bars
@@ -0,0 +1,186 @@
+"""
+DRAIZER V2.0 - Orderbook Partitions
+Daily partitions of orderbook_snapshots: created ahead, rolled up per
+minute and dropped under the retention policy
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "orderbook_snapshots"
+ROLLUP_TABLE = "orderbook_rollups_1m"
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{8}})$")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT_TABLE}_p{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return datetime.strptime(match.group(1), "%Y%m%d").date() if match else None
+
+
+def create_partition_sql(day: date) -> str:
+    """DDL of one day's partition (timestamp is naive UTC)"""
+    return (
+        f'CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {PARENT_TABLE} '
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+
+
+def rollup_sql(source: str) -> str:
+    """Upsert per-minute bid/ask/spread summaries of every row in source"""
+    return f"""
+        INSERT INTO {ROLLUP_TABLE} (
+            minute, exchange, symbol, samples,
+            bid_open, bid_high, bid_low, bid_close,
+            ask_open, ask_high, ask_low, ask_close,
+            spread_bps_avg, spread_bps_min, spread_bps_max
+        )
+        SELECT
+            minute, exchange, symbol, count(*),
+            (array_agg(bid ORDER BY "timestamp"))[1], max(bid), min(bid), (array_agg(bid ORDER BY "timestamp" DESC))[1],
+            (array_agg(ask ORDER BY "timestamp"))[1], max(ask), min(ask), (array_agg(ask ORDER BY "timestamp" DESC))[1],
+            avg(spread_bps), min(spread_bps), max(spread_bps)
+        FROM (
+            SELECT
+                date_trunc('minute', "timestamp") AS minute, exchange, symbol, "timestamp", bid, ask,
+                (ask - bid) * 10000 / NULLIF((ask + bid) / 2, 0) AS spread_bps
+            FROM {source}
+        ) AS quotes
+        GROUP BY minute, exchange, symbol
+        ON CONFLICT (minute, exchange, symbol) DO UPDATE SET
+            samples = EXCLUDED.samples,
+            bid_open = EXCLUDED.bid_open, bid_high = EXCLUDED.bid_high,
+            bid_low = EXCLUDED.bid_low, bid_close = EXCLUDED.bid_close,
+            ask_open = EXCLUDED.ask_open, ask_high = EXCLUDED.ask_high,
+            ask_low = EXCLUDED.ask_low, ask_close = EXCLUDED.ask_close,
+            spread_bps_avg = EXCLUDED.spread_bps_avg,
+            spread_bps_min = EXCLUDED.spread_bps_min,
+            spread_bps_max = EXCLUDED.spread_bps_max
+    """
+
+
+class OrderbookPartitionManager:
+    """
+    Keeps orderbook_snapshots partitioned by day
+    
+    maintain() creates the partitions for today and the next days_ahead
+    days (an insert into a day without a partition fails), and for every
+    partition older than retention_days rolls it up into
+    orderbook_rollups_1m and drops it in the same transaction: retention
+    is one DROP TABLE per day instead of row-by-row deletes. Runs at
+    start-up and every interval seconds in the recording worker.
+    """
+    
+    def __init__(
+        self,
+        session_factory=None,
+        days_ahead: int = settings.ORDERBOOK_PARTITIONS_AHEAD_DAYS,
+        retention_days: int = settings.ORDERBOOK_RETENTION_DAYS,
+        interval: float = settings.ORDERBOOK_PARTITION_MAINTENANCE_SECONDS
+    ):
+        if session_factory is None:
+            from app.db.session import AsyncSessionLocal as session_factory
+        self.session_factory = session_factory
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    async def partitions(self) -> List[date]:
+        """Days that have a partition, oldest first"""
+        async with self.session_factory() as session:
+            result = await session.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :parent"
+            ), {'parent': PARENT_TABLE})
+            days = [partition_day(name) for name in result.scalars()]
+        return sorted(day for day in days if day)
+    
+    async def ensure_partitions(self, today: Optional[date] = None) -> List[date]:
+        """Create missing partitions for today .. today + days_ahead"""
+        today = today or datetime.utcnow().date()
+        existing = set(await self.partitions())
+        missing = [today + timedelta(days=i) for i in range(self.days_ahead + 1)]
+        missing = [day for day in missing if day not in existing]
+        if missing:
+            async with self.session_factory() as session:
+                for day in missing:
+                    await session.execute(text(create_partition_sql(day)))
+                await session.commit()
+            logger.info(f"🗂️  Created orderbook partitions: {', '.join(map(str, missing))}")
+        return missing
+    
+    async def rollup(self, day: date):
+        """(Re)compute the per-minute rollups of one day's partition"""
+        async with self.session_factory() as session:
+            await session.execute(text(rollup_sql(partition_name(day))))
+            await session.commit()
+    
+    async def drop_expired(self, today: Optional[date] = None) -> List[date]:
+        """Roll up and drop the partitions older than retention_days"""
+        today = today or datetime.utcnow().date()
+        horizon = today - timedelta(days=self.retention_days)
+        expired = [day for day in await self.partitions() if day < horizon]
+        for day in expired:
+            async with self.session_factory() as session:
+                await session.execute(text(rollup_sql(partition_name(day))))
+                await session.execute(text(f"DROP TABLE {partition_name(day)}"))
+                await session.commit()
+            logger.info(f"🗑️  Orderbook partition {day} rolled up and dropped")
+        return expired
+    
+    async def maintain(self):
+        await self.ensure_partitions()
+        if self.retention_days > 0:
+            await self.drop_expired()
+    
+    # ==================== BACKGROUND ====================
+    
+    async def start(self):
+        """Run maintain() now and every interval seconds (idempotent)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"❌ Orderbook partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Process-wide partition manager
+_manager: Optional[OrderbookPartitionManager] = None
+
+
+def get_orderbook_partitions() -> OrderbookPartitionManager:
+    """Get or create the process-wide orderbook partition manager"""
+    global _manager
+    if _manager is None:
+        _manager = OrderbookPartitionManager()
+    return _manager
@@ -1,50 +1,215 @@
 """
 Orderbook Recorder Service - записывает snapshots для backtracking
-Получает данные из shared memory C-engine и сохраняет в БД
+Получает данные из shared memory C-engine (через EngineHub) и пишет в БД
+пачками через OrderbookWriter
 """
 
 import asyncio
 import time
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Union
+from sqlalchemy import select
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
+import numpy as np
 from app.models.orderbook_snapshot import OrderbookSnapshot
+from app.services.engine_hub import EngineHub, get_engine_hub
+from app.services.engine_prices import PriceBook
+from app.services.depth_archive import DEPTH_SOURCES, DepthArchive, get_depth_archive
+from app.services.orderbook_bars import OrderbookBars, get_orderbook_bars
+from app.services.orderbook_writer import OrderbookWriter, SnapshotRow, get_orderbook_writer, snapshot_row
+from app.services.tick_archive import TickArchive, get_tick_archive
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Строка stream_snapshots(as_numpy=True); пустые quantity -> NaN
+SNAPSHOT_BATCH_DTYPE = np.dtype([
+    ('timestamp_ns', '<i8'),
+    ('exchange', 'U20'),
+    ('symbol', 'U20'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('bid_qty', '<f8'),
+    ('ask_qty', '<f8'),
+])
+
+_SNAPSHOT_STREAM_COLUMNS = (
+    OrderbookSnapshot.timestamp_ns,
+    OrderbookSnapshot.exchange,
+    OrderbookSnapshot.symbol,
+    OrderbookSnapshot.bid,
+    OrderbookSnapshot.ask,
+    OrderbookSnapshot.bid_quantity,
+    OrderbookSnapshot.ask_quantity,
+)
+
 
 class OrderbookRecorder:
     """
     Записывает orderbook snapshots в БД для последующего backtracking
+    
+    Режимы (ORDERBOOK_RECORD_MODE):
+    - change: раз в conflation window берёт top-of-book из последнего
+      snapshot хаба (= последняя котировка по (exchange, symbol) за окно)
+      и пишет её, только если bid или ask сдвинулся от последней
+      записанной больше порога (bps и/или тиков) или истёк heartbeat.
+      Стоящий рынок не пишется, движения между секундами не теряются.
+    - interval: каждые ORDERBOOK_RECORD_INTERVAL_MS пишет все котировки,
+      обновившиеся с прошлого прохода.
+    
+    Запись в БД - пачками в фоне (см. OrderbookWriter); если writer не
+    успевает, recorder ждёт не дольше put_timeout, дальше snapshots
+    отбрасываются и считаются в writer.dropped. Те же строки пишутся в
+    tick archive (колоночные файлы для BacktestEngine), раз в
+    ORDERBOOK_ARCHIVE_FLUSH_SECONDS; прошедшие дни archive сжимаются
+    (compact_sealed) в фоновом потоке при старте и после смены суток UTC,
+    flush на это время откладывается. Записанные строки сразу же
+    агрегируются в 1s/1m/1h bars (OrderbookBars), при старте bars
+    догоняют archive.
+    
+    Глубина: shared memory C-engine содержит только лучшие bid/ask, поэтому
+    top-N уровней (ORDERBOOK_DEPTH_LEVELS) символов ORDERBOOK_DEPTH_SYMBOLS
+    снимаются отдельной задачей раз в ORDERBOOK_DEPTH_INTERVAL_MS с бирж,
+    у которых есть источник (DEPTH_SOURCES), и пишутся в DepthArchive
+    (полная книга + дельты уровней).
     """
     
-    def __init__(self, db: Session):
+    MODES = ('change', 'interval')
+    
+    def __init__(
+        self,
+        db: Optional[Session] = None,
+        writer: Optional[OrderbookWriter] = None,
+        hub: Optional[EngineHub] = None,
+        mode: str = settings.ORDERBOOK_RECORD_MODE,
+        archive: Optional[TickArchive] = None,
+        bars: Optional[OrderbookBars] = None,
+        depth: Optional[DepthArchive] = None
+    ):
         self.db = db
+        self.writer = writer or get_orderbook_writer()
+        self.hub = hub or get_engine_hub()
+        self.archive = archive or get_tick_archive()
+        self.bars = bars or get_orderbook_bars()
+        self.depth = depth or get_depth_archive()
+        self.depth_symbols = settings.ORDERBOOK_DEPTH_SYMBOLS
+        self.depth_interval_seconds = settings.ORDERBOOK_DEPTH_INTERVAL_MS / 1000
+        self.depth_errors = 0
+        self.archive_flush_seconds = settings.ORDERBOOK_ARCHIVE_FLUSH_SECONDS
         self.is_running = False
-        self.record_interval_seconds = 1  # Записывать каждую секунду
+        self.mode = mode
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown orderbook record mode: {mode}")
+        self.record_interval_seconds = (
+            settings.ORDERBOOK_CONFLATION_WINDOW_MS if mode == 'change' else settings.ORDERBOOK_RECORD_INTERVAL_MS
+        ) / 1000
+        self.threshold_bps = settings.ORDERBOOK_CHANGE_THRESHOLD_BPS
+        self.threshold_ticks = settings.ORDERBOOK_CHANGE_THRESHOLD_TICKS
+        self.tick_sizes = settings.ORDERBOOK_TICK_SIZES
+        self.heartbeat_ns = int(settings.ORDERBOOK_HEARTBEAT_SECONDS * 1_000_000_000)
+        self.put_timeout = settings.ORDERBOOK_WRITER_PUT_TIMEOUT_SECONDS
+        self.recorded = 0
+        self.updates_seen = 0  # новые котировки (change: записанные + ниже порога)
+        self.heartbeats = 0
         
-    async def start_recording(self, symbols: List[str], exchanges: List[str]):
+        # Последняя записанная котировка по слоту price cache
+        self._index: Optional[Dict] = None  # index книги, к которой относятся слоты
+        self._seen_ns = np.zeros(0, dtype=np.int64)  # timestamp последней просмотренной котировки (в т.ч. ниже порога)
+        self._last_ns = np.zeros(0, dtype=np.int64)
+        self._last_bid = np.zeros(0)
+        self._last_ask = np.zeros(0)
+        self._last_recorded_ns = np.zeros(0, dtype=np.int64)  # когда записана (для heartbeat)
+        self._task: Optional[asyncio.Task] = None
+        self._archive_flush_at = 0.0
+        self._archive_day = None  # день UTC, до которого archive уже сжат
+        self._compaction: Optional[asyncio.Task] = None
+        self._depth_task: Optional[asyncio.Task] = None
+    
+    def stats(self) -> Dict:
+        return {
+            'running': self.is_running,
+            'mode': self.mode,
+            'interval_ms': self.record_interval_seconds * 1000,
+            'updates_seen': self.updates_seen,
+            'recorded': self.recorded,
+            'heartbeats': self.heartbeats,
+            'writer': self.writer.stats(),
+            'archive': {
+                'written': self.archive.written,
+                'out_of_order': self.archive.out_of_order,
+                'compacted_days': self.archive.compacted_days,
+            } if self.archive else None,
+            'bars': self.bars.stats() if self.bars else None,
+            'depth': {
+                'symbols': self.depth_symbols,
+                'levels': self.depth.depth,
+                'keyframes': self.depth.keyframes,
+                'deltas': self.depth.deltas,
+                'bytes_written': self.depth.bytes_written,
+                'errors': self.depth_errors,
+            } if self.depth else None,
+        }
+    
+    async def start(self, symbols: Optional[List[str]] = None, exchanges: Optional[List[str]] = None):
+        """
+        Запустить writer и запись в фоне (идемпотентно)
+        """
+        await self.writer.start()
+        if self._task and not self._task.done():
+            return
+        if self.bars:
+            await self.bars.start(self.archive)
+        self._task = asyncio.create_task(self.start_recording(symbols, exchanges))
+        if self.depth and self.depth_symbols:
+            self._depth_task = asyncio.create_task(self._capture_depth())
+    
+    async def stop(self):
         """
-        Начать запись orderbook snapshots
+        Остановить запись и дописать буфер writer'а в БД
+        """
+        self.stop_recording()
+        for task in (self._task, self._depth_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._depth_task = None
+        if self._compaction:
+            await self._compaction
+            self._compaction = None
+        if self.archive:
+            self.archive.flush()
+        if self.bars:
+            self.bars.close()
+        await self.writer.stop()
+    
+    async def start_recording(self, symbols: Optional[List[str]] = None, exchanges: Optional[List[str]] = None):
+        """
+        Начать запись orderbook snapshots (None = все символы / биржи из price cache)
         """
         self.is_running = True
-        logger.info(f"📊 Starting orderbook recording for {symbols} on {exchanges}")
+        logger.info(
+            f"📊 Starting orderbook recording ({self.mode}) for {symbols or 'all symbols'} on {exchanges or 'all exchanges'}"
+        )
         
         while self.is_running:
             try:
-                # Get current prices from C-engine shared memory
-                # TODO: Implement shared memory reading
-                # For now, this is a placeholder
-                
-                # In real implementation, we would:
-                # 1. Read from shared memory (price_cache)
-                # 2. Save to DB
-                # 3. Sleep for interval
+                book = self.hub.snapshot().prices
+                rows = self.collect(book, symbols, exchanges) if book is not None else []
+                if rows:
+                    self._archive_rows(rows)
+                    self.recorded += await self.writer.put(rows, self.put_timeout)
+                if self.archive:
+                    self._maintain_archive()
                 
                 await asyncio.sleep(self.record_interval_seconds)
-                
+            
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"❌ Error recording orderbook: {e}")
                 await asyncio.sleep(5)
@@ -56,6 +221,125 @@ class OrderbookRecorder:
         self.is_running = False
         logger.info("⏸️  Orderbook recording stopped")
     
+    def _track_slots(self, book: PriceBook):
+        if book.index is not self._index:
+            # Новый запуск движка: слоты пересобраны
+            self._index = book.index
+            self._seen_ns = np.zeros(0, dtype=np.int64)
+            self._last_ns = np.zeros(0, dtype=np.int64)
+            self._last_bid = np.zeros(0)
+            self._last_ask = np.zeros(0)
+            self._last_recorded_ns = np.zeros(0, dtype=np.int64)
+        
+        extra = len(book) - len(self._last_ns)
+        if extra > 0:
+            self._seen_ns = np.concatenate([self._seen_ns, np.zeros(extra, dtype=np.int64)])
+            self._last_ns = np.concatenate([self._last_ns, np.zeros(extra, dtype=np.int64)])
+            self._last_bid = np.concatenate([self._last_bid, np.zeros(extra)])
+            self._last_ask = np.concatenate([self._last_ask, np.zeros(extra)])
+            self._last_recorded_ns = np.concatenate([self._last_recorded_ns, np.zeros(extra, dtype=np.int64)])
+    
+    def _moved(self, book: PriceBook, slots: np.ndarray) -> np.ndarray:
+        """Сдвинулся ли bid/ask слотов от последней записанной котировки больше порога"""
+        bid, ask = book.bid[slots], book.ask[slots]
+        move = np.maximum(np.abs(bid - self._last_bid[slots]), np.abs(ask - self._last_ask[slots]))
+        first = self._last_ns[slots] == 0
+        
+        moved = move * 10_000 >= self.threshold_bps * (bid + ask) / 2 if self.threshold_bps > 0 else move > 0
+        if self.threshold_ticks > 0 and self.tick_sizes:
+            ticks = np.array([self.tick_sizes.get(symbol, 0.0) for symbol in book.symbols[slots].tolist()])
+            by_ticks = (ticks > 0) & (move >= self.threshold_ticks * ticks - 1e-12)
+            # Для символов с известным тиком решает порог в тиках
+            moved = np.where(ticks > 0, by_ticks, moved)
+        return first | moved
+    
+    def collect(
+        self,
+        book: PriceBook,
+        symbols: Optional[List[str]] = None,
+        exchanges: Optional[List[str]] = None,
+        now_ns: Optional[int] = None
+    ) -> List[SnapshotRow]:
+        """
+        Строки для записи: котировки, обновившиеся с прошлой записи
+        (в режиме change - только сдвинувшиеся больше порога или по heartbeat)
+        """
+        self._track_slots(book)
+        
+        mask = book.priced() & (book.timestamp_ns > self._seen_ns[:len(book)])
+        if symbols:
+            mask &= np.isin(book.symbols, symbols)
+        if exchanges:
+            mask &= np.isin(book.exchanges, exchanges)
+        
+        slots = np.flatnonzero(mask)
+        self.updates_seen += len(slots)
+        # Котировка ниже порога не пересматривается на следующих проходах
+        self._seen_ns[slots] = book.timestamp_ns[slots]
+        if self.mode == 'change' and len(slots):
+            now_ns = now_ns or time.time_ns()
+            moved = self._moved(book, slots)
+            heartbeat = ~moved & (now_ns - self._last_recorded_ns[slots] >= self.heartbeat_ns)
+            self.heartbeats += int(heartbeat.sum())
+            slots = slots[moved | heartbeat]
+        if len(slots) == 0:
+            return []
+        
+        timestamps = book.timestamp_ns[slots]
+        self._last_ns[slots] = timestamps
+        self._last_bid[slots] = book.bid[slots]
+        self._last_ask[slots] = book.ask[slots]
+        self._last_recorded_ns[slots] = now_ns or time.time_ns()
+        
+        return [
+            snapshot_row(exchange, symbol, bid, ask, None, None, ts)
+            for exchange, symbol, bid, ask, ts in zip(
+                book.exchanges[slots].tolist(), book.symbols[slots].tolist(),
+                book.bid[slots].tolist(), book.ask[slots].tolist(), timestamps.tolist()
+            )
+        ]
+    
+    async def _capture_depth(self):
+        """Снимать top-N уровней книги с бирж, у которых есть источник глубины"""
+        logger.info(f"📚 Capturing {self.depth.depth}-level depth for {self.depth_symbols} on {list(DEPTH_SOURCES)}")
+        while True:
+            started = time.monotonic()
+            for exchange, fetch in DEPTH_SOURCES.items():
+                for symbol in self.depth_symbols:
+                    try:
+                        book = await asyncio.to_thread(fetch, symbol, self.depth.depth)
+                        if book:
+                            self.depth.record(exchange, symbol, time.time_ns(), *book)
+                    except Exception as e:
+                        self.depth_errors += 1
+                        logger.error(f"❌ Depth capture {exchange}/{symbol} failed: {e}")
+            await asyncio.sleep(max(self.depth_interval_seconds - (time.monotonic() - started), 0))
+    
+    def _maintain_archive(self):
+        """Периодический flush archive и сжатие прошедших дней"""
+        if self._compaction and not self._compaction.done():
+            return  # compact_sealed удаляет колонки, в которые дописал бы flush
+        if time.monotonic() >= self._archive_flush_at:
+            self.archive.flush()
+            self._archive_flush_at = time.monotonic() + self.archive_flush_seconds
+        
+        today = datetime.utcnow().date()
+        if self.archive.compress and self._archive_day != today:
+            self.archive.flush()
+            self._archive_day = today
+            self._compaction = asyncio.create_task(asyncio.to_thread(self.archive.compact_sealed, today))
+    
+    def _archive_rows(self, rows: List[SnapshotRow]):
+        """Поставить строки в tick archive (пишется при flush) и в bars"""
+        if self.archive:
+            for exchange, symbol, bid, ask, bid_qty, ask_qty, _, timestamp_ns in rows:
+                self.archive.add(exchange, symbol, timestamp_ns, bid, ask, bid_qty, ask_qty)
+        if self.bars:
+            try:
+                self.bars.ingest_rows(rows)
+            except Exception as e:
+                logger.error(f"❌ Orderbook bars update failed: {e}")
+    
     def save_snapshot(
         self,
         exchange: str,
@@ -65,28 +349,19 @@ class OrderbookRecorder:
         bid_qty: float = 0.0,
         ask_qty: float = 0.0,
         timestamp_ns: int = None
-    ):
+    ) -> bool:
         """
-        Сохранить один snapshot в БД
+        Поставить один snapshot в очередь на запись (без ожидания)
+        
+        Returns:
+            False если буфер writer'а полон и snapshot отброшен
         """
         if timestamp_ns is None:
             timestamp_ns = int(time.time() * 1_000_000_000)
         
-        snapshot = OrderbookSnapshot(
-            exchange=exchange,
-            symbol=symbol,
-            bid=bid,
-            ask=ask,
-            bid_quantity=bid_qty,
-            ask_quantity=ask_qty,
-            timestamp=datetime.utcnow(),
-            timestamp_ns=timestamp_ns
-        )
-        
-        self.db.add(snapshot)
-        self.db.commit()
-        
-        return snapshot
+        row = snapshot_row(exchange, symbol, bid, ask, bid_qty, ask_qty, timestamp_ns)
+        self._archive_rows([row])
+        return self.writer.offer([row]) == 1
     
     def get_snapshots(
         self,
@@ -96,22 +371,77 @@ class OrderbookRecorder:
         exchanges: List[str] = None
     ) -> List[OrderbookSnapshot]:
         """
-        Получить snapshots для backtest
+        Получить snapshots для backtest (все сразу, ORM объекты)
+        
+        Для длинных окон - stream_snapshots
         """
         query = self.db.query(OrderbookSnapshot).filter(
-            OrderbookSnapshot.timestamp >= start_time,
-            OrderbookSnapshot.timestamp <= end_time
+            *self._snapshot_filters(start_time, end_time, symbols, exchanges)
         )
+        return query.order_by(OrderbookSnapshot.timestamp).all()
+    
+    def stream_snapshots(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        symbols: List[str] = None,
+        exchanges: List[str] = None,
+        chunk_rows: int = settings.ORDERBOOK_STREAM_CHUNK_ROWS,
+        as_numpy: bool = True
+    ) -> Iterator[Union[np.ndarray, List[Row]]]:
+        """
+        Snapshots окна пачками по chunk_rows в порядке timestamp
         
+        Server-side cursor (yield_per => stream_results): в памяти одна
+        пачка, следующая читается, пока обрабатывается текущая. Выбираются
+        только колонки (без ORM объектов); пачка - record array
+        SNAPSHOT_BATCH_DTYPE или (as_numpy=False) список Row в порядке
+        SNAPSHOT_BATCH_DTYPE.
+        """
+        stmt = (
+            select(*_SNAPSHOT_STREAM_COLUMNS)
+            .where(*self._snapshot_filters(start_time, end_time, symbols, exchanges))
+            .order_by(OrderbookSnapshot.timestamp)
+            .execution_options(yield_per=chunk_rows)
+        )
+        result = self.db.execute(stmt)
+        try:
+            for rows in result.partitions():
+                if not as_numpy:
+                    yield rows
+                    continue
+                batch = np.empty(len(rows), dtype=SNAPSHOT_BATCH_DTYPE)
+                for name, values in zip(SNAPSHOT_BATCH_DTYPE.names, zip(*rows)):
+                    batch[name] = np.array(values, dtype=SNAPSHOT_BATCH_DTYPE[name])
+                yield batch
+        finally:
+            result.close()
+    
+    @staticmethod
+    def _snapshot_filters(
+        start_time: datetime,
+        end_time: datetime,
+        symbols: Optional[List[str]],
+        exchanges: Optional[List[str]]
+    ) -> List:
+        filters = [
+            OrderbookSnapshot.timestamp >= start_time,
+            OrderbookSnapshot.timestamp <= end_time
+        ]
         if symbols:
-            query = query.filter(OrderbookSnapshot.symbol.in_(symbols))
-        
+            filters.append(OrderbookSnapshot.symbol.in_(symbols))
         if exchanges:
-            query = query.filter(OrderbookSnapshot.exchange.in_(exchanges))
-        
-        return query.order_by(OrderbookSnapshot.timestamp).all()
-
+            filters.append(OrderbookSnapshot.exchange.in_(exchanges))
+        return filters
 
 
+# Recorder процесса (запускается в main.py при ORDERBOOK_RECORDING_ENABLED)
+_recorder: Optional[OrderbookRecorder] = None
 
 
+def get_orderbook_recorder() -> OrderbookRecorder:
+    """Получить или создать recorder процесса"""
+    global _recorder
+    if _recorder is None:
+        _recorder = OrderbookRecorder()
+    return _recorder
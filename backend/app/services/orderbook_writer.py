@@ -0,0 +1,262 @@
+"""
+DRAIZER V2.0 - Orderbook Snapshot Writer
+Bounded in-memory buffer of snapshot rows flushed in batches via COPY
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.orderbook_snapshot import OrderbookSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Columns written per row (id is generated by the table's sequence)
+SNAPSHOT_COLUMNS = (
+    'exchange', 'symbol', 'bid', 'ask', 'bid_quantity', 'ask_quantity', 'timestamp', 'timestamp_ns'
+)
+
+SnapshotRow = Tuple[str, str, float, float, Optional[float], Optional[float], datetime, int]
+
+
+def snapshot_row(
+    exchange: str,
+    symbol: str,
+    bid: float,
+    ask: float,
+    bid_qty: Optional[float],
+    ask_qty: Optional[float],
+    timestamp_ns: int
+) -> SnapshotRow:
+    """Row in SNAPSHOT_COLUMNS order (timestamp derived from timestamp_ns, naive UTC)"""
+    timestamp = datetime.utcfromtimestamp(timestamp_ns // 1000 / 1_000_000)
+    return (exchange, symbol, bid, ask, bid_qty, ask_qty, timestamp, timestamp_ns)
+
+
+class OrderbookWriter:
+    """
+    Batched writer for orderbook_snapshots
+    
+    Producers put() rows into a bounded buffer; one background task
+    flushes it every batch_rows rows or flush_interval seconds, whichever
+    comes first, with a single COPY (asyncpg) or multi-row INSERT (other
+    drivers) per batch instead of a transaction per snapshot.
+    
+    Backpressure: put() waits up to its timeout for room in the buffer,
+    then drops the rows that still do not fit (counted in dropped). A
+    failed batch goes back to the front of the buffer and is retried
+    after a back-off. stop() flushes whatever is buffered.
+    """
+    
+    RETRY_DELAYS_SECONDS = (0.5, 1.0, 2.0, 5.0)
+    
+    def __init__(
+        self,
+        session_factory=None,
+        batch_rows: int = settings.ORDERBOOK_WRITER_BATCH_ROWS,
+        flush_interval: float = settings.ORDERBOOK_WRITER_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.ORDERBOOK_WRITER_MAX_PENDING_ROWS
+    ):
+        if session_factory is None:
+            from app.db.session import AsyncSessionLocal as session_factory
+        self.session_factory = session_factory
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        
+        self._pending: Deque[SnapshotRow] = deque()
+        self._ready: Optional[asyncio.Event] = None  # batch_rows pending (or stopping)
+        self._room: Optional[asyncio.Event] = None   # buffer below max_pending
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        
+        # Metrics
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.flush_errors = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.last_error: Optional[str] = None
+    
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+    
+    def stats(self) -> Dict:
+        return {
+            'running': bool(self._task and not self._task.done()),
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'accepted': self.accepted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'flush_errors': self.flush_errors,
+            'last_flush_rows': self.last_flush_rows,
+            'last_flush_ms': self.last_flush_ms,
+            'last_error': self.last_error,
+        }
+    
+    # ==================== PRODUCERS ====================
+    
+    def _events(self):
+        if self._ready is None:
+            self._ready = asyncio.Event()
+            self._room = asyncio.Event()
+            self._room.set()
+    
+    def _accept(self, rows: List[SnapshotRow]) -> int:
+        accepted = rows[:max(self.max_pending - len(self._pending), 0)]
+        self._pending.extend(accepted)
+        self.accepted += len(accepted)
+        
+        if len(self._pending) >= self.batch_rows:
+            self._ready.set()
+        if len(self._pending) >= self.max_pending:
+            self._room.clear()
+        return len(accepted)
+    
+    def offer(self, rows: Iterable[SnapshotRow]) -> int:
+        """Buffer rows without waiting; rows that do not fit are dropped. Returns rows accepted"""
+        self._events()
+        rows = list(rows)
+        accepted = self._accept(rows)
+        self.dropped += len(rows) - accepted
+        return accepted
+    
+    async def put(self, rows: Iterable[SnapshotRow], timeout: float = 0.0) -> int:
+        """
+        Buffer rows, waiting up to timeout seconds while the buffer is full
+        
+        Returns:
+            Rows accepted (the rest were dropped)
+        """
+        self._events()
+        rows = list(rows)
+        accepted = self._accept(rows)
+        deadline = time.monotonic() + timeout
+        
+        while accepted < len(rows) and not self._stopping:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._room.wait(), wait)
+            except asyncio.TimeoutError:
+                break
+            accepted += self._accept(rows[accepted:])
+        
+        self.dropped += len(rows) - accepted
+        return accepted
+    
+    # ==================== FLUSHING ====================
+    
+    async def start(self):
+        """Start the background flusher (idempotent)"""
+        self._events()
+        if self._task and not self._task.done():
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self, timeout: float = 10.0):
+        """Flush everything buffered and stop"""
+        if not self._task:
+            return
+        self._stopping = True
+        self._ready.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error(f"❌ Orderbook writer stopped with {self.pending} rows unwritten")
+        self._task = None
+    
+    async def _run(self):
+        retry = 0
+        while True:
+            if not self._stopping and len(self._pending) < self.batch_rows:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._ready.clear()
+            
+            if not self._pending:
+                if self._stopping:
+                    return
+                continue
+            
+            batch = [self._pending.popleft() for _ in range(min(self.batch_rows, len(self._pending)))]
+            self._room.set()
+            try:
+                await self.flush(batch)
+                retry = 0
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_error = str(e)
+                # Keep the rows (ahead of newer ones), unless shutdown is giving up
+                if self._stopping and retry >= len(self.RETRY_DELAYS_SECONDS):
+                    self.dropped += len(batch) + len(self._pending)
+                    self._pending.clear()
+                    logger.error(f"❌ Orderbook writer gave up on shutdown: {e}")
+                    return
+                self._pending.extendleft(reversed(batch))
+                self._trim()
+                delay = self.RETRY_DELAYS_SECONDS[min(retry, len(self.RETRY_DELAYS_SECONDS) - 1)]
+                retry += 1
+                logger.error(f"❌ Orderbook snapshot flush failed ({len(batch)} rows), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+            
+            if len(self._pending) >= self.batch_rows:
+                self._ready.set()
+    
+    def _trim(self):
+        # Rows put back after a failure may overfill the buffer: drop the oldest
+        excess = len(self._pending) - self.max_pending
+        for _ in range(max(excess, 0)):
+            self._pending.popleft()
+        self.dropped += max(excess, 0)
+        if len(self._pending) >= self.max_pending:
+            self._room.clear()
+    
+    async def flush(self, rows: List[SnapshotRow]):
+        """Write rows in one transaction (COPY on asyncpg, multi-row INSERT otherwise)"""
+        started = time.perf_counter()
+        async with self.session_factory() as session:
+            connection = await session.connection()
+            raw = (await connection.get_raw_connection()).driver_connection
+            if hasattr(raw, 'copy_records_to_table'):
+                await raw.copy_records_to_table(
+                    OrderbookSnapshot.__tablename__, records=rows, columns=SNAPSHOT_COLUMNS
+                )
+            else:
+                await session.execute(
+                    insert(OrderbookSnapshot), [dict(zip(SNAPSHOT_COLUMNS, row)) for row in rows]
+                )
+            await session.commit()
+        
+        self.batches += 1
+        self.written += len(rows)
+        self.last_flush_rows = len(rows)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+
+# Process-wide writer instance
+_writer: Optional[OrderbookWriter] = None
+
+
+def get_orderbook_writer() -> OrderbookWriter:
+    """Get or create the process-wide orderbook snapshot writer"""
+    global _writer
+    if _writer is None:
+        _writer = OrderbookWriter()
+    return _writer
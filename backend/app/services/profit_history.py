@@ -0,0 +1,239 @@
+"""
+DRAIZER V2.0 - Profit History
+Multi-resolution cumulative P&L rollups and chart downsampling (LTTB, min/max)
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Resolution seconds -> retention seconds (None = keep everything)
+RESOLUTIONS: Dict[int, Optional[int]] = {
+    1: 86400,             # per second for a day
+    60: 30 * 86400,       # per minute for a month
+    3600: None,           # per hour forever
+}
+
+
+class ProfitSeries:
+    """
+    Cumulative P&L bucketed at one resolution
+    
+    Columns per bucket: start (s), pnl, count, and the cumulative P&L at
+    the end of the bucket and its min/max inside it. Columns are numpy
+    arrays grown by doubling; expired buckets are cut off the front.
+    """
+    
+    COLUMNS = (('start', np.int64), ('pnl', np.float64), ('count', np.int64),
+               ('end', np.float64), ('low', np.float64), ('high', np.float64))
+    
+    def __init__(self, resolution: int, retention: Optional[int]):
+        self.resolution = resolution
+        self.retention = retention
+        self.size = 0
+        self.trimmed = False  # buckets were expired: history no longer complete
+        self._columns = {name: np.empty(1024, dtype=dtype) for name, dtype in self.COLUMNS}
+    
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name][:self.size]
+    
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        capacity = len(self._columns['start'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+    
+    def _expire(self):
+        if self.retention is None or self.size == 0:
+            return
+        starts = self.column('start')
+        cut = int(np.searchsorted(starts, starts[-1] - self.retention, side='left'))
+        if cut > self.size // 2:  # compact in bulk, not on every batch
+            for column in self._columns.values():
+                column[:self.size - cut] = column[cut:self.size]
+            self.size -= cut
+            self.trimmed = True
+    
+    def ingest(self, seconds: np.ndarray, pnl: np.ndarray, cumulative: np.ndarray):
+        """
+        Add operations in arrival order
+        
+        Args:
+            seconds: Operation timestamps (s)
+            pnl: Operation P&L
+            cumulative: Cumulative P&L after each operation
+        """
+        buckets = seconds - seconds % self.resolution
+        if self.size:
+            # Late operations join the newest bucket, keeping buckets ordered
+            buckets = np.maximum(buckets, self._columns['start'][self.size - 1])
+        buckets = np.maximum.accumulate(buckets)
+        
+        first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        last = np.r_[first[1:] - 1, len(buckets) - 1]
+        starts = buckets[first]
+        sums = np.add.reduceat(pnl, first)
+        counts = np.diff(np.r_[first, len(buckets)])
+        ends = cumulative[last]
+        lows = np.minimum.reduceat(cumulative, first)
+        highs = np.maximum.reduceat(cumulative, first)
+        
+        columns = self._columns
+        if self.size and starts[0] == columns['start'][self.size - 1]:
+            i = self.size - 1
+            columns['pnl'][i] += sums[0]
+            columns['count'][i] += counts[0]
+            columns['end'][i] = ends[0]
+            columns['low'][i] = min(columns['low'][i], lows[0])
+            columns['high'][i] = max(columns['high'][i], highs[0])
+            starts, sums, counts, ends, lows, highs = (a[1:] for a in (starts, sums, counts, ends, lows, highs))
+        
+        self._reserve(len(starts))
+        new = slice(self.size, self.size + len(starts))
+        for name, values in zip(('start', 'pnl', 'count', 'end', 'low', 'high'), (starts, sums, counts, ends, lows, highs)):
+            columns[name][new] = values
+        self.size += len(starts)
+        self._expire()
+    
+    def covers(self, since: Optional[float]) -> bool:
+        """Whether buckets from `since` (None = the beginning) are still retained"""
+        if not self.trimmed:
+            return True
+        return since is not None and since >= self._columns['start'][0]
+    
+    def range(self, since: Optional[float], until: Optional[float]) -> slice:
+        starts = self.column('start')
+        lo = 0 if since is None else int(np.searchsorted(starts, since - self.resolution + 1, side='left'))
+        hi = self.size if until is None else int(np.searchsorted(starts, until, side='right'))
+        return slice(lo, hi)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the Largest-Triangle-Three-Buckets downsample of (x, y)"""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    
+    x = x.astype(np.float64)
+    every = (n - 2) / (points - 2)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(points - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nhi = min(int((i + 2) * every) + 1, n)
+        # Triangle with the previous pick and the average of the next bucket
+        avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(low: np.ndarray, high: np.ndarray, ends: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lowest low and highest high of (points - 2) // 2 equal buckets, plus
+    the first and last point (at their end value) so the curve spans the range
+    
+    Returns:
+        (indices, values) in index order, at most max(points, 2)
+    """
+    n = len(low)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    picks: Dict[int, float] = {0: float(ends[0]), n - 1: float(ends[-1])}
+    buckets = min((points - 2) // 2, n)
+    if buckets > 0:
+        first = np.unique(np.linspace(0, n, buckets + 1).astype(np.int64)[:-1])
+        for f, l in zip(first.tolist(), np.r_[first[1:], n].tolist()):
+            lo = f + int(low[f:l].argmin())
+            hi = f + int(high[f:l].argmax())
+            picks[lo] = float(low[lo])
+            picks[hi] = float(high[hi])
+    index = np.array(sorted(picks), dtype=np.int64)
+    return index, np.array([picks[i] for i in index.tolist()])
+
+
+class ProfitRollups:
+    """
+    Cumulative P&L curve kept at several resolutions
+    
+    Fed incrementally (see OperationsAggregator); a chart query picks the
+    coarsest resolution that covers the range with at least the requested
+    number of points (the finest one with data if none does), then
+    downsamples.
+    """
+    
+    def __init__(self, resolutions: Dict[int, Optional[int]] = RESOLUTIONS):
+        self.series = [ProfitSeries(resolution, retention) for resolution, retention in sorted(resolutions.items())]
+        self.cumulative = 0.0
+    
+    def ingest(self, ops: np.ndarray):
+        """Add a batch of operations (OPERATION_DTYPE) in arrival order"""
+        if len(ops) == 0:
+            return
+        seconds = (ops['timestamp_ns'] // 1_000_000_000).astype(np.int64)
+        pnl = ops['pnl'].astype(np.float64)
+        cumulative = self.cumulative + np.cumsum(pnl)
+        self.cumulative = float(cumulative[-1])
+        
+        for series in self.series:
+            series.ingest(seconds, pnl, cumulative)
+    
+    def _pick(self, since: Optional[float], until: Optional[float], points: int) -> Tuple[ProfitSeries, slice]:
+        # Finest first; the coarsest series keeps everything, so it always covers
+        candidates = [(series, series.range(since, until)) for series in self.series if series.covers(since)]
+        for series, window in reversed(candidates):
+            if window.stop - window.start >= points:
+                return series, window
+        for series, window in candidates:
+            if window.stop > window.start:
+                return series, window
+        return candidates[-1]
+    
+    def query(
+        self,
+        points: int = 500,
+        since_ms: Optional[int] = None,
+        until_ms: Optional[int] = None,
+        method: str = 'lttb'
+    ) -> List[Dict]:
+        """
+        Downsampled cumulative P&L curve
+        
+        Args:
+            points: Maximum number of points returned
+            since_ms, until_ms: Time range (default: everything)
+            method: 'lttb' (shape preserving) or 'minmax' (keeps extremes)
+        
+        Returns:
+            [{'timestamp': ms, 'profit': bucket P&L, 'cumulative': P&L}], oldest first
+        """
+        since = since_ms / 1000.0 if since_ms is not None else None
+        until = until_ms / 1000.0 if until_ms is not None else None
+        
+        series, window = self._pick(since, until, points)
+        starts = series.column('start')[window]
+        if len(starts) == 0:
+            return []
+        pnl = series.column('pnl')[window]
+        
+        ends = series.column('end')[window]
+        if method == 'minmax':
+            index, values = minmax(series.column('low')[window], series.column('high')[window], ends, points)
+        else:
+            index = lttb(starts, ends, points)
+            values = ends[index]
+        
+        timestamps = ((starts[index] + series.resolution) * 1000).tolist()
+        return [
+            {'timestamp': ts, 'profit': profit, 'cumulative': cum}
+            for ts, profit, cum in zip(timestamps, pnl[index].tolist(), values.tolist())
+        ]
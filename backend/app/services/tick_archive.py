@@ -0,0 +1,369 @@
+"""
+DRAIZER V2.0 - Tick Archive
+Columnar per (exchange, symbol, day) top-of-book files, memory-mapped for backtests;
+past days compressed into time-indexed blocks (see tick_codec)
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import tick_codec
+
+logger = logging.getLogger(__name__)
+
+# Column name -> on-disk dtype (one raw little-endian file per column)
+TICK_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('timestamp_ns', '<i8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('bid_qty', '<f8'),
+    ('ask_qty', '<f8'),
+)
+
+NS_PER_DAY = 86400 * 1_000_000_000
+
+# Compressed form of a sealed day (replaces its .col files)
+BLOCKS_FILE = "ticks.blk"
+
+
+def _day_of(timestamp_ns: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(timestamp_ns // NS_PER_DAY))
+
+
+def _day_start_ns(day: date) -> int:
+    return (day - date(1970, 1, 1)).days * NS_PER_DAY
+
+
+@dataclass(frozen=True)
+class TickColumns:
+    """
+    Ticks of one (exchange, symbol), oldest first
+    
+    Arrays are read-only; inside one raw day they are views on the memory
+    mapped column files (no copy), compressed days are decoded into
+    memory. Missing quantities are NaN.
+    """
+    timestamp_ns: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    bid_qty: np.ndarray
+    ask_qty: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.timestamp_ns)
+    
+    def slice(self, start: int, stop: int) -> "TickColumns":
+        return TickColumns(*(getattr(self, name)[start:stop] for name, _ in TICK_COLUMNS))
+    
+    @classmethod
+    def empty(cls) -> "TickColumns":
+        return cls(*(np.empty(0, dtype=dtype) for _, dtype in TICK_COLUMNS))
+    
+    @classmethod
+    def concatenate(cls, parts: Sequence["TickColumns"]) -> "TickColumns":
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(part, name) for part in parts]) for name, _ in TICK_COLUMNS))
+
+
+class TickArchive:
+    """
+    Append-only tick archive
+    
+    Layout on disk:
+    - {exchange}/{symbol}/{YYYYMMDD}/{column}.col  one raw column per file
+      (TICK_COLUMNS), all of the same length, appended in time order
+    - {exchange}/{symbol}/{YYYYMMDD}/ticks.blk  a sealed day compressed by
+      compact_sealed(): tick_codec blocks with min/max time headers
+    
+    A raw day opens with one np.memmap per column. Its sparse time index is
+    timestamp_ns of every INDEX_STRIDE-th tick, read on open (one page per
+    stride), so a time range is found by binary search over the index and
+    then inside one stride, and scanned straight off the page cache.
+    
+    Writes are buffered by add() and written by flush(), one append per
+    column file per (exchange, symbol, day). Ticks older than the last one
+    written for their pair are dropped (columns must stay sorted). After a
+    crash, columns may differ in length by a torn write: readers use the
+    shortest, and the next append truncates the others to it.
+    
+    Days before today are compacted into ticks.blk (written to a temp file
+    and renamed, then the columns are removed). A range read of a compact
+    day decodes only the blocks whose [min_ts, max_ts] overlap it. Ticks a
+    late flush appends to a compacted day are read after its blocks and
+    merged into them by the next compaction.
+    """
+    
+    INDEX_STRIDE = 1024
+    
+    def __init__(self, directory: str = settings.ORDERBOOK_ARCHIVE_DIR, compress: bool = settings.ORDERBOOK_ARCHIVE_COMPRESS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compress = compress
+        
+        self.written = 0
+        self.out_of_order = 0
+        self.compacted_days = 0
+        self._pending: Dict[Tuple[str, str], List[Tuple[int, float, float, float, float]]] = {}
+        self._last_ns: Dict[Tuple[str, str], int] = {}
+    
+    # ==================== PATHS ====================
+    
+    def _day_path(self, exchange: str, symbol: str, day: date) -> Path:
+        return self.directory / exchange / symbol / f"{day:%Y%m%d}"
+    
+    def pairs(self) -> List[Tuple[str, str]]:
+        """Archived (exchange, symbol) pairs"""
+        return sorted(
+            (exchange.name, symbol.name)
+            for exchange in self.directory.iterdir() if exchange.is_dir()
+            for symbol in exchange.iterdir() if symbol.is_dir()
+        )
+    
+    def days(self, exchange: str, symbol: str) -> List[date]:
+        """Archived days of one pair, oldest first"""
+        root = self.directory / exchange / symbol
+        if not root.is_dir():
+            return []
+        return sorted(datetime.strptime(path.name, "%Y%m%d").date() for path in root.iterdir() if path.is_dir())
+    
+    # ==================== WRITE ====================
+    
+    def add(
+        self,
+        exchange: str,
+        symbol: str,
+        timestamp_ns: int,
+        bid: float,
+        ask: float,
+        bid_qty: Optional[float] = None,
+        ask_qty: Optional[float] = None
+    ):
+        """Buffer one tick (written by the next flush())"""
+        self._pending.setdefault((exchange, symbol), []).append((
+            timestamp_ns, bid, ask,
+            np.nan if bid_qty is None else bid_qty,
+            np.nan if ask_qty is None else ask_qty,
+        ))
+    
+    def flush(self) -> int:
+        """Append buffered ticks to their column files; returns ticks written"""
+        pending, self._pending = self._pending, {}
+        written = 0
+        for (exchange, symbol), ticks in pending.items():
+            rows = np.array(ticks, dtype=[(name, dtype) for name, dtype in TICK_COLUMNS])
+            rows = rows[np.argsort(rows['timestamp_ns'], kind='stable')]
+            
+            last = self._last_ns.get((exchange, symbol))
+            if last is None:
+                last = self._last_written_ns(exchange, symbol)
+            keep = rows['timestamp_ns'] >= last
+            self.out_of_order += int((~keep).sum())
+            rows = rows[keep]
+            if len(rows) == 0:
+                continue
+            
+            days = rows['timestamp_ns'] // NS_PER_DAY
+            for start, stop in zip(*self._runs(days)):
+                day_rows = rows[start:stop]
+                path = self._day_path(exchange, symbol, _day_of(day_rows['timestamp_ns'][0]))
+                path.mkdir(parents=True, exist_ok=True)
+                for name, dtype in TICK_COLUMNS:
+                    with open(path / f"{name}.col", 'ab') as f:
+                        f.write(np.ascontiguousarray(day_rows[name], dtype=dtype).tobytes())
+            
+            self._last_ns[(exchange, symbol)] = int(rows['timestamp_ns'][-1])
+            written += len(rows)
+        
+        self.written += written
+        return written
+    
+    @staticmethod
+    def _runs(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return starts, np.r_[starts[1:], len(keys)]
+    
+    def _last_written_ns(self, exchange: str, symbol: str) -> int:
+        """Newest archived tick of a pair (an earlier process may have written it)"""
+        days = self.days(exchange, symbol)
+        if not days:
+            return -1
+        
+        # Appends go on after the newest day: cut a torn write back to whole ticks
+        path = self._day_path(exchange, symbol, days[-1])
+        length = self._length(path)
+        for name, dtype in TICK_COLUMNS:
+            column = path / f"{name}.col"
+            if column.exists() and column.stat().st_size != length * np.dtype(dtype).itemsize:
+                with open(column, 'r+b') as f:
+                    f.truncate(length * np.dtype(dtype).itemsize)
+        
+        if length:
+            ticks = self._open_raw(path, length)
+            return int(ticks.timestamp_ns[-1])
+        headers = tick_codec.block_headers(self._blocks(path))
+        return int(headers[-1][1]['max_ts']) if headers else -1
+    
+    # ==================== COMPACTION ====================
+    
+    def compact_day(self, exchange: str, symbol: str, day: date) -> bool:
+        """Compress a day's raw columns (and earlier blocks) into ticks.blk"""
+        path = self._day_path(exchange, symbol, day)
+        length = self._length(path)
+        if length == 0:
+            return False
+        
+        ticks = self.open_day(exchange, symbol, day)
+        tmp = path / f"{BLOCKS_FILE}.tmp"
+        with open(tmp, 'wb') as f:
+            for block in tick_codec.encode_blocks(*(getattr(ticks, name) for name, _ in TICK_COLUMNS)):
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path / BLOCKS_FILE)
+        
+        for name, _ in TICK_COLUMNS:
+            (path / f"{name}.col").unlink(missing_ok=True)
+        self.compacted_days += 1
+        return True
+    
+    def compact_sealed(self, today: Optional[date] = None) -> int:
+        """Compact every raw day before today; returns days compacted"""
+        if not self.compress:
+            return 0
+        today = today or datetime.utcnow().date()
+        compacted = 0
+        for exchange, symbol in self.pairs():
+            for day in self.days(exchange, symbol):
+                if day >= today:
+                    break
+                try:
+                    compacted += self.compact_day(exchange, symbol, day)
+                except (OSError, ValueError) as e:
+                    logger.error(f"❌ Tick archive compaction of {exchange}/{symbol}/{day} failed: {e}")
+        if compacted:
+            logger.info(f"🗜️  Tick archive: compacted {compacted} day(s)")
+        return compacted
+    
+    # ==================== READ ====================
+    
+    @staticmethod
+    def _length(path: Path) -> int:
+        """Ticks in a day directory (shortest column)"""
+        sizes = []
+        for name, dtype in TICK_COLUMNS:
+            column = path / f"{name}.col"
+            sizes.append(column.stat().st_size // np.dtype(dtype).itemsize if column.exists() else 0)
+        return min(sizes)
+    
+    @staticmethod
+    def _open_raw(path: Path, length: int) -> TickColumns:
+        return TickColumns(*(
+            np.memmap(path / f"{name}.col", dtype=dtype, mode='r', shape=(length,))
+            for name, dtype in TICK_COLUMNS
+        ))
+    
+    @staticmethod
+    def _blocks(path: Path) -> np.ndarray:
+        """Compressed blocks of a day (empty if not compacted)"""
+        blocks = path / BLOCKS_FILE
+        if not blocks.exists() or blocks.stat().st_size == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(blocks, dtype=np.uint8, mode='r')
+    
+    def _decode(self, path: Path, since_ns: Optional[int] = None, until_ns: Optional[int] = None) -> List[TickColumns]:
+        """Decode the blocks of a day that overlap [since_ns, until_ns]"""
+        data = self._blocks(path)
+        parts = []
+        for offset, header in tick_codec.block_headers(data):
+            if since_ns is not None and header['max_ts'] < since_ns:
+                continue
+            if until_ns is not None and header['min_ts'] > until_ns:
+                break
+            columns = tick_codec.decode_block(data, offset, header)
+            for column in columns:
+                column.flags.writeable = False
+            parts.append(TickColumns(*columns))
+        return parts
+    
+    def _load(self, path: Path, since_ns: Optional[int] = None, until_ns: Optional[int] = None) -> TickColumns:
+        """Decoded blocks (those in range) followed by the raw columns of a day"""
+        parts = self._decode(path, since_ns, until_ns)
+        length = self._length(path)
+        if length:
+            parts.append(self._open_raw(path, length))
+        return TickColumns.concatenate(parts)
+    
+    def open_day(self, exchange: str, symbol: str, day: date) -> TickColumns:
+        """One day of a pair: memory-mapped, or decoded if compacted (empty if not archived)"""
+        return self._load(self._day_path(exchange, symbol, day))
+    
+    def _day_range(self, ticks: TickColumns, since_ns: Optional[int], until_ns: Optional[int]) -> Tuple[int, int]:
+        """[start, stop) of ticks with since_ns <= timestamp_ns <= until_ns"""
+        timestamps = ticks.timestamp_ns
+        index = np.asarray(timestamps[::self.INDEX_STRIDE])
+        stride = self.INDEX_STRIDE
+        
+        def bound(value: int, side: str) -> int:
+            # Sparse index narrows to one stride, searchsorted finishes inside it
+            block = max(int(np.searchsorted(index, value, side=side)) - 1, 0)
+            lo = block * stride
+            return lo + int(np.searchsorted(timestamps[lo:lo + stride + 1], value, side=side))
+        
+        start = 0 if since_ns is None else bound(since_ns, 'left')
+        stop = len(timestamps) if until_ns is None else bound(until_ns, 'right')
+        return start, max(start, stop)
+    
+    def scan(
+        self,
+        exchange: str,
+        symbol: str,
+        since_ns: Optional[int] = None,
+        until_ns: Optional[int] = None
+    ) -> Iterator[TickColumns]:
+        """Ticks of one pair in a time range, one day (zero-copy view of a raw day) at a time"""
+        for day in self.days(exchange, symbol):
+            day_start = _day_start_ns(day)
+            if since_ns is not None and day_start + NS_PER_DAY <= since_ns:
+                continue
+            if until_ns is not None and day_start > until_ns:
+                break
+            ticks = self._load(self._day_path(exchange, symbol, day), since_ns, until_ns)
+            if len(ticks):
+                start, stop = self._day_range(ticks, since_ns, until_ns)
+                if stop > start:
+                    yield ticks.slice(start, stop)
+    
+    def read(
+        self,
+        exchange: str,
+        symbol: str,
+        since_ns: Optional[int] = None,
+        until_ns: Optional[int] = None
+    ) -> TickColumns:
+        """Ticks of one pair in a time range (copied only if it spans days)"""
+        return TickColumns.concatenate(list(self.scan(exchange, symbol, since_ns, until_ns)))
+
+
+# Process-wide archive
+_archive: Optional[TickArchive] = None
+
+
+def get_tick_archive() -> Optional[TickArchive]:
+    """Get or open the tick archive (None if disabled or unavailable)"""
+    global _archive
+    if _archive is None and settings.ORDERBOOK_ARCHIVE_DIR:
+        try:
+            _archive = TickArchive()
+        except OSError as e:
+            logger.error(f"❌ Tick archive unavailable: {e}")
+    return _archive
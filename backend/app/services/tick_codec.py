@@ -0,0 +1,198 @@
+"""
+DRAIZER V2.0 - Tick Codec
+Gorilla-style compressed blocks of archived ticks with vectorized encode/decode
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Ticks per block (the unit readers skip by time)
+BLOCK_TICKS = 4096
+
+BLOCK_MAGIC = 0x4B425444  # b'DTBK' little-endian
+
+# Fixed-size header in front of every block; column payloads follow in
+# header order: timestamp_ns, bid, ask, bid_qty, ask_qty (modes/decimals
+# are those of the four float columns)
+BLOCK_HEADER = np.dtype([
+    ('magic', '<u4'),
+    ('count', '<u4'),
+    ('min_ts', '<i8'),
+    ('max_ts', '<i8'),
+    ('first_ts', '<i8'),
+    ('sizes', '<u4', (5,)),
+    ('modes', 'u1', (4,)),
+    ('decimals', 'u1', (4,)),
+    ('padding', 'V4'),
+])
+
+# Float column encodings
+FLOAT_EMPTY = 0    # every value NaN (no payload)
+FLOAT_DECIMAL = 1  # exact decimals with <= MAX_DECIMALS places: zigzag delta varints of the scaled integers
+FLOAT_XOR = 2      # anything else: XOR doubles
+MAX_DECIMALS = 8
+
+_VARINT_BYTES = 10  # 64 bits / 7
+
+
+# ==================== VARINT ====================
+
+def varint_encode(values: np.ndarray) -> bytes:
+    """LEB128 of uint64 values, vectorized"""
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b''
+    shifts = np.arange(_VARINT_BYTES, dtype=np.uint64) * np.uint64(7)
+    groups = (values[:, None] >> shifts) & np.uint64(0x7F)
+    lengths = np.maximum((values[:, None] >> shifts[1:] != 0).sum(axis=1) + 1, 1)
+    
+    present = np.arange(_VARINT_BYTES) < lengths[:, None]
+    more = np.arange(_VARINT_BYTES) < (lengths - 1)[:, None]
+    encoded = groups.astype(np.uint8) | (more.astype(np.uint8) << 7)
+    return encoded[present].tobytes()
+
+
+def varint_decode(data: np.ndarray, count: int) -> np.ndarray:
+    """uint64 values of count LEB128 varints, vectorized"""
+    data = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) else data
+    if count == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) != count:
+        raise ValueError(f"Corrupt varint stream: {len(ends)} values, expected {count}")
+    starts = np.r_[0, ends[:-1] + 1]
+    
+    # Byte position inside its varint -> shift of its 7 bits
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    groups = (data & 0x7F).astype(np.uint64) << (position.astype(np.uint64) * np.uint64(7))
+    return np.bitwise_or.reduceat(groups, starts)
+
+
+def zigzag_encode(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def zigzag_decode(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.uint64)
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+# ==================== COLUMNS ====================
+
+def encode_timestamps(timestamps: np.ndarray) -> bytes:
+    """Delta-of-delta, zigzag varints (regular cadence -> ~1 byte per tick)"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    deltas = np.diff(timestamps, prepend=timestamps[0])
+    return varint_encode(zigzag_encode(np.diff(deltas, prepend=0)))
+
+
+def decode_timestamps(data: np.ndarray, count: int, first: int) -> np.ndarray:
+    return first + np.cumsum(np.cumsum(zigzag_decode(varint_decode(data, count))))
+
+
+def encode_doubles(values: np.ndarray) -> bytes:
+    """XOR with the previous value, varints (unchanged price -> 1 byte)"""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    return varint_encode(bits ^ np.r_[np.uint64(0), bits[:-1]])
+
+
+def decode_doubles(data: np.ndarray, count: int) -> np.ndarray:
+    return np.bitwise_xor.accumulate(varint_decode(data, count)).view(np.float64)
+
+
+def decimal_places(values: np.ndarray, max_decimals: int = MAX_DECIMALS) -> Optional[int]:
+    """Fewest decimals at which every value is an exact integer multiple (None: none up to max_decimals)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 or not np.isfinite(values).all():
+        return None
+    if np.signbit(values[values == 0]).any():
+        return None  # -0.0 has no integer form (it would decode as +0.0)
+    for decimals in range(max_decimals + 1):
+        units = np.round(values * 10.0 ** decimals)
+        if np.abs(units).max() >= 2 ** 53:
+            return None
+        if np.array_equal(units / 10.0 ** decimals, values):
+            return decimals
+    return None
+
+
+def encode_floats(values: np.ndarray) -> Tuple[int, int, bytes]:
+    """
+    (mode, decimals, payload) of a float column
+    
+    Prices and quantities are mostly short decimals, whose low mantissa
+    bits differ on every change and defeat XOR; if the whole block
+    round-trips through integers at some scale 10^decimals they are
+    stored as deltas of those integers (a tick move is one byte).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).all():
+        return FLOAT_EMPTY, 0, b''
+    decimals = decimal_places(values)
+    if decimals is not None:
+        deltas = np.diff(np.round(values * 10.0 ** decimals).astype(np.int64), prepend=0)
+        return FLOAT_DECIMAL, decimals, varint_encode(zigzag_encode(deltas))
+    return FLOAT_XOR, 0, encode_doubles(values)
+
+
+def decode_floats(mode: int, decimals: int, data: np.ndarray, count: int) -> np.ndarray:
+    if mode == FLOAT_EMPTY:
+        return np.full(count, np.nan)
+    if mode == FLOAT_DECIMAL:
+        return np.cumsum(zigzag_decode(varint_decode(data, count))) / 10.0 ** decimals
+    return decode_doubles(data, count)
+
+
+# ==================== BLOCKS ====================
+
+def encode_block(timestamp_ns, bid, ask, bid_qty, ask_qty) -> bytes:
+    """One block (header + payloads) of up to BLOCK_TICKS sorted ticks"""
+    timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+    floats = [encode_floats(column) for column in (bid, ask, bid_qty, ask_qty)]
+    payloads = [encode_timestamps(timestamp_ns)] + [payload for _, _, payload in floats]
+    
+    header = np.zeros(1, dtype=BLOCK_HEADER)
+    header['magic'] = BLOCK_MAGIC
+    header['count'] = len(timestamp_ns)
+    header['min_ts'] = timestamp_ns[0]
+    header['max_ts'] = timestamp_ns[-1]
+    header['first_ts'] = timestamp_ns[0]
+    header['sizes'] = [len(payload) for payload in payloads]
+    header['modes'] = [mode for mode, _, _ in floats]
+    header['decimals'] = [decimals for _, decimals, _ in floats]
+    return header.tobytes() + b''.join(payloads)
+
+
+def encode_blocks(timestamp_ns, bid, ask, bid_qty, ask_qty, block_ticks: int = BLOCK_TICKS) -> Iterator[bytes]:
+    for start in range(0, len(timestamp_ns), block_ticks):
+        stop = start + block_ticks
+        yield encode_block(timestamp_ns[start:stop], bid[start:stop], ask[start:stop], bid_qty[start:stop], ask_qty[start:stop])
+
+
+def block_headers(data: np.ndarray) -> List[Tuple[int, np.void]]:
+    """(offset, header) of every block in a buffer, reading headers only"""
+    headers = []
+    offset = 0
+    while offset + BLOCK_HEADER.itemsize <= len(data):
+        header = np.frombuffer(data, dtype=BLOCK_HEADER, count=1, offset=offset)[0]
+        if header['magic'] != BLOCK_MAGIC:
+            raise ValueError(f"Corrupt tick block at offset {offset}")
+        size = BLOCK_HEADER.itemsize + int(header['sizes'].sum())
+        if offset + size > len(data):
+            break  # torn trailing block
+        headers.append((offset, header))
+        offset += size
+    return headers
+
+
+def decode_block(data: np.ndarray, offset: int, header: np.void) -> Tuple[np.ndarray, ...]:
+    """(timestamp_ns, bid, ask, bid_qty, ask_qty) of one block"""
+    count = int(header['count'])
+    bounds = np.cumsum(np.r_[offset + BLOCK_HEADER.itemsize, header['sizes']]).tolist()
+    payloads = [data[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    floats = zip(header['modes'].tolist(), header['decimals'].tolist(), payloads[1:])
+    return (decode_timestamps(payloads[0], count, int(header['first_ts'])),) + tuple(
+        decode_floats(mode, decimals, payload, count) for mode, decimals, payload in floats
+    )
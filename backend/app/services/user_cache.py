@@ -0,0 +1,176 @@
+"""
+DRAIZER V2.0 - Authenticated User Cache
+In-process TTL/LRU of user principals with an optional shared Redis tier
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """What request handlers need to know about the caller (no ORM, no session)"""
+    id: uuid.UUID
+    username: str
+    is_active: bool
+    
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        return cls(id=user.id, username=user.username, is_active=user.is_active)
+    
+    def to_json(self) -> str:
+        return json.dumps({'id': str(self.id), 'username': self.username, 'is_active': self.is_active})
+    
+    @classmethod
+    def from_json(cls, data) -> "UserPrincipal":
+        fields = json.loads(data)
+        return cls(id=uuid.UUID(fields['id']), username=fields['username'], is_active=fields['is_active'])
+
+
+class UserCache:
+    """
+    Principals by user ID, so authenticating a request needs no DB session
+    
+    Local tier: TTL + LRU per worker. Redis tier (AUTH_CACHE_REDIS): shared
+    by all workers, so a user is loaded from the DB once per Redis TTL.
+    
+    invalidate() (logout) drops the user from the Redis tier and publishes
+    the ID on INVALIDATE_CHANNEL, which every worker's listener applies to
+    its local tier, so all workers reload the user on their next request.
+    Without Redis each worker only knows its own invalidations: the others
+    reload within AUTH_CACHE_TTL_SECONDS. Changes made directly in the DB
+    are seen within the TTL of the tiers in use.
+    """
+    
+    PRINCIPAL_KEY = "auth:user:{}"
+    INVALIDATE_CHANNEL = "auth:invalidate"
+    RESUBSCRIBE_DELAY = 1.0
+    
+    def __init__(
+        self,
+        ttl: float = settings.AUTH_CACHE_TTL_SECONDS,
+        max_size: int = settings.AUTH_CACHE_MAX_USERS,
+        redis_url: Optional[str] = settings.REDIS_URL if settings.AUTH_CACHE_REDIS else None,
+        redis_ttl: int = settings.AUTH_CACHE_REDIS_TTL_SECONDS
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.redis_ttl = redis_ttl
+        
+        self._entries: "OrderedDict[uuid.UUID, Tuple[float, UserPrincipal]]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+    
+    # ==================== LOOKUP ====================
+    
+    async def get(self, user_id: uuid.UUID) -> Optional[UserPrincipal]:
+        """Cached principal (None on miss: load from the DB and put())"""
+        entry = self._entries.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            return entry[1]
+        self._entries.pop(user_id, None)
+        
+        if self._redis is None:
+            return None
+        try:
+            data = await self._redis.get(self.PRINCIPAL_KEY.format(user_id))
+        except Exception as e:
+            logger.warning(f"⚠️  User cache Redis unavailable: {e}")
+            return None
+        
+        if data is None:
+            return None
+        principal = UserPrincipal.from_json(data)
+        self._store(principal)
+        return principal
+    
+    # ==================== UPDATE ====================
+    
+    def _store(self, principal: UserPrincipal):
+        self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    async def put(self, principal: UserPrincipal):
+        """Cache a principal freshly loaded from the DB"""
+        self._store(principal)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self.PRINCIPAL_KEY.format(principal.id), principal.to_json(), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"⚠️  User cache Redis unavailable: {e}")
+    
+    async def invalidate(self, user_id: uuid.UUID):
+        """Forget a user in every worker (logout, changed user): next request reloads from the DB"""
+        self._entries.pop(user_id, None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self.PRINCIPAL_KEY.format(user_id))
+                await self._redis.publish(self.INVALIDATE_CHANNEL, str(user_id))
+            except Exception as e:
+                logger.warning(f"⚠️  User cache Redis unavailable: {e}")
+    
+    # ==================== BACKGROUND ====================
+    
+    async def start(self):
+        """Listen for other workers' invalidations (Redis tier only)"""
+        if self._redis is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+    
+    async def _listen(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.INVALIDATE_CHANNEL)
+                    # Invalidations missed while unsubscribed are unknown: start clean
+                    self._entries.clear()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        try:
+                            self._entries.pop(uuid.UUID(message['data'].decode()), None)
+                        except ValueError:
+                            pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️  User cache invalidation listener failed: {e}")
+                self._entries.clear()
+                await asyncio.sleep(self.RESUBSCRIBE_DELAY)
+
+
+# Process-wide cache instance
+_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Get or create the process-wide user cache"""
+    global _cache
+    if _cache is None:
+        _cache = UserCache()
+    return _cache
@@ -25,10 +25,12 @@ int price_cache_find(PriceCache *cache, const char *symbol, const char *exchange
     
     // Not found, add new entry
     if (cache->num_entries < MAX_SYMBOLS) {
-        int idx = cache->num_entries++;
+        int idx = cache->num_entries;
         strncpy(cache->entries[idx].symbol, symbol, 11);
         strncpy(cache->entries[idx].exchange, exchange, 19);
         cache->entries[idx].sequence = 0;
+        // Publish only after the entry is filled (Python reads num_entries concurrently)
+        __atomic_store_n(&cache->num_entries, idx + 1, __ATOMIC_RELEASE);
         return idx;
     }
     
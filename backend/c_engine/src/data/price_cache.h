@@ -10,20 +10,24 @@
 
 #define MAX_SYMBOLS 1000
 
-// Cached price entry (64 bytes aligned)
+// Cached price entry (one 64-byte cache line)
+// Lives in shared memory and is read by Python (engine_layout.py)
 typedef struct __attribute__((aligned(64))) {
     volatile uint32_t sequence;  // Even=stable, Odd=writing
     char symbol[12];
     char exchange[20];
+    uint32_t padding;
     double bid;
     double ask;
     uint64_t timestamp_tsc;
-    uint32_t padding[6];  // Pad to 64 bytes
 } CachedPrice;
 
+_Static_assert(sizeof(CachedPrice) == 64, "CachedPrice must be one cache line");
+
+// Entries are append-only: an entry is fully written before num_entries covers it
 typedef struct {
     CachedPrice entries[MAX_SYMBOLS];
-    int num_entries;
+    volatile int num_entries;
 } PriceCache;
 
 PriceCache* price_cache_create(void);
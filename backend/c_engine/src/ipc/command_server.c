@@ -0,0 +1,258 @@
+/**
+ * DRAIZER V2 - Command Server Implementation
+ */
+
+#include "command_server.h"
+#include <sys/socket.h>
+#include <sys/un.h>
+#include <poll.h>
+#include <pthread.h>
+#include <unistd.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdio.h>
+#include <errno.h>
+
+typedef struct {
+    int fd;
+    
+    // Partially received frame
+    CommandFrame frame;
+    size_t frame_bytes;
+    
+    // Payload being reassembled from CMD_FLAG_MORE frames
+    char *payload;
+    size_t payload_len;
+    size_t payload_cap;
+    uint32_t payload_id;
+    int payload_error;
+} CommandClient;
+
+struct CommandServer {
+    int listen_fd;
+    char path[108];
+    volatile int running;
+    pthread_t thread;
+    command_handler_fn handler;
+    void *ctx;
+    CommandClient clients[CMD_MAX_CLIENTS];
+};
+
+static void client_close(CommandClient *client) {
+    if (client->fd >= 0) close(client->fd);
+    free(client->payload);
+    memset(client, 0, sizeof(*client));
+    client->fd = -1;
+}
+
+static void make_ack(CommandAck *ack, uint32_t request_id, int status, const char *message) {
+    memset(ack, 0, sizeof(*ack));
+    ack->request_id = request_id;
+    ack->status = status;
+    strncpy(ack->message, message, sizeof(ack->message) - 1);
+}
+
+/**
+ * Consume one complete frame
+ * Returns 1 and fills ack when a command completed, 0 otherwise
+ */
+static int client_handle_frame(CommandServer *server, CommandClient *client, CommandAck *ack) {
+    CommandFrame *frame = &client->frame;
+    uint32_t length = frame->length > CMD_FRAME_DATA ? CMD_FRAME_DATA : frame->length;
+    
+    // A new request id starts a new payload
+    if (client->payload_len > 0 && client->payload_id != frame->request_id) {
+        client->payload_len = 0;
+        client->payload_error = 0;
+    }
+    client->payload_id = frame->request_id;
+    
+    if (!client->payload_error) {
+        size_t needed = client->payload_len + length + 1;
+        if (needed > CMD_MAX_PAYLOAD) {
+            client->payload_error = CMD_ETOOBIG;
+        } else {
+            if (needed > client->payload_cap) {
+                size_t cap = client->payload_cap ? client->payload_cap : CMD_FRAME_DATA + 1;
+                while (cap < needed) cap *= 2;
+                char *grown = realloc(client->payload, cap);
+                if (!grown) {
+                    client->payload_error = CMD_ETOOBIG;
+                } else {
+                    client->payload = grown;
+                    client->payload_cap = cap;
+                }
+            }
+            if (!client->payload_error) {
+                memcpy(client->payload + client->payload_len, frame->data, length);
+                client->payload_len += length;
+                client->payload[client->payload_len] = '\0';
+            }
+        }
+    }
+    
+    if (frame->flags & CMD_FLAG_MORE) {
+        return 0;
+    }
+    
+    if (client->payload_error) {
+        make_ack(ack, frame->request_id, client->payload_error, "payload too large");
+    } else {
+        char message[sizeof(ack->message)] = "ok";
+        int status = server->handler(frame->type, client->payload ? client->payload : "",
+                                     client->payload_len, message, sizeof(message), server->ctx);
+        make_ack(ack, frame->request_id, status, message);
+    }
+    
+    client->payload_len = 0;
+    client->payload_error = 0;
+    return 1;
+}
+
+/**
+ * Read everything available, handle complete frames, and answer all
+ * acks of this batch in one write. Returns -1 if the client went away.
+ */
+static int client_read(CommandServer *server, CommandClient *client) {
+    char buffer[16 * sizeof(CommandFrame)];
+    ssize_t n = recv(client->fd, buffer, sizeof(buffer), 0);
+    if (n <= 0) {
+        return (n < 0 && (errno == EAGAIN || errno == EINTR)) ? 0 : -1;
+    }
+    
+    CommandAck acks[sizeof(buffer) / sizeof(CommandFrame) + 1];
+    int num_acks = 0;
+    
+    for (ssize_t offset = 0; offset < n;) {
+        size_t take = sizeof(CommandFrame) - client->frame_bytes;
+        if (take > (size_t)(n - offset)) take = (size_t)(n - offset);
+        
+        memcpy((char*)&client->frame + client->frame_bytes, buffer + offset, take);
+        client->frame_bytes += take;
+        offset += take;
+        
+        if (client->frame_bytes == sizeof(CommandFrame)) {
+            client->frame_bytes = 0;
+            num_acks += client_handle_frame(server, client, &acks[num_acks]);
+        }
+    }
+    
+    if (num_acks > 0) {
+        size_t total = num_acks * sizeof(CommandAck);
+        const char *out = (const char*)acks;
+        while (total > 0) {
+            ssize_t sent = send(client->fd, out, total, MSG_NOSIGNAL);
+            if (sent < 0) {
+                if (errno == EINTR) continue;
+                return -1;
+            }
+            out += sent;
+            total -= sent;
+        }
+    }
+    
+    return 0;
+}
+
+static void* command_server_thread(void *arg) {
+    CommandServer *server = arg;
+    struct pollfd fds[CMD_MAX_CLIENTS + 1];
+    
+    while (server->running) {
+        int nfds = 0;
+        fds[nfds++] = (struct pollfd){ .fd = server->listen_fd, .events = POLLIN };
+        for (int i = 0; i < CMD_MAX_CLIENTS; i++) {
+            if (server->clients[i].fd >= 0) {
+                fds[nfds++] = (struct pollfd){ .fd = server->clients[i].fd, .events = POLLIN };
+            }
+        }
+        
+        // Short timeout so command_server_stop() is noticed
+        if (poll(fds, nfds, 200) <= 0) continue;
+        
+        for (int f = 1; f < nfds; f++) {
+            if (!fds[f].revents) continue;
+            for (int i = 0; i < CMD_MAX_CLIENTS; i++) {
+                if (server->clients[i].fd == fds[f].fd) {
+                    if (client_read(server, &server->clients[i]) < 0) {
+                        client_close(&server->clients[i]);
+                    }
+                    break;
+                }
+            }
+        }
+        
+        if (fds[0].revents & POLLIN) {
+            int fd = accept(server->listen_fd, NULL, NULL);
+            if (fd < 0) continue;
+            
+            int slot = -1;
+            for (int i = 0; i < CMD_MAX_CLIENTS; i++) {
+                if (server->clients[i].fd < 0) { slot = i; break; }
+            }
+            if (slot < 0) {
+                fprintf(stderr, "⚠️  Command server: too many clients\n");
+                close(fd);
+                continue;
+            }
+            server->clients[slot].fd = fd;
+        }
+    }
+    
+    return NULL;
+}
+
+CommandServer* command_server_start(const char *path, command_handler_fn handler, void *ctx) {
+    CommandServer *server = calloc(1, sizeof(CommandServer));
+    if (!server) return NULL;
+    
+    server->handler = handler;
+    server->ctx = ctx;
+    strncpy(server->path, path, sizeof(server->path) - 1);
+    for (int i = 0; i < CMD_MAX_CLIENTS; i++) {
+        server->clients[i].fd = -1;
+    }
+    
+    server->listen_fd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (server->listen_fd < 0) {
+        perror("socket");
+        free(server);
+        return NULL;
+    }
+    
+    struct sockaddr_un addr = { .sun_family = AF_UNIX };
+    strncpy(addr.sun_path, server->path, sizeof(addr.sun_path) - 1);
+    unlink(server->path);  // stale socket from a previous run
+    
+    if (bind(server->listen_fd, (struct sockaddr*)&addr, sizeof(addr)) < 0 ||
+        listen(server->listen_fd, CMD_MAX_CLIENTS) < 0) {
+        perror("command socket");
+        close(server->listen_fd);
+        free(server);
+        return NULL;
+    }
+    
+    server->running = 1;
+    if (pthread_create(&server->thread, NULL, command_server_thread, server) != 0) {
+        close(server->listen_fd);
+        unlink(server->path);
+        free(server);
+        return NULL;
+    }
+    
+    return server;
+}
+
+void command_server_stop(CommandServer *server) {
+    if (!server) return;
+    
+    server->running = 0;
+    pthread_join(server->thread, NULL);
+    
+    for (int i = 0; i < CMD_MAX_CLIENTS; i++) {
+        if (server->clients[i].fd >= 0) client_close(&server->clients[i]);
+    }
+    close(server->listen_fd);
+    unlink(server->path);
+    free(server);
+}
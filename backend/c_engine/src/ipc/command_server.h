@@ -0,0 +1,67 @@
+/**
+ * DRAIZER V2 - Command Server
+ * Persistent Unix socket command channel (Python: engine_commands.py)
+ *
+ * Clients keep one connection open and may pipeline any number of
+ * fixed-size frames in one write. A payload longer than one frame is
+ * split over consecutive frames of the same request_id, all but the last
+ * flagged CMD_FLAG_MORE. Every complete command gets exactly one ack.
+ */
+
+#ifndef COMMAND_SERVER_H
+#define COMMAND_SERVER_H
+
+#include <stdint.h>
+#include <stddef.h>
+
+#define CMD_FRAME_DATA 256
+#define CMD_FLAG_MORE 0x1
+#define CMD_MAX_PAYLOAD (64 * 1024)
+#define CMD_MAX_CLIENTS 8
+
+// Command types (Must match Python COMMAND_TYPES!)
+#define CMD_START 0
+#define CMD_STOP 1
+#define CMD_UPDATE_CONFIG 2
+#define CMD_SHUTDOWN 3
+#define CMD_PING 4
+
+// Ack status
+#define CMD_OK 0
+#define CMD_EUNKNOWN -1     // unknown command type
+#define CMD_EINVAL -2       // payload rejected
+#define CMD_ETOOBIG -3      // payload over CMD_MAX_PAYLOAD
+
+// Request frame (Must match Python struct!)
+typedef struct __attribute__((packed)) {
+    uint32_t request_id;
+    uint16_t type;
+    uint16_t flags;           // CMD_FLAG_MORE: payload continues in the next frame
+    uint32_t length;          // bytes of data used in this frame
+    char data[CMD_FRAME_DATA];
+} CommandFrame;
+
+// Reply frame (Must match Python struct!)
+typedef struct __attribute__((packed)) {
+    uint32_t request_id;
+    int32_t status;           // CMD_OK or CMD_E*
+    char message[56];
+} CommandAck;
+
+_Static_assert(sizeof(CommandFrame) == 268, "CommandFrame layout changed: update engine_layout.py");
+_Static_assert(sizeof(CommandAck) == 64, "CommandAck layout changed: update engine_layout.py");
+
+/**
+ * Apply one command
+ * Runs on the command server thread. Returns CMD_OK or CMD_E* and may
+ * write a short human-readable message.
+ */
+typedef int (*command_handler_fn)(uint16_t type, const char *payload, size_t length,
+                                  char *message, size_t message_size, void *ctx);
+
+typedef struct CommandServer CommandServer;
+
+CommandServer* command_server_start(const char *path, command_handler_fn handler, void *ctx);
+void command_server_stop(CommandServer *server);
+
+#endif // COMMAND_SERVER_H
@@ -38,7 +38,19 @@ SharedMemory* shm_create(const char *name, size_t size) {
     // Zero out
     memset(ptr, 0, size);
     
-    return (SharedMemory*)ptr;
+    // Layout handshake for readers
+    SharedMemory *shm = (SharedMemory*)ptr;
+    shm->layout_version = SHM_LAYOUT_VERSION;
+    shm->layout_size = (uint32_t)size;
+    
+    // Let readers convert CachedPrice.timestamp_tsc (timestamp_init() must have run)
+    struct timespec now;
+    clock_gettime(CLOCK_REALTIME, &now);
+    shm->tsc_to_ns = g_tsc_to_ns_multiplier;
+    shm->clock_ref_tsc = rdtsc();
+    shm->clock_ref_epoch_ns = (uint64_t)now.tv_sec * 1000000000ULL + (uint64_t)now.tv_nsec;
+    
+    return shm;
 }
 
 void shm_destroy(SharedMemory *shm, const char *name, size_t size) {
@@ -48,7 +60,28 @@ void shm_destroy(SharedMemory *shm, const char *name, size_t size) {
     shm_unlink(name);
 }
 
+uint32_t shm_latency_bucket(uint64_t latency_us) {
+    const uint64_t sub = 1u << SHM_LATENCY_SUB_BITS;
+    
+    // Small values: one bucket each
+    if (latency_us < sub) return (uint32_t)latency_us;
+    
+    // Power of two split into `sub` equal buckets (Python: latency_bucket_bounds)
+    uint32_t msb = 63 - __builtin_clzll(latency_us);
+    uint32_t shift = msb - SHM_LATENCY_SUB_BITS;
+    uint64_t idx = (uint64_t)(shift + 1) * sub + ((latency_us >> shift) - sub);
+    
+    return idx < SHM_LATENCY_BUCKETS ? (uint32_t)idx : SHM_LATENCY_BUCKETS - 1;
+}
+
 void shm_update_stats(SharedMemory *shm, uint64_t latency_us) {
+    shm_stats_write_begin(shm);
+    
+    // Histogram (single writer, relaxed is enough for monotonic counters)
+    __atomic_fetch_add(&shm->latency_hist[shm_latency_bucket(latency_us)], 1, __ATOMIC_RELAXED);
+    __atomic_fetch_add(&shm->latency_sum_us, latency_us, __ATOMIC_RELAXED);
+    __atomic_fetch_add(&shm->latency_count, 1, __ATOMIC_RELAXED);
+    
     // Update latency (simple moving average)
     uint32_t avg = __atomic_load_n(&shm->avg_latency_us, __ATOMIC_RELAXED);
     uint32_t new_avg = (avg * 9 + latency_us) / 10;  // EMA
@@ -61,6 +94,8 @@ void shm_update_stats(SharedMemory *shm, uint64_t latency_us) {
     
     // Update timestamp
     __atomic_store_n(&shm->last_update_ns, get_time_ns(), __ATOMIC_RELEASE);
+    
+    shm_stats_write_end(shm);
 }
 
 void shm_push_operation(SharedMemory *shm, const ShmOperation *op) {
@@ -9,9 +9,17 @@
 #include <stdint.h>
 #include <stdbool.h>
 #include <stddef.h>
+#include "../data/price_cache.h"
 
 #define SHM_OPERATION_RING_SIZE 100
 
+// Bump on ANY change to ShmOperation/SharedMemory (Python: engine_layout.py)
+#define SHM_LAYOUT_VERSION 5
+
+// Latency histogram: log-linear buckets (8 per power of two), see shm_latency_bucket()
+#define SHM_LATENCY_SUB_BITS 3
+#define SHM_LATENCY_BUCKETS 160
+
 // Операция для передачи на фронт (Must match Python struct!)
 typedef struct __attribute__((packed)) {
     uint64_t id;
@@ -66,11 +74,61 @@ typedef struct __attribute__((packed)) {
     volatile uint32_t operations_head;  // Где писать следующую
     volatile uint32_t operations_tail;  // Откуда читать (Python)
     uint64_t total_operations;
+    
+    // Layout handshake (checked by Python on connect)
+    uint32_t layout_version;            // SHM_LAYOUT_VERSION
+    uint32_t layout_size;               // sizeof(SharedMemory)
+    
+    // Latency histogram (µs), appended after the handshake
+    uint64_t latency_hist[SHM_LATENCY_BUCKETS];
+    uint64_t latency_count;
+    uint64_t latency_sum_us;
+    
+    // TSC clock reference: epoch_ns = clock_ref_epoch_ns + (tsc - clock_ref_tsc) * tsc_to_ns
+    double tsc_to_ns;
+    uint64_t clock_ref_tsc;
+    uint64_t clock_ref_epoch_ns;
+    
+    // Stats seqlock: odd while any stats header field is being written
+    // (see shm_stats_write_begin/end; Python retries copies across it)
+    uint64_t stats_seq;
+    uint8_t padding3[40];               // cache-line align the price cache
+    
+    // Live top-of-book (seqlock entries, see price_cache.h)
+    PriceCache prices;
 } SharedMemory;
 
+_Static_assert(sizeof(ShmOperation) == 172, "ShmOperation layout changed: update engine_layout.py");
+_Static_assert(offsetof(SharedMemory, prices) % 64 == 0, "price cache must be cache-line aligned");
+
+/**
+ * Writer side of the stats seqlock. Every write to the stats header
+ * (counters, profit, balance, flags, latency) goes between begin and end.
+ * Writers from several threads (main loop, command server) are
+ * serialized by the CAS: begin waits for an even sequence.
+ */
+static inline void shm_stats_write_begin(SharedMemory *shm) {
+    uint64_t seq = __atomic_load_n(&shm->stats_seq, __ATOMIC_RELAXED);
+    for (;;) {
+        if ((seq & 1) == 0 &&
+            __atomic_compare_exchange_n(&shm->stats_seq, &seq, seq + 1, false,
+                                        __ATOMIC_ACQUIRE, __ATOMIC_RELAXED)) {
+            break;
+        }
+        seq = __atomic_load_n(&shm->stats_seq, __ATOMIC_RELAXED);
+    }
+    // Field stores below must not become visible before the odd sequence
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+}
+
+static inline void shm_stats_write_end(SharedMemory *shm) {
+    __atomic_fetch_add(&shm->stats_seq, 1, __ATOMIC_RELEASE);
+}
+
 SharedMemory* shm_create(const char *name, size_t size);
 void shm_destroy(SharedMemory *shm, const char *name, size_t size);
 void shm_update_stats(SharedMemory *shm, uint64_t latency_us);
+uint32_t shm_latency_bucket(uint64_t latency_us);
 
 // Добавить операцию в ring buffer
 void shm_push_operation(SharedMemory *shm, const ShmOperation *op);
@@ -29,6 +29,7 @@
 #include "risk/risk_manager.h"
 #include "risk/hft_risk_manager.h"
 #include "ipc/shared_memory.h"
+#include "ipc/command_server.h"
 #include "network/exchange.h"
 // NEW: Bitfinex + Deribit WebSocket clients
 #include "network/bitfinex_ws.h"
@@ -62,6 +63,7 @@ static StatisticalStrategy *g_statistical = NULL;
 static RiskManager *g_risk_manager = NULL;  // Legacy
 static HFTRiskManager *g_hft_risk = NULL;   // New HFT risk manager
 static SharedMemory *g_shm = NULL;
+static CommandServer *g_command_server = NULL;
 static SPSCRingBuffer *g_price_feed = NULL;
 
 // NEW: Bitfinex + Deribit clients
@@ -95,6 +97,85 @@ void signal_handler(int signo) {
     g_running = 0;
 }
 
+// Strategy name -> SharedMemory.strategy_enabled index (-1 if unknown)
+static int strategy_index(const char *name) {
+    static const char *names[] = {"cross_exchange", "funding_rate", "triangular"};
+    for (int i = 0; i < 3; i++) {
+        if (name && strcmp(name, names[i]) == 0) return i;
+    }
+    return -1;
+}
+
+/**
+ * Apply a command from the backend (runs on the command server thread)
+ */
+static int handle_command(uint16_t type, const char *payload, size_t length,
+                          char *message, size_t message_size, void *ctx) {
+    (void)ctx;
+    
+    if (type == CMD_PING) {
+        snprintf(message, message_size, "pong");
+        return CMD_OK;
+    }
+    
+    if (type == CMD_SHUTDOWN) {
+        g_running = 0;
+        snprintf(message, message_size, "shutting down");
+        return CMD_OK;
+    }
+    
+    if (type != CMD_START && type != CMD_STOP && type != CMD_UPDATE_CONFIG) {
+        snprintf(message, message_size, "unknown command %u", type);
+        return CMD_EUNKNOWN;
+    }
+    
+    yyjson_doc *doc = yyjson_read(payload, length, 0);
+    yyjson_val *root = doc ? yyjson_doc_get_root(doc) : NULL;
+    if (!root || !yyjson_is_obj(root)) {
+        yyjson_doc_free(doc);
+        snprintf(message, message_size, "invalid JSON");
+        return CMD_EINVAL;
+    }
+    
+    int status = CMD_OK;
+    
+    if (type == CMD_START || type == CMD_STOP) {
+        // {"strategy": "cross_exchange"}
+        int idx = strategy_index(yyjson_get_str(yyjson_obj_get(root, "strategy")));
+        if (idx < 0) {
+            snprintf(message, message_size, "unknown strategy");
+            status = CMD_EINVAL;
+        } else {
+            shm_stats_write_begin(g_shm);
+            __atomic_store_n(&g_shm->strategy_enabled[idx], type == CMD_START, __ATOMIC_RELEASE);
+            shm_stats_write_end(g_shm);
+            snprintf(message, message_size, "strategy %d %s", idx, type == CMD_START ? "started" : "stopped");
+        }
+    } else {
+        // Hot-reloadable part of the config file: strategies.<name>.enabled
+        int applied = 0;
+        yyjson_val *strategies = yyjson_obj_get(root, "strategies");
+        yyjson_val *key, *val;
+        yyjson_obj_iter iter;
+        yyjson_obj_iter_init(strategies, &iter);
+        while ((key = yyjson_obj_iter_next(&iter))) {
+            val = yyjson_obj_iter_get_val(key);
+            int idx = strategy_index(yyjson_get_str(key));
+            yyjson_val *enabled = yyjson_obj_get(val, "enabled");
+            if (idx >= 0 && yyjson_is_bool(enabled)) {
+                shm_stats_write_begin(g_shm);
+                __atomic_store_n(&g_shm->strategy_enabled[idx], yyjson_get_bool(enabled), __ATOMIC_RELEASE);
+                shm_stats_write_end(g_shm);
+                applied++;
+            }
+        }
+        snprintf(message, message_size, "applied %d strategy toggles", applied);
+    }
+    
+    yyjson_doc_free(doc);
+    return status;
+}
+
 int load_config(const char *path, EngineConfig *config) {
     // Load JSON config from file
     FILE *fp = fopen(path, "r");
@@ -241,13 +322,31 @@ int initialize_components(EngineConfig *config) {
     // 1. Initialize timestamp system
     timestamp_init();
     
-    // 2. Create price cache
-    g_price_cache = price_cache_create();
-    if (!g_price_cache) {
-        fprintf(stderr, "❌ Failed to create price cache\n");
+    // 2. Create shared memory IPC (для передачи данных в Python)
+    //    The price cache lives inside it so Python reads top-of-book directly
+    g_shm = shm_create("/draizer_v2", sizeof(SharedMemory));
+    if (!g_shm) {
+        fprintf(stderr, "❌ Failed to create shared memory\n");
         return -1;
     }
-    printf("   ✓ Price cache: Ready\n");
+    shm_stats_write_begin(g_shm);
+    g_shm->engine_running = true;
+    g_shm->strategy_enabled[0] = true;  // spot_futures
+    g_shm->strategy_enabled[1] = true;  // statistical
+    g_shm->balance_usd = config->capital_usd;
+    shm_stats_write_end(g_shm);
+    printf("   ✓ IPC: Shared memory mapped (/draizer_v2)\n");
+    
+    g_price_cache = &g_shm->prices;
+    printf("   ✓ Price cache: Ready (shared, %d slots)\n", MAX_SYMBOLS);
+    
+    // Command channel from the backend (start/stop strategy, config, shutdown)
+    g_command_server = command_server_start("/tmp/draizer_v2.sock", handle_command, NULL);
+    if (!g_command_server) {
+        fprintf(stderr, "❌ Failed to start command server\n");
+        return -1;
+    }
+    printf("   ✓ IPC: Command socket listening (/tmp/draizer_v2.sock)\n");
     
     // 3. Create SPSC price feed
     g_price_feed = spsc_create(4096);
@@ -314,18 +413,6 @@ int initialize_components(EngineConfig *config) {
     printf("   ✓ HFT Risk Manager: Active ($%.2f, %s mode)\n", 
            config->capital_usd, config->paper_mode ? "PAPER" : "LIVE");
     
-    // 9. Create shared memory IPC (для передачи данных в Python)
-    g_shm = shm_create("/draizer_v2", sizeof(SharedMemory));
-    if (!g_shm) {
-        fprintf(stderr, "❌ Failed to create shared memory\n");
-        return -1;
-    }
-    g_shm->engine_running = true;
-    g_shm->strategy_enabled[0] = true;  // spot_futures
-    g_shm->strategy_enabled[1] = true;  // statistical
-    g_shm->balance_usd = config->capital_usd;
-    printf("   ✓ IPC: Shared memory mapped (/draizer_v2)\n");
-    
     return 0;
 }
 
@@ -637,7 +724,10 @@ void main_event_loop() {
         
         // 3. NEW: Run Spot-Futures arbitrage detection
         Opportunity opportunities[10];  // Max 10 opportunities per cycle
-        int num_opps = spot_futures_detect(g_spot_futures, opportunities, 10, g_funding_rates);
+        int num_opps = 0;
+        if (__atomic_load_n(&g_shm->strategy_enabled[0], __ATOMIC_ACQUIRE)) {  // toggled via command channel
+            num_opps = spot_futures_detect(g_spot_futures, opportunities, 10, g_funding_rates);
+        }
         
         if (num_opps > 0) {
             opps_this_second += num_opps;
@@ -689,17 +779,17 @@ void main_event_loop() {
                         fflush(stdout);
                     }
                     
-                    // Update stats
-                    __atomic_fetch_add(&g_shm->opps_executed, 1, __ATOMIC_RELAXED);
-                    __atomic_fetch_add(&g_shm->orders_placed, 2, __ATOMIC_RELAXED);
-                    __atomic_fetch_add(&g_shm->orders_filled, 2, __ATOMIC_RELAXED);
-                    
                     risk_manager_update_balance(g_risk_manager, profit);
                     hft_risk_record_trade(g_hft_risk, 0, profit, latency_us);
                     
-                    // Update balance in shared memory
+                    // Update stats + balance in shared memory (one seqlock section)
+                    shm_stats_write_begin(g_shm);
+                    __atomic_fetch_add(&g_shm->opps_executed, 1, __ATOMIC_RELAXED);
+                    __atomic_fetch_add(&g_shm->orders_placed, 2, __ATOMIC_RELAXED);
+                    __atomic_fetch_add(&g_shm->orders_filled, 2, __ATOMIC_RELAXED);
                     g_shm->total_profit_usd += profit;
                     g_shm->balance_usd = g_hft_risk->balance_usd;
+                    shm_stats_write_end(g_shm);
                     
                     // 6. Push operation to frontend via shared memory
                     ShmOperation shm_op = {0};
@@ -727,7 +817,9 @@ void main_event_loop() {
         }
         
         // Update shared memory
+        shm_stats_write_begin(g_shm);
         __atomic_store_n(&g_shm->opps_detected, g_cross_exchange->opps_detected, __ATOMIC_RELAXED);
+        shm_stats_write_end(g_shm);
         
         // Calculate loop latency
         uint64_t loop_end = rdtsc();
@@ -767,9 +859,18 @@ void cleanup() {
         printf("   ✓ Deribit client destroyed\n");
     }
     
+    // Stop accepting commands before shared memory goes away
+    if (g_command_server) {
+        command_server_stop(g_command_server);
+        g_command_server = NULL;
+        printf("   ✓ Command server stopped\n");
+    }
+    
     // Close shared memory
     if (g_shm) {
+        shm_stats_write_begin(g_shm);
         g_shm->engine_running = false;
+        shm_stats_write_end(g_shm);
         shm_destroy(g_shm, "/draizer_v2", sizeof(SharedMemory));
         printf("   ✓ Shared memory unmapped\n");
     }
@@ -803,11 +904,8 @@ void cleanup() {
     }
     
     // Destroy data structures
-    if (g_price_cache) {
-        price_cache_destroy(g_price_cache);
-        g_price_cache = NULL;
-        printf("   ✓ Price cache destroyed\n");
-    }
+    // Price cache is part of shared memory, released with it
+    g_price_cache = NULL;
     
     if (g_price_feed) {
         spsc_destroy(g_price_feed);
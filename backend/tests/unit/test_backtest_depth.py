@@ -0,0 +1,45 @@
+"""
+Backtest depth slippage: recorded books within depth_max_age_ns, else slippage_bps
+"""
+
+import pytest
+
+from app.services.depth_archive import DepthArchive
+
+backtest_service = pytest.importorskip('app.services.backtest_service')
+
+pytestmark = pytest.mark.unit
+
+START_NS = 1_792_000_000 * 1_000_000_000
+SECOND = 1_000_000_000
+
+BIDS = [(100.0, 0.5), (99.9, 0.5), (99.8, 5.0)]
+ASKS = [(100.1, 0.5), (100.2, 0.5), (100.3, 5.0)]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    archive = DepthArchive(str(tmp_path), depth=5, keyframe_seconds=30)
+    for exchange in ('binance', 'bybit'):
+        archive.record(exchange, 'BTCUSDT', START_NS, BIDS, ASKS)
+    monkeypatch.setattr(backtest_service, 'get_depth_archive', lambda: archive)
+    monkeypatch.setattr(backtest_service, 'OrderbookRecorder', lambda db: None)
+    return backtest_service.BacktestEngine(db=None)
+
+
+def test_fresh_books_walk_the_levels(engine):
+    slippage = engine._depth_slippage_bps('BTCUSDT', 'binance', 'bybit', START_NS + 5 * SECOND)
+    assert slippage != engine.slippage_bps
+    assert slippage > 0
+
+
+def test_stale_books_fall_back_to_slippage_bps(engine):
+    # The cursor opens depth_max_age_ns before the query: the book found there is an hour old
+    at = START_NS + 3600 * SECOND
+    assert engine._depth_slippage_bps('BTCUSDT', 'binance', 'bybit', at) == engine.slippage_bps
+
+
+def test_book_ages_out_along_one_cursor(engine):
+    assert engine._depth_slippage_bps('BTCUSDT', 'binance', 'bybit', START_NS + SECOND) != engine.slippage_bps
+    at = START_NS + engine.depth_max_age_ns + SECOND
+    assert engine._depth_slippage_bps('BTCUSDT', 'binance', 'bybit', at) == engine.slippage_bps
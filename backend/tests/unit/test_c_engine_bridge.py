@@ -0,0 +1,197 @@
+"""
+C engine bridge: stats seqlock, operations ring copies and client cursors,
+read from a fake segment laid out with engine_layout
+"""
+
+import numpy as np
+import pytest
+
+from app.services import c_engine_bridge
+from app.services.c_engine_bridge import CEngineBridge
+from app.services.engine_layout import OPERATION_DTYPE, SHARED_MEMORY
+
+pytestmark = pytest.mark.unit
+
+RING = CEngineBridge.OPERATION_RING_SIZE
+
+
+def _stats(opps_detected: int) -> tuple:
+    return (True, b'\x01\x00\x00', opps_detected, 1, 2, 3, 4.5, 1000.0, 5, 6, 0.5, 7, 8, 9, 10)
+
+
+class FakeSegment:
+    """Writable buffer with the SharedMemory layout, standing in for the mmap"""
+    
+    def __init__(self):
+        self.buffer = bytearray(SHARED_MEMORY.size)
+        self.slots = np.frombuffer(
+            self.buffer, dtype=OPERATION_DTYPE, count=RING, offset=CEngineBridge.OFFSET_OPERATIONS
+        )
+    
+    def write_stats(self, values: tuple, seq: int):
+        CEngineBridge.STATS_STRUCT.pack_into(self.buffer, 0, *values)
+        CEngineBridge.U64_STRUCT.pack_into(self.buffer, CEngineBridge.OFFSET_STATS_SEQ, seq)
+    
+    def push_operations(self, start: int, stop: int):
+        """Operations start..stop-1 written like the engine: slot n % RING, id n + 1"""
+        for seq in range(start, stop):
+            self.slots[seq % RING]['id'] = seq + 1
+        self.set_total(stop)
+    
+    def set_total(self, total: int):
+        CEngineBridge.U64_STRUCT.pack_into(self.buffer, CEngineBridge.OFFSET_TOTAL_OPERATIONS, total)
+
+
+@pytest.fixture
+def segment():
+    return FakeSegment()
+
+
+@pytest.fixture
+def bridge(segment):
+    bridge = CEngineBridge()
+    bridge.shm = segment.buffer
+    bridge.connected = True
+    return bridge
+
+
+def _seq_reads(bridge, monkeypatch, values):
+    """stats_seq reads return `values` in turn (the engine writing meanwhile)"""
+    values = iter(values)
+    read_u64 = bridge._read_u64
+    monkeypatch.setattr(bridge, '_read_u64', lambda offset: (
+        next(values) if offset == bridge.OFFSET_STATS_SEQ else read_u64(offset)
+    ))
+
+
+# ==================== STATS SEQLOCK ====================
+
+def test_stable_stats_are_decoded(bridge, segment):
+    segment.write_stats(_stats(42), seq=2)
+    assert bridge.read_stats_snapshot() == _stats(42)
+    assert bridge.get_stats()['opportunities_detected'] == 42
+    assert bridge.stats_torn_reads == 0
+
+
+@pytest.mark.parametrize('reads', [
+    [1, 3, 4, 4],        # odd (writing) twice, then stable
+    [2, 4, 4, 4],        # changed during the copy, then stable
+    [5, 6, 8, 9, 10, 10],
+])
+def test_torn_stats_are_retried(bridge, segment, monkeypatch, reads):
+    segment.write_stats(_stats(7), seq=0)
+    _seq_reads(bridge, monkeypatch, reads)
+    assert bridge.read_stats_snapshot() == _stats(7)
+    assert bridge.stats_torn_reads == 0
+
+
+def test_torn_stats_fall_back_to_the_last_good_snapshot(bridge, segment, monkeypatch):
+    assert bridge.read_stats_snapshot() is not None  # seq 0: stable zeros
+    segment.write_stats(_stats(1), seq=2)
+    assert bridge.read_stats_snapshot() == _stats(1)
+    
+    # Engine keeps writing through every retry: the copy would be half new, half old
+    segment.write_stats(_stats(2), seq=3)
+    assert bridge.read_stats_snapshot() == _stats(1)
+    _seq_reads(bridge, monkeypatch, [4, 6] * bridge.STATS_SNAPSHOT_RETRIES)
+    assert bridge.read_stats_snapshot() == _stats(1)
+    assert bridge.stats_torn_reads == 2
+
+
+def test_no_good_snapshot_yet_is_none(bridge, segment):
+    segment.write_stats(_stats(1), seq=1)
+    assert bridge.read_stats_snapshot() is None
+    assert bridge.stats_torn_reads == 1
+
+
+# ==================== OPERATIONS RING ====================
+
+def _ids(ops) -> list:
+    return ops['id'].tolist()
+
+
+@pytest.mark.parametrize('total, start', [(0, 0), (30, 0), (30, 12), (30, 30), (250, 0), (250, 200), (250, 260)])
+def test_copy_returns_complete_slots_in_order(bridge, segment, total, start):
+    segment.push_operations(0, total)
+    ops, first_seq, end_seq = bridge.copy_operations(start)
+    
+    assert end_seq == total
+    assert first_seq == min(max(start, total - (RING - 1)), total)
+    assert _ids(ops) == list(range(first_seq + 1, end_seq + 1))
+
+
+@pytest.mark.parametrize('written_during_copy', [1, 20, RING - 1, 3 * RING])
+def test_writer_lapping_the_copy_cuts_overwritten_slots(bridge, segment, monkeypatch, written_during_copy):
+    segment.push_operations(0, 150)
+    totals = iter([150, 150 + written_during_copy])
+    monkeypatch.setattr(bridge, 'read_total_operations', lambda: next(totals))
+    
+    ops, first_seq, end_seq = bridge.copy_operations(0)
+    
+    # Slot of n is reused by n + RING: only n >= total after the copy - (RING - 1) is intact
+    safe_seq = 150 + written_during_copy - (RING - 1)
+    assert end_seq == 150
+    assert first_seq == min(max(51, safe_seq), 150)
+    assert _ids(ops) == list(range(first_seq + 1, 151))
+
+
+def test_cursor_counts_lapped_operations_as_dropped(bridge, segment):
+    cursor = bridge.get_cursor('test')
+    segment.push_operations(0, 40)
+    assert _ids(bridge.read_new_operations(cursor, limit=25)) == list(range(1, 26))
+    
+    segment.push_operations(40, 300)
+    ops = bridge.read_new_operations(cursor, limit=RING)
+    assert _ids(ops) == list(range(202, 301))
+    assert (cursor.position, cursor.dropped, cursor.delivered) == (300, 300 - 25 - (RING - 1), 25 + RING - 1)
+
+
+def test_cursor_rewinds_on_engine_restart(bridge, segment):
+    segment.push_operations(0, 50)
+    cursor = bridge.get_cursor('test', from_latest=True)
+    assert cursor.position == 50
+    
+    segment.push_operations(0, 10)  # new run: total went back
+    assert _ids(bridge.read_new_operations(cursor)) == list(range(1, 11))
+
+
+# ==================== CURSOR EVICTION ====================
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(c_engine_bridge.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_client_cursors_beyond_the_cap_are_evicted_lru_first(bridge, clock, monkeypatch):
+    monkeypatch.setattr(bridge, 'MAX_CURSORS', 3)
+    bridge.get_cursor('journal')  # internal consumers are never evicted
+    for name in ('a', 'b', 'c'):
+        bridge.get_cursor(name, evictable=True)
+        clock[0] += 1
+    bridge.get_cursor('a', evictable=True)  # a is now the most recently used
+    
+    bridge.get_cursor('d', evictable=True)
+    assert list(bridge._cursors) == ['journal', 'c', 'a', 'd']
+    bridge.get_cursor('e', evictable=True)
+    assert list(bridge._cursors) == ['journal', 'a', 'd', 'e']
+
+
+def test_idle_client_cursors_expire(bridge, segment, clock):
+    segment.push_operations(0, 20)
+    stale = bridge.get_cursor('stale', evictable=True)
+    bridge.read_new_operations(stale)
+    bridge.get_cursor('journal')
+    clock[0] += bridge.CURSOR_IDLE_SECONDS / 2
+    bridge.get_cursor('fresh', evictable=True)
+    
+    clock[0] += bridge.CURSOR_IDLE_SECONDS / 2 + 1
+    bridge.get_cursor('new', evictable=True)
+    assert list(bridge._cursors) == ['journal', 'fresh', 'new']
+    
+    # An evicted consumer starts over
+    assert bridge.get_cursor('stale', evictable=True).position == 0
+    clock[0] += 10 * bridge.CURSOR_IDLE_SECONDS
+    bridge.get_cursor('other', evictable=True)
+    assert 'journal' in bridge._cursors
@@ -0,0 +1,118 @@
+"""
+Depth archive: books rebuilt from keyframes + deltas equal the recorded ones
+"""
+
+import numpy as np
+import pytest
+
+from app.services.depth_archive import DELTA, KEYFRAME, DepthArchive, decode_record, encode_record
+
+pytestmark = pytest.mark.unit
+
+DEPTH = 5
+START_NS = 1_792_000_000 * 1_000_000_000
+SECOND = 1_000_000_000
+
+
+def _books(count: int = 400, seed: int = 0):
+    """(timestamp_ns, bids, asks) with levels moving in and out of the top DEPTH"""
+    rng = np.random.default_rng(seed)
+    books = []
+    timestamp_ns = START_NS
+    for _ in range(count):
+        timestamp_ns += int(rng.integers(1, 3 * SECOND))
+        mid = 100 + int(rng.integers(-3, 4))
+        bids = [(round(mid - 0.01 * k, 2), round(float(rng.uniform(0.1, 5)), 3)) for k in rng.choice(20, 8, replace=False) + 1]
+        asks = [(round(mid + 0.01 * k, 2), round(float(rng.uniform(0.1, 5)), 3)) for k in rng.choice(20, 8, replace=False) + 1]
+        books.append((timestamp_ns, bids, asks))
+    return books
+
+
+def _top(levels, reverse):
+    return sorted(levels, reverse=reverse)[:DEPTH]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return DepthArchive(str(tmp_path), depth=DEPTH, keyframe_seconds=30)
+
+
+def _record(archive, books):
+    for timestamp_ns, bids, asks in books:
+        assert archive.record('binance', 'BTCUSDT', timestamp_ns, bids, asks)
+
+
+def test_record_codec_roundtrip():
+    bids = [(100.25, 1.5), (100.0, 0.001), (99.75, 0.0)]
+    asks = [(100.5, 2.0)]
+    data = np.frombuffer(encode_record(START_NS, DELTA, bids, asks), dtype=np.uint8)
+    header, decoded_bids, decoded_asks, end = decode_record(data, 0)
+    assert (int(header['timestamp_ns']), int(header['kind']), end) == (START_NS, DELTA, len(data))
+    assert decoded_bids.tolist() == [list(level) for level in bids]
+    assert decoded_asks.tolist() == [list(level) for level in asks]
+
+
+def test_book_at_matches_recorded_books(archive):
+    books = _books()
+    _record(archive, books)
+    assert archive.keyframes > 1 and archive.deltas > 0
+    
+    for timestamp_ns, bids, asks in books:
+        for at in (timestamp_ns, timestamp_ns + 1):
+            book = archive.book_at('binance', 'BTCUSDT', at)
+            assert book.timestamp_ns == timestamp_ns
+            assert book.bids.tolist() == [list(level) for level in _top(bids, reverse=True)]
+            assert book.asks.tolist() == [list(level) for level in _top(asks, reverse=False)]
+    
+    assert archive.book_at('binance', 'BTCUSDT', books[0][0] - 1) is None
+
+
+def test_cursor_matches_book_at(archive):
+    books = _books(seed=2)
+    _record(archive, books)
+    cursor = archive.cursor('binance', 'BTCUSDT', books[0][0])
+    for timestamp_ns, _, _ in books[::7]:
+        expected = archive.book_at('binance', 'BTCUSDT', timestamp_ns)
+        book = cursor.at(timestamp_ns)
+        assert book.bids.tolist() == expected.bids.tolist()
+        assert book.asks.tolist() == expected.asks.tolist()
+
+
+def test_book_keeps_its_capture_time(archive):
+    books = _books(20, seed=4)
+    _record(archive, books)
+    last_ns = books[-1][0]
+    
+    # A book from an hour ago is still that old when looked up now
+    assert archive.book_at('binance', 'BTCUSDT', last_ns + 3600 * SECOND).timestamp_ns == last_ns
+    cursor = archive.cursor('binance', 'BTCUSDT', last_ns + 3590 * SECOND)
+    assert cursor.at(last_ns + 3600 * SECOND).timestamp_ns == last_ns
+    
+    cursor = archive.cursor('binance', 'BTCUSDT', books[5][0] + 1)
+    assert [cursor.at(timestamp_ns).timestamp_ns for timestamp_ns, _, _ in books[6:]] == [timestamp_ns for timestamp_ns, _, _ in books[6:]]
+
+
+def test_torn_trailing_record_is_ignored_then_cut(archive, tmp_path):
+    books = _books(50, seed=3)
+    _record(archive, books)
+    day = archive.days('binance', 'BTCUSDT')[0]
+    path = archive._path('binance', 'BTCUSDT', day, 'depth')
+    size = path.stat().st_size
+    
+    # Crash mid-write: half a keyframe (with its index entry) after the last record
+    torn = encode_record(books[-1][0] + SECOND, KEYFRAME, books[0][1], books[0][2])
+    with open(path, 'ab') as f:
+        f.write(torn[:len(torn) // 2])
+    with open(archive._path('binance', 'BTCUSDT', day, 'keys'), 'ab') as f:
+        f.write(np.array([(books[-1][0] + SECOND, size)], dtype=[('timestamp_ns', '<i8'), ('offset', '<i8')]).tobytes())
+    
+    last_ns, bids, asks = books[-1]
+    book = archive.book_at('binance', 'BTCUSDT', last_ns + 2 * SECOND)
+    assert book.bids.tolist() == [list(level) for level in _top(bids, reverse=True)]
+    
+    restarted = DepthArchive(str(tmp_path), depth=DEPTH, keyframe_seconds=30)
+    restarted.record('binance', 'BTCUSDT', last_ns + 3 * SECOND, books[0][1], books[0][2])
+    assert restarted.book_at('binance', 'BTCUSDT', last_ns + SECOND).bids.tolist() == book.bids.tolist()
+    assert restarted.book_at('binance', 'BTCUSDT', last_ns + 3 * SECOND).asks.tolist() == [
+        list(level) for level in _top(books[0][2], reverse=False)
+    ]
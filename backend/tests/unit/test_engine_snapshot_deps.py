@@ -0,0 +1,117 @@
+"""
+Conditional engine snapshots: ETag / If-None-Match → 304, long-poll on ?wait_ms=
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException, Request, Response
+
+from app.api import deps
+from app.services.engine_hub import EngineSnapshot
+
+pytestmark = pytest.mark.unit
+
+ETAG = '"1a-2b-3c"'
+
+
+class StubHub:
+    """snapshot() / wait_for_change() of EngineHub over a settable etag"""
+    
+    def __init__(self, etag: str = ETAG):
+        self._snapshot = EngineSnapshot(sequence=1, etag=etag)
+        self._advanced = asyncio.Event()
+        self.waits = 0
+    
+    def snapshot(self) -> EngineSnapshot:
+        return self._snapshot
+    
+    def advance(self, etag: str):
+        self._snapshot = EngineSnapshot(sequence=self._snapshot.sequence + 1, etag=etag)
+        self._advanced.set()
+    
+    async def wait_for_change(self, etag: str, timeout: float) -> EngineSnapshot:
+        self.waits += 1
+        try:
+            await asyncio.wait_for(self._advanced.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._snapshot
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = StubHub()
+    monkeypatch.setattr(deps, 'get_engine_hub', lambda: hub)
+    return hub
+
+
+def _request(if_none_match=None) -> Request:
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match is not None else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+async def _get(if_none_match=None, wait_ms: int = 0):
+    response = Response()
+    snapshot = await deps.get_engine_snapshot(_request(if_none_match), response, wait_ms)
+    return snapshot, response
+
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False),
+    ('', False),
+    (ETAG, True),
+    (f'W/{ETAG}', True),
+    ('*', True),
+    (f'"other", {ETAG}', True),
+    (f'"other",W/{ETAG} ', True),
+    ('"1a-2b-3d"', False),
+    ('1a-2b-3c', False),  # unquoted is not the same entity tag
+])
+def test_etag_matches(header, matches):
+    assert deps._etag_matches(header, ETAG) is matches
+
+
+def test_fresh_request_gets_the_snapshot_and_etag(hub):
+    snapshot, response = asyncio.run(_get())
+    assert snapshot is hub.snapshot()
+    assert response.headers['etag'] == ETAG
+    assert response.headers['cache-control'] == 'no-cache'
+
+
+@pytest.mark.parametrize('header', [ETAG, f'W/{ETAG}', '*'])
+def test_matching_if_none_match_is_304(hub, header):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_get(header))
+    assert error.value.status_code == 304
+    assert error.value.headers['ETag'] == ETAG
+    assert hub.waits == 0
+
+
+def test_stale_if_none_match_gets_the_snapshot(hub):
+    snapshot, response = asyncio.run(_get('"0-0-0"', wait_ms=5000))
+    assert snapshot.etag == ETAG and response.headers['etag'] == ETAG
+    assert hub.waits == 0  # no long-poll when the client is already behind
+
+
+def test_long_poll_returns_when_the_sequence_advances(hub):
+    async def scenario():
+        asyncio.get_running_loop().call_later(0.05, hub.advance, '"1a-2b-3d"')
+        started = time.monotonic()
+        snapshot, response = await _get(ETAG, wait_ms=10000)
+        return snapshot, response, time.monotonic() - started
+    
+    snapshot, response, elapsed = asyncio.run(scenario())
+    assert snapshot.etag == '"1a-2b-3d"' and snapshot.sequence == 2
+    assert response.headers['etag'] == '"1a-2b-3d"'
+    assert 0.04 <= elapsed < 5
+
+
+def test_long_poll_timeout_is_304(hub):
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_get(ETAG, wait_ms=100))
+    assert error.value.status_code == 304
+    assert hub.waits == 1
+    assert time.monotonic() - started >= 0.09
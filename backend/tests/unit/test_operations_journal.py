@@ -0,0 +1,211 @@
+"""
+Operations journal: crash recovery of the drain position, torn segments, paging
+"""
+
+import numpy as np
+import pytest
+
+from app.services.c_engine_bridge import OPERATION_DTYPE, OperationsCursor, operations_mask
+from app.services.operations_journal import OperationsJournal
+
+pytestmark = pytest.mark.unit
+
+RING_SIZE = 100
+
+
+def _ops(start: int, stop: int) -> np.ndarray:
+    """Operations with sequence numbers start..stop-1, every 7th on BTCUSDT"""
+    ops = np.zeros(stop - start, dtype=OPERATION_DTYPE)
+    sequence = np.arange(start, stop)
+    ops['timestamp_ns'] = sequence * 1_000_000
+    ops['symbol'] = np.where(sequence % 7 == 0, b'BTCUSDT', b'ETHUSDT')
+    return ops
+
+
+class FakeRing:
+    """Engine ring of RING_SIZE slots, read like CEngineBridge.read_new_operations"""
+    
+    OPERATION_RING_SIZE = RING_SIZE
+    
+    def __init__(self, total: int = 0, shm_inode: int = 1):
+        self.connected = True
+        self.shm_inode = shm_inode
+        self.total = total
+    
+    def get_cursor(self, consumer: str, position: int = 0) -> OperationsCursor:
+        return OperationsCursor(consumer, position)
+    
+    def read_new_operations(self, cursor: OperationsCursor, limit: int = 100) -> np.ndarray:
+        if cursor.position > self.total:
+            cursor.position = 0
+        first = max(cursor.position, self.total - RING_SIZE)
+        cursor.dropped += first - cursor.position
+        ops = _ops(first, min(self.total, first + limit))
+        cursor.position = first + len(ops)
+        return ops
+
+
+class FakeHub:
+    def __init__(self, ring: FakeRing):
+        self.bridge = ring
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    # 4 index blocks per segment so a few thousand records span several segments
+    monkeypatch.setattr(OperationsJournal, 'SEGMENT_RECORDS', 4096)
+
+
+def _sequences(journal: OperationsJournal) -> list:
+    return [int(ts) // 1_000_000 for chunk in journal.scan() for ts in chunk['timestamp_ns']]
+
+
+def _drain_all(journal: OperationsJournal, hub: FakeHub):
+    while journal.drain(hub):
+        pass
+
+
+def _crash_on_append(journal: OperationsJournal, monkeypatch, written: int = 0, torn: bytes = b''):
+    """The next append writes `written` records plus `torn` bytes, then the process dies"""
+    def append(ops):
+        with open(journal._segment_path(journal.count // journal.SEGMENT_RECORDS), 'ab') as f:
+            f.write(ops[:written].tobytes() + torn)
+        raise Crash()
+    monkeypatch.setattr(journal, 'append', append)
+
+
+def test_drain_follows_the_ring_across_batches(tmp_path):
+    ring = FakeRing()
+    journal = OperationsJournal(str(tmp_path))
+    for produced in (30, 130, 230):
+        ring.total = produced
+        _drain_all(journal, FakeHub(ring))
+    assert _sequences(journal) == list(range(230))
+    assert journal.checkpoint() == (230, ring.shm_inode, 230)
+
+
+@pytest.mark.parametrize('written, torn', [(0, b''), (10, b''), (10, b'\x01' * 5), (99, b'\x01')])
+def test_crash_mid_append_neither_duplicates_nor_skips(tmp_path, monkeypatch, written, torn):
+    ring = FakeRing(total=90)
+    journal = OperationsJournal(str(tmp_path))
+    _drain_all(journal, FakeHub(ring))
+    
+    ring.total = 190
+    _crash_on_append(journal, monkeypatch, written, torn)
+    with pytest.raises(Crash):
+        journal.drain(FakeHub(ring))
+    
+    restarted = OperationsJournal(str(tmp_path))
+    _drain_all(restarted, FakeHub(ring))
+    assert _sequences(restarted) == list(range(190))
+    assert restarted.checkpoint() == (190, ring.shm_inode, 190)
+
+
+def test_crash_after_append_resumes_after_the_batch(tmp_path):
+    ring = FakeRing(total=80)
+    journal = OperationsJournal(str(tmp_path))
+    _drain_all(journal, FakeHub(ring))
+    
+    # Killed between batches: drain.json already matches the records on disk
+    ring.total = 120
+    restarted = OperationsJournal(str(tmp_path))
+    _drain_all(restarted, FakeHub(ring))
+    assert _sequences(restarted) == list(range(120))
+
+
+def test_new_engine_run_drains_from_its_start(tmp_path):
+    journal = OperationsJournal(str(tmp_path))
+    _drain_all(journal, FakeHub(FakeRing(total=60, shm_inode=1)))
+    
+    restarted = OperationsJournal(str(tmp_path))
+    _drain_all(restarted, FakeHub(FakeRing(total=20, shm_inode=2)))
+    assert _sequences(restarted) == list(range(60)) + list(range(20))
+
+
+def test_lapped_ring_counts_dropped(tmp_path):
+    ring = FakeRing(total=50)
+    journal = OperationsJournal(str(tmp_path))
+    _drain_all(journal, FakeHub(ring))
+    ring.total = 50 + 3 * RING_SIZE
+    _drain_all(journal, FakeHub(ring))
+    assert journal.dropped == 2 * RING_SIZE
+    assert _sequences(journal) == list(range(50)) + list(range(ring.total - RING_SIZE, ring.total))
+
+
+def test_torn_segment_is_ignored_then_cut(tmp_path, small_segments):
+    ring = FakeRing(total=5000)
+    journal = OperationsJournal(str(tmp_path))
+    journal.append(_ops(0, 5000))
+    journal._save_drain_state({'segment_inode': ring.shm_inode, 'position': 5000, 'count': 5000})
+    
+    # Half a record after the last one of the active segment (no drain.json update)
+    path = journal._segment_path(1)
+    size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(_ops(5000, 5001).tobytes()[:OPERATION_DTYPE.itemsize // 2])
+    
+    reader = OperationsJournal(str(tmp_path))
+    assert reader.count == 5000
+    assert reader.query(limit=1)[0]['timestamp_ns'].tolist() == [4999 * 1_000_000]
+    
+    ring.total = 5100
+    writer = OperationsJournal(str(tmp_path))
+    _drain_all(writer, FakeHub(ring))
+    assert path.stat().st_size == size + 100 * OPERATION_DTYPE.itemsize
+    assert _sequences(writer) == list(range(5100))
+
+
+def test_truncate_drops_later_segments(tmp_path, small_segments):
+    journal = OperationsJournal(str(tmp_path))
+    journal._lock_fd = -1  # sealed segments get their .idx written
+    journal.append(_ops(0, 10000))
+    assert journal._index_path(1).exists()
+    
+    journal._truncate(4100)
+    assert journal.count == 4100
+    assert not journal._segment_path(2).exists() and not journal._index_path(2).exists()
+    assert _sequences(journal) == list(range(4100))
+
+
+def _all_pages(journal: OperationsJournal, limit: int, **filters) -> list:
+    pages, before = [], None
+    while True:
+        ops, before = journal.query(limit=limit, before=before, **filters)
+        assert len(ops) <= limit
+        pages.append(ops)
+        if before is None:
+            return [int(ts) // 1_000_000 for ops in pages[::-1] for ts in ops['timestamp_ns']]
+
+
+@pytest.mark.parametrize('scan_records', [1 << 18, 1024, 1500])
+@pytest.mark.parametrize('filters', [
+    {},
+    {'symbol': 'BTCUSDT'},
+    {'symbol': 'BTCUSDT', 'since_ms': 3000, 'until_ms': 9000},
+    {'since_ms': 4095, 'until_ms': 4096},
+    {'symbol': 'SOLUSDT'},
+])
+def test_pages_across_segments_match_brute_force(tmp_path, small_segments, monkeypatch, scan_records, filters):
+    monkeypatch.setattr(OperationsJournal, 'QUERY_SCAN_RECORDS', scan_records)
+    journal = OperationsJournal(str(tmp_path))
+    journal.append(_ops(0, 10000))
+    
+    expected = np.flatnonzero(operations_mask(_ops(0, 10000), **filters)).tolist()
+    for limit in (1, 50, 700):
+        assert _all_pages(journal, limit, **filters) == expected
+
+
+def test_scan_budget_returns_a_short_page_with_a_cursor(tmp_path, small_segments, monkeypatch):
+    monkeypatch.setattr(OperationsJournal, 'QUERY_SCAN_RECORDS', 1024)
+    journal = OperationsJournal(str(tmp_path))
+    journal.append(_ops(0, 10000))
+    
+    ops, before = journal.query(limit=500, symbol='BTCUSDT')
+    assert 0 < len(ops) < 500
+    assert before == 8192  # blocks [9216, 10000) and [8192, 9216) read, budget spent
+    ops, _ = journal.query(limit=500, before=before, symbol='BTCUSDT')
+    assert int(ops['timestamp_ns'][-1]) // 1_000_000 < before
@@ -0,0 +1,110 @@
+"""
+Operations statistics: merged / removed / windowed aggregates equal NumPy on the same operations
+"""
+
+import numpy as np
+import pytest
+
+from app.services import operations_stats
+from app.services.c_engine_bridge import OPERATION_DTYPE
+from app.services.operations_stats import Aggregate, OperationsAggregator, RollingAggregate, _group_aggregates
+
+pytestmark = pytest.mark.unit
+
+NOW = 1_792_000_000
+SYMBOLS = (b'BTCUSDT', b'ETHUSDT', b'SOLUSDT')
+
+
+def _operations(count: int, span: int, seed: int = 0) -> np.ndarray:
+    """Operations over the `span` seconds before NOW, time ordered"""
+    rng = np.random.default_rng(seed)
+    ops = np.zeros(count, dtype=OPERATION_DTYPE)
+    ops['timestamp_ns'] = np.sort(NOW - rng.integers(0, span, count)) * 1_000_000_000 + rng.integers(0, 10**9, count)
+    ops['symbol'] = rng.choice(SYMBOLS, count)
+    ops['strategy'] = b'cross_exchange'
+    ops['exchange_buy'] = rng.choice([b'binance', b'bybit'], count)
+    ops['exchange_sell'] = b'okx'
+    ops['pnl'] = rng.normal(0.1, 1.0, count)
+    ops['spread_bps'] = rng.gamma(2.0, 4.0, count) + 1000.0  # large mean: cancellation in naive variance
+    ops['fees_paid'] = rng.uniform(0, 0.05, count)
+    return ops
+
+
+def _expected(ops: np.ndarray) -> dict:
+    spread = ops['spread_bps']
+    return {
+        'count': len(ops),
+        'total_profit': pytest.approx(ops['pnl'].sum(), rel=1e-9, abs=1e-9),
+        'wins': int((ops['pnl'] > 0).sum()),
+        'fees': pytest.approx(ops['fees_paid'].sum(), rel=1e-9, abs=1e-12),
+        'avg_spread_bps': pytest.approx(spread.mean(), rel=1e-12),
+        'spread_std_bps': pytest.approx(spread.std(ddof=1), rel=1e-7) if len(ops) > 1 else 0.0,
+    }
+
+
+def _actual(aggregate: Aggregate) -> dict:
+    result = aggregate.to_dict()
+    return {key: result[key] for key in ('count', 'total_profit', 'wins', 'fees', 'avg_spread_bps', 'spread_std_bps')}
+
+
+def _aggregate(ops: np.ndarray) -> Aggregate:
+    return _group_aggregates(np.zeros(len(ops), dtype=np.int64), 1, ops['pnl'], ops['spread_bps'], ops['fees_paid'])[0]
+
+
+def test_merged_groups_equal_the_whole():
+    ops = _operations(5000, 3600)
+    merged = Aggregate()
+    for part in np.array_split(ops, [1, 2, 700, 701, 3000]):
+        merged.merge(_aggregate(part))
+    assert _actual(merged) == _expected(ops)
+
+
+def test_removing_merged_groups_leaves_the_rest():
+    ops = _operations(5000, 3600, seed=1)
+    parts = np.array_split(ops, 10)
+    total = Aggregate()
+    for part in parts:
+        total.merge(_aggregate(part))
+    for removed in range(9):
+        total.remove(_aggregate(parts[removed]))
+        assert _actual(total) == _expected(np.concatenate(parts[removed + 1:]))
+    
+    total.remove(_aggregate(parts[9]))
+    assert total.count == 0 and total.to_dict()['spread_std_bps'] == 0.0
+
+
+@pytest.mark.parametrize('window, bucket', [(60, 1), (3600, 60), (86400, 900)])
+def test_rolling_window_equals_numpy_on_the_window(window, bucket):
+    ops = _operations(20000, 3 * window, seed=2)
+    seconds = ops['timestamp_ns'] // 1_000_000_000
+    rolling = RollingAggregate(window, bucket)
+    
+    for step, second in enumerate(np.unique(seconds).tolist()):
+        rolling.add(second, _aggregate(ops[seconds == second]))
+        if step % 97 == 0:
+            # Buckets are dropped whole once they end before the window starts
+            start = second - second % bucket
+            inside = seconds[:np.searchsorted(seconds, second, side='right')]
+            inside = inside - inside % bucket + bucket > start - window
+            assert _actual(rolling.total) == _expected(ops[:len(inside)][inside])
+
+
+def test_aggregator_windows_and_breakdown(monkeypatch):
+    monkeypatch.setattr(operations_stats.time, 'time', lambda: float(NOW))
+    ops = _operations(30000, 2 * 86400, seed=3)
+    aggregator = OperationsAggregator(hub=object())
+    for batch in np.array_split(ops, 17):
+        aggregator.ingest(batch, now=float(NOW))
+    
+    seconds = ops['timestamp_ns'] // 1_000_000_000
+    for window, (length, _) in operations_stats.WINDOWS.items():
+        inside = np.ones(len(ops), dtype=bool) if length is None else seconds >= NOW - length
+        assert _actual(aggregator.totals(window)) == _expected(ops[inside])
+        
+        breakdown = aggregator.breakdown('symbol', window)
+        for symbol in SYMBOLS:
+            assert _actual(breakdown[symbol.decode()]) == _expected(ops[inside & (ops['symbol'] == symbol)])
+    
+    pairs = aggregator.breakdown('pair')
+    assert sorted(pairs) == ['binance→okx', 'bybit→okx']
+    assert _actual(pairs['bybit→okx']) == _expected(ops[ops['exchange_buy'] == b'bybit'])
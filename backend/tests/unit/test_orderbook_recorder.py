@@ -0,0 +1,121 @@
+"""
+Orderbook recorder (change mode): threshold in bps or ticks, heartbeat, updates seen once
+"""
+
+import numpy as np
+import pytest
+
+from app.services.depth_archive import DepthArchive
+from app.services.engine_prices import PriceBook
+from app.services.orderbook_bars import OrderbookBars
+from app.services.tick_archive import TickArchive
+
+orderbook_writer = pytest.importorskip('app.services.orderbook_writer')
+orderbook_recorder = pytest.importorskip('app.services.orderbook_recorder')
+
+pytestmark = pytest.mark.unit
+
+SECOND = 1_000_000_000
+START_NS = 1_792_000_000 * SECOND
+SYMBOLS = ('BTCUSDT', 'ETHUSDT')
+INDEX = {(symbol, 'binance'): slot for slot, symbol in enumerate(SYMBOLS)}
+
+
+def _book(bids, timestamps, index=INDEX) -> PriceBook:
+    bid = np.array(bids, dtype=np.float64)
+    return PriceBook(
+        symbols=np.array(SYMBOLS),
+        exchanges=np.array(['binance'] * len(SYMBOLS)),
+        bid=bid,
+        ask=bid + 0.01,
+        timestamp_ns=START_NS + np.array(timestamps, dtype=np.int64) * SECOND,
+        index=index,
+    )
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = orderbook_recorder.OrderbookRecorder(
+        writer=orderbook_writer.OrderbookWriter(session_factory=object),
+        hub=object(),
+        mode='change',
+        archive=TickArchive(str(tmp_path / 'ticks')),
+        bars=OrderbookBars(str(tmp_path / 'bars')),
+        depth=DepthArchive(str(tmp_path / 'depth')),
+    )
+    recorder.threshold_bps = 1.0
+    recorder.threshold_ticks = 0
+    recorder.tick_sizes = {}
+    recorder.heartbeat_ns = 60 * SECOND
+    return recorder
+
+
+def _collect(recorder, bids, timestamps, now_s, **kwargs) -> list:
+    rows = recorder.collect(_book(bids, timestamps, **kwargs), now_ns=START_NS + now_s * SECOND)
+    return [(row[1], row[2]) for row in rows]
+
+
+def test_first_quotes_are_recorded(recorder):
+    assert _collect(recorder, [10000.0, 100.0], [1, 1], 1) == [('BTCUSDT', 10000.0), ('ETHUSDT', 100.0)]
+    assert _collect(recorder, [0.0, 100.5], [0, 1], 2) == []  # unpriced / not newer
+
+
+def test_threshold_is_measured_from_the_last_recorded_quote(recorder):
+    _collect(recorder, [10000.0, 100.0], [1, 1], 1)
+    assert _collect(recorder, [10000.5, 100.0], [2, 1], 2) == []     # 0.5 bps
+    assert _collect(recorder, [10000.9, 100.0], [3, 1], 3) == []     # 0.9 bps
+    assert _collect(recorder, [10001.2, 100.0], [4, 1], 4) == [('BTCUSDT', 10001.2)]  # drifted 1.2 bps
+    assert _collect(recorder, [10000.7, 100.0], [5, 1], 5) == []     # 0.5 bps back
+
+
+def test_quotes_below_the_threshold_are_seen_once(recorder):
+    _collect(recorder, [10000.0, 100.0], [1, 1], 1)
+    _collect(recorder, [10000.5, 100.0], [2, 1], 2)
+    for now_s in range(3, 20):
+        assert _collect(recorder, [10000.5, 100.0], [2, 1], now_s) == []
+    assert recorder.updates_seen == 3  # two first quotes + one below the threshold
+
+
+def test_heartbeat_records_a_fresh_quote_after_the_interval(recorder):
+    _collect(recorder, [10000.0, 100.0], [1, 1], 1)
+    assert _collect(recorder, [10000.1, 100.0], [30, 1], 30) == []
+    assert _collect(recorder, [10000.2, 100.0], [61, 1], 61) == [('BTCUSDT', 10000.2)]
+    assert recorder.heartbeats == 1
+    
+    assert _collect(recorder, [10000.3, 100.0], [90, 1], 90) == []  # 29 s after the heartbeat
+    
+    # Not refreshed since: no heartbeat, however long the wait
+    assert _collect(recorder, [10000.3, 100.0], [90, 1], 500) == []
+    assert _collect(recorder, [10000.3, 100.0], [501, 1], 501) == [('BTCUSDT', 10000.3)]
+    assert recorder.heartbeats == 2
+
+
+def test_tick_threshold_overrides_bps_for_known_symbols(recorder):
+    recorder.threshold_ticks = 2
+    recorder.tick_sizes = {'ETHUSDT': 0.01}
+    _collect(recorder, [10000.0, 100.0], [1, 1], 1)
+    
+    assert _collect(recorder, [10000.0, 100.015], [1, 2], 2) == []  # 1.5 ticks (but 1.5 bps)
+    assert _collect(recorder, [10000.0, 100.02], [1, 3], 3) == [('ETHUSDT', 100.02)]
+    assert _collect(recorder, [10000.5, 100.02], [2, 3], 4) == []  # BTCUSDT: no tick size, 0.5 bps
+    assert _collect(recorder, [10001.5, 100.02], [3, 3], 5) == [('BTCUSDT', 10001.5)]
+
+
+def test_symbol_and_exchange_filters(recorder):
+    book = _book([10000.0, 100.0], [1, 1])
+    assert [row[1] for row in recorder.collect(book, symbols=['ETHUSDT'], now_ns=START_NS)] == ['ETHUSDT']
+    assert recorder.collect(book, exchanges=['bybit'], now_ns=START_NS) == []
+    assert [row[1] for row in recorder.collect(book, now_ns=START_NS)] == ['BTCUSDT']
+
+
+def test_new_engine_run_starts_over(recorder):
+    _collect(recorder, [10000.0, 100.0], [5, 5], 5)
+    restarted = dict(INDEX)  # new index object: slots rebuilt
+    assert len(_collect(recorder, [10000.0, 100.0], [1, 1], 6, index=restarted)) == 2
+
+
+def test_interval_mode_records_every_fresh_quote(recorder):
+    recorder.mode = 'interval'
+    assert len(_collect(recorder, [10000.0, 100.0], [1, 1], 1)) == 2
+    assert _collect(recorder, [10000.0001, 100.0], [2, 1], 2) == [('BTCUSDT', 10000.0001)]
+    assert _collect(recorder, [10000.0001, 100.0], [2, 1], 3) == []
@@ -0,0 +1,192 @@
+"""
+Orderbook writer: backpressure, retry order after failed batches, flush on stop
+"""
+
+import asyncio
+
+import pytest
+
+orderbook_writer = pytest.importorskip('app.services.orderbook_writer')
+OrderbookWriter = orderbook_writer.OrderbookWriter
+
+pytestmark = pytest.mark.unit
+
+START_NS = 1_792_000_000 * 1_000_000_000
+
+
+def _rows(start: int, stop: int) -> list:
+    return [orderbook_writer.snapshot_row('binance', 'BTCUSDT', 100.0, 100.1, 1.0, 2.0, START_NS + i) for i in range(start, stop)]
+
+
+def _numbers(rows) -> list:
+    return [row[-1] - START_NS for row in rows]
+
+
+class FakeSessionFactory:
+    """
+    async with factory() as session: COPY through a fake asyncpg connection
+    
+    The first `failures` batches raise; `delay` is awaited inside every
+    COPY (before failing), and `hang` makes COPY never return.
+    """
+    
+    def __init__(self, failures: int = 0, delay: float = 0.0, hang: bool = False):
+        self.failures = failures
+        self.delay = delay
+        self.hang = hang
+        self.calls = 0
+        self.copied = []
+        self.committed = []
+        self.driver_connection = self
+    
+    def __call__(self):
+        return self
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def connection(self):
+        return self
+    
+    async def get_raw_connection(self):
+        return self
+    
+    async def copy_records_to_table(self, table, records, columns):
+        self.calls += 1
+        assert (table, tuple(columns)) == ('orderbook_snapshots', orderbook_writer.SNAPSHOT_COLUMNS)
+        if self.hang:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('connection reset')
+        self.copied.append(list(records))
+    
+    async def commit(self):
+        self.committed.extend(self.copied.pop())
+
+
+def _writer(factory, monkeypatch, **kwargs) -> OrderbookWriter:
+    writer = OrderbookWriter(session_factory=factory, **kwargs)
+    monkeypatch.setattr(writer, 'RETRY_DELAYS_SECONDS', (0.001, 0.002, 0.003))
+    return writer
+
+
+# ==================== BACKPRESSURE ====================
+
+def test_offer_drops_what_does_not_fit(monkeypatch):
+    writer = _writer(FakeSessionFactory(), monkeypatch, batch_rows=4, max_pending=10)
+    assert writer.offer(_rows(0, 6)) == 6
+    assert writer.offer(_rows(6, 15)) == 4
+    assert (writer.pending, writer.accepted, writer.dropped) == (10, 10, 5)
+    assert writer.offer(_rows(15, 16)) == 0 and writer.dropped == 6
+
+
+def test_put_gives_up_after_its_timeout(monkeypatch):
+    writer = _writer(FakeSessionFactory(), monkeypatch, batch_rows=4, max_pending=5)
+    
+    async def scenario():
+        assert await writer.put(_rows(0, 3)) == 3
+        return await writer.put(_rows(3, 10), timeout=0.05)  # nothing drains the buffer
+    
+    assert asyncio.run(scenario()) == 2
+    assert (writer.pending, writer.dropped) == (5, 5)
+
+
+def test_put_waits_for_room_while_the_flusher_drains(monkeypatch):
+    factory = FakeSessionFactory(delay=0.005)
+    writer = _writer(factory, monkeypatch, batch_rows=4, max_pending=8, flush_interval=0.01)
+    
+    async def scenario():
+        await writer.start()
+        accepted = await writer.put(_rows(0, 40), timeout=5.0)
+        await writer.stop()
+        return accepted
+    
+    assert asyncio.run(scenario()) == 40
+    assert _numbers(factory.committed) == list(range(40))
+    assert (writer.written, writer.dropped, writer.pending) == (40, 0, 0)
+
+
+# ==================== RETRIES ====================
+
+def test_failed_batches_are_retried_in_order(monkeypatch):
+    factory = FakeSessionFactory(failures=3)
+    writer = _writer(factory, monkeypatch, batch_rows=5, max_pending=100, flush_interval=0.01)
+    
+    async def scenario():
+        await writer.start()
+        for start in range(0, 30, 3):
+            await writer.put(_rows(start, start + 3))
+            await asyncio.sleep(0.002)
+        await writer.stop()
+    
+    asyncio.run(scenario())
+    assert _numbers(factory.committed) == list(range(30))
+    assert (writer.flush_errors, writer.dropped) == (3, 0)
+    assert writer.last_error == 'connection reset'
+
+
+def test_rows_put_back_over_the_limit_drop_the_oldest(monkeypatch):
+    # Rows 8-11 arrive while batch 0-3 is failing: putting it back overfills the buffer
+    factory = FakeSessionFactory(failures=1, delay=0.05)
+    writer = _writer(factory, monkeypatch, batch_rows=4, max_pending=8, flush_interval=0.01)
+    
+    async def scenario():
+        writer.offer(_rows(0, 8))
+        await writer.start()
+        await asyncio.sleep(0.02)  # batch 0-3 is in flight
+        assert writer.offer(_rows(8, 12)) == 4
+        await writer.stop()
+    
+    asyncio.run(scenario())
+    assert _numbers(factory.committed) == list(range(4, 12))
+    assert writer.dropped == 4
+
+
+# ==================== STOP ====================
+
+def test_stop_flushes_everything_buffered(monkeypatch):
+    factory = FakeSessionFactory()
+    writer = _writer(factory, monkeypatch, batch_rows=1000, max_pending=10_000, flush_interval=60.0)
+    
+    async def scenario():
+        await writer.start()
+        writer.offer(_rows(0, 2500))
+        await writer.stop()
+    
+    asyncio.run(scenario())
+    assert _numbers(factory.committed) == list(range(2500))
+    assert writer.batches == 3 and not writer.stats()['running']
+
+
+def test_stop_gives_up_after_the_retries(monkeypatch):
+    factory = FakeSessionFactory(failures=10**6)
+    writer = _writer(factory, monkeypatch, batch_rows=4, max_pending=100, flush_interval=60.0)
+    
+    async def scenario():
+        await writer.start()
+        writer.offer(_rows(0, 10))
+        await writer.stop(timeout=5.0)
+    
+    asyncio.run(scenario())
+    assert factory.committed == []
+    assert (writer.pending, writer.dropped, writer.written) == (0, 10, 0)
+    assert writer.flush_errors == len(writer.RETRY_DELAYS_SECONDS) + 1
+
+
+def test_stop_timeout_cancels_a_hung_flush(monkeypatch):
+    writer = _writer(FakeSessionFactory(hang=True), monkeypatch, batch_rows=4, max_pending=100, flush_interval=0.01)
+    
+    async def scenario():
+        await writer.start()
+        writer.offer(_rows(0, 10))
+        await asyncio.sleep(0.02)
+        await writer.stop(timeout=0.05)
+    
+    asyncio.run(scenario())
+    assert writer.pending == 6  # the hung batch is lost with the task, the rest stays buffered
+    assert writer.stats()['running'] is False
@@ -0,0 +1,178 @@
+"""
+Profit history: rollups equal a NumPy group-by, downsampling keeps endpoints and extremes
+"""
+
+import numpy as np
+import pytest
+
+from app.services.c_engine_bridge import OPERATION_DTYPE
+from app.services.profit_history import ProfitRollups, ProfitSeries, lttb, minmax
+
+pytestmark = pytest.mark.unit
+
+START = 1_792_000_000
+
+
+def _operations(count: int, span: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    ops = np.zeros(count, dtype=OPERATION_DTYPE)
+    ops['timestamp_ns'] = np.sort(START + rng.integers(0, span, count)) * 1_000_000_000
+    ops['pnl'] = rng.normal(0.01, 1.0, count)
+    return ops
+
+
+def _expected_buckets(seconds: np.ndarray, pnl: np.ndarray, resolution: int) -> dict:
+    cumulative = np.cumsum(pnl)
+    starts, first = np.unique(seconds - seconds % resolution, return_index=True)
+    last = np.r_[first[1:], len(seconds)] - 1
+    return {
+        'start': starts,
+        'pnl': np.add.reduceat(pnl, first),
+        'count': np.diff(np.r_[first, len(seconds)]),
+        'end': cumulative[last],
+        'low': np.minimum.reduceat(cumulative, first),
+        'high': np.maximum.reduceat(cumulative, first),
+    }
+
+
+# ==================== ROLLUPS ====================
+
+@pytest.mark.parametrize('resolution', [1, 60, 3600])
+def test_series_equals_group_by_across_batches(resolution):
+    ops = _operations(20000, 3 * 86400)
+    seconds = ops['timestamp_ns'] // 1_000_000_000
+    series = ProfitSeries(resolution, None)
+    cumulative = np.cumsum(ops['pnl'])
+    for part in np.array_split(np.arange(len(ops)), [1, 2, 5000, 5001, 13333]):
+        series.ingest(seconds[part], ops['pnl'][part], cumulative[part])
+    
+    for name, values in _expected_buckets(seconds, ops['pnl'], resolution).items():
+        assert np.allclose(series.column(name), values, rtol=1e-12, atol=1e-9), name
+
+
+def test_late_operations_join_the_newest_bucket():
+    series = ProfitSeries(60, None)
+    series.ingest(np.array([120, 185]), np.array([1.0, 2.0]), np.array([1.0, 3.0]))
+    series.ingest(np.array([100, 130]), np.array([-4.0, 1.0]), np.array([-1.0, 0.0]))
+    assert series.column('start').tolist() == [120, 180]
+    assert series.column('count').tolist() == [1, 3]
+    assert (series.column('end')[-1], series.column('low')[-1], series.column('high')[-1]) == (0.0, -1.0, 3.0)
+
+
+def test_expired_buckets_are_cut_in_bulk():
+    series = ProfitSeries(1, 100)
+    for start in range(0, 1000, 10):
+        seconds = np.arange(start, start + 10)
+        series.ingest(seconds, np.ones(10), seconds + 1.0)
+        
+        starts = series.column('start')
+        # Everything within the retention is kept, at most as much again before it
+        assert starts[0] <= starts[-1] - 100 or not series.trimmed
+        assert len(starts) <= 2 * 101 + 10
+        assert np.array_equal(starts, np.arange(starts[0], starts[-1] + 1))
+        assert series.column('end').tolist() == (starts + 1.0).tolist()
+    
+    assert series.trimmed
+    assert not series.covers(None) and not series.covers(float(series.column('start')[0] - 1))
+    assert series.covers(float(series.column('start')[0]))
+
+
+def test_pick_prefers_the_coarsest_resolution_with_enough_points():
+    rollups = ProfitRollups({1: 86400, 60: None, 3600: None})
+    ops = _operations(150000, 3 * 86400, seed=1)
+    for batch in np.array_split(ops, 50):
+        rollups.ingest(batch)
+    last = int(ops['timestamp_ns'][-1] // 1_000_000_000)
+    
+    def picked(since, until, points):
+        series, window = rollups._pick(since, until, points)
+        return series.resolution, window.stop - window.start
+    
+    hours = 10 * 3600
+    assert picked(last - hours, last, 11) == (3600, 11)  # the bucket holding `since` counts
+    assert picked(last - hours, last, 12)[0] == 60
+    assert picked(last - hours, last, 600)[0] == 60
+    assert picked(last - hours, last, 700)[0] == 1
+    assert picked(last - hours, last, 10**6)[0] == 1  # none has enough: finest with data
+    
+    # Seconds expired before `since`: the per-second series is not a candidate
+    assert rollups.series[0].trimmed
+    assert picked(START, last, 10**6)[0] == 60
+    assert picked(None, None, 10**6)[0] == 60
+    
+    resolution, size = picked(last - 600, last, 200)
+    assert resolution == 1 and size >= 200
+
+
+def test_query_returns_at_most_points_spanning_the_range():
+    rollups = ProfitRollups()
+    ops = _operations(50000, 86400, seed=2)
+    rollups.ingest(ops)
+    series, window = rollups._pick(None, None, 300)
+    starts = series.column('start')[window]
+    
+    for method in ('lttb', 'minmax'):
+        curve = rollups.query(points=300, method=method)
+        assert 2 <= len(curve) <= 300
+        timestamps = [point['timestamp'] for point in curve]
+        assert timestamps == sorted(timestamps)
+        assert timestamps[0] == (starts[0] + series.resolution) * 1000
+        assert timestamps[-1] == (starts[-1] + series.resolution) * 1000
+        assert curve[-1]['cumulative'] == pytest.approx(ops['pnl'].sum())
+
+
+# ==================== DOWNSAMPLING ====================
+
+def _walk(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(count, dtype=np.int64) * 60
+    y = np.cumsum(rng.normal(0, 1, count))
+    return x, y
+
+
+@pytest.mark.parametrize('points', [3, 10, 100, 999])
+def test_lttb_keeps_endpoints_and_a_spike(points):
+    x, y = _walk(1000)
+    y[437] = y.max() + 1000  # one outlier must survive any downsample
+    index = lttb(x, y, points)
+    assert len(index) == points
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert np.all(np.diff(index) > 0)
+    assert 437 in index.tolist()
+
+
+def test_lttb_short_series_is_returned_whole():
+    x, y = _walk(50)
+    assert lttb(x, y, 50).tolist() == list(range(50))
+    assert lttb(x, y, 2).tolist() == list(range(50))
+
+
+@pytest.mark.parametrize('points', [2, 3, 4, 11, 100, 2000])
+def test_minmax_keeps_endpoints_and_extremes(points):
+    _, ends = _walk(1000, seed=3)
+    low, high = ends - 0.5, ends + 0.5
+    index, values = minmax(low, high, ends, points)
+    
+    assert len(index) <= max(points, 2)
+    assert np.all(np.diff(index) > 0)
+    assert index[0] == 0 and index[-1] == len(ends) - 1
+    if 4 <= points <= len(ends):  # beyond that one-record buckets keep one of low/high
+        assert values.min() == low.min() and values.max() == high.max()
+        assert int(low.argmin()) in index.tolist() and int(high.argmax()) in index.tolist()
+    for i, value in zip(index.tolist(), values.tolist()):
+        assert value in (low[i], high[i], ends[i])
+
+
+def test_minmax_extremes_per_bucket():
+    _, ends = _walk(1000, seed=4)
+    low, high = ends - 0.25, ends + 0.25
+    index, values = minmax(low, high, ends, 2 + 2 * 10)
+    picks = dict(zip(index.tolist(), values.tolist()))
+    for bucket in np.array_split(np.arange(1000), 10):
+        lo, hi = int(bucket[0] + low[bucket].argmin()), int(bucket[0] + high[bucket].argmax())
+        assert picks[lo] == low[lo] and picks[hi] == high[hi]
+
+
+def test_minmax_empty():
+    index, values = minmax(np.empty(0), np.empty(0), np.empty(0), 10)
+    assert len(index) == len(values) == 0
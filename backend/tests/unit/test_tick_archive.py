@@ -0,0 +1,112 @@
+"""
+Tick archive: time range bounds of a day, torn column writes, compacted days
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.services.tick_archive import NS_PER_DAY, TICK_COLUMNS, TickArchive, TickColumns, _day_start_ns
+
+pytestmark = pytest.mark.unit
+
+DAY = date(2026, 10, 16)
+DAY_START = _day_start_ns(DAY)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = TickArchive(str(tmp_path), compress=True)
+    archive.INDEX_STRIDE = 4
+    return archive
+
+
+def _columns(timestamp_ns) -> TickColumns:
+    timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+    prices = np.arange(len(timestamp_ns), dtype=np.float64)
+    return TickColumns(timestamp_ns, prices, prices + 1, prices, prices)
+
+
+def _add(archive, timestamps):
+    for i, timestamp_ns in enumerate(timestamps):
+        archive.add('binance', 'BTCUSDT', int(timestamp_ns), 100.0 + i, 101.0 + i, 1.0, 2.0)
+    archive.flush()
+
+
+# Runs of equal timestamps straddle the index stride (4) on purpose
+TIMESTAMPS = [1, 2, 2, 2, 2, 2, 3, 5, 5, 5, 5, 5, 5, 5, 8, 9, 9, 12]
+
+
+@pytest.mark.parametrize('since_ns', [None, -1, 0, 1, 2, 3, 4, 5, 6, 8, 9, 10, 12, 13])
+@pytest.mark.parametrize('until_ns', [None, -1, 0, 1, 2, 4, 5, 7, 9, 12, 20])
+def test_day_range_matches_brute_force(archive, since_ns, until_ns):
+    ticks = _columns(TIMESTAMPS)
+    timestamps = np.asarray(TIMESTAMPS)
+    inside = np.ones(len(timestamps), dtype=bool)
+    if since_ns is not None:
+        inside &= timestamps >= since_ns
+    if until_ns is not None:
+        inside &= timestamps <= until_ns
+    
+    start, stop = archive._day_range(ticks, since_ns, until_ns)
+    if inside.any():
+        assert (start, stop) == (np.flatnonzero(inside)[0], np.flatnonzero(inside)[-1] + 1)
+    else:
+        assert start == stop
+
+
+@pytest.mark.parametrize('length', [1, 3, 4, 5, 8, 9])
+def test_day_range_lengths_around_the_stride(archive, length):
+    ticks = _columns(np.arange(length) * 10)
+    assert archive._day_range(ticks, None, None) == (0, length)
+    assert archive._day_range(ticks, 0, (length - 1) * 10) == (0, length)
+    assert archive._day_range(ticks, (length - 1) * 10, None) == (length - 1, length)
+    assert archive._day_range(ticks, (length - 1) * 10 + 1, None) == (length, length)
+
+
+def test_read_spans_days_and_clips_at_the_boundary(archive):
+    timestamps = [DAY_START + NS_PER_DAY - 2, DAY_START + NS_PER_DAY - 1, DAY_START + NS_PER_DAY, DAY_START + NS_PER_DAY + 1]
+    _add(archive, timestamps)
+    assert len(archive.days('binance', 'BTCUSDT')) == 2
+    
+    ticks = archive.read('binance', 'BTCUSDT', DAY_START + NS_PER_DAY - 1, DAY_START + NS_PER_DAY)
+    assert ticks.timestamp_ns.tolist() == timestamps[1:3]
+    assert ticks.bid.tolist() == [101.0, 102.0]
+
+
+def test_torn_column_write_is_cut_back(archive):
+    timestamps = DAY_START + np.arange(10) * 1_000
+    _add(archive, timestamps)
+    path = archive._day_path('binance', 'BTCUSDT', DAY)
+    
+    # Crash mid-flush: bid got two more ticks plus half a value, the rest did not
+    with open(path / 'bid.col', 'ab') as f:
+        f.write(np.array([1.0, 2.0]).tobytes() + b'\x00' * 3)
+    assert len(archive.open_day('binance', 'BTCUSDT', DAY)) == 10
+    
+    restarted = TickArchive(str(archive.directory), compress=True)
+    _add(restarted, [DAY_START + 20_000])
+    for name, dtype in TICK_COLUMNS:
+        assert (path / f'{name}.col').stat().st_size == 11 * np.dtype(dtype).itemsize
+    ticks = restarted.open_day('binance', 'BTCUSDT', DAY)
+    assert ticks.timestamp_ns[-1] == DAY_START + 20_000
+    assert ticks.bid[-1] == 100.0
+
+
+def test_compacted_day_reads_like_the_raw_one(archive):
+    rng = np.random.default_rng(1)
+    timestamps = np.sort(DAY_START + rng.integers(0, NS_PER_DAY, 10_000))
+    _add(archive, timestamps)
+    raw = archive.read('binance', 'BTCUSDT')
+    raw = TickColumns(*(np.array(getattr(raw, name)) for name, _ in TICK_COLUMNS))
+    
+    assert archive.compact_sealed(today=date(2026, 10, 17)) == 1
+    path = archive._day_path('binance', 'BTCUSDT', DAY)
+    assert not (path / 'bid.col').exists()
+    
+    for since_ns, until_ns in [(None, None), (timestamps[100], timestamps[5000]), (timestamps[-1], None)]:
+        expected = archive._day_range(raw, since_ns, until_ns)
+        compacted = archive.read('binance', 'BTCUSDT', since_ns, until_ns)
+        for name, _ in TICK_COLUMNS:
+            assert np.array_equal(getattr(compacted, name), getattr(raw, name)[slice(*expected)])
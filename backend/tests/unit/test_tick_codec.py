@@ -0,0 +1,97 @@
+"""
+Tick codec: exact round-trips of every column encoding and torn blocks
+"""
+
+import numpy as np
+import pytest
+
+from app.services import tick_codec
+
+pytestmark = pytest.mark.unit
+
+SPECIAL = np.array([
+    0.0, -0.0, np.inf, -np.inf, np.nan,
+    5e-324, -5e-324, 2.2250738585072009e-308,  # subnormals
+    np.finfo(np.float64).max, np.finfo(np.float64).tiny, 1.5, -2.25,
+])
+
+
+def _bits(values: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+
+
+def _roundtrip_floats(values: np.ndarray) -> np.ndarray:
+    mode, decimals, payload = tick_codec.encode_floats(values)
+    return tick_codec.decode_floats(mode, decimals, np.frombuffer(payload, dtype=np.uint8), len(values))
+
+
+def _ticks(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamp_ns = 1_700_000_000_000_000_000 + np.cumsum(rng.integers(0, 5_000_000, count))
+    bid = 30000 + np.round(np.cumsum(rng.normal(0, 0.5, count)), 2)
+    ask = bid + 0.01
+    bid_qty = np.round(rng.uniform(0, 3, count), 3)
+    ask_qty = np.full(count, np.nan)
+    return timestamp_ns, bid, ask, bid_qty, ask_qty
+
+
+def test_varint_zigzag_extremes():
+    values = np.array([0, 1, -1, 63, -64, 2**62, -2**63, 2**63 - 1], dtype=np.int64)
+    encoded = tick_codec.varint_encode(tick_codec.zigzag_encode(values))
+    decoded = tick_codec.zigzag_decode(tick_codec.varint_decode(np.frombuffer(encoded, dtype=np.uint8), len(values)))
+    assert np.array_equal(decoded, values)
+
+
+@pytest.mark.parametrize('values', [
+    SPECIAL,
+    np.array([-0.0, -0.0, 0.0]),
+    np.array([0.0, -0.0, 1.25]),
+    np.array([np.nan, 1.0, np.nan]),
+    np.array([5e-324, 1e-310, -1e-310]),
+    np.array([101.25, 101.5, 101.5, 99.75]),
+])
+def test_float_column_roundtrip_is_bit_exact(values):
+    assert np.array_equal(_bits(_roundtrip_floats(values)), _bits(values))
+
+
+def test_float_column_modes():
+    assert tick_codec.encode_floats(np.array([np.nan, np.nan]))[0] == tick_codec.FLOAT_EMPTY
+    assert tick_codec.encode_floats(np.array([1.25, 1.5]))[:2] == (tick_codec.FLOAT_DECIMAL, 2)
+    assert tick_codec.encode_floats(np.array([1.0, -0.0]))[0] == tick_codec.FLOAT_XOR
+    assert tick_codec.encode_floats(np.array([1.0, np.inf]))[0] == tick_codec.FLOAT_XOR
+
+
+def test_timestamps_roundtrip_with_repeats_and_jumps():
+    timestamps = np.array([5, 5, 5, 1_000_000_000_000, 1_000_000_000_001, 2**62], dtype=np.int64)
+    payload = np.frombuffer(tick_codec.encode_timestamps(timestamps), dtype=np.uint8)
+    assert np.array_equal(tick_codec.decode_timestamps(payload, len(timestamps), int(timestamps[0])), timestamps)
+
+
+def test_blocks_roundtrip():
+    columns = _ticks(10_000)
+    data = np.frombuffer(b''.join(tick_codec.encode_blocks(*columns, block_ticks=4096)), dtype=np.uint8)
+    
+    headers = tick_codec.block_headers(data)
+    assert [int(header['count']) for _, header in headers] == [4096, 4096, 1808]
+    decoded = [tick_codec.decode_block(data, offset, header) for offset, header in headers]
+    for original, parts in zip(columns, zip(*decoded)):
+        assert np.array_equal(_bits(np.concatenate(parts)), _bits(original))
+    
+    for (_, header), start in zip(headers, range(0, 10_000, 4096)):
+        chunk = columns[0][start:start + 4096]
+        assert (header['min_ts'], header['max_ts']) == (chunk[0], chunk[-1])
+
+
+@pytest.mark.parametrize('cut', [1, tick_codec.BLOCK_HEADER.itemsize - 1, tick_codec.BLOCK_HEADER.itemsize + 3])
+def test_torn_trailing_block_is_ignored(cut):
+    blocks = list(tick_codec.encode_blocks(*_ticks(300), block_ticks=100))
+    data = np.frombuffer(b''.join(blocks[:2]) + blocks[2][:cut], dtype=np.uint8)
+    headers = tick_codec.block_headers(data)
+    assert [offset for offset, _ in headers] == [0, len(blocks[0])]
+
+
+def test_corrupt_block_is_rejected():
+    block = bytearray(tick_codec.encode_block(*_ticks(10)))
+    block[0] ^= 0xFF
+    with pytest.raises(ValueError):
+        tick_codec.block_headers(np.frombuffer(bytes(block), dtype=np.uint8))
@@ -0,0 +1,94 @@
+import { useEffect, useRef, useState } from 'react'
+import { engineStreamURL } from '../services/api'
+
+export interface EngineOperation {
+  id: number
+  timestamp: number
+  type: string
+  strategy: string
+  symbol: string
+  exchange_buy: string
+  exchange_sell: string
+  quantity: number
+  entry_price: number
+  exit_price: number
+  pnl: number
+  pnl_percent: number
+  spread_bps: number
+  fees_paid: number
+  is_open: boolean
+}
+
+export type EngineStats = Record<string, number | boolean>
+
+interface EngineStreamMessage {
+  type: 'snapshot' | 'update'
+  timestamp: number
+  connected?: boolean
+  stats?: EngineStats
+  operations?: EngineOperation[]
+  dropped?: number
+}
+
+/**
+ * Live engine stats and new operations pushed by /api/v2/engine/stream
+ *
+ * The server sends the full state first and then only changed fields,
+ * at most maxHz times per second. `streaming` is false while the socket
+ * is down so pages can fall back to polling.
+ */
+export const useEngineStream = (maxHz: number, onOperations?: (operations: EngineOperation[]) => void) => {
+  const [stats, setStats] = useState<EngineStats | null>(null)
+  const [engineConnected, setEngineConnected] = useState(false)
+  const [streaming, setStreaming] = useState(false)
+  const onOperationsRef = useRef(onOperations)
+  onOperationsRef.current = onOperations
+
+  useEffect(() => {
+    let ws: WebSocket | null = null
+    let reconnectTimeout: ReturnType<typeof setTimeout>
+    let shouldReconnect = true
+
+    const connect = () => {
+      ws = new WebSocket(engineStreamURL(maxHz))
+
+      ws.onopen = () => setStreaming(true)
+
+      ws.onmessage = (event) => {
+        try {
+          const message: EngineStreamMessage = JSON.parse(event.data)
+          if (message.connected !== undefined) {
+            setEngineConnected(message.connected)
+          }
+          if (message.type === 'snapshot') {
+            setStats(message.stats || null)
+          } else if (message.stats) {
+            setStats((prev) => ({ ...(prev || {}), ...message.stats }))
+          }
+          if (message.operations?.length && message.type === 'update') {
+            onOperationsRef.current?.(message.operations)
+          }
+        } catch (e) {
+          console.error('Failed to parse engine stream message:', e)
+        }
+      }
+
+      ws.onclose = () => {
+        setStreaming(false)
+        if (shouldReconnect) {
+          reconnectTimeout = setTimeout(connect, 3000)
+        }
+      }
+    }
+
+    connect()
+
+    return () => {
+      shouldReconnect = false
+      if (reconnectTimeout) clearTimeout(reconnectTimeout)
+      if (ws) ws.close()
+    }
+  }, [maxHz])
+
+  return { stats, engineConnected, streaming }
+}
@@ -20,6 +20,7 @@ import {
 } from '@mui/icons-material'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
 import { arbitrageAPI } from '../services/api'
+import { useEngineStream, EngineOperation } from '../hooks/useEngineStream'
 import dayjs from 'dayjs'
 
 interface DashboardStats {
@@ -39,6 +40,9 @@ interface DashboardStats {
   worst_pair: string | null
 }
 
+// /arbitrage/profit-history returns the whole range downsampled to this many points
+const PROFIT_HISTORY_POINTS = 500
+
 interface ProfitPoint {
   timestamp: number
   profit: number
@@ -65,11 +69,45 @@ export default function ArbitrageDashboard() {
     }
   }
 
+  // New operations extend the profit chart without refetching it; past twice
+  // the fetched size every other point is dropped, so the full range stays
+  const appendOperations = (operations: EngineOperation[]) => {
+    setProfitHistory((prev) => {
+      let cumulative = prev.length ? prev[prev.length - 1].cumulative : 0
+      const points = operations.map((op) => {
+        cumulative += op.pnl
+        return { timestamp: op.timestamp, profit: op.pnl, cumulative }
+      })
+      const merged = [...prev, ...points]
+      if (merged.length <= 2 * PROFIT_HISTORY_POINTS) return merged
+      return merged.filter((_, i) => i % 2 === 0 || i === merged.length - 1)
+    })
+  }
+
+  const { stats: engineStats, engineConnected, streaming } = useEngineStream(1, appendOperations)
+
   useEffect(() => {
     fetchDashboard()
+    // Live updates come from the engine stream; poll only while it is down
+    if (streaming) return
     const interval = setInterval(fetchDashboard, 5000) // Refresh every 5s
     return () => clearInterval(interval)
-  }, [])
+  }, [streaming])
+
+  useEffect(() => {
+    if (!streaming || !engineStats) return
+    setStats((prev) => prev && {
+      ...prev,
+      engine_status: (engineConnected && engineStats.engine_running ? 'RUNNING' : 'STOPPED') as DashboardStats['engine_status'],
+      balance_usd: Number(engineStats.balance_usd),
+      total_operations: Number(engineStats.opportunities_executed),
+      total_profit: Number(engineStats.total_profit_usd),
+      avg_execution_time_us: Number(engineStats.avg_latency_us),
+      opportunities_found: Number(engineStats.opportunities_detected),
+      opportunities_executed: Number(engineStats.opportunities_executed),
+      win_rate_percent: Number(engineStats.win_rate) * 100,
+    })
+  }, [streaming, engineConnected, engineStats])
 
   if (loading || !stats) {
     return (
@@ -23,10 +23,11 @@ import {
 import dayjs from 'dayjs'
 
 interface LogEntry {
-  id: string
+  id?: number
   timestamp: number
   level: 'INFO' | 'WARN' | 'ERROR' | 'SUCCESS' | 'OPPORTUNITY'
   message: string
+  dropped?: number
   exchange?: string
   symbol?: string
   data?: any
@@ -64,6 +65,10 @@ export default function ArbitrageLogs() {
           try {
             const logEntry: LogEntry = JSON.parse(event.data)
             setLogs((prev) => {
+              // Reconnects replay recent lines: skip ones already shown
+              if (logEntry.id !== undefined && prev.some((log) => log.id === logEntry.id)) {
+                return prev
+              }
               const newLogs = [...prev, logEntry]
               // Keep last 1000 logs in memory
               if (newLogs.length > 1000) {
@@ -25,6 +25,7 @@ import {
   TrendingUp,
 } from '@mui/icons-material'
 import { engineAPI } from '../services/api'
+import { useEngineStream } from '../hooks/useEngineStream'
 
 interface EngineConfig {
   capital_usd?: number
@@ -71,17 +72,42 @@ export default function EngineControl() {
     }
   }
 
+  const { stats: engineStats, engineConnected, streaming } = useEngineStream(1)
+
   useEffect(() => {
     fetchStatus()
+    // Live updates come from the engine stream; poll only while it is down
+    if (streaming) return
     const interval = setInterval(fetchStatus, 3000)
     return () => clearInterval(interval)
-  }, [isEditing])
+  }, [isEditing, streaming])
+
+  useEffect(() => {
+    if (!streaming) return
+    setStatus((prev) => ({
+      ...prev,
+      running: engineConnected && Boolean(engineStats?.engine_running),
+      active_positions: Number(engineStats?.open_positions ?? 0),
+    }))
+  }, [streaming, engineConnected, engineStats])
+
+  // Start/stop/restart run as server-side jobs: long-poll until finished
+  const runEngineJob = async (request: () => Promise<any>) => {
+    let job = (await request()).data
+    while (job.status === 'queued' || job.status === 'running') {
+      job = (await engineAPI.getJob(job.job_id, 5000)).data
+    }
+    if (job.status !== 'succeeded') {
+      throw new Error(job.message)
+    }
+    return job
+  }
 
   const handleStart = async () => {
     setLoading(true)
     setMessage(null)
     try {
-      await engineAPI.start()
+      await runEngineJob(engineAPI.start)
       setMessage({ type: 'success', text: '✅ Engine started successfully!' })
       
       // Wait a bit for engine to fully initialize
@@ -98,7 +124,7 @@ export default function EngineControl() {
     setLoading(true)
     setMessage(null)
     try {
-      await engineAPI.stop()
+      await runEngineJob(engineAPI.stop)
       setMessage({ type: 'success', text: '🛑 Engine stopped successfully!' })
       
       // Wait a bit for engine to fully stop
@@ -115,7 +141,7 @@ export default function EngineControl() {
     setLoading(true)
     setMessage(null)
     try {
-      await engineAPI.restart()
+      await runEngineJob(engineAPI.restart)
       setMessage({ type: 'success', text: '🔄 Engine restarted successfully!' })
       await fetchStatus()
     } catch (error: any) {
@@ -72,6 +72,7 @@ export const engineAPI = {
   start: () => apiV2.post('/engine/start'),
   stop: () => apiV2.post('/engine/stop'),
   restart: () => apiV2.post('/engine/restart'),
+  getJob: (jobId: string, waitMs: number) => apiV2.get(`/engine/jobs/${jobId}`, { params: { wait_ms: waitMs } }),
   saveConfig: (config: any) => apiV2.post('/engine/config', config),
 }
 
@@ -79,7 +80,14 @@ export const arbitrageAPI = {
   getStats: () => apiV2.get('/arbitrage/stats'),
   getProfitHistory: () => apiV2.get('/arbitrage/profit-history'),
   getHistory: (params: any) => apiV2.get('/arbitrage/history', { params }),
-  exportHistory: () => apiV2.get('/arbitrage/history/export', { responseType: 'blob' }),
+  exportHistory: (params?: any) => apiV2.get('/arbitrage/history/export', { params, responseType: 'blob' }),
+}
+
+// Engine push stream (WebSocket, token in the query string)
+export const engineStreamURL = (maxHz: number) => {
+  const token = localStorage.getItem('accessToken') || ''
+  const wsBase = API_URL.replace(/^http/, 'ws')
+  return `${wsBase}/api/v2/engine/stream?max_hz=${maxHz}&token=${encodeURIComponent(token)}`
 }
 
 export const operationsAPI = {